@@ -14,3 +14,9 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'libremetronome_backend.settings')
 
 application = get_asgi_application()
+
+# Preload URL patterns, templates, the catalog and samples before the server
+# forks its workers (set METRONOME_WARMUP=1, see metronome_api/warmup.py)
+from metronome_api.warmup import maybe_warmup  # noqa: E402
+
+maybe_warmup()
@@ -32,7 +32,12 @@ CORS_ALLOW_HEADERS = [
     'x-csrftoken',
     'x-requested-with',
 ]
-CORS_EXPOSE_HEADERS = ['content-disposition']
+# The production list, plus the file names of downloads
+CORS_EXPOSE_HEADERS = [
+    'content-disposition',
+    'link', 'x-next-cursor', 'x-sync-cursor', 'x-loop-samples', 'x-sample-rate', 'retry-after',
+    'x-grid-start', 'x-grid-end', 'x-grid-format', 'x-click-count',
+]
 
 # Disable security settings for local development
 SECURE_SSL_REDIRECT = False
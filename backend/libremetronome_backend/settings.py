@@ -37,7 +37,6 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'rest_framework',
     'metronome_api',
 ]
 
@@ -56,8 +55,17 @@ CORS_ALLOWED_ORIGINS = [
 # Allow cookies and credentials
 CORS_ALLOW_CREDENTIALS = True
 
+# Pagination and sync cursors of the sound set catalog, loop render metadata,
+# the layout of beat grids and the clicks of the calibration train
+CORS_EXPOSE_HEADERS = [
+    'link', 'x-next-cursor', 'x-sync-cursor', 'x-loop-samples', 'x-sample-rate', 'retry-after',
+    'x-grid-start', 'x-grid-end', 'x-grid-format', 'x-click-count',
+]
+
 MIDDLEWARE = [
+    'metronome_api.profiling.ProfilingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'metronome_api.admission.AdmissionControlMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -94,12 +102,50 @@ WSGI_APPLICATION = 'libremetronome_backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': str(BASE_DIR / 'db.sqlite3'),
+# METRONOME_DB_ENGINE selects the profile: 'sqlite' (default) for a single
+# node, or 'postgresql' with the connection taken from the METRONOME_DB_*
+# environment variables. Both keep connections open across requests: every
+# worker thread reuses its connection for CONN_MAX_AGE seconds, and health
+# checks replace connections the server has closed in the meantime.
+METRONOME_DB_ENGINE = os.environ.get('METRONOME_DB_ENGINE', 'sqlite')
+METRONOME_DB_CONN_MAX_AGE = int(os.environ.get('METRONOME_DB_CONN_MAX_AGE', 600))
+
+if METRONOME_DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('METRONOME_DB_NAME', 'libremetronome'),
+            'USER': os.environ.get('METRONOME_DB_USER', 'libremetronome'),
+            'PASSWORD': os.environ.get('METRONOME_DB_PASSWORD', ''),
+            'HOST': os.environ.get('METRONOME_DB_HOST', 'localhost'),
+            'PORT': os.environ.get('METRONOME_DB_PORT', '5432'),
+            'CONN_MAX_AGE': METRONOME_DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            # Set METRONOME_DB_PGBOUNCER=1 behind PgBouncer in transaction
+            # pooling mode, which cannot keep server-side cursors open
+            'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('METRONOME_DB_PGBOUNCER') == '1',
+            'OPTIONS': {
+                'connect_timeout': 5,
+            },
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('METRONOME_DB_NAME', str(BASE_DIR / 'db.sqlite3')),
+            'CONN_MAX_AGE': METRONOME_DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                # Seconds a writer waits for the database lock
+                'timeout': 20,
+            },
+        }
     }
-}
+
+# Pragmas run on every new SQLite connection (metronome_api/db.py), merged
+# over the WAL/mmap defaults there; None removes a default
+METRONOME_SQLITE_PRAGMAS = {}
 
 
 # Password validation
@@ -143,6 +189,13 @@ STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'metronome_api/static'),
 ]
 
+# collectstatic writes content-hashed names plus .gz (and, with the brotli
+# package, .br) siblings, served by metronome_api.views.serve_static
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'metronome_api.staticfiles.CompressedManifestStaticFilesStorage'},
+}
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
@@ -152,6 +205,61 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 MEDIA_URL = '/metronome_sounds/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'metronome_sounds')
 
+# Read path of the sound set catalog: 'orm' (database) or 'manifest' (a file
+# written by `manage.py export_catalog_manifest`, no database needed)
+METRONOME_CATALOG_BACKEND = 'orm'
+METRONOME_CATALOG_MANIFEST = os.path.join(BASE_DIR, 'catalog_manifest.json')
+
+# Cache alias of the serialized sound set payloads (metronome_api/payload_cache.py),
+# None to disable. With several workers it must be a cache they share; payloads
+# in a process-local cache expire after 30 seconds instead of the timeout.
+METRONOME_PAYLOAD_CACHE = 'default'
+METRONOME_PAYLOAD_CACHE_TIMEOUT = 60 * 60
+
+# Largest sample accepted by the chunked upload API (metronome_api/uploads.py)
+METRONOME_MAX_UPLOAD_SIZE = 50 * 1024 * 1024
+
+# Every uploaded sample is resampled to these rates once at ingest and served
+# for ?sample_rate=<rate> (metronome_api/audio/rate_variants.py)
+METRONOME_SAMPLE_RATES = (44100, 48000)
+
+# Training telemetry log (metronome_api/telemetry.py): one NDJSON file per
+# day, appended with group commit. Disable fsync only where durability does
+# not matter, e.g. in development.
+METRONOME_TELEMETRY_DIR = os.path.join(BASE_DIR, 'telemetry')
+METRONOME_TELEMETRY_FSYNC = True
+
+# Request profiling (metronome_api/profiling.py), off by default. When
+# enabled, one in SAMPLE_RATE requests is profiled (0: none), plus every
+# request sending the header `X-Metronome-Profile: <TOKEN>` if a token is set.
+METRONOME_PROFILING_ENABLED = False
+METRONOME_PROFILING_SAMPLE_RATE = 0
+METRONOME_PROFILING_TOKEN = ''
+METRONOME_PROFILING_DIR = os.path.join(BASE_DIR, 'profiles')
+METRONOME_PROFILING_MAX_PROFILES = 200
+METRONOME_PROFILING_INTERVAL = 0.005
+METRONOME_PROFILING_TRACEMALLOC = True
+
+# Process pool for heavy audio jobs (metronome_api/jobs.py)
+METRONOME_JOB_WORKERS = 2
+METRONOME_JOB_QUEUE_LIMIT = 32
+METRONOME_JOBS_EAGER = False
+# Running jobs without a progress report for this long, and queued jobs
+# not started after this long, are failed as abandoned
+METRONOME_JOB_LEASE_SECONDS = 600
+METRONOME_JOB_QUEUE_TIMEOUT = 60 * 60
+# Seconds job output files are kept for download
+METRONOME_JOB_RESULT_TTL = 24 * 60 * 60
+# Processes rendering the segments of a setlist job (None: one per core)
+METRONOME_SETLIST_WORKERS = None
+
+# Per-client rate limits and concurrency caps (metronome_api/admission.py).
+# Set the proxy hops to the number of trusted reverse proxies in front of
+# Django so the client address is taken from X-Forwarded-For.
+METRONOME_ADMISSION_ENABLED = True
+METRONOME_ADMISSION_PROXY_HOPS = 0
+METRONOME_ADMISSION_CLASSES = {}
+
 # Security settings for production
 SECURE_SSL_REDIRECT = False
 SESSION_COOKIE_SECURE = False
@@ -1,4 +1,4 @@
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.contrib import admin
 from django.views.generic import RedirectView
 from django.conf import settings
@@ -6,6 +6,7 @@ from django.conf.urls.static import static
 
 # Import API and non-API URL patterns separately to avoid route conflicts
 from metronome_api.urls import api_urlpatterns
+from metronome_api.views import serve_static
 
 urlpatterns = [
     # Admin site
@@ -14,9 +15,13 @@ urlpatterns = [
     # API endpoints
     path('api/', include(api_urlpatterns)),
     
-    # Serve React frontend and static files
+    # Collected static files, hashed and precompressed; must come before the
+    # React catch-all
+    re_path(r'^%s(?P<path>.+)$' % settings.STATIC_URL.lstrip('/'), serve_static, name='serve_static'),
+
+    # Serve React frontend
     path('', include('metronome_api.urls')),  # Let metronome_api handle serving React
-] + static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
+]
 
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
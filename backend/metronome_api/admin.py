@@ -1,6 +1,9 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.http import StreamingHttpResponse
+from django.urls import reverse
 from django.utils.html import format_html
-from .models import MetronomeSoundSet
+from . import packs
+from .models import DeviceCalibration, Job, MetronomeSoundSet, SampleUpload, TrainingDayStats, TrainingUserStats
 
 # Register your models here.
 
@@ -11,22 +14,75 @@ class MetronomeSoundSetAdmin(admin.ModelAdmin):
     search_fields = ('name', 'description')
     readonly_fields = ('created_at', 'updated_at')
     list_filter = ('is_active', 'created_at')
+    actions = ['export_pack']
+
+    @admin.action(description='Export selected sound sets as a pack')
+    def export_pack(self, request, queryset):
+        try:
+            chunks = packs.export_pack(queryset.order_by('name', 'id'))
+        except packs.PackError as e:
+            self.message_user(request, str(e), messages.ERROR)
+            return None
+        response = StreamingHttpResponse(chunks, content_type='application/zip')
+        response['Content-Disposition'] = 'attachment; filename="sound-sets.zip"'
+        return response
     
     def sound_preview(self, obj):
         preview_html = ''
-        for field_name, label in [
-            ('first_beat_sound', 'First Beat'),
-            ('accent_sound', 'Accent'),
-            ('normal_beat_sound', 'Normal Beat')
+        for field_name, role, label in [
+            ('first_beat_sound', 'first', 'First Beat'),
+            ('accent_sound', 'accent', 'Accent'),
+            ('normal_beat_sound', 'normal', 'Normal Beat')
         ]:
-            sound_file = getattr(obj, field_name)
-            if sound_file:
-                preview_html += format_html(
-                    '<div style="margin: 5px 0;"><strong>{}</strong>: '
-                    '<audio controls style="height: 30px"><source src="{}" type="audio/mpeg">'
-                    'Your browser does not support the audio element.</audio></div>',
-                    label, sound_file.url
-                )
+            if obj.is_synthesized:
+                src, mime_type = reverse('sound_set_synth_sample', args=[obj.id, role]), 'audio/wav'
+            else:
+                sound_file = getattr(obj, field_name)
+                if not sound_file:
+                    continue
+                src, mime_type = sound_file.url, 'audio/mpeg'
+            preview_html += format_html(
+                '<div style="margin: 5px 0;"><strong>{}</strong>: '
+                '<audio controls style="height: 30px"><source src="{}" type="{}">'
+                'Your browser does not support the audio element.</audio></div>',
+                label, src, mime_type
+            )
         return format_html(preview_html)
     
     sound_preview.short_description = 'Sound Previews'
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'progress', 'created_at', 'finished_at')
+    list_filter = ('kind', 'status')
+    readonly_fields = [field.name for field in Job._meta.fields]
+
+
+@admin.register(SampleUpload)
+class SampleUploadAdmin(admin.ModelAdmin):
+    list_display = ('filename', 'status', 'received', 'total_size', 'sound_set', 'role', 'created_at')
+    list_filter = ('status', 'audio_format')
+    readonly_fields = [field.name for field in SampleUpload._meta.fields]
+
+
+@admin.register(DeviceCalibration)
+class DeviceCalibrationAdmin(admin.ModelAdmin):
+    list_display = ('device_id', 'compensation_ms', 'jitter_ms', 'clicks_detected', 'sample_rate', 'created_at')
+    search_fields = ('device_id', 'user_agent')
+    readonly_fields = [field.name for field in DeviceCalibration._meta.fields]
+
+
+@admin.register(TrainingUserStats)
+class TrainingUserStatsAdmin(admin.ModelAdmin):
+    list_display = ('user_id', 'days_active', 'measures', 'tempo_steps', 'max_bpm', 'last_event_at')
+    search_fields = ('user_id',)
+    readonly_fields = [field.name for field in TrainingUserStats._meta.fields]
+
+
+@admin.register(TrainingDayStats)
+class TrainingDayStatsAdmin(admin.ModelAdmin):
+    list_display = ('user_id', 'day', 'measures', 'silent_measures', 'tempo_steps', 'mutes', 'max_bpm')
+    list_filter = ('day',)
+    search_fields = ('user_id',)
+    readonly_fields = [field.name for field in TrainingDayStats._meta.fields]
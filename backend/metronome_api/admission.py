@@ -0,0 +1,205 @@
+"""
+Admission control for the public endpoints.
+
+Every request to a classified route is checked against a token bucket per
+client address and endpoint class; expensive classes additionally have a cap
+on requests in progress per server process; a streamed response holds its
+slot until it has been sent and closed. Requests over the limits are
+refused immediately, never queued:
+
+- 429 with ``Retry-After`` when the client's bucket is empty
+- 503 with ``Retry-After`` when the class is at its concurrency cap
+
+The buckets live in memory, shared by all threads of the process, and cost
+one lock acquisition and a few float operations per request. Buckets that
+have refilled completely are indistinguishable from new ones and are swept
+once the table grows past ``MAX_BUCKETS``.
+"""
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.http import JsonResponse
+
+# rate: tokens per second, burst: bucket size, concurrency: requests in
+# progress per process (None for no cap)
+DEFAULT_CLASSES = {
+    'render': {'rate': 2.0, 'burst': 20, 'concurrency': 4},
+    'files': {'rate': 20.0, 'burst': 200, 'concurrency': None},
+    'api': {'rate': 50.0, 'burst': 300, 'concurrency': None},
+}
+
+# URL name -> endpoint class. Other routes below /api/ are 'api'; the rest
+# (frontend, admin) is not limited.
+ROUTE_CLASSES = {
+    'render_loop': 'render',
+    'render_track': 'render',
+    'render_stems': 'render',
+    'render_setlist': 'render',
+    'beat_grid': 'render',
+    'render_midi': 'render',
+    'synth_preview': 'render',
+    'sound_set_synth_sample': 'render',
+    'sound_set_variants': 'render',
+    'calibration_create': 'render',
+    'sound_sets_import': 'render',
+    'sound_sets_sprite': 'render',
+    'sound_set_variant_file': 'files',
+    'serve_sound_file': 'files',
+    'serve_frontend_sound_file': 'files',
+    'job_result': 'files',
+    'job_events': 'files',
+    'calibration_click_train': 'files',
+    'sound_sets_export': 'files',
+    'sound_sets_sprite_file': 'files',
+    'upload_create': 'files',
+    'upload_detail': 'files',
+    'telemetry_ingest': 'files',
+}
+
+MAX_BUCKETS = 10000
+
+
+def client_address(request, proxy_hops=0):
+    """
+    The client's IP address. Behind ``proxy_hops`` trusted reverse proxies it
+    is taken from ``X-Forwarded-For``, counted from the right so that clients
+    cannot spoof it.
+    """
+    if proxy_hops:
+        forwarded = [a.strip() for a in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if a.strip()]
+        if len(forwarded) >= proxy_hops:
+            return forwarded[-proxy_hops]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def endpoint_class(request):
+    match = request.resolver_match
+    if match is None:
+        return None
+    if match.url_name in ROUTE_CLASSES:
+        return ROUTE_CLASSES[match.url_name]
+    if request.path_info.startswith('/api/'):
+        return 'api'
+    return None
+
+
+class AdmissionController:
+    """Token buckets and in-progress counters of one server process."""
+
+    def __init__(self, classes):
+        self.classes = classes
+        self.buckets = {}
+        self.in_progress = {name: 0 for name in classes}
+        self.lock = threading.Lock()
+
+    def _sweep(self, now):
+        full = [
+            key for key, (tokens, updated) in self.buckets.items()
+            if tokens + (now - updated) * self.classes[key[1]]['rate'] >= self.classes[key[1]]['burst']
+        ]
+        for key in full:
+            del self.buckets[key]
+
+    def acquire(self, client, name):
+        """
+        Admit a request, returning ``(None, None)``, or refuse it with
+        ``(status, retry_after_seconds)``.
+        """
+        config = self.classes[name]
+        now = time.monotonic()
+        with self.lock:
+            key = (client, name)
+            tokens, updated = self.buckets.get(key, (config['burst'], now))
+            tokens = min(config['burst'], tokens + (now - updated) * config['rate'])
+            if tokens < 1:
+                self.buckets[key] = (tokens, now)
+                return 429, math.ceil((1 - tokens) / config['rate'])
+
+            cap = config['concurrency']
+            if cap is not None and self.in_progress[name] >= cap:
+                # Refused requests keep their token: the client is not at fault
+                self.buckets[key] = (tokens, now)
+                return 503, 1
+
+            self.buckets[key] = (tokens - 1, now)
+            if len(self.buckets) > MAX_BUCKETS:
+                self._sweep(now)
+            if cap is not None:
+                self.in_progress[name] += 1
+        return None, None
+
+    def release(self, name):
+        if self.classes[name]['concurrency'] is not None:
+            with self.lock:
+                self.in_progress[name] -= 1
+
+
+class ReleaseOnClose:
+    """Streaming content that calls ``release`` when the response is closed."""
+
+    def __init__(self, content, release):
+        self.content = content
+        self.release = release
+
+    def __iter__(self):
+        return iter(self.content)
+
+    def close(self):
+        self.release()
+
+
+class AdmissionControlMiddleware:
+    """Refuse requests over the per-client rate or per-class concurrency limits."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'METRONOME_ADMISSION_ENABLED', True)
+        self.proxy_hops = getattr(settings, 'METRONOME_ADMISSION_PROXY_HOPS', 0)
+        classes = {name: dict(config) for name, config in DEFAULT_CLASSES.items()}
+        for name, overrides in getattr(settings, 'METRONOME_ADMISSION_CLASSES', {}).items():
+            classes[name].update(overrides)
+        self.controller = AdmissionController(classes)
+
+    def __call__(self, request):
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            self._release(request)
+            raise
+        name = getattr(request, '_admission_class', None)
+        capped = name is not None and self.controller.classes[name]['concurrency'] is not None
+        if capped and response.streaming and not getattr(response, 'is_async', False):
+            # A streamed body is produced after the view returns: keep the
+            # slot until the server has sent it and closes the response
+            response.streaming_content = ReleaseOnClose(response.streaming_content, lambda: self._release(request))
+        else:
+            self._release(request)
+        return response
+
+    def _release(self, request):
+        name = getattr(request, '_admission_class', None)
+        if name is not None:
+            request._admission_class = None
+            self.controller.release(name)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not self.enabled or request.method == 'OPTIONS':
+            return None
+        name = endpoint_class(request)
+        if name is None:
+            return None
+
+        status, retry_after = self.controller.acquire(client_address(request, self.proxy_hops), name)
+        if status is None:
+            request._admission_class = name
+            return None
+
+        if status == 429:
+            message = 'Too many requests, slow down'
+        else:
+            message = 'Server busy, try again shortly'
+        response = JsonResponse({'error': message}, status=status)
+        response['Retry-After'] = str(retry_after)
+        return response
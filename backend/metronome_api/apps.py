@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class MetronomeApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'metronome_api'
+
+    def ready(self):
+        from . import db, signals, tasks  # noqa: F401
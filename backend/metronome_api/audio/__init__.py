@@ -0,0 +1,7 @@
+"""
+Server-side audio for LibreMetronome.
+
+Everything in this package works on NumPy arrays of float32 PCM in the
+range [-1, 1]. Rhythms are described by ``rhythm.RhythmSpec`` and turned
+into integer sample positions, so rendered audio is sample accurate.
+"""
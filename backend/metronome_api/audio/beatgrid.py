@@ -0,0 +1,155 @@
+"""
+Beat grids: the onsets of a rhythm over a time window, for client scheduling.
+
+Instead of computing every next onset itself, a client can ask for the
+onsets of a window of the timeline and schedule them from a flat array. A
+grid is a packed array of ``GRID_DTYPE`` records, one per onset:
+
+- ``offset``: sample offset from the start of the window (uint32)
+- ``role``: the accent role, ``ROLE_MUTE`` for muted beats of the pattern
+- ``layer``: index of the polyrhythm layer
+- ``flags``: ``FLAG_MUTED`` for onsets silenced by training mutes,
+  ``FLAG_MEASURE`` for onsets on the downbeat of a measure
+- ``beat``: index of the beat of the onset within its layer
+
+The timeline starts at sample 0 with the first measure. One cycle of
+onsets is computed per rhythm and sample rate and memoized; windows repeat
+it for every measure they cover, without a loop over onsets.
+
+Training mutes follow the frontend's macro-timing modes: ``fixed`` plays
+``play_measures`` measures and then silences ``mute_measures``, over and
+over; ``random`` silences every beat with ``probability``. Random mutes are
+a hash of ``seed`` and the beat's position on the timeline, so a beat is
+muted or not whichever window it is requested in.
+"""
+import functools
+from dataclasses import dataclass
+
+import numpy as np
+
+from .rhythm import RhythmSpecError, cycle_steps
+
+GRID_DTYPE = np.dtype([('offset', '<u4'), ('role', 'u1'), ('layer', 'u1'), ('flags', 'u1'), ('beat', 'u1')])
+
+FLAG_MUTED = 1
+FLAG_MEASURE = 2
+
+TRAINING_MODES = ('off', 'fixed', 'random')
+MAX_TRAINING_MEASURES = 1000
+
+# Largest window and most onsets one grid may hold
+MAX_WINDOW_SECONDS = 600
+MAX_GRID_ONSETS = 100_000
+# Sample positions stay exact in int64 and float64 arithmetic
+MAX_GRID_POSITION = 2 ** 53
+
+
+@dataclass(frozen=True)
+class TrainingMutes:
+    mode: str = 'off'
+    play_measures: int = 4
+    mute_measures: int = 4
+    probability: float = 0.3
+    seed: int = 0
+
+    def cache_key(self):
+        if self.mode == 'fixed':
+            return f'fixed-{self.play_measures}-{self.mute_measures}'
+        if self.mode == 'random':
+            return f'random-{self.probability}-{self.seed}'
+        return 'off'
+
+
+def training_from_query(params):
+    """
+    Build TrainingMutes from the query parameters ``training`` (``off``,
+    ``fixed`` or ``random``), ``play_measures``, ``mute_measures``,
+    ``mute_probability`` and ``seed``.
+    """
+    mode = params.get('training') or 'off'
+    if mode not in TRAINING_MODES:
+        raise RhythmSpecError(f"training must be one of {', '.join(TRAINING_MODES)}")
+    try:
+        training = TrainingMutes(
+            mode,
+            int(params.get('play_measures', 4)),
+            int(params.get('mute_measures', 4)),
+            float(params.get('mute_probability', 0.3)),
+            int(params.get('seed', 0)),
+        )
+    except ValueError:
+        raise RhythmSpecError('play_measures, mute_measures and seed must be integers, mute_probability a number')
+    measures = (training.play_measures, training.mute_measures)
+    if not all(1 <= count <= MAX_TRAINING_MEASURES for count in measures):
+        raise RhythmSpecError(f'play_measures and mute_measures must be between 1 and {MAX_TRAINING_MEASURES}')
+    if not 0 <= training.probability <= 1:
+        raise RhythmSpecError('mute_probability must be between 0 and 1')
+    if not 0 <= training.seed < 2 ** 63:
+        raise RhythmSpecError('seed must not be negative')
+    return training
+
+
+@functools.lru_cache(maxsize=256)
+def _cycle(spec, sample_rate):
+    """One cycle of onsets with the beat of each within its layer and within the first layer."""
+    positions, roles, layers, steps = cycle_steps(spec, sample_rate)
+    subdivisions = np.array([layer.subdivisions for layer in spec.layers], dtype=np.int64)
+    beats = (steps // subdivisions[layers]).astype(np.uint8)
+    # Swing delays onsets by less than a step, never into the next beat
+    beat_starts = np.arange(spec.beats, dtype=np.int64) * spec.cycle_samples(sample_rate) // spec.beats
+    main_beats = np.searchsorted(beat_starts, positions, side='right') - 1
+    cycle = (positions, roles, layers, beats, main_beats)
+    for array in cycle:
+        array.setflags(write=False)
+    return cycle
+
+
+def _uniform(seed, index):
+    """Uniform numbers in [0, 1) that depend on ``seed`` and ``index`` only (splitmix64)."""
+    with np.errstate(over='ignore'):
+        z = index.astype(np.uint64) + np.uint64((seed * 0x9E3779B97F4A7C15 + 0x9E3779B97F4A7C15) % 2 ** 64)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        z ^= z >> np.uint64(31)
+    return (z >> np.uint64(11)).astype(np.float64) * 2.0 ** -53
+
+
+def beat_grid(spec, sample_rate, start, end, training=TrainingMutes()):
+    """Return the onsets from sample ``start`` up to ``end`` as a ``GRID_DTYPE`` array."""
+    if start < 0 or end <= start:
+        raise RhythmSpecError('the window must start at 0 or later and end after its start')
+    if end > MAX_GRID_POSITION:
+        raise RhythmSpecError(f'the window must end at sample {MAX_GRID_POSITION} at the latest')
+    if end - start > MAX_WINDOW_SECONDS * sample_rate:
+        raise RhythmSpecError(f'a window may span at most {MAX_WINDOW_SECONDS} seconds')
+    positions, roles, layers, beats, main_beats = _cycle(spec, sample_rate)
+    total = spec.cycle_samples(sample_rate)
+
+    first, last = start // total, (end - 1) // total
+    measures = np.arange(first, last + 1, dtype=np.int64)
+    if len(measures) * len(positions) > MAX_GRID_ONSETS + 2 * len(positions):
+        raise RhythmSpecError(f'a window may hold at most {MAX_GRID_ONSETS} onsets')
+    offsets = (measures[:, None] * total + positions[None, :]).ravel()
+    index = np.repeat(measures, len(positions))
+    columns = [np.tile(column, len(measures)) for column in (roles, layers, beats, main_beats)]
+    keep = (offsets >= start) & (offsets < end)
+    offsets, index = offsets[keep], index[keep]
+    roles, layers, beats, main_beats = (column[keep] for column in columns)
+    if len(offsets) > MAX_GRID_ONSETS:
+        raise RhythmSpecError(f'a window may hold at most {MAX_GRID_ONSETS} onsets')
+
+    if training.mode == 'fixed':
+        muted = index % (training.play_measures + training.mute_measures) >= training.play_measures
+    elif training.mode == 'random':
+        muted = _uniform(training.seed, index * spec.beats + main_beats) < training.probability
+    else:
+        muted = np.zeros(len(offsets), dtype=bool)
+    measure_starts = offsets % total == 0
+
+    grid = np.empty(len(offsets), dtype=GRID_DTYPE)
+    grid['offset'] = offsets - start
+    grid['role'] = roles
+    grid['layer'] = layers
+    grid['flags'] = np.where(muted, FLAG_MUTED, 0) | np.where(measure_starts, FLAG_MEASURE, 0)
+    grid['beat'] = beats
+    return grid
@@ -0,0 +1,197 @@
+"""
+Output latency calibration from a loopback recording.
+
+The client plays ``click_train(sample_rate)`` and records it at the same
+time, through a loopback cable or the microphone. Where the train shows up
+in the recording is the device's round-trip latency: the time from
+scheduling a sound to it leaving the speaker, plus the time from the
+microphone back into the recording.
+
+The clicks are short chirps at irregular intervals, so the train matches the
+recording at exactly one offset. ``analyze_recording`` finds it in two
+passes of FFT cross-correlation:
+
+1. coarse: the energy envelopes of train and recording, at a resolution of
+   ``COARSE_RATE`` frames per second, give the offset of the whole train
+2. fine: the chirp itself is correlated with a short window of the
+   recording around each expected click, all windows in one batched FFT,
+   with parabolic interpolation of the peak for sub-sample precision
+
+The median of the per-click offsets is the latency and their standard
+deviation the jitter. A 30 second recording is analyzed in milliseconds.
+"""
+import functools
+
+import numpy as np
+
+CLICK_COUNT = 24
+LEAD_IN_SECONDS = 0.5
+# Gaps between clicks are drawn from this range with a fixed seed
+MIN_GAP_SECONDS = 0.45
+MAX_GAP_SECONDS = 0.75
+TRAIN_SEED = 20240613
+
+CHIRP_SECONDS = 0.01
+CHIRP_START_HZ = 500.0
+CHIRP_END_HZ = 6000.0
+CHIRP_GAIN = 0.8
+
+# Latencies above this are treated as failed recordings
+MAX_LATENCY_SECONDS = 1.0
+COARSE_RATE = 2000
+# Half-width of the window searched around each click in the fine pass
+FINE_SEARCH_SECONDS = 0.004
+# Clicks whose normalized correlation is lower are ignored
+MIN_CLICK_CORRELATION = 0.3
+# Clicks further than this from the median offset are ignored as outliers
+MAX_DEVIATION_SECONDS = 0.002
+MIN_CLICKS = CLICK_COUNT // 2
+
+
+class CalibrationError(ValueError):
+    """Raised when the click train cannot be found in a recording."""
+
+
+@functools.lru_cache(maxsize=8)
+def chirp(sample_rate):
+    """The click: a Hann-windowed linear chirp."""
+    frames = int(round(CHIRP_SECONDS * sample_rate))
+    t = np.arange(frames) / sample_rate
+    sweep = (CHIRP_END_HZ - CHIRP_START_HZ) / CHIRP_SECONDS
+    phase = 2 * np.pi * (CHIRP_START_HZ * t + 0.5 * sweep * t * t)
+    pcm = (CHIRP_GAIN * np.sin(phase) * np.hanning(frames)).astype(np.float32)
+    pcm.setflags(write=False)
+    return pcm
+
+
+def click_times():
+    """Onset of every click in seconds from the start of the train."""
+    gaps = np.random.default_rng(TRAIN_SEED).uniform(MIN_GAP_SECONDS, MAX_GAP_SECONDS, CLICK_COUNT - 1)
+    return LEAD_IN_SECONDS + np.concatenate([[0.0], np.cumsum(gaps)])
+
+
+def click_positions(sample_rate):
+    return np.round(click_times() * sample_rate).astype(np.int64)
+
+
+@functools.lru_cache(maxsize=8)
+def click_train(sample_rate):
+    """The calibration signal as a read-only float32 array."""
+    click = chirp(sample_rate)
+    positions = click_positions(sample_rate)
+    pcm = np.zeros(positions[-1] + len(click) + int(LEAD_IN_SECONDS * sample_rate), dtype=np.float32)
+    for position in positions:
+        pcm[position:position + len(click)] = click
+    pcm.setflags(write=False)
+    return pcm
+
+
+def _envelope(pcm, block):
+    """Mean energy of consecutive blocks of ``block`` frames."""
+    blocks = pcm[:len(pcm) // block * block].reshape(-1, block)
+    return np.einsum('ij,ij->i', blocks, blocks).astype(np.float64) / block
+
+
+@functools.lru_cache(maxsize=8)
+def _train_envelope(sample_rate, block):
+    envelope = _envelope(click_train(sample_rate), block)
+    envelope -= envelope.mean()
+    envelope.setflags(write=False)
+    return envelope
+
+
+def _coarse_offset(recording, sample_rate):
+    """Offset of the train in the recording, in frames, to within one envelope block."""
+    block = max(1, sample_rate // COARSE_RATE)
+    train_env = _train_envelope(sample_rate, block)
+    recording_env = _envelope(recording, block)
+    max_lag = min(int(MAX_LATENCY_SECONDS * sample_rate) // block, len(recording_env) - 1)
+    if len(recording_env) < len(train_env) // 2:
+        raise CalibrationError('The recording is shorter than the click train')
+
+    recording_env -= recording_env.mean()
+    size = 1 << int(len(recording_env) + len(train_env)).bit_length()
+    correlation = np.fft.irfft(
+        np.fft.rfft(recording_env, size) * np.conj(np.fft.rfft(train_env, size)), size,
+    )[:max_lag + 1]
+    if not np.any(correlation > 0):
+        raise CalibrationError('The recording does not contain the click train')
+    return int(np.argmax(correlation)) * block
+
+
+def _fine_offsets(recording, sample_rate, coarse):
+    """Per-click offsets in frames and their normalized correlation peaks."""
+    click = chirp(sample_rate).astype(np.float64)
+    search = int(FINE_SEARCH_SECONDS * sample_rate) + max(1, sample_rate // COARSE_RATE)
+    width = len(click) + 2 * search
+    starts = click_positions(sample_rate) + coarse - search
+    inside = (starts >= 0) & (starts + width <= len(recording))
+    starts = starts[inside]
+    if not len(starts):
+        return np.empty(0), np.empty(0)
+
+    windows = recording[starts[:, None] + np.arange(width)].astype(np.float64)
+    size = 1 << (width + len(click)).bit_length()
+    # Lag k of row i: sum_n windows[i, n + k] * click[n]
+    correlation = np.fft.irfft(
+        np.fft.rfft(windows, size, axis=1) * np.conj(np.fft.rfft(click, size)), size, axis=1,
+    )[:, :2 * search + 1]
+    magnitude = np.abs(correlation)
+    peaks = np.argmax(magnitude, axis=1)
+
+    # Parabolic interpolation between the neighbours of each peak
+    rows = np.arange(len(peaks))
+    left = magnitude[rows, np.maximum(peaks - 1, 0)]
+    center = magnitude[rows, peaks]
+    right = magnitude[rows, np.minimum(peaks + 1, 2 * search)]
+    denominator = left - 2 * center + right
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fraction = np.where(denominator < 0, 0.5 * (left - right) / denominator, 0.0)
+
+    # Normalized correlation of the click with the part of the window it matched
+    segments = windows[rows[:, None], peaks[:, None] + np.arange(len(click))]
+    energy = np.sqrt(np.sum(segments * segments, axis=1) * np.dot(click, click))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        score = np.where(energy > 0, center / energy, 0.0)
+
+    expected = click_positions(sample_rate)[inside]
+    offsets = starts + peaks + fraction - expected
+    return offsets, score
+
+
+def analyze_recording(recording, sample_rate):
+    """
+    Locate the click train in a recording of shape ``(frames,)`` or
+    ``(frames, channels)``.
+
+    Returns a dict with ``round_trip_ms``, ``jitter_ms``, ``clicks_detected``,
+    ``clicks_total`` and ``confidence`` (mean normalized correlation of the
+    detected clicks, 0 to 1). Raises CalibrationError if the train is not
+    found reliably.
+    """
+    recording = np.asarray(recording, dtype=np.float32)
+    if recording.ndim == 2:
+        recording = recording.mean(axis=1)
+
+    coarse = _coarse_offset(recording, sample_rate)
+    offsets, score = _fine_offsets(recording, sample_rate, coarse)
+    offsets = offsets[score >= MIN_CLICK_CORRELATION]
+    score = score[score >= MIN_CLICK_CORRELATION]
+    if len(offsets) < MIN_CLICKS:
+        raise CalibrationError(
+            f'Only {len(offsets)} of {CLICK_COUNT} clicks were found in the recording; '
+            'turn the volume up or reduce background noise'
+        )
+
+    median = np.median(offsets)
+    keep = np.abs(offsets - median) <= MAX_DEVIATION_SECONDS * sample_rate
+    if keep.sum() < MIN_CLICKS:
+        raise CalibrationError('The clicks in the recording are too irregular to measure the latency')
+    offsets = offsets[keep]
+    return {
+        'round_trip_ms': float(np.median(offsets)) * 1000 / sample_rate,
+        'jitter_ms': float(np.std(offsets)) * 1000 / sample_rate,
+        'clicks_detected': int(len(offsets)),
+        'clicks_total': CLICK_COUNT,
+        'confidence': float(np.mean(score[keep])),
+    }
@@ -0,0 +1,193 @@
+"""
+Click maps as Standard MIDI Files: the tempo map and the clicks of a rhythm
+or a setlist, for DAWs, without rendering any audio.
+
+A file is format 1 at ``PPQ`` ticks per quarter note. A beat of a rhythm is
+a quarter note, so a measure lasts ``beats * PPQ`` ticks at any tempo, and
+``cycle_steps`` lays out the clicks of a measure on that tick grid: beats,
+subdivisions, polyrhythm layers and swing land where they do in rendered
+audio, to the nearest tick.
+
+The first track is the conductor track: for every song a tempo, a time
+signature of ``beats``/4 and a marker with its name, at the start of its
+count-in. Every polyrhythm layer gets a track of its own on the General
+MIDI percussion channel, so that layers can be muted or re-voiced in the
+DAW. Roles map to notes and velocities: the first layer plays a high wood
+block on first beats and accents and a low wood block on normal beats,
+further layers play claves; subdivision clicks are quieter. Muted steps
+have no events.
+
+The clicks of a layer are generated for all measures of a song at once and
+their delta times encoded as variable-length quantities with numpy. Note
+offs are sent as note ons with velocity 0, so every event of a layer track
+shares one running status and a click costs 6 to 8 bytes.
+"""
+import functools
+import struct
+
+import numpy as np
+
+from .rhythm import ROLE_ACCENT, ROLE_FIRST, ROLE_MUTE, ROLE_NORMAL, RhythmSpecError, cycle_steps
+from .setlist import count_in_spec
+
+PPQ = 960
+# Clicks are 1/64 notes, or shorter when the next click of the layer is closer
+NOTE_TICKS = PPQ // 16
+
+# General MIDI percussion, channel 10
+NOTE_ON = 0x99
+HI_WOOD_BLOCK = 76
+LOW_WOOD_BLOCK = 77
+CLAVES = 75
+
+# Indexed by role
+FIRST_LAYER_NOTES = np.zeros(4, dtype=np.uint8)
+FIRST_LAYER_NOTES[[ROLE_FIRST, ROLE_ACCENT, ROLE_NORMAL]] = [HI_WOOD_BLOCK, HI_WOOD_BLOCK, LOW_WOOD_BLOCK]
+VELOCITIES = np.zeros(4, dtype=np.uint8)
+VELOCITIES[[ROLE_FIRST, ROLE_ACCENT, ROLE_NORMAL]] = [127, 100, 80]
+SUBDIVISION_VELOCITY = 50
+
+# Tempo events hold the microseconds per quarter note in 24 bits, delta
+# times 28 bits
+MIN_MIDI_BPM = 60_000_000 / 0xFFFFFF
+MAX_TICKS = (1 << 28) - 1
+MAX_MIDI_NOTES = 500_000
+
+
+def _vlq(value):
+    """One variable-length quantity as bytes."""
+    out = [value & 0x7F]
+    value >>= 7
+    while value:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    return bytes(reversed(out))
+
+
+def encode_events(deltas, data):
+    """
+    Encode events as their delta times, in variable-length quantities,
+    followed by their data bytes: row ``i`` of the uint8 array ``data``.
+    """
+    deltas = np.asarray(deltas, dtype=np.int64)
+    lengths = 1 + (deltas >= 1 << 7) + (deltas >= 1 << 14) + (deltas >= 1 << 21)
+    sizes = lengths + data.shape[1]
+    starts = np.cumsum(sizes) - sizes
+    out = np.empty(int(sizes.sum()), dtype=np.uint8)
+    # Byte k of every quantity at once: seven bits each, most significant
+    # first, the high bit set on all but the last
+    for k in range(4):
+        has = lengths > k
+        remaining = lengths[has] - 1 - k
+        out[starts[has] + k] = (deltas[has] >> (7 * remaining)) & 0x7F | np.where(remaining > 0, 0x80, 0)
+    for column in range(data.shape[1]):
+        out[starts + lengths + column] = data[:, column]
+    return out.tobytes()
+
+
+def _meta(kind, data):
+    return bytes([0xFF, kind]) + _vlq(len(data)) + data
+
+
+def _track(events, end=0):
+    """A track chunk of ``events`` (already encoded with their delta times), ended ``end`` ticks later."""
+    data = events + _vlq(end) + _meta(0x2F, b'')
+    return b'MTrk' + struct.pack('>I', len(data)) + data
+
+
+@functools.lru_cache(maxsize=256)
+def _cycle(spec):
+    """The clicks of one measure of ``spec`` as ``(ticks, layers, notes, velocities)``."""
+    # At this rate a measure lasts beats x PPQ "samples": ticks
+    positions, roles, layers, steps = cycle_steps(spec, PPQ * spec.bpm / 60)
+    subdivisions = np.array([layer.subdivisions for layer in spec.layers], dtype=np.int64)
+    sounding = roles != ROLE_MUTE
+    notes = np.where(layers == 0, FIRST_LAYER_NOTES[roles], CLAVES).astype(np.uint8)
+    velocities = np.where(steps % subdivisions[layers] == 0, VELOCITIES[roles], SUBDIVISION_VELOCITY)
+    cycle = (positions[sounding], layers[sounding], notes[sounding], velocities[sounding].astype(np.uint8))
+    for array in cycle:
+        array.setflags(write=False)
+    return cycle
+
+
+def _conductor_track(songs):
+    events = [b'\x00' + _meta(0x03, b'Tempo map')]
+    position = previous = 0
+    for index, song in enumerate(songs):
+        spec = song.spec
+        events.append(_vlq(position - previous))
+        events.append(_meta(0x51, round(60_000_000 / spec.bpm).to_bytes(3, 'big')))
+        # beats/4, a metronome click every quarter note, eight 32nds per quarter
+        events.append(b'\x00' + _meta(0x58, bytes([spec.beats, 2, 24, 8])))
+        name = song.name or f'Song {index + 1}'
+        events.append(b'\x00' + _meta(0x06, name.encode('utf-8')))
+        previous = position
+        position += (song.count_in + song.measures) * spec.beats * PPQ
+    # The end of the conductor track marks the end of the timeline
+    return _track(b''.join(events), position - previous)
+
+
+def _layer_track(name, ticks, notes, velocities):
+    """A track of clicks at ``ticks``, every one a note on followed by its note off."""
+    events = [b'\x00' + _meta(0x03, name.encode('utf-8'))]
+    if len(ticks):
+        order = np.argsort(ticks, kind='stable')
+        ticks, notes, velocities = ticks[order], notes[order], velocities[order]
+        gaps = np.diff(ticks, append=ticks[-1] + NOTE_TICKS)
+        ends = ticks + np.clip(gaps, 1, NOTE_TICKS)
+
+        all_ticks = np.concatenate([ticks, ends])
+        is_on = np.concatenate([np.ones(len(ticks), dtype=bool), np.zeros(len(ticks), dtype=bool)])
+        # Note offs before note ons at the same tick
+        order = np.lexsort((is_on, all_ticks))
+        data = np.empty((len(order), 2), dtype=np.uint8)
+        data[:, 0] = np.concatenate([notes, notes])[order]
+        data[:, 1] = np.where(is_on, np.concatenate([velocities, velocities]), 0)[order]
+        encoded = encode_events(np.diff(all_ticks[order], prepend=0), data)
+        # The status byte goes after the first delta time; running status covers the rest
+        first = len(_vlq(int(all_ticks[order[0]])))
+        events.append(encoded[:first] + bytes([NOTE_ON]) + encoded[first:])
+    return _track(b''.join(events))
+
+
+def click_map(songs):
+    """
+    Return the Standard MIDI File of the click map of ``songs`` (see
+    ``setlist.py``): count-ins and songs back to back, with their tempo
+    and meter changes.
+    """
+    clicks = 0
+    ticks = 0
+    for song in songs:
+        if song.spec.bpm < MIN_MIDI_BPM:
+            raise RhythmSpecError(f'MIDI tempos must be at least {MIN_MIDI_BPM:.2f} bpm')
+        ticks += (song.count_in + song.measures) * song.spec.beats * PPQ
+        clicks += song.measures * len(_cycle(song.spec)[0]) + song.count_in * song.spec.beats
+    if ticks > MAX_TICKS:
+        raise RhythmSpecError('The click map is too long for a MIDI file')
+    if clicks > MAX_MIDI_NOTES:
+        raise RhythmSpecError(f'A click map may hold at most {MAX_MIDI_NOTES} clicks')
+
+    # (ticks, notes, velocities) of every part of the timeline, per layer
+    parts = [[] for _ in range(max(len(song.spec.layers) for song in songs))]
+    position = 0
+    for song in songs:
+        for spec, measures in ((count_in_spec(song.spec), song.count_in), (song.spec, song.measures)):
+            cycle_ticks, layers, notes, velocities = _cycle(spec)
+            measure_ticks = spec.beats * PPQ
+            starts = position + np.arange(measures, dtype=np.int64) * measure_ticks
+            for layer in range(len(spec.layers)):
+                selected = layers == layer
+                parts[layer].append((
+                    (starts[:, None] + cycle_ticks[selected][None, :]).ravel(),
+                    np.tile(notes[selected], measures),
+                    np.tile(velocities[selected], measures),
+                ))
+            position += measures * measure_ticks
+
+    chunks = [_conductor_track(songs)]
+    for layer, layer_parts in enumerate(parts):
+        name = 'Click' if layer == 0 else f'Layer {layer + 1}'
+        chunks.append(_layer_track(name, *(np.concatenate(column) for column in zip(*layer_parts))))
+    header = b'MThd' + struct.pack('>IHHH', 6, 1, len(chunks), PPQ)
+    return header + b''.join(chunks)
@@ -0,0 +1,104 @@
+"""
+Sample files converted to the sample rates of the clients.
+
+The frontend asks the browser for a 48 kHz AudioContext (some devices
+insist on 44.1 kHz), and ``decodeAudioData`` resamples every sample whose
+rate differs on every load. For each uploaded sample a 16-bit WAV copy at
+every rate of ``METRONOME_SAMPLE_RATES`` is written once, when the sample is
+ingested, so a client that requests the file with ``?sample_rate=<its
+rate>`` only has to parse PCM.
+
+Variants live below ``MEDIA_ROOT/resampled/<rate>/``, named after the file
+they were made from. A variant older than its source is stale and not
+served. Sources already at a target rate still get a variant there: a
+16-bit PCM WAV is the cheapest format to decode, whatever the source was.
+"""
+import os
+
+from django.conf import settings
+
+from ..models import ROLE_FIELDS
+from .resample import resample
+from .samples import SampleDecodeError, decode_native, resolve_sample_path
+from .wavfile import write_wav
+
+RATE_VARIANTS_DIR = 'resampled'
+DEFAULT_RATES = (44100, 48000)
+
+
+def target_rates():
+    return tuple(getattr(settings, 'METRONOME_SAMPLE_RATES', DEFAULT_RATES))
+
+
+def rate_variant_path(source_path, rate):
+    return os.path.join(settings.MEDIA_ROOT, RATE_VARIANTS_DIR, str(rate), os.path.basename(source_path) + '.wav')
+
+
+def _is_fresh(path, source_mtime_ns):
+    try:
+        return os.stat(path).st_mtime_ns >= source_mtime_ns
+    except OSError:
+        return False
+
+
+def find_rate_variant(source_path, rate):
+    """Path of the up-to-date ``rate`` variant of ``source_path``, or None."""
+    if rate not in target_rates():
+        return None
+    path = rate_variant_path(source_path, rate)
+    try:
+        source_mtime_ns = os.stat(source_path).st_mtime_ns
+    except OSError:
+        return None
+    return path if _is_fresh(path, source_mtime_ns) else None
+
+
+def _missing_rates(source_path, source_mtime_ns):
+    return [rate for rate in target_rates() if not _is_fresh(rate_variant_path(source_path, rate), source_mtime_ns)]
+
+
+def build_rate_variants(source_path):
+    """
+    Write the missing or stale variants of ``source_path``; return the
+    rates written. The file is decoded once for all rates.
+    """
+    source_mtime_ns = os.stat(source_path).st_mtime_ns
+    missing = _missing_rates(source_path, source_mtime_ns)
+    if not missing:
+        return []
+    pcm, source_rate = decode_native(source_path)
+    for rate in missing:
+        path = rate_variant_path(source_path, rate)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(write_wav(resample(pcm, source_rate, rate), rate))
+        os.replace(tmp_path, path)
+    return missing
+
+
+def sample_paths(sound_set):
+    """The distinct sample files of a file-backed sound set that exist here."""
+    paths = []
+    if sound_set.is_synthesized:
+        return paths
+    for field in ROLE_FIELDS.values():
+        sound_file = getattr(sound_set, field)
+        if not sound_file:
+            continue
+        try:
+            path = resolve_sample_path(sound_file.name)
+        except SampleDecodeError:
+            continue
+        if path not in paths:
+            paths.append(path)
+    return paths
+
+
+def needs_rate_variants(sound_set):
+    """Whether any sample of ``sound_set`` lacks an up-to-date variant (stat calls only)."""
+    for path in sample_paths(sound_set):
+        source_mtime_ns = os.stat(path).st_mtime_ns
+        if _missing_rates(path, source_mtime_ns):
+            return True
+    return False
@@ -0,0 +1,122 @@
+"""
+Mixing of samples at onset positions.
+
+Besides the mono loop, a rhythm can be rendered as stems for recording
+sessions: one channel each for the first beats, accents and normal beats of
+the first layer, and one channel per further polyrhythm layer. The channels
+add up to the mono loop.
+"""
+import numpy as np
+
+from .rhythm import ROLE_ACCENT, ROLE_FIRST, ROLE_NAMES, ROLE_NORMAL, cycle_onsets
+from .variants import truncate_for_interval
+
+# Above this many (onset x sample) products the FFT convolution is cheaper
+DIRECT_MIX_LIMIT = 1 << 22
+
+MAX_LOOP_SECONDS = 60
+
+# Roles of the first layer that get a stem of their own, in channel order
+STEM_ROLES = (ROLE_FIRST, ROLE_ACCENT, ROLE_NORMAL)
+
+
+def mix_circular(length, positions, sample):
+    """
+    Add ``sample`` at every position into a buffer of ``length`` samples that wraps around.
+
+    Tails running past the end continue at the start, which is what makes a
+    rendered cycle loop seamlessly.
+    """
+    return mix_circular_channels(length, 1, positions, np.zeros(len(positions), dtype=np.int64), sample)[0]
+
+
+def mix_circular_channels(length, channels, positions, channel_index, sample):
+    """
+    Like ``mix_circular``, into ``channels`` buffers at once: the onset at
+    ``positions[i]`` goes to buffer ``channel_index[i]``. Returns float64 of
+    shape ``(channels, length)``.
+    """
+    positions = np.asarray(positions, dtype=np.int64)
+    channel_index = np.asarray(channel_index, dtype=np.int64)
+    out = np.zeros((channels, length), dtype=np.float64)
+    if len(positions) == 0 or len(sample) == 0:
+        return out
+
+    if len(positions) * len(sample) <= DIRECT_MIX_LIMIT:
+        indices = channel_index[:, None] * length + (positions[:, None] + np.arange(len(sample))[None, :]) % length
+        weights = np.broadcast_to(sample, indices.shape)
+        return np.bincount(indices.ravel(), weights=weights.ravel(), minlength=channels * length).reshape(channels, length)
+
+    # Circular convolution of an impulse train with the sample folded onto the
+    # cycle, for the channels that have onsets only
+    used, rows = np.unique(channel_index, return_inverse=True)
+    impulses = np.bincount(rows * length + positions % length, minlength=len(used) * length)
+    impulses = impulses.reshape(len(used), length).astype(np.float64)
+    folded = np.bincount(np.arange(len(sample)) % length, weights=sample, minlength=length)
+    out[used] = np.fft.irfft(np.fft.rfft(impulses, axis=1) * np.fft.rfft(folded), n=length, axis=1)
+    return out
+
+
+def min_interval_ms(positions, length, sample_rate):
+    """Return the shortest gap between distinct onsets of a cycle, including the wrap to the next cycle."""
+    distinct = np.unique(positions)
+    gaps = np.diff(np.append(distinct, distinct[0] + length))
+    return float(gaps.min()) * 1000 / sample_rate
+
+
+def render_loop(spec, samples, sample_rate, truncate_tails=True):
+    """
+    Render one cycle of ``spec`` as a gapless mono loop.
+
+    ``samples`` maps role names ('first', 'accent', 'normal') to float32 PCM at
+    ``sample_rate``. Returns float32 PCM of exactly ``spec.cycle_samples(sample_rate)``
+    frames; played with looping enabled it reproduces the pattern indefinitely.
+    With ``truncate_tails`` samples longer than the shortest inter-onset
+    interval are replaced by their truncated variants.
+    """
+    length = spec.cycle_samples(sample_rate)
+    positions, roles, _ = cycle_onsets(spec, sample_rate)
+    if truncate_tails:
+        samples = truncate_for_interval(samples, min_interval_ms(positions, length, sample_rate), sample_rate)
+
+    out = np.zeros(length, dtype=np.float64)
+    for role, name in ROLE_NAMES.items():
+        selected = positions[roles == role]
+        if len(selected):
+            out += mix_circular(length, selected, samples[name])
+    return np.clip(out, -1.0, 1.0).astype(np.float32)
+
+
+def stem_names(spec):
+    """Names of the stems of ``spec`` in channel order, e.g. ``['first', 'accent', 'normal', 'layer2']``."""
+    return [ROLE_NAMES[role] for role in STEM_ROLES] + [f'layer{index + 1}' for index in range(1, len(spec.layers))]
+
+
+def render_stems(spec, samples, sample_rate, truncate_tails=True):
+    """
+    Render one cycle of ``spec`` as a gapless multi-channel loop of stems.
+
+    Takes the same arguments as ``render_loop`` and returns float32 PCM of
+    shape ``(spec.cycle_samples(sample_rate), len(stem_names(spec)))``. Each
+    sample is mixed into all stems that use it at once, and tails are
+    truncated to the shortest interval of the whole rhythm, so the stems sum
+    to the unclipped mix of ``render_loop``. Every stem is clipped on its
+    own: where the mix exceeds full scale, their sum differs from the
+    clipped loop.
+    """
+    length = spec.cycle_samples(sample_rate)
+    positions, roles, layers = cycle_onsets(spec, sample_rate)
+    if truncate_tails:
+        samples = truncate_for_interval(samples, min_interval_ms(positions, length, sample_rate), sample_rate)
+
+    role_channels = np.zeros(max(STEM_ROLES) + 1, dtype=np.int64)
+    role_channels[list(STEM_ROLES)] = np.arange(len(STEM_ROLES))
+    channel_index = np.where(layers == 0, role_channels[roles], len(STEM_ROLES) - 1 + layers.astype(np.int64))
+
+    channels = len(stem_names(spec))
+    out = np.zeros((channels, length), dtype=np.float64)
+    for role, name in ROLE_NAMES.items():
+        selected = roles == role
+        if selected.any():
+            out += mix_circular_channels(length, channels, positions[selected], channel_index[selected], samples[name])
+    return np.clip(out.T, -1.0, 1.0).astype(np.float32)
@@ -0,0 +1,107 @@
+"""
+Band-limited polyphase resampling.
+
+For a rate change of ``source_rate`` to ``target_rate`` with ``L / M`` in
+lowest terms, output frame ``n`` lies at input position ``n * M / L``, whose
+fractional part is one of only ``L`` phases. Each phase gets its own set of
+taps of a Kaiser-windowed sinc low-pass, cut off just below the lower of the
+two Nyquist frequencies. The filter bank is computed once per rate pair.
+Output frames ``n``, ``n + L``, ``n + 2L``, ... share a phase and lie ``M``
+input frames apart, so each phase is a single matrix-vector product of its
+taps with a strided view of sliding windows over the input, without copying
+the input per output frame.
+
+Rate pairs with more than ``MAX_PHASES`` phases (e.g. 44101 Hz to 48000 Hz)
+use the nearest of ``MAX_PHASES`` evenly spaced phases, an error below
+1/8000 of a frame, and gather the input around blocks of output frames.
+"""
+import functools
+import math
+
+import numpy as np
+
+# Zero crossings of the sinc on each side of the center
+ZERO_CROSSINGS = 32
+KAISER_BETA = 8.6
+# Cutoff relative to the lower Nyquist frequency
+ROLLOFF = 0.945
+MAX_PHASES = 4096
+# Output frames computed per einsum, bounding the gathered block to a few MB
+BLOCK_FRAMES = 8192
+
+
+def _kaiser(x, beta):
+    """The Kaiser window at positions ``x`` in [-1, 1]."""
+    return np.i0(beta * np.sqrt(np.clip(1.0 - x * x, 0.0, 1.0))) / np.i0(beta)
+
+
+@functools.lru_cache(maxsize=16)
+def filter_bank(up, down):
+    """
+    Taps for every phase of an ``up / down`` rate change, as a read-only
+    ``(phases, taps)`` float32 array, plus the offset of the first tap.
+
+    Tap ``k`` of phase ``p`` weighs input frame ``floor(t) - offset + k``
+    for an output frame at input position ``t`` with ``frac(t) = p / phases``.
+    """
+    phases = min(up, MAX_PHASES)
+    # Downsampling lowers the cutoff below the input Nyquist frequency and
+    # stretches the sinc by the same factor
+    cutoff = ROLLOFF * min(1.0, up / down)
+    half_width = int(math.ceil(ZERO_CROSSINGS / cutoff))
+    offset = half_width - 1
+    fractions = np.arange(phases)[:, None] / phases
+    # Distance of each tap's input frame from the output position
+    distance = fractions + offset - np.arange(2 * half_width)[None, :]
+    taps = cutoff * np.sinc(cutoff * distance) * _kaiser(distance / half_width, KAISER_BETA)
+    taps = taps.astype(np.float32)
+    taps.setflags(write=False)
+    return taps, offset
+
+
+def resample(pcm, source_rate, target_rate):
+    """
+    Resample float32 PCM of shape ``(frames,)`` or ``(frames, channels)``.
+
+    Returns ``round(frames * target_rate / source_rate)`` frames; the input
+    is returned unchanged when the rates are equal.
+    """
+    pcm = np.asarray(pcm, dtype=np.float32)
+    if source_rate == target_rate or len(pcm) == 0:
+        return pcm
+    common = math.gcd(source_rate, target_rate)
+    up, down = target_rate // common, source_rate // common
+    taps, offset = filter_bank(up, down)
+    phases, width = taps.shape
+
+    mono = pcm.ndim == 1
+    if mono:
+        pcm = pcm[:, None]
+    frames = int(round(len(pcm) * target_rate / source_rate))
+    # Zeros around the input stand in for the silence before and after it
+    padded = np.zeros((len(pcm) + 2 * width, pcm.shape[1]), dtype=np.float32)
+    padded[width:width + len(pcm)] = pcm
+
+    out = np.empty((frames, pcm.shape[1]), dtype=np.float32)
+    if phases == up:
+        # Output frames n, n + up, n + 2 * up, ... share a phase and lie
+        # ``down`` input frames apart: a strided view of the sliding
+        # windows over the input, multiplied with that phase's taps
+        windows = np.lib.stride_tricks.sliding_window_view(padded, width, axis=0)
+        for residue in range(min(up, frames)):
+            base, phase = divmod(residue * down, up)
+            start = base + width - offset
+            count = len(range(residue, frames, up))
+            out[residue::up] = windows[start:start + count * down:down] @ taps[phase]
+    else:
+        tap_index = np.arange(width)
+        for start in range(0, frames, BLOCK_FRAMES):
+            n = np.arange(start, min(start + BLOCK_FRAMES, frames), dtype=np.int64)
+            base, remainder = np.divmod(n * down, up)
+            phase = (remainder * phases + up // 2) // up
+            # Rounding up to the next phase moves the position into the next frame
+            base = base + phase // phases
+            phase = phase % phases
+            window = padded[(base + width - offset)[:, None] + tap_index]
+            out[start:start + len(n)] = np.einsum('nk,nkc->nc', taps[phase], window)
+    return out[:, 0] if mono else out
@@ -0,0 +1,227 @@
+"""
+Rhythm specifications and their onsets.
+
+A rhythm is one measure (the cycle) played by one or more layers. The first
+layer defines the measure: ``len(accents)`` beats at ``bpm``. Further layers
+are polyrhythms spread evenly over the same measure, like the circles of the
+polyrhythm mode. Accent values follow the frontend: 3 = first beat,
+2 = accent, 1 = normal beat, 0 = muted. Subdivision clicks inside a beat use
+the normal sound and are muted together with their beat.
+
+With ``swing`` (0 to 0.5, as the frontend's swing slider) every odd step of
+the first layer is played late by that fraction of a step, like the long
+and short halves of swung eighths; onsets of other layers on those steps
+move along with them. The cycle length does not change.
+
+All layers are laid out on a common grid whose size is the least common
+multiple of every layer's steps (beats x subdivisions), and grid points are
+mapped to integer sample positions, so onsets are sample accurate and a
+cycle loops without drift. Positions are computed per layer, step index
+times cycle length over steps, which is the same point of the grid.
+
+Views parse specs on every render request, so numpy is only imported by the
+functions that lay out onsets.
+"""
+import hashlib
+import json
+import math
+from dataclasses import dataclass
+
+ROLE_MUTE = 0
+ROLE_NORMAL = 1
+ROLE_ACCENT = 2
+ROLE_FIRST = 3
+
+ROLE_NAMES = {ROLE_FIRST: 'first', ROLE_ACCENT: 'accent', ROLE_NORMAL: 'normal'}
+
+MIN_BPM = 1
+MAX_BPM = 1000
+MAX_BEATS = 64
+MAX_SUBDIVISIONS = 16
+MAX_LAYERS = 8
+MAX_SWING = 0.5
+
+
+class RhythmSpecError(ValueError):
+    """Raised for rhythm specifications that are malformed or out of range."""
+
+
+@dataclass(frozen=True)
+class Layer:
+    accents: tuple
+    subdivisions: int = 1
+
+    @property
+    def steps(self):
+        return len(self.accents) * self.subdivisions
+
+
+@dataclass(frozen=True)
+class RhythmSpec:
+    bpm: float
+    layers: tuple
+    swing: float = 0.0
+
+    @property
+    def beats(self):
+        return len(self.layers[0].accents)
+
+    @property
+    def grid_size(self):
+        return math.lcm(*(layer.steps for layer in self.layers))
+
+    def cycle_seconds(self):
+        return self.beats * 60.0 / self.bpm
+
+    def cycle_samples(self, sample_rate):
+        return int(round(self.cycle_seconds() * sample_rate))
+
+    def to_dict(self):
+        data = {
+            'bpm': self.bpm,
+            'layers': [{'accents': list(l.accents), 'subdivisions': l.subdivisions} for l in self.layers],
+        }
+        # Left out when unset so that cache keys of straight rhythms stay the same
+        if self.swing:
+            data['swing'] = self.swing
+        return data
+
+    def cache_key(self):
+        raw = json.dumps(self.to_dict(), sort_keys=True, separators=(',', ':'))
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def _parse_int_list(value, name):
+    if isinstance(value, str):
+        value = [v for v in value.split(',') if v.strip()]
+    try:
+        return tuple(int(v) for v in value)
+    except (TypeError, ValueError):
+        raise RhythmSpecError(f'{name} must be a list of integers')
+
+
+def _parse_number(value, name, cast=float):
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        raise RhythmSpecError(f'{name} must be a number')
+
+
+def build_spec(bpm, layers, swing=0):
+    """Validate raw values and build a RhythmSpec. ``layers`` is a list of (accents, subdivisions)."""
+    bpm = _parse_number(bpm, 'bpm')
+    if not MIN_BPM <= bpm <= MAX_BPM:
+        raise RhythmSpecError(f'bpm must be between {MIN_BPM} and {MAX_BPM}')
+    swing = _parse_number(swing, 'swing')
+    if not 0 <= swing <= MAX_SWING:
+        raise RhythmSpecError(f'swing must be between 0 and {MAX_SWING}')
+    if not 1 <= len(layers) <= MAX_LAYERS:
+        raise RhythmSpecError(f'between 1 and {MAX_LAYERS} layers are supported')
+
+    built = []
+    for accents, subdivisions in layers:
+        accents = _parse_int_list(accents, 'accents')
+        subdivisions = _parse_number(subdivisions, 'subdivisions', int)
+        if not 1 <= len(accents) <= MAX_BEATS:
+            raise RhythmSpecError(f'accents must have between 1 and {MAX_BEATS} beats')
+        if any(a not in ROLE_NAMES and a != ROLE_MUTE for a in accents):
+            raise RhythmSpecError('accent values must be 0, 1, 2 or 3')
+        if not 1 <= subdivisions <= MAX_SUBDIVISIONS:
+            raise RhythmSpecError(f'subdivisions must be between 1 and {MAX_SUBDIVISIONS}')
+        built.append(Layer(accents, subdivisions))
+    return RhythmSpec(bpm, tuple(built), swing)
+
+
+def spec_from_query(params):
+    """
+    Build a RhythmSpec from query parameters.
+
+    ``accents`` may be repeated, once per layer. ``subdivisions`` is either a
+    single value for all layers or repeated once per layer. ``swing`` is
+    optional.
+    """
+    accents = params.getlist('accents')
+    if not accents:
+        raise RhythmSpecError('accents is required')
+    subdivisions = params.getlist('subdivisions') or ['1']
+    if len(subdivisions) == 1:
+        subdivisions = subdivisions * len(accents)
+    if len(subdivisions) != len(accents):
+        raise RhythmSpecError('subdivisions must be given once or once per layer')
+    return build_spec(params.get('bpm', 120), list(zip(accents, subdivisions)), params.get('swing') or 0)
+
+
+def spec_from_dict(data):
+    """Build a RhythmSpec from a JSON object like ``{"bpm": 120, "layers": [{"accents": [3, 1]}]}``."""
+    if not isinstance(data, dict):
+        raise RhythmSpecError('rhythm must be an object')
+    layers = data.get('layers')
+    if layers is None and 'accents' in data:
+        layers = [{'accents': data['accents'], 'subdivisions': data.get('subdivisions', 1)}]
+    if not isinstance(layers, list):
+        raise RhythmSpecError('layers must be a list')
+    try:
+        raw = [(layer['accents'], layer.get('subdivisions', 1)) for layer in layers]
+    except (TypeError, KeyError):
+        raise RhythmSpecError('every layer needs accents')
+    return build_spec(data.get('bpm', 120), raw, data.get('swing', 0))
+
+
+def layer_roles(layer):
+    """Return the role of every step of a layer as a uint8 array."""
+    import numpy as np
+
+    accents = np.asarray(layer.accents, dtype=np.uint8)
+    roles = np.repeat(accents, layer.subdivisions).reshape(-1, layer.subdivisions)
+    # Subdivision clicks sound as normal beats unless their beat is muted
+    roles[:, 1:] = np.where(roles[:, 1:] == ROLE_MUTE, ROLE_MUTE, ROLE_NORMAL)
+    return roles.ravel()
+
+
+def cycle_steps(spec, sample_rate):
+    """
+    Return the onsets of one cycle as ``(positions, roles, layers, steps)``.
+
+    Like ``cycle_onsets``, with ``steps`` the int64 index of every onset
+    among the steps of its layer.
+    """
+    import numpy as np
+
+    total = spec.cycle_samples(sample_rate)
+    main_steps = spec.layers[0].steps
+    # Swing delay of the odd steps of the first layer, in samples
+    delay = int(round(spec.swing * total / main_steps)) if main_steps >= 2 else 0
+    positions, roles, layers, steps = [], [], [], []
+    for index, layer in enumerate(spec.layers):
+        # Grid point k * grid / steps, mapped to k * total // steps: the
+        # same position, without forming the common grid, whose size can
+        # reach 1e14 for coprime layers and overflow int64 times samples
+        indices = np.arange(layer.steps, dtype=np.int64)
+        layer_positions = indices * total // layer.steps
+        if delay:
+            # On a step of the first layer, and an odd one
+            main_index, remainder = np.divmod(indices * main_steps, layer.steps)
+            swung = (remainder == 0) & (main_index % 2 == 1)
+            layer_positions = np.where(swung, layer_positions + delay, layer_positions)
+        positions.append(layer_positions)
+        roles.append(layer_roles(layer))
+        layers.append(np.full(layer.steps, index, dtype=np.uint8))
+        steps.append(np.arange(layer.steps, dtype=np.int64))
+
+    positions = np.concatenate(positions)
+    order = np.argsort(positions, kind='stable')
+    return (
+        positions[order], np.concatenate(roles)[order], np.concatenate(layers)[order], np.concatenate(steps)[order],
+    )
+
+
+def cycle_onsets(spec, sample_rate):
+    """
+    Return the onsets of one cycle as ``(positions, roles, layers)``.
+
+    ``positions`` are int64 sample offsets from the start of the cycle, sorted
+    ascending; ``roles`` and ``layers`` are uint8. Muted steps are included
+    with ``ROLE_MUTE`` so callers can tell silence from absence.
+    """
+    positions, roles, layers, _ = cycle_steps(spec, sample_rate)
+    return positions, roles, layers
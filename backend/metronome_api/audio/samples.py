@@ -0,0 +1,103 @@
+"""
+Loading of sound set samples as mono float32 arrays.
+
+Synthesized sound sets are generated by ``synth``. For file-backed ones, WAV
+files are decoded in-process; MP3 and Ogg need ``ffmpeg`` on the PATH, and
+without it those samples cannot be rendered server-side. Samples are
+decoded at their own rate and converted with the polyphase resampler of
+``resample``. Decoded samples are memoized per file path, modification time
+and sample rate, and returned read-only so the cached arrays can be shared
+safely.
+"""
+import functools
+import os
+import shutil
+import subprocess
+
+import numpy as np
+from django.conf import settings
+
+from ..models import ROLE_FIELDS
+from .resample import resample
+from .synth import synthesize_sound_set
+from .wavfile import WavError, read_wav
+
+
+class SampleDecodeError(Exception):
+    """Raised when a sample file is missing or cannot be decoded."""
+
+
+def resolve_sample_path(name):
+    """
+    Find a sample file below MEDIA_ROOT.
+
+    Mirrors the lookup of ``views.serve_sound_file``: files may live directly in
+    MEDIA_ROOT or in the legacy ``metronome_sounds/`` sub directory.
+    """
+    candidates = [
+        os.path.join(settings.MEDIA_ROOT, name),
+        os.path.join(settings.MEDIA_ROOT, 'metronome_sounds', os.path.basename(name)),
+    ]
+    for path in candidates:
+        if os.path.isfile(path):
+            return path
+    raise SampleDecodeError(f'Sample file {name} not found')
+
+
+def _decode_with_ffmpeg(path):
+    ffmpeg = shutil.which('ffmpeg')
+    if not ffmpeg:
+        raise SampleDecodeError(
+            f'Cannot decode {os.path.basename(path)}: only WAV samples can be rendered without ffmpeg'
+        )
+    # A float WAV keeps the channels and the rate of the source
+    result = subprocess.run(
+        [ffmpeg, '-v', 'error', '-i', path, '-f', 'wav', '-c:a', 'pcm_f32le', '-'],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False,
+    )
+    if result.returncode != 0:
+        raise SampleDecodeError(f'ffmpeg failed to decode {os.path.basename(path)}')
+    return result.stdout
+
+
+def decode_native(path):
+    """Decode the file at ``path`` into float32 ``(pcm, sample_rate)`` with ``pcm`` of shape ``(frames, channels)``."""
+    source = path if path.lower().endswith('.wav') else _decode_with_ffmpeg(path)
+    try:
+        return read_wav(source)
+    except WavError as e:
+        raise SampleDecodeError(f'Cannot decode {os.path.basename(path)}: {e}')
+    except OSError:
+        raise SampleDecodeError(f'Sample file {os.path.basename(path)} not found')
+
+
+@functools.lru_cache(maxsize=256)
+def _decode_cached(path, mtime_ns, size, sample_rate):
+    pcm, source_rate = decode_native(path)
+    mono = resample(pcm.mean(axis=1, dtype=np.float32), source_rate, sample_rate)
+    mono = np.ascontiguousarray(mono, dtype=np.float32)
+    mono.setflags(write=False)
+    return mono
+
+
+def decode_sample(path, sample_rate):
+    """Return the sample at ``path`` as a read-only mono float32 array at ``sample_rate``."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        raise SampleDecodeError(f'Sample file {os.path.basename(path)} not found')
+    return _decode_cached(path, stat.st_mtime_ns, stat.st_size, sample_rate)
+
+
+def load_sound_set_samples(sound_set, sample_rate):
+    """Return ``{role: pcm}`` for the first, accent and normal samples of a sound set."""
+    if sound_set.is_synthesized:
+        return synthesize_sound_set(sound_set.synth_params, sample_rate)
+
+    samples = {}
+    for role, field_name in ROLE_FIELDS.items():
+        sound_file = getattr(sound_set, field_name)
+        if not sound_file:
+            raise SampleDecodeError(f'Sound set {sound_set.pk} has no {role} sample')
+        samples[role] = decode_sample(resolve_sample_path(sound_file.name), sample_rate)
+    return samples
@@ -0,0 +1,239 @@
+"""
+Setlists: a sequence of songs rendered into one gapless click track.
+
+Every song has its own rhythm (tempo, meter, accents, layers, swing), a
+number of ``measures`` and an optional ``count_in``: measures of plain beats
+at the song's tempo, first beat accented, played before it. Songs follow
+each other without a gap.
+
+The timeline is bookkept in samples. A measure lasts
+``spec.cycle_samples(sample_rate)`` samples, as in click tracks, and every
+part (count-in or song) starts where the previous one ended, so boundaries
+fall on exact integer sample positions however many songs precede them.
+
+For rendering, the timeline is cut at measure boundaries into segments of
+at most ``SEGMENT_SECONDS`` that are rendered independently, in parallel
+processes. A segment is mixed linearly and returns the tails of its last
+clicks past its end as well; the tails are added onto the start of the
+following segments (overlap-add) when the segments are stitched together in
+order, so the result is the same as a single pass over the whole timeline.
+"""
+import collections
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+
+from .render import min_interval_ms, mix_circular
+from .rhythm import ROLE_FIRST, ROLE_NAMES, ROLE_NORMAL, RhythmSpecError, build_spec, cycle_onsets, spec_from_dict
+from .variants import truncate_for_interval
+from .wavfile import to_pcm16
+
+MAX_SONGS = 200
+MAX_COUNT_IN = 8
+SEGMENT_SECONDS = 30
+
+
+@dataclass(frozen=True)
+class Song:
+    spec: object
+    measures: int
+    count_in: int = 0
+    name: str = ''
+
+
+@dataclass(frozen=True)
+class Segment:
+    """``measures`` measures of ``spec`` starting at sample ``start`` of the timeline."""
+    spec: object
+    start: int
+    measures: int
+
+    def frames(self, sample_rate):
+        return self.spec.cycle_samples(sample_rate) * self.measures
+
+
+def setlist_from_dict(data):
+    """
+    Build the songs of a setlist from a JSON object like
+    ``{"songs": [{"name": "Intro", "bpm": 96, "accents": [3, 1, 1, 1], "measures": 32, "count_in": 1}]}``.
+    Songs take the rhythm fields of ``spec_from_dict``.
+    """
+    if not isinstance(data, dict) or not isinstance(data.get('songs'), list):
+        raise RhythmSpecError('songs must be a list')
+    if not 1 <= len(data['songs']) <= MAX_SONGS:
+        raise RhythmSpecError(f'a setlist must have between 1 and {MAX_SONGS} songs')
+    songs = []
+    for index, song in enumerate(data['songs']):
+        if not isinstance(song, dict):
+            raise RhythmSpecError(f'song {index + 1} must be an object')
+        try:
+            spec = spec_from_dict(song)
+            measures = int(song.get('measures', 1))
+            count_in = int(song.get('count_in', 0))
+        except (TypeError, ValueError) as e:
+            raise RhythmSpecError(f'song {index + 1}: {e}')
+        if measures < 1:
+            raise RhythmSpecError(f'song {index + 1}: measures must be positive')
+        if not 0 <= count_in <= MAX_COUNT_IN:
+            raise RhythmSpecError(f'song {index + 1}: count_in must be between 0 and {MAX_COUNT_IN}')
+        songs.append(Song(spec, measures, count_in, str(song.get('name') or '')[:200]))
+    return songs
+
+
+def song_to_dict(song):
+    return {**song.spec.to_dict(), 'measures': song.measures, 'count_in': song.count_in, 'name': song.name}
+
+
+def count_in_spec(spec):
+    """One measure of plain beats at the tempo of ``spec``, its first beat accented."""
+    accents = [ROLE_FIRST] + [ROLE_NORMAL] * (spec.beats - 1)
+    return build_spec(spec.bpm, [(accents, 1)])
+
+
+def setlist_seconds(songs):
+    return sum(song.spec.cycle_seconds() * (song.measures + song.count_in) for song in songs)
+
+
+def _plan_part(segments, spec, measures, position, sample_rate, segment_seconds):
+    per_segment = max(1, int(segment_seconds / spec.cycle_seconds()))
+    for first in range(0, measures, per_segment):
+        segment = Segment(spec, position, min(per_segment, measures - first))
+        segments.append(segment)
+        position += segment.frames(sample_rate)
+    return position
+
+
+def plan_segments(songs, sample_rate, segment_seconds=SEGMENT_SECONDS):
+    """
+    Cut the timeline of ``songs`` into segments. Returns ``(segments,
+    markers, frames)``: the segments in timeline order, the sample positions
+    of every song (``start`` of its count-in and ``downbeat`` of its first
+    measure) and the length of the timeline.
+    """
+    segments = []
+    markers = []
+    position = 0
+    for song in songs:
+        start = position
+        position = _plan_part(segments, count_in_spec(song.spec), song.count_in, position, sample_rate, segment_seconds)
+        markers.append({'name': song.name, 'start': start, 'downbeat': position})
+        position = _plan_part(segments, song.spec, song.measures, position, sample_rate, segment_seconds)
+    return segments, markers, position
+
+
+def render_measure(spec, samples, sample_rate):
+    """
+    One measure of ``spec`` mixed linearly: float32 PCM of the measure
+    followed by the tails of its clicks that reach past its end.
+
+    Tails are truncated to the shortest interval of the rhythm, as in click
+    tracks, so they never reach past the following measure.
+    """
+    total = spec.cycle_samples(sample_rate)
+    positions, roles, _ = cycle_onsets(spec, sample_rate)
+    samples = truncate_for_interval(samples, min_interval_ms(positions, total, sample_rate), sample_rate)
+    # Long enough that nothing wraps around: the mix is linear
+    length = total + max(len(pcm) for pcm in samples.values())
+    out = np.zeros(length, dtype=np.float64)
+    for role, name in ROLE_NAMES.items():
+        selected = positions[roles == role]
+        if len(selected):
+            out += mix_circular(length, selected, samples[name])
+    return out.astype(np.float32)
+
+
+def render_segment(segment, samples, sample_rate):
+    """
+    Render a segment on its own: float32 PCM of its frames followed by the
+    tails of its last clicks that reach into the following segments.
+    """
+    total = segment.spec.cycle_samples(sample_rate)
+    measure = render_measure(segment.spec, samples, sample_rate)
+    tail = measure[total:]
+    # Every measure but the first also holds the tails of the one before
+    loop = measure[:total].copy()
+    loop[:len(tail)] += tail
+    out = np.concatenate([np.tile(loop, segment.measures), tail])
+    out[:total] = measure[:total]
+    return out
+
+
+def _render_split(segment, samples, sample_rate):
+    """
+    Render a segment as ``(head, body, tail)``: float32 PCM of the frames
+    that tails of earlier segments may reach into, 16-bit PCM bytes of the
+    rest of the segment and float32 PCM of its own tails.
+    """
+    frames = segment.frames(sample_rate)
+    pcm = render_segment(segment, samples, sample_rate)
+    head = min(frames, max(len(sample) for sample in samples.values()))
+    return pcm[:head], to_pcm16(pcm[head:frames]), pcm[frames:]
+
+
+_worker_samples = None
+
+
+def _init_worker(samples):
+    global _worker_samples
+    _worker_samples = samples
+
+
+def _render_in_worker(segment, sample_rate):
+    return _render_split(segment, _worker_samples, sample_rate)
+
+
+def _rendered_in_order(segments, samples, sample_rate, workers):
+    """Yield the renders of ``segments`` in order, computed by ``workers`` processes."""
+    if workers <= 1 or len(segments) <= 1:
+        for segment in segments:
+            yield _render_split(segment, samples, sample_rate)
+        return
+
+    # The samples are sent to every worker once. Workers are forked and
+    # never use the database connections they inherit.
+    executor = ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context('fork'),
+        initializer=_init_worker, initargs=(samples,),
+    )
+    try:
+        # A bounded window of segments in flight keeps memory flat
+        pending = collections.deque()
+        for segment in segments:
+            pending.append(executor.submit(_render_in_worker, segment, sample_rate))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def render_setlist(segments, samples, sample_rate, write, workers=1, progress=None):
+    """
+    Render ``segments`` (from ``plan_segments``) and pass the timeline to
+    ``write`` in order, as 16-bit PCM bytes. Tails are overlap-added across
+    segment boundaries; the tails of the last clicks are cut at the end of
+    the timeline. ``progress(done, total)`` is called after every segment.
+
+    Workers convert all but the first frames of a segment, which the tails
+    of earlier segments cannot reach, to PCM themselves, so only those and
+    the segment's own tails are mixed here.
+    """
+    carry = np.zeros(0, dtype=np.float32)
+    rendered = _rendered_in_order(segments, samples, sample_rate, workers)
+    try:
+        for index, (head, body, tail) in enumerate(rendered):
+            # Truncated tails end within a measure of the next click, and
+            # segments hold at least one measure of 60 ms or more: the
+            # tails of a segment fit into the head of the next one
+            head = head.copy()
+            head[:len(carry)] += carry
+            write(to_pcm16(head))
+            write(body)
+            carry = tail
+            if progress:
+                progress(index + 1, len(segments))
+    finally:
+        rendered.close()
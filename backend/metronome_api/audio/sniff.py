@@ -0,0 +1,162 @@
+"""
+Audio format detection from the first bytes of a file.
+
+``sniff_audio(head, complete)`` looks at a prefix of a file and returns
+``'wav'``, ``'mp3'`` or ``'ogg'`` once the header proves the format, ``None``
+while more bytes are needed, and raises ``AudioFormatError`` as soon as the
+bytes cannot belong to a supported file. Uploads call it with the bytes
+received so far, so a bad file is refused after its first few KB.
+
+Checked structures:
+- WAV: RIFF/WAVE container with a plausible ``fmt `` chunk
+- MP3: an optional ID3v2 tag followed by two consecutive valid MPEG audio
+  frame headers
+- Ogg: a beginning-of-stream page carrying a Vorbis or Opus header
+"""
+import struct
+
+# Longest prefix that may be needed (ID3 tags with cover art are large)
+MAX_SNIFF_BYTES = 4 * 1024 * 1024
+
+WAV_FORMATS = {1, 3, 0xFFFE}  # PCM, IEEE float, extensible
+WAV_BITS = {8, 16, 24, 32, 64}
+
+# Bitrates in kbit/s by [version is MPEG-1][layer][index]
+MPEG_BITRATES = {
+    (True, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+# Sample rates by version bits (0: MPEG-2.5, 2: MPEG-2, 3: MPEG-1)
+MPEG_SAMPLE_RATES = {0: (11025, 12000, 8000), 2: (22050, 24000, 16000), 3: (44100, 48000, 32000)}
+
+OGG_CODECS = (b'\x01vorbis', b'OpusHead')
+
+EXTENSIONS = {'wav': {'.wav'}, 'mp3': {'.mp3'}, 'ogg': {'.ogg'}}
+
+
+class AudioFormatError(ValueError):
+    """Raised when the bytes are not a supported audio file."""
+
+
+def _sniff_wav(head):
+    if len(head) < 12:
+        return None
+    if head[8:12] != b'WAVE':
+        raise AudioFormatError('RIFF file is not WAVE')
+    offset = 12
+    while True:
+        if len(head) < offset + 8:
+            return None
+        chunk_id, size = struct.unpack_from('<4sI', head, offset)
+        if chunk_id == b'fmt ':
+            if size < 16:
+                raise AudioFormatError('WAV fmt chunk is too short')
+            if len(head) < offset + 24:
+                return None
+            fmt, channels, sample_rate, _, _, bits = struct.unpack_from('<HHIIHH', head, offset + 8)
+            if fmt not in WAV_FORMATS:
+                raise AudioFormatError(f'Unsupported WAV encoding {fmt:#x}')
+            if not 1 <= channels <= 8 or not 4000 <= sample_rate <= 384000 or bits not in WAV_BITS:
+                raise AudioFormatError('Implausible WAV format parameters')
+            return 'wav'
+        offset += 8 + size + (size & 1)
+        if offset > MAX_SNIFF_BYTES:
+            raise AudioFormatError('WAV file has no fmt chunk near its start')
+
+
+def mpeg_frame_length(header):
+    """Length in bytes of the MPEG audio frame with the 4-byte ``header``, or None if invalid."""
+    b1, b2 = header[1], header[2]
+    if header[0] != 0xFF or b1 & 0xE0 != 0xE0:
+        return None
+    version = (b1 >> 3) & 3
+    layer = 4 - ((b1 >> 1) & 3)
+    bitrate_index = b2 >> 4
+    rate_index = (b2 >> 2) & 3
+    if version == 1 or layer == 4 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    mpeg1 = version == 3
+    bitrate = MPEG_BITRATES[(mpeg1, layer)][bitrate_index] * 1000
+    sample_rate = MPEG_SAMPLE_RATES[version][rate_index]
+    padding = (b2 >> 1) & 1
+    if layer == 1:
+        return (12 * bitrate // sample_rate + padding) * 4
+    if layer == 3 and not mpeg1:
+        return 72 * bitrate // sample_rate + padding
+    return 144 * bitrate // sample_rate + padding
+
+
+def _sniff_mp3(head, complete):
+    offset = 0
+    if head[:3] == b'ID3':
+        if len(head) < 10:
+            return None
+        size_bytes = head[6:10]
+        if any(b & 0x80 for b in size_bytes):
+            raise AudioFormatError('Invalid ID3 tag size')
+        size = (size_bytes[0] << 21) | (size_bytes[1] << 14) | (size_bytes[2] << 7) | size_bytes[3]
+        offset = 10 + size + (10 if head[5] & 0x10 else 0)
+        if offset > MAX_SNIFF_BYTES:
+            raise AudioFormatError('ID3 tag is too large')
+    if len(head) < offset + 4:
+        return None
+    length = mpeg_frame_length(head[offset:offset + 4])
+    if length is None:
+        raise AudioFormatError('No MPEG audio frame at the start of the file')
+    # A second frame right after the first rules out a chance sync pattern
+    if len(head) < offset + length + 4:
+        # ... unless the file is a single frame
+        return 'mp3' if complete and len(head) == offset + length else None
+    if mpeg_frame_length(head[offset + length:offset + length + 4]) is None:
+        raise AudioFormatError('MPEG audio frames are not consecutive')
+    return 'mp3'
+
+
+def _sniff_ogg(head):
+    if len(head) < 27:
+        return None
+    version, header_type = head[4], head[5]
+    if version != 0 or not header_type & 0x02:
+        raise AudioFormatError('Ogg file does not start with a beginning-of-stream page')
+    segments = head[26]
+    if len(head) < 27 + segments + 8:
+        return None
+    packet = head[27 + segments:27 + segments + 8]
+    if not any(packet.startswith(codec) for codec in OGG_CODECS):
+        raise AudioFormatError('Ogg stream is neither Vorbis nor Opus')
+    return 'ogg'
+
+
+def sniff_audio(head, complete=False):
+    """
+    Identify the audio format of a file from its first bytes.
+
+    ``complete`` says that ``head`` is the whole file, in which case an
+    undecided result is an error.
+    """
+    head = bytes(head[:MAX_SNIFF_BYTES])
+    if head[:4] == b'RIFF':
+        result = _sniff_wav(head)
+    elif head[:4] == b'OggS':
+        result = _sniff_ogg(head)
+    elif head[:3] == b'ID3' or head[:1] == b'\xff':
+        result = _sniff_mp3(head, complete)
+    elif len(head) < 4 and any(magic.startswith(head) for magic in (b'RIFF', b'OggS', b'ID3')):
+        result = None
+    else:
+        raise AudioFormatError('Not a WAV, MP3 or Ogg file')
+
+    if result is None and (complete or len(head) >= MAX_SNIFF_BYTES):
+        raise AudioFormatError('File is too short to be a valid audio file')
+    return result
+
+
+def check_extension(filename, audio_format):
+    """Raise AudioFormatError if ``filename``'s extension does not match the detected format."""
+    extension = '.' + filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if extension not in EXTENSIONS[audio_format]:
+        raise AudioFormatError(f'File content is {audio_format.upper()} but the name ends in {extension or "nothing"}')
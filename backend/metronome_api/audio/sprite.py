@@ -0,0 +1,226 @@
+"""
+One audio sprite with the previews of every sound set.
+
+Auditioning sound sets in the picker used to load three sample files per
+set. The sprite concatenates a short preview of the first, accent and
+normal sample of every set into a single mono 16-bit WAV, and a table gives
+the position of each preview in it, so the picker needs two requests
+however many sets there are.
+
+Previews are the samples with their trailing silence cut, at most
+``PREVIEW_MS`` long and faded out like the tempo variants. Silence of
+``GAP_MS`` separates neighbouring previews, so the filter of a client that
+resamples the sprite on decode cannot smear one preview into the next.
+
+The sprite is rebuilt incrementally: the previews of a set are kept below
+``MEDIA_ROOT/sprites/<rate>/segments/`` under the version of the set, so
+after a change only the previews of changed sets are rendered again and the
+sprite is reassembled from the stored ones. Sprites are named after a hash
+of the versions of all sets, which makes their URLs immutable.
+"""
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+from django.conf import settings
+
+from ..models import ROLE_FIELDS, MetronomeSoundSet
+from .samples import SampleDecodeError, load_sound_set_samples
+from .variants import MAX_FADE_MS, truncate_with_fade
+from .wavfile import to_pcm16, wav_header
+
+SPRITES_DIR = 'sprites'
+SEGMENTS_DIR = 'segments'
+
+PREVIEW_MS = 400
+GAP_MS = 20
+# Level relative to the peak below which the tail of a sample counts as silence
+SILENCE_DB = -60
+# Older sprites kept for clients still downloading them
+KEEP_SPRITES = 3
+
+_build_lock = threading.Lock()
+
+
+def sprite_dir(sample_rate):
+    return os.path.join(settings.MEDIA_ROOT, SPRITES_DIR, str(sample_rate))
+
+
+def sprite_path(sample_rate, version):
+    return os.path.join(sprite_dir(sample_rate), f'{version}.wav')
+
+
+def _table_path(sample_rate, version):
+    return os.path.join(sprite_dir(sample_rate), f'{version}.json')
+
+
+def _set_version(sound_set):
+    return int(sound_set.updated_at.timestamp() * 1_000_000) if sound_set.updated_at else 0
+
+
+def _segment_path(sound_set, role, sample_rate):
+    name = f'{sound_set.pk}-{_set_version(sound_set)}-{role}.pcm'
+    return os.path.join(sprite_dir(sample_rate), SEGMENTS_DIR, name)
+
+
+def sprite_sound_sets():
+    """The sound sets of the sprite, in catalog order."""
+    return list(
+        MetronomeSoundSet.objects.order_by('name', 'id')
+        .only('id', 'name', 'updated_at', 'synth_params', *ROLE_FIELDS.values())
+    )
+
+
+def sprite_version(sound_sets, sample_rate):
+    """Hash of everything the sprite of ``sound_sets`` is made from."""
+    key = [sample_rate, PREVIEW_MS, GAP_MS, SILENCE_DB]
+    key += [(s.pk, s.name, _set_version(s)) for s in sound_sets]
+    return hashlib.sha256(json.dumps(key).encode()).hexdigest()[:16]
+
+
+def preview(pcm, sample_rate):
+    """``pcm`` without its trailing silence, cut to ``PREVIEW_MS`` with a fade-out."""
+    peak = float(np.abs(pcm).max()) if len(pcm) else 0.0
+    if peak == 0.0:
+        return np.zeros(0, dtype=np.float32)
+    audible = np.flatnonzero(np.abs(pcm) >= peak * 10 ** (SILENCE_DB / 20))
+    frames = min(int(audible[-1]) + 1, int(sample_rate * PREVIEW_MS / 1000))
+    fade = max(1, int(sample_rate * MAX_FADE_MS / 1000))
+    return truncate_with_fade(pcm[:frames], frames, fade) if frames < len(pcm) else pcm
+
+
+def _write_atomic(path, data):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _segments(sound_set, sample_rate):
+    """``{role: pcm16 bytes}`` of the previews of a sound set, rendered when not stored yet."""
+    paths = {role: _segment_path(sound_set, role, sample_rate) for role in ROLE_FIELDS}
+    if all(os.path.exists(path) for path in paths.values()):
+        segments = {}
+        for role, path in paths.items():
+            with open(path, 'rb') as f:
+                segments[role] = f.read()
+        return segments
+
+    samples = load_sound_set_samples(sound_set, sample_rate)
+    os.makedirs(os.path.dirname(paths['first']), exist_ok=True)
+    segments = {role: to_pcm16(preview(samples[role], sample_rate)) for role in ROLE_FIELDS}
+    for role, data in segments.items():
+        _write_atomic(paths[role], data)
+    return segments
+
+
+def _prune(sample_rate, keep_version, segment_names):
+    directory = sprite_dir(sample_rate)
+    sprites = sorted(
+        (entry for entry in os.scandir(directory) if entry.is_file() and entry.name.endswith('.wav')),
+        key=lambda entry: entry.stat().st_mtime_ns, reverse=True,
+    )
+    for entry in sprites[KEEP_SPRITES:]:
+        version = entry.name[:-len('.wav')]
+        if version == keep_version:
+            continue
+        for path in (entry.path, _table_path(sample_rate, version)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    # Segments of sets that were changed or deleted since
+    for entry in os.scandir(os.path.join(directory, SEGMENTS_DIR)):
+        if entry.name not in segment_names and not entry.name.endswith('.tmp'):
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+
+def _build(sound_sets, sample_rate, version):
+    gap = bytes(2 * int(sample_rate * GAP_MS / 1000))
+    chunks = []
+    position = 0
+    table = {}
+    missing = []
+    segment_names = set()
+    for sound_set in sound_sets:
+        try:
+            segments = _segments(sound_set, sample_rate)
+        except SampleDecodeError as e:
+            print(f"Leaving sound set {sound_set.pk} out of the preview sprite: {e}")
+            missing.append(sound_set.pk)
+            continue
+        entry = {'name': sound_set.name}
+        for role, data in segments.items():
+            frames = len(data) // 2
+            entry[role] = {
+                'start': position,
+                'frames': frames,
+                'offset': round(position / sample_rate, 6),
+                'duration': round(frames / sample_rate, 6),
+            }
+            chunks += [data, gap]
+            position += frames + len(gap) // 2
+            segment_names.add(os.path.basename(_segment_path(sound_set, role, sample_rate)))
+        table[str(sound_set.pk)] = entry
+
+    data = {
+        'version': version,
+        'sample_rate': sample_rate,
+        'frames': position,
+        'sound_sets': table,
+        'missing': missing,
+    }
+    path = sprite_path(sample_rate, version)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(wav_header(sample_rate, 1, position))
+        for chunk in chunks:
+            f.write(chunk)
+    os.replace(tmp_path, path)
+    # The table is written last: its presence marks a complete sprite
+    _write_atomic(_table_path(sample_rate, version), json.dumps(data).encode())
+    _prune(sample_rate, version, segment_names)
+    return data
+
+
+def load_sprite_table(sample_rate, version):
+    """The table of the built sprite ``version`` at ``sample_rate``, or None."""
+    try:
+        with open(_table_path(sample_rate, version), 'rb') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def needs_sprite(sample_rates, sound_sets):
+    """Whether the sprite of ``sound_sets`` is missing at any of ``sample_rates``."""
+    return any(load_sprite_table(rate, sprite_version(sound_sets, rate)) is None for rate in sample_rates)
+
+
+def build_sprite(sample_rate, sound_sets=None):
+    """
+    Return the table of the sprite of all sound sets at ``sample_rate``,
+    building the sprite if it is not up to date.
+
+    The table maps each sound set id to its name and, per role, the
+    ``start`` frame and ``frames`` count of its preview, also as ``offset``
+    and ``duration`` in seconds. Sets whose samples cannot be decoded are
+    listed under ``missing``.
+    """
+    if sound_sets is None:
+        sound_sets = sprite_sound_sets()
+    version = sprite_version(sound_sets, sample_rate)
+    table = load_sprite_table(sample_rate, version)
+    if table is not None:
+        return table
+    with _build_lock:
+        table = load_sprite_table(sample_rate, version)
+        if table is None:
+            os.makedirs(os.path.join(sprite_dir(sample_rate), SEGMENTS_DIR), exist_ok=True)
+            table = _build(sound_sets, sample_rate, version)
+    return table
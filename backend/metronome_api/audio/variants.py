@@ -0,0 +1,155 @@
+"""
+Truncated sample variants for very high tempos.
+
+When the time between two onsets is shorter than a sample, the tails of
+consecutive clicks overlap and pile up as simultaneous voices. For every
+interval bucket a variant is cut to the bucket length with a short
+raised-cosine fade-out. Callers pick the longest variant that still ends
+before the next onset, which bounds the number of overlapping voices to the
+number of coinciding layers.
+
+Variants are written below a directory per sound set version. Saving a
+sound set queues a job that builds them at every client sample rate (see
+``tasks.py``); a new version removes the directories of older ones.
+"""
+import os
+import shutil
+
+import numpy as np
+from django.conf import settings
+
+from .samples import load_sound_set_samples
+from .wavfile import write_wav
+
+# Maximum inter-onset intervals, in milliseconds, that variants are built for
+INTERVAL_BUCKETS_MS = (400, 200, 100, 50, 25)
+
+MAX_FADE_MS = 5
+
+VARIANTS_DIR = 'variants'
+
+
+def fade_frames(bucket_ms, sample_rate):
+    return max(1, int(sample_rate * min(MAX_FADE_MS, bucket_ms / 4) / 1000))
+
+
+def truncate_with_fade(pcm, max_frames, fade):
+    """Cut ``pcm`` to ``max_frames`` frames, fading out over the last ``fade`` frames."""
+    if len(pcm) <= max_frames:
+        return pcm
+    out = np.array(pcm[:max_frames], dtype=np.float32)
+    fade = min(fade, max_frames)
+    ramp = 0.5 * (1.0 + np.cos(np.linspace(0.0, np.pi, fade, dtype=np.float32)))
+    out[max_frames - fade:] *= ramp
+    return out
+
+
+def buckets_for(pcm, sample_rate):
+    """Return the buckets that actually shorten a sample, longest first."""
+    duration_ms = len(pcm) * 1000 / sample_rate
+    return [b for b in INTERVAL_BUCKETS_MS if b < duration_ms]
+
+
+def select_bucket(interval_ms, sample_ms=None):
+    """
+    Return the longest bucket not exceeding ``interval_ms``.
+
+    Returns None when no truncation is needed, i.e. the sample already ends
+    before the next onset, and the shortest bucket for intervals below it.
+    """
+    if sample_ms is not None and sample_ms <= interval_ms:
+        return None
+    for bucket in INTERVAL_BUCKETS_MS:
+        if bucket <= interval_ms:
+            return bucket
+    return INTERVAL_BUCKETS_MS[-1]
+
+
+def truncate_for_interval(samples, interval_ms, sample_rate):
+    """Return ``samples`` with every sample longer than ``interval_ms`` replaced by its variant."""
+    truncated = {}
+    for role, pcm in samples.items():
+        bucket = select_bucket(interval_ms, len(pcm) * 1000 / sample_rate)
+        if bucket is None:
+            truncated[role] = pcm
+        else:
+            frames = int(sample_rate * bucket / 1000)
+            truncated[role] = truncate_with_fade(pcm, frames, fade_frames(bucket, sample_rate))
+    return truncated
+
+
+def variant_version(sound_set):
+    """
+    The version of a sound set's variants: ``updated_at`` in microseconds, so
+    that two edits within the same second get different files.
+    """
+    updated_at = sound_set.updated_at
+    if not updated_at:
+        return 0
+    return int(updated_at.timestamp()) * 1_000_000 + updated_at.microsecond
+
+
+def sound_set_variants_dir(pk):
+    return os.path.join(settings.MEDIA_ROOT, VARIANTS_DIR, str(pk))
+
+
+def variant_dir(sound_set):
+    # The version keeps files of an edited sound set from being served again
+    return os.path.join(sound_set_variants_dir(sound_set.pk), str(variant_version(sound_set)))
+
+
+def needs_variants(sound_set):
+    """Whether the variants of the current version of ``sound_set`` have not been built yet."""
+    return not os.path.isdir(variant_dir(sound_set))
+
+
+def remove_variants(pk, before=None):
+    """
+    Delete the variants of sound set ``pk`` older than version ``before``,
+    or all of them. Newer versions are kept for requests that loaded the
+    sound set after it was saved again.
+    """
+    root = sound_set_variants_dir(pk)
+    if before is None:
+        shutil.rmtree(root, ignore_errors=True)
+        return
+    if not os.path.isdir(root):
+        return
+    for name in os.listdir(root):
+        if not name.isdecimal() or int(name) < before:
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+
+def variant_filename(role, bucket_ms, sample_rate):
+    return f'{role}-{bucket_ms}ms-{sample_rate}.wav'
+
+
+def build_variants(sound_set, sample_rate):
+    """
+    Write every variant of a sound set to disk and return a manifest.
+
+    The manifest maps each role to its original length and a list of
+    ``{'max_interval_ms', 'frames', 'path'}`` entries, longest first.
+    Existing files are reused.
+    """
+    samples = load_sound_set_samples(sound_set, sample_rate)
+    directory = variant_dir(sound_set)
+    if not os.path.isdir(directory):
+        os.makedirs(directory, exist_ok=True)
+        remove_variants(sound_set.pk, before=variant_version(sound_set))
+
+    manifest = {}
+    for role, pcm in samples.items():
+        entries = []
+        for bucket in buckets_for(pcm, sample_rate):
+            path = os.path.join(directory, variant_filename(role, bucket, sample_rate))
+            frames = int(sample_rate * bucket / 1000)
+            if not os.path.exists(path):
+                variant = truncate_with_fade(pcm, frames, fade_frames(bucket, sample_rate))
+                tmp_path = f'{path}.tmp'
+                with open(tmp_path, 'wb') as f:
+                    f.write(write_wav(variant, sample_rate))
+                os.replace(tmp_path, path)
+            entries.append({'max_interval_ms': bucket, 'frames': frames, 'path': path})
+        manifest[role] = {'frames': len(pcm), 'variants': entries}
+    return manifest
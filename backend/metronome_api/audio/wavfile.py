@@ -0,0 +1,154 @@
+"""
+Minimal RIFF/WAVE reader and writer.
+
+The standard library ``wave`` module only understands integer PCM, while
+uploaded samples are regularly 24-bit or IEEE float, sometimes wrapped in
+WAVE_FORMAT_EXTENSIBLE. This module handles all of those.
+"""
+import struct
+
+import numpy as np
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+class WavError(ValueError):
+    """Raised for files that are not decodable RIFF/WAVE audio."""
+
+
+def _iter_chunks(data, offset=12):
+    while offset + 8 <= len(data):
+        chunk_id, size = struct.unpack_from('<4sI', data, offset)
+        yield chunk_id, offset + 8, size
+        # Chunks are word aligned
+        offset += 8 + size + (size & 1)
+
+
+def read_wav(source):
+    """
+    Decode a WAV file into ``(pcm, sample_rate)``.
+
+    ``source`` is a path, a binary file object or bytes. ``pcm`` is a float32
+    array of shape ``(frames, channels)``.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        data = bytes(source)
+    elif hasattr(source, 'read'):
+        data = source.read()
+    else:
+        with open(source, 'rb') as f:
+            data = f.read()
+
+    if len(data) < 12 or data[:4] != b'RIFF' or data[8:12] != b'WAVE':
+        raise WavError('Not a RIFF/WAVE file')
+
+    fmt = None
+    frames = None
+    for chunk_id, start, size in _iter_chunks(data):
+        if chunk_id == b'fmt ':
+            if size < 16:
+                raise WavError('Truncated fmt chunk')
+            format_tag, channels, sample_rate, _, block_align, bits = struct.unpack_from('<HHIIHH', data, start)
+            if format_tag == WAVE_FORMAT_EXTENSIBLE and size >= 40:
+                # The sub format GUID starts with the actual format tag
+                format_tag = struct.unpack_from('<H', data, start + 24)[0]
+            fmt = (format_tag, channels, sample_rate, block_align, bits)
+        elif chunk_id == b'data':
+            frames = data[start:start + size]
+            break
+
+    if fmt is None or frames is None:
+        raise WavError('Missing fmt or data chunk')
+
+    format_tag, channels, sample_rate, block_align, bits = fmt
+    if channels < 1 or sample_rate < 1 or block_align < 1:
+        raise WavError('Invalid fmt chunk')
+    if bits < 8 or bits % 8 or block_align != channels * bits // 8:
+        raise WavError(f'Inconsistent fmt chunk ({channels} channels of {bits} bit in {block_align} byte frames)')
+    frames = frames[:len(frames) - len(frames) % block_align]
+
+    try:
+        if format_tag == WAVE_FORMAT_PCM:
+            pcm = _decode_pcm(frames, bits)
+        elif format_tag == WAVE_FORMAT_IEEE_FLOAT and bits in (32, 64):
+            pcm = np.frombuffer(frames, dtype=f'<f{bits // 8}').astype(np.float32)
+        else:
+            raise WavError(f'Unsupported WAV encoding (format {format_tag:#06x}, {bits} bit)')
+        return pcm.reshape(-1, channels), sample_rate
+    except WavError:
+        raise
+    except ValueError as e:
+        raise WavError(f'Malformed audio data: {e}')
+
+
+def _decode_pcm(frames, bits):
+    if bits == 8:
+        return (np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    if bits == 16:
+        return np.frombuffer(frames, dtype='<i2').astype(np.float32) / 32768.0
+    if bits == 24:
+        raw = np.frombuffer(frames, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        values = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+        values = np.where(values & 0x800000, values - 0x1000000, values)
+        return values.astype(np.float32) / 8388608.0
+    if bits == 32:
+        return (np.frombuffer(frames, dtype='<i4').astype(np.float64) / 2147483648.0).astype(np.float32)
+    raise WavError(f'Unsupported PCM bit depth: {bits}')
+
+
+# Tail of the sub format GUIDs of WAVE_FORMAT_EXTENSIBLE, after the format tag
+_EXTENSIBLE_GUID_TAIL = b'\x00\x00\x00\x00\x10\x00\x80\x00\x00\xaa\x00\x38\x9b\x71'
+
+
+def _fmt_size(channels):
+    return 16 if channels <= 2 else 40
+
+
+def max_wav_frames(channels, bits=16):
+    """The most frames a WAV file can hold: the RIFF and data sizes are 32-bit."""
+    return (0xFFFFFFFF - (4 + 8 + _fmt_size(channels) + 8)) // (channels * bits // 8)
+
+
+def wav_header(sample_rate, channels, frames, bits=16):
+    """
+    Return the header of a PCM WAV file with ``frames`` frames.
+
+    Up to two channels the header is the plain 44-byte one. Files with more
+    channels need WAVE_FORMAT_EXTENSIBLE; the channel mask is left empty, as
+    stems have no speaker positions. Raises ``WavError`` beyond
+    ``max_wav_frames``.
+    """
+    if frames > max_wav_frames(channels, bits):
+        raise WavError(f'{frames} frames of {channels} channel(s) do not fit in a WAV file')
+    block_align = channels * bits // 8
+    data_size = frames * block_align
+    if channels <= 2:
+        fmt = struct.pack('<HHIIHH', WAVE_FORMAT_PCM, channels, sample_rate, sample_rate * block_align, block_align, bits)
+    else:
+        fmt = struct.pack(
+            '<HHIIHHHHI2s14s',
+            WAVE_FORMAT_EXTENSIBLE, channels, sample_rate, sample_rate * block_align, block_align, bits,
+            22, bits, 0, struct.pack('<H', WAVE_FORMAT_PCM), _EXTENSIBLE_GUID_TAIL,
+        )
+    return (
+        struct.pack('<4sI4s', b'RIFF', 4 + 8 + len(fmt) + 8 + data_size, b'WAVE')
+        + struct.pack('<4sI', b'fmt ', len(fmt)) + fmt
+        + struct.pack('<4sI', b'data', data_size)
+    )
+
+
+def to_pcm16(pcm):
+    """Clip float PCM to [-1, 1] and convert it to little-endian int16 bytes."""
+    clipped = np.clip(pcm, -1.0, 1.0)
+    return np.round(clipped * 32767.0).astype('<i2').tobytes()
+
+
+def write_wav(pcm, sample_rate):
+    """Encode float PCM of shape ``(frames,)`` or ``(frames, channels)`` as 16-bit WAV bytes."""
+    pcm = np.asarray(pcm, dtype=np.float32)
+    if pcm.ndim == 1:
+        pcm = pcm[:, None]
+    frames, channels = pcm.shape
+    return wav_header(sample_rate, channels, frames) + to_pcm16(pcm)
@@ -0,0 +1,307 @@
+"""
+Read path of the sound set catalog.
+
+Views read sound sets through ``get_catalog()``, which returns the backend
+selected by ``settings.METRONOME_CATALOG_BACKEND``:
+
+- ``'orm'`` (default): the database, with serialized payloads cached per id
+- ``'manifest'``: an immutable in-memory index loaded from a versioned
+  manifest file (see ``manifest_catalog``), so replicas serve reads without
+  any database connection
+
+The catalog is paginated with an opaque keyset cursor over ``(name, id)`` so
+every page is a single indexed range scan, no matter how many sound sets
+exist. Search uses the full-text index created in migration 0007: an FTS5
+table on SQLite and trigram GIN indexes on PostgreSQL.
+
+Clients holding a copy of the catalog keep it up to date with ``changes``:
+the sets created or updated after a sync cursor, and the ids of the sets
+deleted since, from their tombstones. A sync cursor is a point in time.
+Changes of the last ``CHANGES_SETTLE_SECONDS`` may belong to transactions
+that have not committed yet, so the cursor handed out trails the present by
+that much and such changes are sent again on the next sync; clients apply
+them idempotently. This relies on every write committing within
+``CHANGES_SETTLE_SECONDS`` of stamping ``updated_at``: saves stamp it as they
+write, ``QuerySet.update()`` stamps it too (``models.SoundSetQuerySet``) and
+``bulk_create`` in pack imports stamps every row as it inserts it. A write that
+stamps the time and then keeps its transaction open longer is missed by
+clients whose cursor has passed that time. Tombstones are kept for ``TOMBSTONE_RETENTION_DAYS``;
+older cursors, and cursors more than ``MAX_CHANGES`` changes behind, are
+refused and the client reloads the whole catalog.
+"""
+import base64
+import datetime
+import json
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.urls import reverse
+from django.utils import timezone
+
+from . import payload_cache
+from .profiling import timer
+from .models import ROLE_FIELDS, MetronomeSoundSet, SoundSetTombstone
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+MAX_BATCH_IDS = 500
+
+CHANGES_SETTLE_SECONDS = 2
+MAX_CHANGES = 1000
+TOMBSTONE_RETENTION_DAYS = 90
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+FTS_TABLE = 'metronome_api_soundset_fts'
+
+# Public field name -> model fields needed to produce it
+FIELD_SOURCES = {
+    'id': ('id',),
+    'name': ('name',),
+    'description': ('description',),
+    'is_active': (),
+    'first_beat_sound_url': ('first_beat_sound', 'synth_params'),
+    'accent_sound_url': ('accent_sound', 'synth_params'),
+    'normal_beat_sound_url': ('normal_beat_sound', 'synth_params'),
+    'synth_params': ('synth_params',),
+    'created_at': ('created_at',),
+    'updated_at': ('updated_at',),
+}
+
+# The UI list never shows the description, so it is only sent on request
+LIST_FIELDS = tuple(f for f in FIELD_SOURCES if f != 'description')
+
+
+class CatalogQueryError(ValueError):
+    """Raised for malformed catalog query parameters."""
+
+
+class SyncCursorExpired(Exception):
+    """Raised when the changes since a sync cursor can no longer be listed."""
+
+
+def _file_url(sound_file):
+    return sound_file.url if sound_file else None
+
+
+def sample_url(sound_set, role):
+    """URL of a role's sound: the synthesis endpoint for synthesized sets, the file otherwise."""
+    if sound_set.is_synthesized:
+        return reverse('sound_set_synth_sample', args=[sound_set.id, role])
+    return _file_url(getattr(sound_set, ROLE_FIELDS[role]))
+
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+
+# Public field name -> getter. Only the requested getters run, so deferred
+# model fields of sparse catalog queries are never loaded by accident.
+SOUND_SET_FIELDS = {
+    'id': lambda s: s.id,
+    'name': lambda s: s.name,
+    'description': lambda s: s.description,
+    # Always include is_active for backwards compatibility, but it's not used
+    'is_active': lambda s: False,  # Default to false since frontend will use cookies now
+    'first_beat_sound_url': lambda s: sample_url(s, 'first'),
+    'accent_sound_url': lambda s: sample_url(s, 'accent'),
+    'normal_beat_sound_url': lambda s: sample_url(s, 'normal'),
+    'synth_params': lambda s: s.synth_params,
+    'created_at': lambda s: _isoformat(s.created_at),
+    'updated_at': lambda s: _isoformat(s.updated_at),
+}
+
+
+def sound_set_to_dict(sound_set, fields=None):
+    """Convert a MetronomeSoundSet instance to a dictionary for JSON serialization.
+    Always includes an ID but doesn't rely on is_active for the frontend.
+    ``fields`` optionally restricts the output to a subset of SOUND_SET_FIELDS.
+    """
+    if not sound_set:
+        return None
+
+    if fields is None:
+        fields = SOUND_SET_FIELDS
+    with timer('catalog.serialize'):
+        return {name: SOUND_SET_FIELDS[name](sound_set) for name in fields}
+
+
+def restrict_fields(payload, fields):
+    return {name: payload[name] for name in fields}
+
+
+def parse_fields(value, default=LIST_FIELDS):
+    """Parse a comma separated ``fields`` parameter into a tuple of field names."""
+    if not value:
+        return default
+    fields = tuple(dict.fromkeys(f.strip() for f in value.split(',') if f.strip()))
+    unknown = [f for f in fields if f not in FIELD_SOURCES]
+    if unknown:
+        raise CatalogQueryError(f"Unknown field(s): {', '.join(unknown)}")
+    # The id is always needed to build the next cursor
+    if 'id' not in fields:
+        fields = ('id',) + fields
+    return fields
+
+
+def parse_limit(value):
+    if not value:
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(value)
+    except ValueError:
+        raise CatalogQueryError('limit must be an integer')
+    if limit < 1:
+        raise CatalogQueryError('limit must be positive')
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def encode_cursor(name, pk):
+    raw = json.dumps([name, pk], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        name, pk = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if not isinstance(name, str) or not isinstance(pk, int):
+            raise ValueError
+    except (ValueError, TypeError, UnicodeError):
+        raise CatalogQueryError('Invalid cursor')
+    return name, pk
+
+
+def encode_sync_cursor(moment):
+    # Exact microseconds: a float timestamp could round past a change
+    micros = (moment - EPOCH) // datetime.timedelta(microseconds=1)
+    return base64.urlsafe_b64encode(json.dumps(['sync', micros]).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_sync_cursor(cursor):
+    """Return the moment a sync cursor stands for."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        kind, micros = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if kind != 'sync' or not isinstance(micros, int):
+            raise ValueError
+        return EPOCH + datetime.timedelta(microseconds=micros)
+    except (ValueError, TypeError, UnicodeError, OverflowError, OSError):
+        raise CatalogQueryError('Invalid cursor')
+
+
+def sync_window(since, now=None):
+    """
+    Check a sync cursor and return ``(since, next_cursor)``: the moment
+    changes are listed after (None for all sound sets) and the cursor of the
+    next sync.
+    """
+    now = now or timezone.now()
+    if since is not None and since < now - datetime.timedelta(days=TOMBSTONE_RETENTION_DAYS):
+        raise SyncCursorExpired('The cursor is too old, reload the catalog')
+    settled = now - datetime.timedelta(seconds=CHANGES_SETTLE_SECONDS)
+    return since, encode_sync_cursor(max(since, settled) if since else settled)
+
+
+def _fts_match_expression(query):
+    """Turn free text into an FTS5 prefix query, quoting every term."""
+    terms = [t.replace('"', '""') for t in query.split()]
+    return ' '.join(f'"{t}"*' for t in terms if t)
+
+
+def search_filter(query):
+    """Return a ``Q`` matching sound sets whose name or description contain ``query``."""
+    if connection.vendor == 'sqlite':
+        match = _fts_match_expression(query)
+        if not match:
+            return Q()
+        return Q(id__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match]))
+    # PostgreSQL serves ILIKE from the pg_trgm indexes; other backends scan
+    return Q(name__icontains=query) | Q(description__icontains=query)
+
+
+def model_fields_for(fields):
+    model_fields = []
+    for field in fields:
+        model_fields.extend(FIELD_SOURCES[field])
+    # name is part of the cursor
+    model_fields.append('name')
+    return list(dict.fromkeys(model_fields))
+
+
+class OrmCatalog:
+    """Catalog backed by the MetronomeSoundSet table."""
+
+    def page(self, cursor=None, limit=DEFAULT_PAGE_SIZE, query=None, fields=LIST_FIELDS):
+        """
+        Return ``(payloads, next_cursor)`` for one page of the catalog.
+
+        Runs exactly one query: ``limit + 1`` rows are fetched to find out
+        whether another page follows.
+        """
+        queryset = MetronomeSoundSet.objects.only(*model_fields_for(fields)).order_by('name', 'id')
+        if query:
+            queryset = queryset.filter(search_filter(query))
+        if cursor:
+            name, pk = decode_cursor(cursor)
+            queryset = queryset.filter(Q(name__gt=name) | Q(name=name, id__gt=pk))
+
+        rows = list(queryset[:limit + 1])
+        next_cursor = encode_cursor(rows[limit - 1].name, rows[limit - 1].id) if len(rows) > limit else None
+        return [sound_set_to_dict(s, fields) for s in rows[:limit]], next_cursor
+
+    def changes(self, since=None, fields=LIST_FIELDS):
+        """
+        Return ``(payloads, deleted_ids, next_cursor)``: the sound sets
+        created or updated after the sync cursor ``since`` (all of them
+        without one) and the ids of those deleted since. Two queries, both
+        index range scans, or one for a full sync.
+        """
+        since, next_cursor = sync_window(decode_sync_cursor(since) if since else None)
+        queryset = MetronomeSoundSet.objects.only(*model_fields_for(fields)).order_by('updated_at', 'id')
+        if since is None:
+            return [sound_set_to_dict(s, fields) for s in queryset], [], next_cursor
+
+        rows = list(queryset.filter(updated_at__gt=since)[:MAX_CHANGES + 1])
+        deleted = list(
+            SoundSetTombstone.objects.filter(deleted_at__gt=since)
+            .order_by('deleted_at').values_list('sound_set_id', flat=True)[:MAX_CHANGES + 1]
+        )
+        if len(rows) + len(deleted) > MAX_CHANGES:
+            raise SyncCursorExpired('Too many changes, reload the catalog')
+        return [sound_set_to_dict(s, fields) for s in rows], deleted, next_cursor
+
+    def payloads(self, ids):
+        """Return ``{id: payload}`` for the ids that exist, from the payload cache where possible."""
+        return payload_cache.get_payloads(ids, sound_set_to_dict)
+
+    def get(self, pk, only=None):
+        """Return the sound set with id ``pk`` or None; ``only`` restricts the loaded fields."""
+        queryset = MetronomeSoundSet.objects.filter(id=pk)
+        if only:
+            queryset = queryset.only(*only)
+        return queryset.first()
+
+    def first(self):
+        return MetronomeSoundSet.objects.first()
+
+    def sound_sets(self, limit):
+        """The first ``limit`` sound sets in catalog order."""
+        return list(MetronomeSoundSet.objects.order_by('name', 'id')[:limit])
+
+    def first_payload(self):
+        return sound_set_to_dict(self.first())
+
+
+_orm_catalog = OrmCatalog()
+
+
+def get_catalog():
+    """Return the catalog backend configured by ``METRONOME_CATALOG_BACKEND``."""
+    backend = getattr(settings, 'METRONOME_CATALOG_BACKEND', 'orm')
+    if backend == 'manifest':
+        from .manifest_catalog import get_manifest_catalog
+        return get_manifest_catalog(settings.METRONOME_CATALOG_MANIFEST)
+    return _orm_catalog
@@ -0,0 +1,62 @@
+"""
+Per-connection database setup.
+
+Django opens one connection per thread and, with ``CONN_MAX_AGE``, keeps it
+for later requests, so whatever is configured here runs once per connection
+instead of once per request.
+
+SQLite connections get the pragmas of ``METRONOME_SQLITE_PRAGMAS`` (defaults
+in ``SQLITE_PRAGMAS``), tuned for a single node serving concurrent readers:
+
+- ``journal_mode=WAL``: readers no longer block the writer nor the other
+  way round (stored in the database file, so it stays on once set)
+- ``synchronous=NORMAL``: in WAL mode commits are still atomic and durable
+  against application crashes; only an OS crash can lose the last commits
+- ``mmap_size``: pages are read through a memory map shared by all
+  connections of a process instead of copied into each connection's cache
+
+How long writers wait for the database lock is the ``timeout`` option of
+the database settings.
+"""
+import re
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+    # Negative values are KiB
+    'cache_size': -16000,
+}
+
+_PRAGMA_RE = re.compile(r'^[a-z_]+$')
+_VALUE_RE = re.compile(r'^-?\w+$')
+
+
+def sqlite_pragmas():
+    pragmas = dict(SQLITE_PRAGMAS)
+    pragmas.update(getattr(settings, 'METRONOME_SQLITE_PRAGMAS', {}))
+    return {name: value for name, value in pragmas.items() if value is not None}
+
+
+def pragma_statements(pragmas):
+    statements = []
+    for name, value in pragmas.items():
+        # Pragmas cannot be parameterized; only plain names and values pass
+        if not _PRAGMA_RE.match(name) or not _VALUE_RE.match(str(value)):
+            raise ValueError(f'Invalid SQLite pragma {name}={value!r}')
+        statements.append(f'PRAGMA {name} = {value}')
+    return statements
+
+
+@receiver(connection_created)
+def configure_connection(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for statement in pragma_statements(sqlite_pragmas()):
+            cursor.execute(statement)
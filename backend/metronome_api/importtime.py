@@ -0,0 +1,142 @@
+"""
+Import-time reports for the Django entry points.
+
+Workers are scaled to zero, so every cold start pays for importing the app
+stack before the first response. A report starts an entry point in a fresh
+interpreter with ``python -X importtime`` and attributes the self time of
+every imported module to the installed app whose package contains it
+(``django.contrib.admin``, ``corsheaders``, ``metronome_api``, ...), or
+otherwise to its top-level package (``django`` for the framework itself,
+``numpy``, ...). Standard library modules are counted together as
+``stdlib``.
+
+The ``wsgi`` and ``asgi`` entry points also load the URLconf, as the first
+request does. Warmup (``METRONOME_WARMUP``) is switched off in the child so
+that only imports are measured.
+"""
+import os
+import subprocess
+import sys
+import time
+
+from django.apps import apps
+from django.conf import settings
+
+# -X importtime only times import statements. Django loads settings, apps
+# and URLconfs with importlib.import_module, whose modules would otherwise
+# be missing from the report and counted as the entry point's own time.
+_PRELUDE = '''
+import importlib, importlib.util, sys
+def _import_module(name, package=None):
+    name = importlib.util.resolve_name(name, package)
+    __import__(name)
+    return sys.modules[name]
+importlib.import_module = _import_module
+'''
+
+_LOAD_URLCONF = 'from django.urls import get_resolver\nget_resolver().url_patterns\n'
+
+ENTRY_POINTS = {
+    'wsgi': 'import libremetronome_backend.wsgi\n' + _LOAD_URLCONF,
+    'asgi': 'import libremetronome_backend.asgi\n' + _LOAD_URLCONF,
+    'manage': (
+        "sys.argv = ['manage.py', 'check']\n"
+        "import runpy\n"
+        "runpy.run_path('manage.py', run_name='__main__')\n"
+    ),
+}
+
+
+class ImportTimeError(Exception):
+    """Raised when an entry point fails to start."""
+
+
+def parse_importtime(text):
+    """
+    Parse the ``-X importtime`` lines of ``text`` into a list of
+    ``(module, self_us, cumulative_us, depth)``, in import completion order.
+    """
+    entries = []
+    for line in text.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3:
+            continue
+        try:
+            self_us, cumulative_us = int(parts[0]), int(parts[1])
+        except ValueError:
+            # The header line
+            continue
+        name = parts[2].rstrip()
+        indent = len(name) - len(name.lstrip(' '))
+        entries.append((name.strip(), self_us, cumulative_us, max(0, indent - 1) // 2))
+    return entries
+
+
+def owner(module, app_packages):
+    """The installed app package ``module`` belongs to, ``stdlib`` or its top-level package."""
+    for package in app_packages:
+        if module == package or module.startswith(package + '.'):
+            return package
+    top_level = module.split('.')[0]
+    if top_level in sys.stdlib_module_names or top_level in sys.builtin_module_names:
+        return 'stdlib'
+    return top_level
+
+
+def attribute(entries, app_packages):
+    """Sum the self time of ``entries`` per owner; returns ``{owner: (us, modules)}``."""
+    # Longest first, so django.contrib.admin wins over django
+    app_packages = sorted(app_packages, key=len, reverse=True)
+    totals = {}
+    for module, self_us, _, _ in entries:
+        name = owner(module, app_packages)
+        us, count = totals.get(name, (0, 0))
+        totals[name] = (us + self_us, count + 1)
+    return totals
+
+
+def run_entry_point(entry_point):
+    """Start ``entry_point`` in a fresh interpreter; return its ``-X importtime`` output and wall time."""
+    env = dict(os.environ, METRONOME_WARMUP='0')
+    env.setdefault('DJANGO_SETTINGS_MODULE', settings.SETTINGS_MODULE)
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', _PRELUDE + ENTRY_POINTS[entry_point]],
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=False,
+    )
+    wall_ms = (time.perf_counter() - started) * 1000
+    if result.returncode != 0:
+        errors = [line for line in result.stderr.splitlines() if not line.startswith('import time:')]
+        raise ImportTimeError(f'{entry_point} failed to start: {errors[-1] if errors else result.returncode}')
+    return result.stderr, wall_ms
+
+
+def measure(entry_point, repeat=1, top=15):
+    """
+    Report the imports of ``entry_point``, from the fastest of ``repeat``
+    runs: the total self time, the time per owner, the ``top`` slowest
+    modules by self time and the names of all imported modules.
+    """
+    runs = []
+    for _ in range(repeat):
+        output, wall_ms = run_entry_point(entry_point)
+        entries = parse_importtime(output)
+        runs.append((sum(entry[1] for entry in entries), wall_ms, entries))
+    total_us, wall_ms, entries = min(runs, key=lambda run: run[0])
+
+    app_packages = [config.name for config in apps.get_app_configs()]
+    owners = sorted(attribute(entries, app_packages).items(), key=lambda item: item[1][0], reverse=True)
+    slowest = sorted(entries, key=lambda entry: entry[1], reverse=True)[:top]
+    return {
+        'entry_point': entry_point,
+        'import_ms': round(total_us / 1000, 1),
+        'wall_ms': round(wall_ms, 1),
+        'owners': [{'owner': name, 'ms': round(us / 1000, 1), 'modules': count} for name, (us, count) in owners],
+        'slowest': [
+            {'module': module, 'self_ms': round(self_us / 1000, 1), 'cumulative_ms': round(cumulative_us / 1000, 1)}
+            for module, self_us, cumulative_us, _ in slowest
+        ],
+        'modules': [entry[0] for entry in entries],
+    }
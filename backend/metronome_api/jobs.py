@@ -0,0 +1,289 @@
+"""
+Local job system for CPU-heavy audio work.
+
+Jobs run in a bounded ``ProcessPoolExecutor`` next to the web server, with
+the ``Job`` table as the only shared state, so no broker is needed:
+
+- ``submit(kind, params)`` returns the queued or running job with the same
+  kind and params if there is one, otherwise creates a job and hands it to
+  the pool. When the pool already holds ``METRONOME_JOB_QUEUE_LIMIT`` jobs
+  ``JobQueueFull`` is raised instead of queueing without bound.
+- Tasks are plain functions registered with ``@register('kind')``. They get
+  the job, its params and a ``progress(fraction, message)`` callback, and
+  return a JSON-serializable result. A result with ``path`` and
+  ``content_type`` is downloadable from the job's result endpoint.
+- ``cancel(job)`` cancels a queued job outright; a running job is flagged and
+  stops at its next progress report.
+
+Workers are forked from the web process. They drop the inherited database
+connections on start so they never share a socket with their parent.
+
+Jobs can be orphaned: a restart or a recycled worker leaves their rows
+queued or running. Running jobs renew a lease with every progress report
+(``heartbeat_at``); ``expire_stale_jobs`` fails running jobs whose lease
+ran out after ``METRONOME_JOB_LEASE_SECONDS`` and queued jobs that never
+started within ``METRONOME_JOB_QUEUE_TIMEOUT``. It runs before every
+submit, so a zombie is never handed out again in place of new work. Output
+files are deleted ``METRONOME_JOB_RESULT_TTL`` seconds after they were
+written; their jobs then answer 410.
+
+With ``METRONOME_JOBS_EAGER = True`` (used by the tests) jobs run inline in
+``submit``.
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Q
+from django.db.models.functions import Coalesce
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Job
+
+# Minimum seconds between two progress writes of a running job
+PROGRESS_INTERVAL = 0.25
+# Minimum seconds between two sweeps of expired output files
+OUTPUT_SWEEP_INTERVAL = 600
+
+TASKS = {}
+
+_executor = None
+_futures = {}
+_lock = threading.Lock()
+_last_output_sweep = 0.0
+
+
+class JobQueueFull(Exception):
+    """Raised when the pool has no room for another job."""
+
+
+class JobCancelled(Exception):
+    """Raised inside a task when its job has been cancelled."""
+
+
+def register(kind):
+    """Register a task function under ``kind``."""
+    def decorator(func):
+        TASKS[kind] = func
+        return func
+    return decorator
+
+
+def dedupe_key(kind, params):
+    raw = json.dumps([kind, params], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def job_output_path(job, extension):
+    """Path below MEDIA_ROOT where a job writes its output file."""
+    directory = os.path.join(settings.MEDIA_ROOT, 'jobs')
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f'{job.id}{extension}')
+
+
+def _max_workers():
+    return getattr(settings, 'METRONOME_JOB_WORKERS', 2)
+
+
+def _queue_limit():
+    return getattr(settings, 'METRONOME_JOB_QUEUE_LIMIT', 32)
+
+
+def _lease_seconds():
+    return getattr(settings, 'METRONOME_JOB_LEASE_SECONDS', 600)
+
+
+def _queue_timeout():
+    return getattr(settings, 'METRONOME_JOB_QUEUE_TIMEOUT', 3600)
+
+
+def _result_ttl():
+    return getattr(settings, 'METRONOME_JOB_RESULT_TTL', 24 * 60 * 60)
+
+
+def expire_stale_jobs(now=None):
+    """Fail the queued and running jobs nobody is working on any more; returns how many."""
+    now = now or timezone.now()
+    lease = now - timedelta(seconds=_lease_seconds())
+    waited = now - timedelta(seconds=_queue_timeout())
+    return Job.objects.annotate(
+        alive_at=Coalesce('heartbeat_at', 'started_at', 'created_at'),
+    ).filter(
+        Q(status=Job.RUNNING, alive_at__lt=lease) | Q(status=Job.QUEUED, created_at__lt=waited),
+    ).update(status=Job.FAILED, error='The job was abandoned by its worker', finished_at=now)
+
+
+def expire_outputs(now=None):
+    """Delete job output files older than ``METRONOME_JOB_RESULT_TTL``; returns how many."""
+    directory = os.path.join(settings.MEDIA_ROOT, 'jobs')
+    cutoff = (now or time.time()) - _result_ttl()
+    removed = 0
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.unlink(entry.path)
+                removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def _sweep_outputs():
+    global _last_output_sweep
+    now = time.monotonic()
+    if now - _last_output_sweep >= OUTPUT_SWEEP_INTERVAL:
+        _last_output_sweep = now
+        expire_outputs()
+
+
+def _init_worker():
+    # Forget the connections inherited from the web process without closing
+    # them: closing would end the parent's session too
+    for conn in connections.all(initialized_only=True):
+        conn.connection = None
+    global _executor
+    _executor = None
+    _futures.clear()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=_max_workers(),
+            mp_context=multiprocessing.get_context('fork'),
+            initializer=_init_worker,
+        )
+    return _executor
+
+
+class ProgressReporter:
+    """The ``progress`` callback handed to tasks."""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.last_write = 0.0
+
+    def __call__(self, fraction, message=''):
+        now = time.monotonic()
+        if now - self.last_write < PROGRESS_INTERVAL and fraction < 1:
+            return
+        self.last_write = now
+        Job.objects.filter(pk=self.job_id).update(
+            progress=min(max(fraction, 0.0), 1.0), message=message[:200], heartbeat_at=timezone.now(),
+        )
+        if Job.objects.filter(pk=self.job_id, cancel_requested=True).exists():
+            raise JobCancelled()
+
+
+def run_job(job_id):
+    """Run a queued job to completion. Executed in a pool worker (or inline when eager)."""
+    now = timezone.now()
+    claimed = Job.objects.filter(pk=job_id, status=Job.QUEUED).update(
+        status=Job.RUNNING, started_at=now, heartbeat_at=now,
+    )
+    if not claimed:
+        # Cancelled while it was waiting
+        return
+    job = Job.objects.get(pk=job_id)
+    try:
+        result = TASKS[job.kind](job, job.params, ProgressReporter(job.pk))
+    except JobCancelled:
+        Job.objects.filter(pk=job_id).update(status=Job.CANCELLED, finished_at=timezone.now())
+    except Exception as e:
+        print(f"Job {job_id} ({job.kind}) failed: {e}")
+        Job.objects.filter(pk=job_id).update(status=Job.FAILED, error=str(e), finished_at=timezone.now())
+    else:
+        Job.objects.filter(pk=job_id).update(
+            status=Job.SUCCEEDED, progress=1.0, result=result, finished_at=timezone.now(),
+        )
+
+
+def _job_done(job_id, future):
+    with _lock:
+        _futures.pop(job_id, None)
+    if future.cancelled():
+        return
+    error = future.exception()
+    if error is not None:
+        # The worker died or the job could not be sent to it
+        print(f"Job {job_id} crashed: {error}")
+        Job.objects.filter(pk=job_id, status__in=Job.ACTIVE_STATUSES).update(
+            status=Job.FAILED, error=f'Worker failed: {error}', finished_at=timezone.now(),
+        )
+
+
+def submit(kind, params):
+    """Return the in-flight job for ``kind``/``params``, or queue a new one."""
+    if kind not in TASKS:
+        raise ValueError(f'Unknown job kind {kind}')
+    key = dedupe_key(kind, params)
+    expire_stale_jobs()
+    _sweep_outputs()
+    with _lock:
+        existing = Job.objects.filter(dedupe_key=key, status__in=Job.ACTIVE_STATUSES, cancel_requested=False).first()
+        if existing:
+            return existing
+
+        eager = getattr(settings, 'METRONOME_JOBS_EAGER', False)
+        if not eager and len(_futures) >= _queue_limit():
+            raise JobQueueFull('Too many jobs in progress, try again later')
+
+        job = Job.objects.create(kind=kind, params=params, dedupe_key=key)
+        if eager:
+            run_job(job.pk)
+            job.refresh_from_db()
+            return job
+
+        future = _get_executor().submit(run_job, job.pk)
+        _futures[job.pk] = future
+    future.add_done_callback(lambda f, job_id=job.pk: _job_done(job_id, f))
+    return job
+
+
+def cancel(job):
+    """Cancel a job: immediately if it is still queued, at its next progress report if running."""
+    with _lock:
+        future = _futures.get(job.pk)
+    if future is not None:
+        future.cancel()
+    Job.objects.filter(pk=job.pk, status=Job.QUEUED).update(
+        status=Job.CANCELLED, cancel_requested=True, finished_at=timezone.now(),
+    )
+    Job.objects.filter(pk=job.pk, status=Job.RUNNING).update(cancel_requested=True)
+    job.refresh_from_db()
+    return job
+
+
+def job_to_dict(job):
+    data = {
+        'id': str(job.id),
+        'kind': job.kind,
+        'status': job.status,
+        'progress': job.progress,
+        'message': job.message,
+        'error': job.error or None,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'result': None,
+        'result_url': None,
+    }
+    if job.status == Job.SUCCEEDED and job.result is not None:
+        # Output paths stay on the server; clients download through the result endpoint
+        data['result'] = {k: v for k, v in job.result.items() if k != 'path'}
+        if 'path' in job.result:
+            data['result_url'] = reverse('job_result', args=[job.pk])
+    return data
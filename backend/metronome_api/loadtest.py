@@ -0,0 +1,246 @@
+"""
+Load testing against a running server.
+
+A scenario file (``backend/loadtest/default.json``) describes the traffic
+mix: weighted routes with a method and a path, plus run parameters. Paths
+may contain ``{sound_set_id}`` and ``{sample_file}``, which are filled from
+the server's own catalog before the run (or from the scenario's
+``variables``), so the scenario works against any database.
+
+Requests are drawn from a seeded random generator, so two runs of the same
+scenario send the same sequence of requests. With a ``rate`` the load is
+open-loop: request *i* is due at ``i / rate`` seconds and its latency is
+measured from that moment, so a server that falls behind is charged for the
+queueing it causes instead of slowing the load down. Without a rate every
+worker sends its next request as soon as the previous one is answered.
+
+``run_scenario`` returns a report with throughput, p50/p95/p99 latency and
+error rate per route and in total.
+"""
+import http.client
+import json
+import os
+import random
+import secrets
+import threading
+import time
+from urllib.parse import urlsplit
+
+METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'DELETE'}
+PERCENTILES = (50, 95, 99)
+
+
+class ScenarioError(ValueError):
+    """Raised for an invalid scenario file."""
+
+
+def load_scenario(path):
+    try:
+        with open(path) as f:
+            scenario = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ScenarioError(f'Cannot read scenario {path}: {e}')
+    return validate_scenario(scenario)
+
+
+def validate_scenario(scenario):
+    if not isinstance(scenario, dict) or not isinstance(scenario.get('routes'), list) or not scenario['routes']:
+        raise ScenarioError('A scenario needs a non-empty "routes" list')
+    names = set()
+    for route in scenario['routes']:
+        if not isinstance(route, dict) or not route.get('name') or not str(route.get('path', '')).startswith('/'):
+            raise ScenarioError(f'Every route needs a "name" and an absolute "path": {route!r}')
+        if route['name'] in names:
+            raise ScenarioError(f"Duplicate route name {route['name']!r}")
+        names.add(route['name'])
+        route.setdefault('method', 'GET')
+        route['method'] = route['method'].upper()
+        if route['method'] not in METHODS:
+            raise ScenarioError(f"Unsupported method {route['method']!r}")
+        route.setdefault('weight', 1)
+        if not isinstance(route['weight'], (int, float)) or route['weight'] <= 0:
+            raise ScenarioError(f"Route {route['name']!r} needs a positive weight")
+    for key in ('duration', 'concurrency', 'rate'):
+        value = scenario.get(key)
+        if value is not None and (not isinstance(value, (int, float)) or value < 0):
+            raise ScenarioError(f'"{key}" must be a non-negative number')
+    return scenario
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def request_plan(scenario, variables, seed):
+    """
+    An endless iterator of ``(route, path)`` pairs drawn with the route
+    weights. The same seed always yields the same sequence.
+    """
+    rng = random.Random(seed)
+    routes = scenario['routes']
+    weights = [route['weight'] for route in routes]
+    while True:
+        route = rng.choices(routes, weights)[0]
+        values = {name: rng.choice(pool) for name, pool in variables.items() if pool}
+        try:
+            path = route['path'].format(**values)
+        except KeyError as e:
+            raise ScenarioError(f"Route {route['name']!r} uses {e}, which has no values")
+        yield route, path
+
+
+class Client:
+    """One keep-alive HTTP connection with a CSRF cookie for unsafe methods."""
+
+    def __init__(self, base_url, timeout):
+        parts = urlsplit(base_url)
+        connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.connect = lambda: connection_class(parts.hostname, parts.port, timeout=timeout)
+        self.prefix = parts.path.rstrip('/')
+        self.connection = None
+        # Django accepts any well-formed token as long as cookie and header agree
+        self.csrf_token = secrets.token_hex(16)
+
+    def request(self, method, path, body=None):
+        headers = {}
+        if method not in ('GET', 'HEAD'):
+            headers['Cookie'] = f'csrftoken={self.csrf_token}'
+            headers['X-CSRFToken'] = self.csrf_token
+            headers['Content-Type'] = 'application/json'
+        for attempt in range(2):
+            if self.connection is None:
+                self.connection = self.connect()
+            try:
+                self.connection.request(method, self.prefix + path, body=body, headers=headers)
+                response = self.connection.getresponse()
+                data = response.read()
+                if response.getheader('Connection', '').lower() == 'close':
+                    self.close()
+                return response.status, len(data), data
+            except (http.client.HTTPException, ConnectionError):
+                # The server closed an idle keep-alive connection; retry once
+                self.close()
+                if attempt:
+                    raise
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+def discover_variables(base_url, timeout=10.0):
+    """Sound set ids and sample file names taken from the server's catalog."""
+    client = Client(base_url, timeout)
+    try:
+        status, _, body = client.request('GET', '/api/sound-sets/?limit=500&fields=id,first_beat_sound_url,'
+                                                 'accent_sound_url,normal_beat_sound_url')
+    finally:
+        client.close()
+    if status != 200:
+        raise ScenarioError(f'Cannot read the sound set catalog (HTTP {status})')
+    sound_sets = json.loads(body)
+    samples = set()
+    for sound_set in sound_sets:
+        for field in ('first_beat_sound_url', 'accent_sound_url', 'normal_beat_sound_url'):
+            url = sound_set.get(field)
+            # Only uploaded files go through serve_sound_file
+            if url and not url.startswith('/api/'):
+                samples.add(os.path.basename(url))
+    return {
+        'sound_set_id': sorted(sound_set['id'] for sound_set in sound_sets),
+        'sample_file': sorted(samples),
+    }
+
+
+def summarize(samples, elapsed):
+    """Throughput, latency percentiles and errors of ``(latency, status, size)`` samples."""
+    latencies = sorted(latency for latency, _, _ in samples)
+    errors = sum(1 for _, status, _ in samples if status is None or status >= 400)
+    statuses = {}
+    for _, status, _ in samples:
+        key = str(status) if status is not None else 'error'
+        statuses[key] = statuses.get(key, 0) + 1
+    summary = {
+        'requests': len(samples),
+        'throughput_rps': round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        'errors': errors,
+        'error_rate': round(errors / len(samples), 4) if samples else 0.0,
+        'status_codes': dict(sorted(statuses.items())),
+        'bytes': sum(size for _, _, size in samples),
+        'latency_ms': {},
+    }
+    if latencies:
+        summary['latency_ms'] = {f'p{p}': round(percentile(latencies, p) * 1000, 2) for p in PERCENTILES}
+        summary['latency_ms']['mean'] = round(sum(latencies) / len(latencies) * 1000, 2)
+        summary['latency_ms']['max'] = round(latencies[-1] * 1000, 2)
+    return summary
+
+
+def run_scenario(scenario, base_url, duration=None, concurrency=None, rate=None, seed=None, timeout=30.0):
+    """
+    Run ``scenario`` against ``base_url`` and return the report. Arguments
+    that are None fall back to the scenario's values.
+    """
+    duration = duration if duration is not None else scenario.get('duration', 30)
+    concurrency = int(concurrency or scenario.get('concurrency') or 8)
+    rate = rate if rate is not None else scenario.get('rate')
+    seed = seed if seed is not None else scenario.get('seed', 0)
+
+    variables = discover_variables(base_url, timeout) if any('{' in r['path'] for r in scenario['routes']) else {}
+    variables.update(scenario.get('variables', {}))
+    plan = request_plan(scenario, variables, seed)
+    lock = threading.Lock()
+    samples = {route['name']: [] for route in scenario['routes']}
+    counter = [0]
+
+    started = time.perf_counter()
+    deadline = started + duration
+
+    def worker():
+        client = Client(base_url, timeout)
+        try:
+            while True:
+                with lock:
+                    index = counter[0]
+                    counter[0] += 1
+                    route, path = next(plan)
+                due = started + index / rate if rate else time.perf_counter()
+                if due >= deadline:
+                    return
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                try:
+                    status, size, _ = client.request(route['method'], path, route.get('body'))
+                except OSError:
+                    status, size = None, 0
+                    client.close()
+                latency = time.perf_counter() - due
+                with lock:
+                    samples[route['name']].append((latency, status, size))
+        finally:
+            client.close()
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    all_samples = [sample for route_samples in samples.values() for sample in route_samples]
+    return {
+        'scenario': scenario.get('name', ''),
+        'base_url': base_url,
+        'duration_s': round(elapsed, 3),
+        'concurrency': concurrency,
+        'target_rate': rate,
+        'seed': seed,
+        'total': summarize(all_samples, elapsed),
+        'routes': {name: summarize(route_samples, elapsed) for name, route_samples in samples.items()},
+    }
@@ -0,0 +1,89 @@
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+
+class Command(BaseCommand):
+    help = (
+        'Measure cheap-route latency while one client floods an expensive route, '
+        'with admission control off and on'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=15.0, help='Duration of each run')
+        parser.add_argument('--workers', type=int, default=8, help='Server worker threads all requests share')
+        parser.add_argument('--attackers', type=int, default=16, help='Clients flooding the expensive route')
+        parser.add_argument(
+            '--round-trip', type=float, default=0.01,
+            help='Seconds each attacker waits between requests, standing in for the network round trip'
+        )
+        parser.add_argument('--cheap-url', default='/api/sound-sets/?limit=20')
+        parser.add_argument(
+            '--expensive-url', default='/api/synth/preview/?voice=beep&duration=1.5',
+            help='Expensive route; a random pitch is appended to defeat caching'
+        )
+
+    def handle(self, *args, **options):
+        for enabled in (False, True):
+            # Requests are built in-process, so their host needs to be allowed
+            with override_settings(METRONOME_ADMISSION_ENABLED=enabled, ALLOWED_HOSTS=['testserver']):
+                # A fresh handler loads the middleware with the current settings
+                result = self.run(WSGIHandler(), options)
+            label = 'on' if enabled else 'off'
+            latencies = result['cheap']
+            if not latencies:
+                self.stdout.write(self.style.ERROR(f"admission {label}: no cheap request completed"))
+                continue
+            p50 = statistics.median(latencies) * 1000
+            p99 = sorted(latencies)[int(len(latencies) * 0.99)] * 1000
+            self.stdout.write(self.style.SUCCESS(
+                f"admission {label:>3}: cheap p50 {p50:7.2f} ms  p99 {p99:7.2f} ms  "
+                f"({len(latencies)} requests, {result['cheap_errors']} errors)  "
+                f"expensive served {result['served']}, shed {result['shed']}"
+            ))
+
+    def run(self, handler, options):
+        # Requests wait for one of a fixed number of workers, like in a
+        # threaded WSGI server, so a flood can starve the cheap route
+        workers = ThreadPoolExecutor(max_workers=options['workers'])
+        factory = RequestFactory()
+        deadline = time.monotonic() + options['seconds']
+        result = {'cheap': [], 'cheap_errors': 0, 'served': 0, 'shed': 0}
+        lock = threading.Lock()
+
+        def attack():
+            while time.monotonic() < deadline:
+                url = f"{options['expensive_url']}&pitch={random.uniform(100, 400):.3f}"
+                request = factory.get(url, REMOTE_ADDR='203.0.113.7')
+                response = workers.submit(handler.get_response, request).result()
+                with lock:
+                    if response.status_code in (429, 503):
+                        result['shed'] += 1
+                    else:
+                        result['served'] += 1
+                time.sleep(options['round_trip'])
+
+        def probe():
+            while time.monotonic() < deadline:
+                request = factory.get(options['cheap_url'], REMOTE_ADDR='198.51.100.1')
+                started = time.perf_counter()
+                response = workers.submit(handler.get_response, request).result()
+                elapsed = time.perf_counter() - started
+                if response.status_code == 200:
+                    result['cheap'].append(elapsed)
+                else:
+                    result['cheap_errors'] += 1
+                time.sleep(0.05)
+
+        threads = [threading.Thread(target=attack) for _ in range(options['attackers'])]
+        threads.append(threading.Thread(target=probe))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        workers.shutdown()
+        return result
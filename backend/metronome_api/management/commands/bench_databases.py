@@ -0,0 +1,187 @@
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import RequestFactory, override_settings
+from metronome_api.loadtest import ScenarioError, load_scenario, request_plan, summarize
+from metronome_api.models import MetronomeSoundSet
+
+PROFILES = ('sqlite', 'postgresql')
+
+class Command(BaseCommand):
+    help = (
+        'Compare the database profiles under the same request mix: every profile and connection '
+        'lifetime runs in its own process against a freshly migrated and seeded test database'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--profile', action='append', choices=PROFILES,
+            help='Database profile to measure (repeatable, default: sqlite and postgresql); '
+                 'postgresql connects with the METRONOME_DB_* environment variables'
+        )
+        parser.add_argument(
+            '--conn-max-age', type=int, action='append',
+            help='Connection lifetimes to measure (repeatable, default: 0 and 600)'
+        )
+        parser.add_argument(
+            '--scenario', default=os.path.join(settings.BASE_DIR, 'loadtest', 'default.json'),
+            help='Request mix (default: loadtest/default.json); routes needing sample files are left out'
+        )
+        parser.add_argument('--seconds', type=float, default=10.0, help='Duration of each run')
+        parser.add_argument('--workers', type=int, default=8, help='Concurrent request threads')
+        parser.add_argument('--sound-sets', type=int, default=200, help='Sound sets in the test database')
+        parser.add_argument('--seed', type=int, default=1, help='Seed of the request sequence')
+        parser.add_argument('--run', action='store_true', help='Measure the current settings only and print JSON')
+
+    def handle(self, *args, **options):
+        if options['run']:
+            self.stdout.write(json.dumps(self.measure(options)))
+            return
+
+        results = []
+        for profile in options['profile'] or PROFILES:
+            for conn_max_age in options['conn_max_age'] or [0, 600]:
+                label = f'{profile} CONN_MAX_AGE={conn_max_age}'
+                report = self.run_child(profile, conn_max_age, options)
+                if 'error' in report:
+                    self.stdout.write(self.style.WARNING(f"{label}: skipped, {report['error']}"))
+                    continue
+                results.append(report)
+                total = report['total']
+                latency = total['latency_ms']
+                self.stdout.write(self.style.SUCCESS(
+                    f"{label:<32} {total['throughput_rps']:8.1f} req/s  p50 {latency.get('p50', 0):7.2f} ms  "
+                    f"p95 {latency.get('p95', 0):7.2f} ms  p99 {latency.get('p99', 0):7.2f} ms  "
+                    f"({total['requests']} requests, {total['errors']} errors)"
+                ))
+        if not results:
+            raise CommandError('No profile could be measured')
+
+    def run_child(self, profile, conn_max_age, options):
+        env = dict(os.environ, METRONOME_DB_ENGINE=profile, METRONOME_DB_CONN_MAX_AGE=str(conn_max_age))
+        command = [
+            sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'bench_databases', '--run',
+            '--scenario', options['scenario'], '--seconds', str(options['seconds']),
+            '--workers', str(options['workers']), '--sound-sets', str(options['sound_sets']),
+            '--seed', str(options['seed']),
+        ]
+        result = subprocess.run(command, env=env, capture_output=True, text=True, check=False)
+        if result.returncode != 0:
+            lines = (result.stderr or result.stdout).strip().splitlines()
+            return {'error': lines[-1] if lines else f'exit status {result.returncode}'}
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def measure(self, options):
+        try:
+            scenario = load_scenario(options['scenario'])
+        except ScenarioError as e:
+            raise CommandError(str(e))
+
+        with tempfile.TemporaryDirectory() as directory:
+            database_name = connection.settings_dict['NAME']
+            if connection.vendor == 'sqlite':
+                # A file, unlike the in-memory default, is shared by all threads and uses WAL
+                connection.settings_dict['TEST']['NAME'] = os.path.join(directory, 'bench.sqlite3')
+            try:
+                connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            except Exception as e:
+                raise CommandError(f'Cannot create the test database: {e}')
+            try:
+                MetronomeSoundSet.objects.bulk_create(
+                    [MetronomeSoundSet(name=f'Bench {i:05}', synth_params={}) for i in range(options['sound_sets'])],
+                    batch_size=500,
+                )
+                variables = {
+                    'sound_set_id': list(MetronomeSoundSet.objects.values_list('id', flat=True)),
+                    'sample_file': [],
+                }
+                # Requests are built in-process, so their host needs to be allowed;
+                # admission control would count all of them as one client
+                with override_settings(ALLOWED_HOSTS=['testserver'], METRONOME_ADMISSION_ENABLED=False):
+                    report = self.run_mix(scenario, variables, options)
+            finally:
+                connections.close_all()
+                connection.creation.destroy_test_db(database_name, verbosity=0)
+        report.update(
+            vendor=connection.vendor,
+            conn_max_age=connection.settings_dict['CONN_MAX_AGE'],
+            sound_sets=options['sound_sets'],
+            workers=options['workers'],
+        )
+        return report
+
+    def run_mix(self, scenario, variables, options):
+        scenario['routes'] = [
+            route for route in scenario['routes']
+            if all(f'{{{name}}}' not in route['path'] for name, pool in variables.items() if not pool)
+        ]
+        plan = request_plan(scenario, variables, options['seed'])
+        handler = WSGIHandler()
+        factory = RequestFactory()
+        csrf_token = 'b' * 32
+        lock = threading.Lock()
+        samples = {route['name']: [] for route in scenario['routes']}
+        deadline = time.perf_counter() + options['seconds']
+
+        def call(route, path):
+            if route['method'] == 'GET':
+                request = factory.get(path)
+            else:
+                request = factory.generic(
+                    route['method'], path, route.get('body') or '', content_type='application/json',
+                    HTTP_COOKIE=f'csrftoken={csrf_token}', HTTP_X_CSRFTOKEN=csrf_token,
+                )
+            status = []
+            # The full WSGI call sends request_started/finished, which open
+            # and close connections according to CONN_MAX_AGE
+            response = handler(request.environ, lambda s, headers, exc_info=None: status.append(s))
+            try:
+                size = sum(len(chunk) for chunk in response)
+            finally:
+                response.close()
+            return int(status[0].split()[0]), size
+
+        def worker():
+            try:
+                while True:
+                    with lock:
+                        route, path = next(plan)
+                    started = time.perf_counter()
+                    if started >= deadline:
+                        return
+                    try:
+                        status, size = call(route, path)
+                    except Exception:
+                        status, size = None, 0
+                    with lock:
+                        samples[route['name']].append((time.perf_counter() - started, status, size))
+            finally:
+                connections.close_all()
+
+        # Django's request logging of 4xx/5xx would interleave with the report
+        sys.stderr = io.StringIO()
+        try:
+            started = time.perf_counter()
+            threads = [threading.Thread(target=worker) for _ in range(options['workers'])]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+        finally:
+            sys.stderr = sys.__stderr__
+
+        all_samples = [sample for route_samples in samples.values() for sample in route_samples]
+        return {
+            'total': summarize(all_samples, elapsed),
+            'routes': {name: summarize(route_samples, elapsed) for name, route_samples in samples.items()},
+        }
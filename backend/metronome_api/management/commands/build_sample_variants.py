@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from metronome_api.models import MetronomeSoundSet
+from metronome_api.audio.rate_variants import build_rate_variants, sample_paths
+from metronome_api.audio.samples import SampleDecodeError
+from metronome_api.audio.variants import build_variants
+
+class Command(BaseCommand):
+    help = 'Precompute truncated high-tempo variants of every sound set sample, and with --rates its resampled copies'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sound-set', type=int, help='Only process the sound set with this ID')
+        parser.add_argument(
+            '--sample-rate', type=int, action='append',
+            help='Sample rate to build variants for (repeatable, default 48000)'
+        )
+        parser.add_argument(
+            '--rates', action='store_true',
+            help='Also write the missing METRONOME_SAMPLE_RATES copies of the sample files'
+        )
+
+    def handle(self, *args, **options):
+        sample_rates = options['sample_rate'] or [48000]
+        sound_sets = MetronomeSoundSet.objects.all()
+        if options['sound_set']:
+            sound_sets = sound_sets.filter(id=options['sound_set'])
+        if not sound_sets.exists():
+            self.stdout.write(self.style.ERROR('No sound sets found in database!'))
+            return
+
+        for sound_set in sound_sets:
+            for sample_rate in sample_rates:
+                try:
+                    manifest = build_variants(sound_set, sample_rate)
+                except SampleDecodeError as e:
+                    self.stdout.write(self.style.WARNING(f"Skipping {sound_set.name} (ID: {sound_set.id}): {e}"))
+                    break
+                count = sum(len(info['variants']) for info in manifest.values())
+                self.stdout.write(self.style.SUCCESS(
+                    f"{sound_set.name} (ID: {sound_set.id}): {count} variant(s) at {sample_rate} Hz"
+                ))
+            if options['rates']:
+                self.build_rates(sound_set)
+
+    def build_rates(self, sound_set):
+        written = 0
+        for path in sample_paths(sound_set):
+            try:
+                written += len(build_rate_variants(path))
+            except SampleDecodeError as e:
+                self.stdout.write(self.style.WARNING(f"Skipping {path}: {e}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"{sound_set.name} (ID: {sound_set.id}): {written} resampled file(s) written"
+        ))
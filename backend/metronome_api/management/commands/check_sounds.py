@@ -1,6 +1,5 @@
 from django.core.management.base import BaseCommand
 from metronome_api.models import MetronomeSoundSet
-from metronome_api.serializers import MetronomeSoundSetSerializer
 from django.conf import settings
 import os
 import shutil
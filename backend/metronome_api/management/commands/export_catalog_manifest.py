@@ -0,0 +1,58 @@
+import datetime
+import json
+import os
+import tempfile
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from metronome_api.catalog import TOMBSTONE_RETENTION_DAYS
+from metronome_api.manifest_catalog import sound_set_to_manifest_entry
+from metronome_api.models import MetronomeSoundSet, SoundSetTombstone
+
+class Command(BaseCommand):
+    help = 'Write the sound set catalog manifest served by the manifest catalog backend'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', default=None,
+            help='Manifest path (default: METRONOME_CATALOG_MANIFEST)'
+        )
+
+    def handle(self, *args, **options):
+        path = options['output'] or settings.METRONOME_CATALOG_MANIFEST
+        now = timezone.now()
+        sound_sets = [sound_set_to_manifest_entry(s) for s in MetronomeSoundSet.objects.order_by('name', 'id')]
+        # Tombstones that sync cursors can still reach
+        tombstones = SoundSetTombstone.objects.filter(
+            deleted_at__gt=now - datetime.timedelta(days=TOMBSTONE_RETENTION_DAYS)
+        ).order_by('deleted_at', 'id')
+        deleted = [{'id': t.sound_set_id, 'deleted_at': t.deleted_at.isoformat()} for t in tombstones]
+
+        # Bump the version of the manifest being replaced
+        version = 1
+        try:
+            with open(path, 'rb') as f:
+                previous = json.load(f)
+            if previous.get('sound_sets') == sound_sets and previous.get('deleted', []) == deleted:
+                self.stdout.write(self.style.SUCCESS(f"Manifest {path} is up to date (version {previous['version']})"))
+                return
+            version = int(previous['version']) + 1
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            pass
+
+        manifest = {'version': version, 'generated_at': now.isoformat(), 'sound_sets': sound_sets, 'deleted': deleted}
+        # Write next to the target and rename, so readers never see a partial file
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(manifest, f, indent=1)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {len(sound_sets)} sound set(s) to {path} (version {version})"
+        ))
@@ -0,0 +1,41 @@
+import os
+import tempfile
+from django.core.management.base import BaseCommand, CommandError
+from metronome_api.models import MetronomeSoundSet
+from metronome_api.packs import PackError, export_pack
+
+class Command(BaseCommand):
+    help = 'Write sound sets and their samples to a portable pack (zip with a checksummed manifest)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('ids', nargs='*', type=int, help='Sound sets to export (default: all)')
+        parser.add_argument('--output', required=True, help='Pack file to write')
+
+    def handle(self, *args, **options):
+        sound_sets = MetronomeSoundSet.objects.order_by('name', 'id')
+        if options['ids']:
+            sound_sets = sound_sets.filter(pk__in=options['ids'])
+            missing = set(options['ids']) - set(sound_sets.values_list('pk', flat=True))
+            if missing:
+                raise CommandError(f"Unknown sound set id(s): {', '.join(map(str, sorted(missing)))}")
+        count = sound_sets.count()
+
+        path = options['output']
+        # Write next to the target and rename, so a failed export leaves no partial pack
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in export_pack(sound_sets):
+                    f.write(chunk)
+            os.replace(tmp_path, path)
+        except PackError as e:
+            os.unlink(tmp_path)
+            raise CommandError(str(e))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported {count} sound set(s) to {path} ({os.path.getsize(path)} bytes)"
+        ))
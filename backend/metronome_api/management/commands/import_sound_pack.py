@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from metronome_api.packs import EXISTING_CHOICES, PackError, import_pack
+
+class Command(BaseCommand):
+    help = 'Import the sound sets of a pack written by export_sound_pack'
+
+    def add_arguments(self, parser):
+        parser.add_argument('pack', help='Pack file to import')
+        parser.add_argument(
+            '--existing', choices=EXISTING_CHOICES, default='skip',
+            help='What to do with sound sets whose name is already taken (default: skip)'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            result = import_pack(options['pack'], existing=options['existing'])
+        except PackError as e:
+            raise CommandError(str(e))
+
+        for name in result['skipped']:
+            self.stdout.write(f'Skipped "{name}": a sound set with that name exists')
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {len(result['created'])} sound set(s) with {result['files']} sample file(s)"
+        ))
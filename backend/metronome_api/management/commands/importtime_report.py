@@ -0,0 +1,54 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from metronome_api.importtime import ENTRY_POINTS, ImportTimeError, measure
+
+class Command(BaseCommand):
+    help = (
+        'Start the Django entry points in fresh interpreters with -X importtime and report '
+        'their import time per installed app and the slowest modules'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--entry-point', action='append', choices=sorted(ENTRY_POINTS),
+            help='Entry point to measure (repeatable, default: all)'
+        )
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per entry point; the fastest is reported')
+        parser.add_argument('--top', type=int, default=15, help='Slowest modules to list')
+        parser.add_argument(
+            '--budget-ms', type=float, default=None,
+            help='Fail if the import time of an entry point exceeds this many milliseconds'
+        )
+        parser.add_argument('--json', action='store_true', help='Print the reports as JSON')
+
+    def handle(self, *args, **options):
+        reports = []
+        for entry_point in options['entry_point'] or sorted(ENTRY_POINTS):
+            try:
+                reports.append(measure(entry_point, repeat=max(1, options['repeat']), top=options['top']))
+            except ImportTimeError as e:
+                raise CommandError(str(e))
+
+        if options['json']:
+            self.stdout.write(json.dumps(reports, indent=2))
+        else:
+            for report in reports:
+                self.write_report(report)
+
+        over = [r for r in reports if options['budget_ms'] is not None and r['import_ms'] > options['budget_ms']]
+        if over:
+            raise CommandError(', '.join(
+                f"{r['entry_point']} imports for {r['import_ms']} ms" for r in over
+            ) + f", the budget is {options['budget_ms']} ms")
+
+    def write_report(self, report):
+        self.stdout.write(self.style.SUCCESS(
+            f"{report['entry_point']}: {report['import_ms']} ms importing {len(report['modules'])} modules "
+            f"({report['wall_ms']} ms until exit)"
+        ))
+        for entry in report['owners']:
+            self.stdout.write(f"  {entry['owner']:<36} {entry['ms']:8.1f} ms  {entry['modules']:4} modules")
+        self.stdout.write('  Slowest modules (self / cumulative):')
+        for entry in report['slowest']:
+            self.stdout.write(f"    {entry['module']:<52} {entry['self_ms']:7.1f} {entry['cumulative_ms']:8.1f} ms")
+        self.stdout.write('')
@@ -0,0 +1,46 @@
+import json
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from metronome_api.loadtest import ScenarioError, load_scenario, run_scenario
+
+class Command(BaseCommand):
+    help = 'Replay a traffic scenario against a running server and report latency and errors per route as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scenario', default=os.path.join(settings.BASE_DIR, 'loadtest', 'default.json'),
+            help='Scenario file (default: loadtest/default.json)'
+        )
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000', help='Server to load')
+        parser.add_argument('--duration', type=float, default=None, help='Seconds to run')
+        parser.add_argument('--concurrency', type=int, default=None, help='Parallel connections')
+        parser.add_argument(
+            '--rate', type=float, default=None,
+            help='Requests per second to send, independent of response times; 0 sends as fast as possible'
+        )
+        parser.add_argument('--seed', type=int, default=None, help='Seed of the request sequence')
+        parser.add_argument('--output', default=None, help='Also write the report to this file')
+
+    def handle(self, *args, **options):
+        try:
+            scenario = load_scenario(options['scenario'])
+            report = run_scenario(
+                scenario, options['base_url'], duration=options['duration'], concurrency=options['concurrency'],
+                rate=options['rate'], seed=options['seed'],
+            )
+        except ScenarioError as e:
+            raise CommandError(str(e))
+        except OSError as e:
+            raise CommandError(f"Cannot reach {options['base_url']}: {e}")
+
+        text = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(text + '\n')
+        self.stdout.write(text)
+        total = report['total']
+        self.stderr.write(self.style.SUCCESS(
+            f"{total['requests']} requests, {total['throughput_rps']} req/s, "
+            f"p99 {total['latency_ms'].get('p99')} ms, error rate {total['error_rate']:.2%}"
+        ))
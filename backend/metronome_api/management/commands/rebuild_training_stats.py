@@ -0,0 +1,13 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from metronome_api.telemetry import rebuild_stats
+
+class Command(BaseCommand):
+    help = 'Recompute the training telemetry aggregates from the event log'
+
+    def handle(self, *args, **options):
+        users, days = rebuild_stats(settings.METRONOME_TELEMETRY_DIR)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt training stats of {users} user(s) over {days} user-day(s) "
+            f"from {settings.METRONOME_TELEMETRY_DIR}"
+        ))
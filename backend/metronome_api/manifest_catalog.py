@@ -0,0 +1,245 @@
+"""
+Database-free sound set catalog.
+
+With ``METRONOME_CATALOG_BACKEND = 'manifest'`` the read endpoints are served
+from a versioned JSON manifest written by ``manage.py export_catalog_manifest``
+instead of the database, so read-only replicas need no database connection:
+
+    {"version": 3, "generated_at": "...", "sound_sets": [{"id": 1, "name": "...", ...}, ...],
+     "deleted": [{"id": 7, "deleted_at": "..."}, ...]}
+
+The manifest is loaded into an immutable index: the sound sets sorted by
+``(name, id)`` for keyset pagination, precomputed payloads per id, and an
+inverted token index with a sorted vocabulary for prefix search. The file is
+checked for changes at most once per ``RELOAD_INTERVAL`` seconds; a new index
+is built off to the side and swapped in with a single assignment, so requests
+never see a half-loaded catalog. A manifest that fails to load leaves the
+previous index in place.
+
+``deleted`` holds the tombstones of deleted sound sets for delta syncs. A
+manifest is a snapshot taken at ``generated_at``, so sync cursors handed out
+by replicas never go past it: changes made after the export reach clients
+with the next manifest.
+"""
+import bisect
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+
+from django.utils.dateparse import parse_datetime
+
+from .catalog import (
+    DEFAULT_PAGE_SIZE, EPOCH, LIST_FIELDS, MAX_CHANGES, SyncCursorExpired, decode_cursor, decode_sync_cursor,
+    encode_cursor, restrict_fields, sound_set_to_dict, sync_window,
+)
+from .models import MetronomeSoundSet
+
+RELOAD_INTERVAL = 1.0
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+class ManifestError(Exception):
+    """Raised when the catalog manifest is missing or malformed."""
+
+
+def tokenize(text):
+    """Split text into lower-case tokens without diacritics, like the FTS5 unicode61 tokenizer."""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return TOKEN_RE.findall(text.casefold())
+
+
+def sound_set_to_manifest_entry(sound_set):
+    return {
+        'id': sound_set.id,
+        'name': sound_set.name,
+        'description': sound_set.description,
+        'first_beat_sound': sound_set.first_beat_sound.name or '',
+        'accent_sound': sound_set.accent_sound.name or '',
+        'normal_beat_sound': sound_set.normal_beat_sound.name or '',
+        'synth_params': sound_set.synth_params,
+        'created_at': sound_set.created_at.isoformat() if sound_set.created_at else None,
+        'updated_at': sound_set.updated_at.isoformat() if sound_set.updated_at else None,
+    }
+
+
+def _sound_set_from_entry(entry):
+    # Unsaved instances: the serialization, render and synthesis code only
+    # reads attributes, so it works on them without touching the database
+    return MetronomeSoundSet(
+        id=int(entry['id']),
+        name=entry['name'],
+        description=entry.get('description') or '',
+        first_beat_sound=entry.get('first_beat_sound') or '',
+        accent_sound=entry.get('accent_sound') or '',
+        normal_beat_sound=entry.get('normal_beat_sound') or '',
+        synth_params=entry.get('synth_params'),
+        created_at=parse_datetime(entry['created_at']) if entry.get('created_at') else None,
+        updated_at=parse_datetime(entry['updated_at']) if entry.get('updated_at') else None,
+    )
+
+
+class ManifestIndex:
+    """Immutable in-memory index of one manifest version."""
+
+    def __init__(self, version, sound_sets, deleted=(), generated_at=None):
+        self.version = version
+        self.sound_sets = sorted(sound_sets, key=lambda s: (s.name, s.id))
+        self.keys = [(s.name, s.id) for s in self.sound_sets]
+        self.by_id = {s.id: s for s in self.sound_sets}
+        self.payloads = {s.id: sound_set_to_dict(s) for s in self.sound_sets}
+
+        # Sets and tombstones in order of change, for delta syncs
+        self.updates = sorted((s.updated_at or EPOCH, s.id) for s in self.sound_sets)
+        self.update_times = [moment for moment, _ in self.updates]
+        self.deleted = sorted(deleted)
+        self.deleted_times = [moment for moment, _ in self.deleted]
+        self.generated_at = generated_at or max(self.update_times[-1:] + self.deleted_times[-1:], default=None)
+
+        postings = {}
+        for position, sound_set in enumerate(self.sound_sets):
+            for token in set(tokenize(sound_set.name) + tokenize(sound_set.description)):
+                postings.setdefault(token, []).append(position)
+        self.postings = postings
+        self.vocabulary = sorted(postings)
+
+    def prefix_positions(self, prefix):
+        """Positions of the sound sets containing a token that starts with ``prefix``."""
+        positions = set()
+        start = bisect.bisect_left(self.vocabulary, prefix)
+        for token in self.vocabulary[start:]:
+            if not token.startswith(prefix):
+                break
+            positions.update(self.postings[token])
+        return positions
+
+    def search(self, query):
+        """Sorted positions matching every term of ``query`` as a prefix."""
+        matches = None
+        for term in tokenize(query):
+            positions = self.prefix_positions(term)
+            matches = positions if matches is None else matches & positions
+            if not matches:
+                return []
+        return sorted(matches) if matches is not None else None
+
+
+def load_manifest(path):
+    """Read and validate a manifest file and build its index."""
+    try:
+        with open(path, 'rb') as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ManifestError(f'Cannot read catalog manifest {path}: {e}')
+    if not isinstance(data, dict) or not isinstance(data.get('sound_sets'), list):
+        raise ManifestError(f'Catalog manifest {path} has no sound_sets list')
+    try:
+        sound_sets = [_sound_set_from_entry(entry) for entry in data['sound_sets']]
+        deleted = [(parse_datetime(entry['deleted_at']), int(entry['id'])) for entry in data.get('deleted') or []]
+        generated_at = parse_datetime(data['generated_at']) if data.get('generated_at') else None
+    except (KeyError, TypeError, ValueError) as e:
+        raise ManifestError(f'Invalid sound set in catalog manifest {path}: {e}')
+    return ManifestIndex(data.get('version'), sound_sets, deleted, generated_at)
+
+
+class ManifestCatalog:
+    """Catalog served from a manifest file, reloaded when the file changes."""
+
+    def __init__(self, path):
+        self.path = path
+        self._index = None
+        self._stat_key = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def index(self):
+        """Return the current index, reloading the manifest if it changed on disk."""
+        now = time.monotonic()
+        if self._index is not None and now - self._checked_at < RELOAD_INTERVAL:
+            return self._index
+
+        with self._lock:
+            if self._index is not None and now - self._checked_at < RELOAD_INTERVAL:
+                return self._index
+            stat_key = self._stat()
+            if self._index is None or (stat_key is not None and stat_key != self._stat_key):
+                try:
+                    index = load_manifest(self.path)
+                except ManifestError as e:
+                    if self._index is None:
+                        raise
+                    print(f"Keeping catalog manifest version {self._index.version}: {e}")
+                else:
+                    self._index = index
+                    print(f"Loaded catalog manifest version {index.version} ({len(index.sound_sets)} sound sets)")
+                self._stat_key = stat_key
+            self._checked_at = now
+            return self._index
+
+    def page(self, cursor=None, limit=DEFAULT_PAGE_SIZE, query=None, fields=LIST_FIELDS):
+        index = self.index()
+        start = bisect.bisect_right(index.keys, decode_cursor(cursor)) if cursor else 0
+
+        positions = index.search(query) if query else None
+        if positions is None:
+            rows = index.sound_sets[start:start + limit + 1]
+        else:
+            offset = bisect.bisect_left(positions, start)
+            rows = [index.sound_sets[p] for p in positions[offset:offset + limit + 1]]
+
+        next_cursor = encode_cursor(rows[limit - 1].name, rows[limit - 1].id) if len(rows) > limit else None
+        return [restrict_fields(index.payloads[s.id], fields) for s in rows[:limit]], next_cursor
+
+    def changes(self, since=None, fields=LIST_FIELDS):
+        index = self.index()
+        since, next_cursor = sync_window(decode_sync_cursor(since) if since else None, now=index.generated_at)
+        if since is None:
+            rows, deleted = index.updates, []
+        else:
+            rows = index.updates[bisect.bisect_right(index.update_times, since):]
+            deleted = [pk for _, pk in index.deleted[bisect.bisect_right(index.deleted_times, since):]]
+            if len(rows) + len(deleted) > MAX_CHANGES:
+                raise SyncCursorExpired('Too many changes, reload the catalog')
+        return [restrict_fields(index.payloads[pk], fields) for _, pk in rows], deleted, next_cursor
+
+    def payloads(self, ids):
+        payloads = self.index().payloads
+        return {pk: payloads[pk] for pk in ids if pk in payloads}
+
+    def get(self, pk, only=None):
+        return self.index().by_id.get(pk)
+
+    def first(self):
+        sound_sets = self.index().sound_sets
+        return sound_sets[0] if sound_sets else None
+
+    def sound_sets(self, limit):
+        return self.index().sound_sets[:limit]
+
+    def first_payload(self):
+        index = self.index()
+        return index.payloads[index.sound_sets[0].id] if index.sound_sets else None
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_manifest_catalog(path):
+    """Return the process-wide catalog for the manifest at ``path``."""
+    catalog = _catalogs.get(path)
+    if catalog is None:
+        with _catalogs_lock:
+            catalog = _catalogs.setdefault(path, ManifestCatalog(path))
+    return catalog
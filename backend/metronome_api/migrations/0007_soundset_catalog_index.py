@@ -0,0 +1,76 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:15
+
+from django.db import migrations, models
+
+FTS_TABLE = 'metronome_api_soundset_fts'
+SOUND_SET_TABLE = 'metronome_api_metronomesoundset'
+
+SQLITE_FORWARD = [
+    f"""CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        name, description,
+        content='{SOUND_SET_TABLE}', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    f"""CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {SOUND_SET_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON {SOUND_SET_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF name, description ON {SOUND_SET_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END""",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+SQLITE_BACKWARD = [
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_au',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ad',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ai',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+POSTGRES_FORWARD = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    f'CREATE INDEX IF NOT EXISTS soundset_name_trgm_idx ON {SOUND_SET_TABLE} USING gin (name gin_trgm_ops)',
+    f'CREATE INDEX IF NOT EXISTS soundset_description_trgm_idx ON {SOUND_SET_TABLE} USING gin (description gin_trgm_ops)',
+]
+
+POSTGRES_BACKWARD = [
+    'DROP INDEX IF EXISTS soundset_description_trgm_idx',
+    'DROP INDEX IF EXISTS soundset_name_trgm_idx',
+]
+
+
+def _run_for_vendor(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+create_search_index = _run_for_vendor({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD})
+drop_search_index = _run_for_vendor({'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRES_BACKWARD})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('metronome_api', '0006_alter_metronomesoundset_is_active'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='metronomesoundset',
+            options={'ordering': ['name', 'id'], 'verbose_name': 'Metronome Sound Set', 'verbose_name_plural': 'Metronome Sound Sets'},
+        ),
+        migrations.AddIndex(
+            model_name='metronomesoundset',
+            index=models.Index(fields=['name', 'id'], name='soundset_name_id_idx'),
+        ),
+        # Full-text search index: FTS5 on SQLite, trigram GIN indexes on PostgreSQL.
+        # Note: an FTS5 external-content table is kept in sync by triggers, so later
+        # migrations must not rebuild the sound set table on SQLite.
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:21
+
+import django.core.validators
+from django.db import migrations, models
+import metronome_api.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('metronome_api', '0007_soundset_catalog_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='metronomesoundset',
+            name='synth_params',
+            field=models.JSONField(blank=True, help_text='Click synthesis parameters per role, e.g. {"first": {"voice": "woodblock", "pitch": 1500}}. When set, the sounds are generated on demand and no files are needed.', null=True),
+        ),
+        migrations.AlterField(
+            model_name='metronomesoundset',
+            name='accent_sound',
+            field=models.FileField(blank=True, help_text='Sound for accented beats', upload_to='', validators=[django.core.validators.FileExtensionValidator(allowed_extensions=['wav', 'mp3', 'ogg']), metronome_api.models.validate_audio_file]),
+        ),
+        migrations.AlterField(
+            model_name='metronomesoundset',
+            name='first_beat_sound',
+            field=models.FileField(blank=True, help_text='Sound for the first beat of the measure', upload_to='', validators=[django.core.validators.FileExtensionValidator(allowed_extensions=['wav', 'mp3', 'ogg']), metronome_api.models.validate_audio_file]),
+        ),
+        migrations.AlterField(
+            model_name='metronomesoundset',
+            name='normal_beat_sound',
+            field=models.FileField(blank=True, help_text='Sound for normal beats', upload_to='', validators=[django.core.validators.FileExtensionValidator(allowed_extensions=['wav', 'mp3', 'ogg']), metronome_api.models.validate_audio_file]),
+        ),
+    ]
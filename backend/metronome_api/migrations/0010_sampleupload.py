@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('metronome_api', '0009_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SampleUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filename', models.CharField(max_length=255)),
+                ('total_size', models.BigIntegerField()),
+                ('received', models.BigIntegerField(default=0)),
+                ('audio_format', models.CharField(blank=True, max_length=3)),
+                ('status', models.CharField(choices=[('uploading', 'Uploading'), ('complete', 'Complete'), ('rejected', 'Rejected')], default='uploading', max_length=10)),
+                ('error', models.TextField(blank=True)),
+                ('role', models.CharField(blank=True, max_length=10)),
+                ('stored_name', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('sound_set', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='metronome_api.metronomesoundset')),
+            ],
+        ),
+    ]
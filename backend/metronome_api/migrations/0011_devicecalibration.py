@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('metronome_api', '0010_sampleupload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeviceCalibration',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('device_id', models.CharField(max_length=64)),
+                ('user_agent', models.CharField(blank=True, max_length=255)),
+                ('sample_rate', models.PositiveIntegerField()),
+                ('round_trip_ms', models.FloatField()),
+                ('jitter_ms', models.FloatField()),
+                ('input_latency_ms', models.FloatField(default=0.0)),
+                ('compensation_ms', models.FloatField()),
+                ('clicks_detected', models.PositiveSmallIntegerField()),
+                ('clicks_total', models.PositiveSmallIntegerField()),
+                ('confidence', models.FloatField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['device_id', '-created_at'], name='calibration_device_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('metronome_api', '0011_devicecalibration'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrainingDayStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.CharField(max_length=64)),
+                ('events', models.PositiveIntegerField(default=0)),
+                ('measures', models.PositiveIntegerField(default=0)),
+                ('silent_measures', models.PositiveIntegerField(default=0)),
+                ('silence_phases', models.PositiveIntegerField(default=0)),
+                ('tempo_steps', models.PositiveIntegerField(default=0)),
+                ('mutes', models.PositiveIntegerField(default=0)),
+                ('max_bpm', models.FloatField(blank=True, null=True)),
+                ('first_event_at', models.DateTimeField(blank=True, null=True)),
+                ('last_event_at', models.DateTimeField(blank=True, null=True)),
+                ('day', models.DateField()),
+            ],
+            options={
+                'verbose_name_plural': 'Training day stats',
+            },
+        ),
+        migrations.CreateModel(
+            name='TrainingUserStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.CharField(max_length=64)),
+                ('events', models.PositiveIntegerField(default=0)),
+                ('measures', models.PositiveIntegerField(default=0)),
+                ('silent_measures', models.PositiveIntegerField(default=0)),
+                ('silence_phases', models.PositiveIntegerField(default=0)),
+                ('tempo_steps', models.PositiveIntegerField(default=0)),
+                ('mutes', models.PositiveIntegerField(default=0)),
+                ('max_bpm', models.FloatField(blank=True, null=True)),
+                ('first_event_at', models.DateTimeField(blank=True, null=True)),
+                ('last_event_at', models.DateTimeField(blank=True, null=True)),
+                ('days_active', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Training user stats',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='traininguserstats',
+            constraint=models.UniqueConstraint(fields=('user_id',), name='training_user_stats_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='trainingdaystats',
+            constraint=models.UniqueConstraint(fields=('user_id', 'day'), name='training_day_stats_unique'),
+        ),
+    ]
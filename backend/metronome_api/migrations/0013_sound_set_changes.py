@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-19 05:32
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('metronome_api', '0012_training_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SoundSetTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sound_set_id', models.PositiveBigIntegerField()),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='metronomesoundset',
+            index=models.Index(fields=['updated_at'], name='soundset_updated_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='soundsettombstone',
+            index=models.Index(fields=['deleted_at'], name='soundset_tombstone_deleted_idx'),
+        ),
+    ]
@@ -1,7 +1,16 @@
 from django.db import models
 from django.core.validators import FileExtensionValidator
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 import os
+import uuid
+
+# Beat role -> sound file field
+ROLE_FIELDS = {
+    'first': 'first_beat_sound',
+    'accent': 'accent_sound',
+    'normal': 'normal_beat_sound',
+}
 
 def validate_audio_file(value):
     """Validate that the file is an audio file."""
@@ -10,8 +19,39 @@ def validate_audio_file(value):
     if not ext in valid_extensions:
         raise ValidationError('Unsupported file type. Please use WAV, MP3, or OGG files.')
 
+    # The extension alone proves nothing: check the header of the content
+    from .audio.sniff import MAX_SNIFF_BYTES, AudioFormatError, check_extension, sniff_audio
+    try:
+        value.open('rb')
+        head = value.read(MAX_SNIFF_BYTES)
+        value.seek(0)
+    except (OSError, ValueError):
+        # Stored files that are not available here were validated on upload
+        return
+    try:
+        check_extension(value.name, sniff_audio(head, complete=len(head) < MAX_SNIFF_BYTES))
+    except AudioFormatError as e:
+        raise ValidationError(f'Invalid audio file: {e}')
+
+class SoundSetQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        """
+        Update the sound sets and stamp ``updated_at``, which ``update()``
+        leaves alone otherwise, so that catalog syncs see the change. The
+        cached payloads of the updated sets are dropped, as saving does.
+        """
+        from . import payload_cache
+
+        kwargs.setdefault('updated_at', timezone.now())
+        pks = list(self.values_list('pk', flat=True))
+        rows = super().update(**kwargs)
+        payload_cache.invalidate_many(pks)
+        return rows
+
 class MetronomeSoundSet(models.Model):
     """A collection of related metronome sounds."""
+    objects = SoundSetQuerySet.as_manager()
+
     def __init__(self, *args, **kwargs):
         if 'is_default' in kwargs:
             kwargs['is_active'] = kwargs.pop('is_default')
@@ -32,33 +72,74 @@ class MetronomeSoundSet(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Synthesized sound sets are defined by a few parameters instead of files
+    synth_params = models.JSONField(
+        null=True,
+        blank=True,
+        help_text='Click synthesis parameters per role, e.g. {"first": {"voice": "woodblock", "pitch": 1500}}. '
+                  'When set, the sounds are generated on demand and no files are needed.'
+    )
+
     first_beat_sound = models.FileField(
         upload_to='',
+        blank=True,
         validators=[FileExtensionValidator(allowed_extensions=['wav', 'mp3', 'ogg']), validate_audio_file],
         help_text='Sound for the first beat of the measure'
     )
     accent_sound = models.FileField(
         upload_to='',
+        blank=True,
         validators=[FileExtensionValidator(allowed_extensions=['wav', 'mp3', 'ogg']), validate_audio_file],
         help_text='Sound for accented beats'
     )
     normal_beat_sound = models.FileField(
         upload_to='',
+        blank=True,
         validators=[FileExtensionValidator(allowed_extensions=['wav', 'mp3', 'ogg']), validate_audio_file],
         help_text='Sound for normal beats'
     )
 
     class Meta:
-        ordering = ['-is_active', 'name']
+        # Matches the keyset cursor of the catalog endpoint so pages are index range scans
+        ordering = ['name', 'id']
+        indexes = [
+            models.Index(fields=['name', 'id'], name='soundset_name_id_idx'),
+            # Delta sync: sets changed after a cursor
+            models.Index(fields=['updated_at'], name='soundset_updated_at_idx'),
+        ]
         verbose_name = "Metronome Sound Set"
         verbose_name_plural = "Metronome Sound Sets"
 
     def __str__(self):
         return self.name
 
+    @property
+    def is_synthesized(self):
+        return self.synth_params is not None
+
+    def clean(self):
+        super().clean()
+        if self.is_synthesized:
+            from .audio.synth import SynthParamsError, normalize_params
+            try:
+                normalize_params(self.synth_params)
+            except SynthParamsError as e:
+                raise ValidationError({'synth_params': str(e)})
+        elif not (self.first_beat_sound and self.accent_sound and self.normal_beat_sound):
+            raise ValidationError('Upload all three sounds or define synthesis parameters.')
+
     def save(self, *args, **kwargs):
         # No longer enforcing single active sound set - cookie-based selection instead
-        
+
+        # Nothing uploaded at all: synthesize the default clicks instead of
+        # pointing at template files that may not exist
+        if not self.is_synthesized and not (self.first_beat_sound or self.accent_sound or self.normal_beat_sound):
+            self.synth_params = {}
+
+        if self.is_synthesized:
+            super().save(*args, **kwargs)
+            return
+
         # Use template audio if sound file not provided
         if not self.first_beat_sound:
             self.first_beat_sound = "src/assets/audio/default_first_beat.wav"
@@ -79,11 +160,153 @@ class MetronomeSoundSet(models.Model):
         # Just return the first sound set or create a default one
         sound_set = cls.objects.first()
         if not sound_set:
-            sound_set = cls.objects.create(
-                name="Default Sound Set",
-                first_beat_sound="src/assets/audio/default_first_beat.wav",
-                accent_sound="src/assets/audio/default_accent.wav",
-                normal_beat_sound="src/assets/audio/default_normal_beat.wav",
-                # No longer setting is_active=True
-            )
+            # Without files the default set is synthesized
+            sound_set = cls.objects.create(name="Default Sound Set")
         return sound_set
+
+class SoundSetTombstone(models.Model):
+    """Record of a deleted sound set, so clients syncing the catalog learn about the deletion."""
+    sound_set_id = models.PositiveBigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [models.Index(fields=['deleted_at'], name='soundset_tombstone_deleted_idx')]
+
+    def __str__(self):
+        return f'Sound set {self.sound_set_id} deleted at {self.deleted_at}'
+
+class Job(models.Model):
+    """A unit of heavy audio work run by the process pool in ``jobs.py``."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+        (CANCELLED, 'Cancelled'),
+    ]
+    ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=50)
+    params = models.JSONField(default=dict)
+    # Hash of kind and params: identical jobs in flight are shared
+    dedupe_key = models.CharField(max_length=64, db_index=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    progress = models.FloatField(default=0.0)
+    message = models.CharField(max_length=200, blank=True)
+    cancel_requested = models.BooleanField(default=False)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Last sign of life of a running job; see ``jobs.expire_stale_jobs``
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f'{self.kind} {self.id} ({self.status})'
+
+    @property
+    def is_finished(self):
+        return self.status not in self.ACTIVE_STATUSES
+
+class SampleUpload(models.Model):
+    """A resumable, chunked upload of one sound set sample (see ``uploads.py``)."""
+    UPLOADING = 'uploading'
+    COMPLETE = 'complete'
+    REJECTED = 'rejected'
+    STATUS_CHOICES = [
+        (UPLOADING, 'Uploading'),
+        (COMPLETE, 'Complete'),
+        (REJECTED, 'Rejected'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    filename = models.CharField(max_length=255)
+    total_size = models.BigIntegerField()
+    received = models.BigIntegerField(default=0)
+    # Set once the header has been recognized: 'wav', 'mp3' or 'ogg'
+    audio_format = models.CharField(max_length=3, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=UPLOADING)
+    error = models.TextField(blank=True)
+    # Optionally attach the finished file to a sound set role
+    sound_set = models.ForeignKey(MetronomeSoundSet, null=True, blank=True, on_delete=models.CASCADE)
+    role = models.CharField(max_length=10, blank=True)
+    stored_name = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.filename} ({self.received}/{self.total_size})'
+
+
+class DeviceCalibration(models.Model):
+    """A measured output latency of one client device (see ``audio/calibration.py``)."""
+    # Chosen by the client, e.g. a random id kept in local storage
+    device_id = models.CharField(max_length=64)
+    user_agent = models.CharField(max_length=255, blank=True)
+    sample_rate = models.PositiveIntegerField()
+    round_trip_ms = models.FloatField()
+    jitter_ms = models.FloatField()
+    # Input latency reported by the client, subtracted from the round trip
+    input_latency_ms = models.FloatField(default=0.0)
+    compensation_ms = models.FloatField()
+    clicks_detected = models.PositiveSmallIntegerField()
+    clicks_total = models.PositiveSmallIntegerField()
+    confidence = models.FloatField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['device_id', '-created_at'], name='calibration_device_idx')]
+
+    def __str__(self):
+        return f'{self.device_id}: {self.compensation_ms:.1f} ms'
+
+
+class TrainingStatsBase(models.Model):
+    """Counters of training telemetry events (see ``telemetry.py``)."""
+    user_id = models.CharField(max_length=64)
+    events = models.PositiveIntegerField(default=0)
+    measures = models.PositiveIntegerField(default=0)
+    silent_measures = models.PositiveIntegerField(default=0)
+    silence_phases = models.PositiveIntegerField(default=0)
+    tempo_steps = models.PositiveIntegerField(default=0)
+    mutes = models.PositiveIntegerField(default=0)
+    max_bpm = models.FloatField(null=True, blank=True)
+    first_event_at = models.DateTimeField(null=True, blank=True)
+    last_event_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        abstract = True
+
+
+class TrainingDayStats(TrainingStatsBase):
+    """Training telemetry of one user on one (UTC) day."""
+    day = models.DateField()
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['user_id', 'day'], name='training_day_stats_unique')]
+        verbose_name_plural = 'Training day stats'
+
+    def __str__(self):
+        return f'{self.user_id} on {self.day}'
+
+
+class TrainingUserStats(TrainingStatsBase):
+    """Training telemetry totals of one user."""
+    days_active = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['user_id'], name='training_user_stats_unique')]
+        verbose_name_plural = 'Training user stats'
+
+    def __str__(self):
+        return self.user_id
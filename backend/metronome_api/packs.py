@@ -0,0 +1,315 @@
+"""
+Sound packs: portable zip archives of sound sets.
+
+A pack holds the sample files of its sound sets below ``samples/`` and a
+``pack.json`` manifest with every sound set's fields, the archive name of
+each of its samples and the size and SHA-256 of every file. Samples shared
+by several sound sets are stored once.
+
+Export streams the archive: ``stream_pack`` yields the zip as it is written,
+reading each sample in ``CHUNK_SIZE`` pieces, so neither temp files nor the
+whole archive are ever needed. The manifest is written last, once all
+checksums are known.
+
+Import reads the manifest from the zip directory, extracts each referenced
+sample into the default storage in pieces while hashing it, verifies size,
+checksum and audio header, and then creates all sound sets with one
+``bulk_create`` in a transaction. Any failure removes the files extracted so
+far.
+"""
+import functools
+import hashlib
+import json
+import os
+import time
+import zipfile
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+
+from .audio.sniff import AudioFormatError, check_extension, sniff_audio
+from .models import ROLE_FIELDS, MetronomeSoundSet
+from .tasks import queue_rate_variants, queue_sample_variants
+
+PACK_FORMAT = 'libremetronome-pack'
+PACK_VERSION = 1
+MANIFEST_NAME = 'pack.json'
+SAMPLE_DIR = 'samples/'
+CHUNK_SIZE = 256 * 1024
+# Bytes of each sample kept for the audio header check on import
+HEAD_SIZE = 64 * 1024
+ZIP_EPOCH = (1980, 1, 1, 0, 0, 0)
+
+EXISTING_CHOICES = ('skip', 'copy')
+
+
+class PackError(ValueError):
+    """Raised for sound sets that cannot be exported and for invalid packs."""
+
+
+class _ZipStream:
+    """Write-only file object that collects what ZipFile writes until drained."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def plan_export(sound_sets):
+    """
+    Resolve the sample files of ``sound_sets`` before anything is streamed,
+    so a missing file fails the export instead of truncating the download.
+
+    Returns ``(entries, files)``: the manifest entries and a list of
+    ``(archive_name, path)`` to store.
+    """
+    from .audio.samples import SampleDecodeError, resolve_sample_path
+
+    entries = []
+    files = []
+    archive_names = {}
+    for sound_set in sound_sets:
+        entry = {
+            'name': sound_set.name,
+            'description': sound_set.description,
+            'synth_params': sound_set.synth_params,
+            'samples': {},
+        }
+        if not sound_set.is_synthesized:
+            for role, field in ROLE_FIELDS.items():
+                name = getattr(sound_set, field).name
+                try:
+                    path = resolve_sample_path(name)
+                except SampleDecodeError as e:
+                    raise PackError(f'Sound set "{sound_set.name}": {e}')
+                if path not in archive_names:
+                    archive_name = SAMPLE_DIR + os.path.basename(path)
+                    if archive_name in archive_names.values():
+                        archive_name = f'{SAMPLE_DIR}{len(files)}-{os.path.basename(path)}'
+                    archive_names[path] = archive_name
+                    files.append((archive_name, path))
+                entry['samples'][role] = archive_names[path]
+        entries.append(entry)
+    return entries, files
+
+
+def _zip_info(name, mtime=None):
+    date_time = time.localtime(mtime)[:6] if mtime else ZIP_EPOCH
+    info = zipfile.ZipInfo(name, date_time=max(date_time, ZIP_EPOCH))
+    info.external_attr = 0o644 << 16
+    return info
+
+
+def stream_pack(entries, files):
+    """Yield the zip archive of a plan from ``plan_export`` piece by piece."""
+    buffer = _ZipStream()
+    checksums = {}
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for archive_name, path in files:
+            stat = os.stat(path)
+            digest = hashlib.sha256()
+            # Samples are already compressed audio or barely compressible PCM
+            with open(path, 'rb') as source, \
+                    archive.open(
+                        _zip_info(archive_name, stat.st_mtime), 'w',
+                        force_zip64=stat.st_size >= zipfile.ZIP64_LIMIT,
+                    ) as target:
+                while True:
+                    data = source.read(CHUNK_SIZE)
+                    if not data:
+                        break
+                    digest.update(data)
+                    target.write(data)
+                    yield buffer.drain()
+            checksums[archive_name] = {'size': stat.st_size, 'sha256': digest.hexdigest()}
+            yield buffer.drain()
+
+        manifest = {
+            'format': PACK_FORMAT,
+            'version': PACK_VERSION,
+            'exported_at': timezone.now().isoformat(),
+            'sound_sets': entries,
+            'files': checksums,
+        }
+        archive.writestr(
+            _zip_info(MANIFEST_NAME), json.dumps(manifest, indent=1), compress_type=zipfile.ZIP_DEFLATED,
+        )
+    yield buffer.drain()
+
+
+def export_pack(sound_sets):
+    """The pack of ``sound_sets`` as an iterator of bytes."""
+    return stream_pack(*plan_export(sound_sets))
+
+
+class _VerifyingReader:
+    """
+    Hashes a zip member while it is read. Reading stops one byte past the
+    size declared in the manifest, so an oversized member is caught by the
+    size check without being extracted completely, and a corrupt member
+    ends the read instead of raising halfway through the storage write.
+    """
+
+    def __init__(self, member, expected_size):
+        self.member = member
+        self.limit = expected_size + 1
+        self.size = 0
+        self.digest = hashlib.sha256()
+        self.head = b''
+        self.error = None
+
+    def read(self, size=-1):
+        remaining = self.limit - self.size
+        try:
+            data = self.member.read(remaining if size < 0 else min(size, remaining))
+        except (zipfile.BadZipFile, OSError, EOFError) as e:
+            self.error = e
+            return b''
+        self.size += len(data)
+        self.digest.update(data)
+        if len(self.head) < HEAD_SIZE:
+            self.head += data[:HEAD_SIZE - len(self.head)]
+        return data
+
+
+def _extract(archive, archive_name, checksum):
+    try:
+        member = archive.open(archive_name)
+    except KeyError:
+        raise PackError(f'{archive_name} is listed in the manifest but missing from the pack')
+    filename = get_valid_filename(os.path.basename(archive_name))
+    with member:
+        reader = _VerifyingReader(member, checksum['size'])
+        stored = default_storage.save(filename, File(reader, name=filename))
+
+    if reader.error:
+        default_storage.delete(stored)
+        raise PackError(f'{archive_name} is corrupt: {reader.error}')
+    if reader.size != checksum['size'] or reader.digest.hexdigest() != checksum['sha256']:
+        default_storage.delete(stored)
+        raise PackError(f'{archive_name} does not match its checksum')
+    try:
+        audio_format = sniff_audio(reader.head, complete=reader.size == len(reader.head))
+        if audio_format:
+            check_extension(filename, audio_format)
+    except AudioFormatError as e:
+        default_storage.delete(stored)
+        raise PackError(f'{archive_name}: {e}')
+    return stored
+
+
+def _validate_entry(entry, files):
+    from .audio.synth import SynthParamsError, normalize_params
+
+    if not isinstance(entry, dict) or not isinstance(entry.get('name'), str) or not entry['name']:
+        raise PackError('Every sound set in the manifest needs a name')
+    if len(entry['name']) > MetronomeSoundSet._meta.get_field('name').max_length:
+        raise PackError(f'Sound set name "{entry["name"][:20]}..." is too long')
+    if entry.get('synth_params') is not None:
+        try:
+            normalize_params(entry['synth_params'])
+        except SynthParamsError as e:
+            raise PackError(f'Sound set "{entry["name"]}": {e}')
+        return
+    samples = entry.get('samples') or {}
+    for role in ROLE_FIELDS:
+        if samples.get(role) not in files:
+            raise PackError(f'Sound set "{entry["name"]}" has no {role} sample in the pack')
+
+
+def read_manifest(archive):
+    try:
+        manifest = json.loads(archive.read(MANIFEST_NAME))
+    except KeyError:
+        raise PackError(f'The pack has no {MANIFEST_NAME}')
+    except ValueError as e:
+        raise PackError(f'{MANIFEST_NAME} is not valid JSON: {e}')
+    if not isinstance(manifest, dict) or manifest.get('format') != PACK_FORMAT:
+        raise PackError('Not a LibreMetronome sound pack')
+    if not isinstance(manifest.get('version'), int) or manifest['version'] > PACK_VERSION:
+        raise PackError(f"Unsupported pack version {manifest.get('version')!r}")
+    files = manifest.get('files')
+    if not isinstance(manifest.get('sound_sets'), list) or not isinstance(files, dict):
+        raise PackError('The manifest lacks its sound sets or files')
+    for archive_name, checksum in files.items():
+        if not isinstance(checksum, dict) or not isinstance(checksum.get('size'), int) \
+                or not isinstance(checksum.get('sha256'), str):
+            raise PackError(f'The manifest entry of {archive_name} is invalid')
+    for entry in manifest['sound_sets']:
+        _validate_entry(entry, files)
+    return manifest
+
+
+def import_pack(source, existing='skip'):
+    """
+    Import the pack in ``source`` (a path or a seekable binary file).
+
+    With ``existing='skip'`` sound sets whose name is already taken are left
+    out; with ``'copy'`` they are imported as additional sound sets.
+    Returns ``{'created': [...ids], 'skipped': [...names], 'files': count}``.
+    """
+    if existing not in EXISTING_CHOICES:
+        raise PackError(f"existing must be one of {', '.join(EXISTING_CHOICES)}")
+    try:
+        archive = zipfile.ZipFile(source)
+    except (zipfile.BadZipFile, OSError) as e:
+        raise PackError(f'Not a zip archive: {e}')
+
+    with archive:
+        manifest = read_manifest(archive)
+        entries = manifest['sound_sets']
+        skipped = []
+        if existing == 'skip':
+            taken = set(MetronomeSoundSet.objects.filter(
+                name__in=[entry['name'] for entry in entries]
+            ).values_list('name', flat=True))
+            skipped = [entry['name'] for entry in entries if entry['name'] in taken]
+            entries = [entry for entry in entries if entry['name'] not in taken]
+
+        needed = sorted({
+            archive_name for entry in entries if entry.get('synth_params') is None
+            for archive_name in entry['samples'].values()
+        })
+        stored = {}
+        try:
+            for archive_name in needed:
+                stored[archive_name] = _extract(archive, archive_name, manifest['files'][archive_name])
+
+            sound_sets = []
+            for entry in entries:
+                sound_set = MetronomeSoundSet(
+                    name=entry['name'],
+                    description=entry.get('description') or '',
+                    synth_params=entry.get('synth_params'),
+                )
+                if entry.get('synth_params') is None:
+                    for role, field in ROLE_FIELDS.items():
+                        setattr(sound_set, field, stored[entry['samples'][role]])
+                sound_sets.append(sound_set)
+            with transaction.atomic():
+                created = MetronomeSoundSet.objects.bulk_create(sound_sets, batch_size=500)
+                # bulk_create sends no post_save, which queues the variants of saved sets
+                for sound_set in created:
+                    if not sound_set.is_synthesized:
+                        transaction.on_commit(functools.partial(queue_rate_variants, sound_set))
+                    transaction.on_commit(functools.partial(queue_sample_variants, sound_set))
+        except BaseException:
+            for name in stored.values():
+                default_storage.delete(name)
+            raise
+
+    return {'created': [sound_set.pk for sound_set in created], 'skipped': skipped, 'files': len(stored)}
@@ -0,0 +1,89 @@
+"""
+Cache of serialized sound set payloads.
+
+Payloads are the dictionaries built by ``catalog.sound_set_to_dict``. They are
+stored per id in the cache named by ``METRONOME_PAYLOAD_CACHE`` and dropped by
+the model signals in ``signals.py`` whenever a sound set is saved or deleted.
+
+Invalidation only reaches the cache of the process that saved the set, and
+``QuerySet.update()`` sends no signals at all. With several workers the cache
+must therefore be shared by all of them (Memcached, Redis, a database or file
+cache); a process-local cache such as ``LocMemCache`` keeps payloads for at
+most ``LOCAL_TIMEOUT`` seconds, which bounds how long another worker can serve
+a stale set. Code that updates sound sets in bulk calls ``invalidate_many``.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+from .models import MetronomeSoundSet
+
+KEY_PREFIX = 'metronome_api:soundset:'
+TIMEOUT = 60 * 60
+LOCAL_TIMEOUT = 30
+
+
+def get_cache():
+    """The payload cache, or None when ``METRONOME_PAYLOAD_CACHE`` is None."""
+    alias = getattr(settings, 'METRONOME_PAYLOAD_CACHE', 'default')
+    return caches[alias] if alias else None
+
+
+def cache_timeout(cache):
+    """Seconds payloads are kept: short-lived in caches other workers cannot invalidate."""
+    if isinstance(cache, (LocMemCache, DummyCache)):
+        return LOCAL_TIMEOUT
+    return getattr(settings, 'METRONOME_PAYLOAD_CACHE_TIMEOUT', TIMEOUT)
+
+
+def payload_key(pk):
+    return f'{KEY_PREFIX}{pk}'
+
+
+def get_payloads(ids, serialize):
+    """
+    Return ``{id: payload}`` for the sound sets in ``ids`` that exist.
+
+    Cached payloads are read with one ``get_many``; the misses are resolved
+    with a single ``in_bulk`` query, serialized with ``serialize`` and written
+    back with one ``set_many``.
+    """
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        return {}
+    cache = get_cache()
+    if cache is None:
+        return {pk: serialize(s) for pk, s in MetronomeSoundSet.objects.in_bulk(ids).items()}
+
+    cached = cache.get_many([payload_key(pk) for pk in ids])
+    payloads = {}
+    missing = []
+    for pk in ids:
+        payload = cached.get(payload_key(pk))
+        if payload is None:
+            missing.append(pk)
+        else:
+            payloads[pk] = payload
+
+    if missing:
+        fresh = {pk: serialize(s) for pk, s in MetronomeSoundSet.objects.in_bulk(missing).items()}
+        cache.set_many({payload_key(pk): payload for pk, payload in fresh.items()}, cache_timeout(cache))
+        payloads.update(fresh)
+    return payloads
+
+
+def get_payload(pk, serialize):
+    """Return the payload of a single sound set, or None if it does not exist."""
+    return get_payloads([pk], serialize).get(pk)
+
+
+def invalidate(pk):
+    invalidate_many([pk])
+
+
+def invalidate_many(pks):
+    """Drop the cached payloads of ``pks``, e.g. after a ``QuerySet.update()``."""
+    cache = get_cache()
+    if cache is not None:
+        cache.delete_many([payload_key(pk) for pk in pks])
@@ -0,0 +1,285 @@
+"""
+On-demand profiling of requests.
+
+``ProfilingMiddleware`` profiles one in ``METRONOME_PROFILING_SAMPLE_RATE``
+requests, and every request carrying ``X-Metronome-Profile: <token>`` when
+``METRONOME_PROFILING_TOKEN`` is set. It is off unless
+``METRONOME_PROFILING_ENABLED`` is true; requests that are not profiled pay
+for one random number.
+
+A profiled request gets:
+
+- a stack sampler: a background thread that records the request thread's
+  stack every ``METRONOME_PROFILING_INTERVAL`` seconds
+- ``tracemalloc`` snapshots before and after, diffed per allocation site
+- the totals of the named ``timer`` sections it ran through
+
+and leaves three files in ``METRONOME_PROFILING_DIR``:
+
+- ``<name>.folded``: sampled stacks in the folded format read by
+  flamegraph.pl, speedscope and inferno (``frame;frame;frame count``)
+- ``<name>.alloc.folded``: net allocated bytes per allocation stack, same
+  format
+- ``<name>.json``: request, status, duration, timers and top allocations
+
+The directory is a ring: only the newest ``METRONOME_PROFILING_MAX_PROFILES``
+profiles are kept.
+"""
+import collections
+import contextvars
+import functools
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+
+from django.conf import settings
+
+PROFILE_HEADER = 'X-Metronome-Profile'
+TRACEMALLOC_FRAMES = 32
+TOP_ALLOCATIONS = 20
+SUFFIXES = ('.folded', '.alloc.folded', '.json')
+
+_current = contextvars.ContextVar('metronome_profile', default=None)
+
+
+class timer:
+    """
+    Time a named section into the current profile, as a context manager or
+    decorator. Outside profiled requests it costs one context variable lookup.
+    """
+    __slots__ = ('name', 'profile', 'started')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.profile = _current.get()
+        if self.profile is not None:
+            self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.profile is not None:
+            self.profile.add_timing(self.name, time.perf_counter() - self.started)
+        return False
+
+    def __call__(self, func):
+        name = self.name
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timer(name):
+                return func(*args, **kwargs)
+        return wrapper
+
+
+def _frame_label(code):
+    filename = code.co_filename
+    for prefix in sorted(sys.path, key=len, reverse=True):
+        if prefix and filename.startswith(prefix + os.sep):
+            filename = filename[len(prefix) + 1:]
+            break
+    # ';' separates frames in the folded format
+    return f'{code.co_name} ({filename}:{code.co_firstlineno})'.replace(';', ':')
+
+
+class StackSampler:
+    """Samples the stack of one thread from a background thread."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self.labels = {}
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name='metronome-profiler', daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def _label(self, code):
+        label = self.labels.get(code)
+        if label is None:
+            label = self.labels[code] = _frame_label(code)
+        return label
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            codes = []
+            while frame is not None:
+                codes.append(frame.f_code)
+                frame = frame.f_back
+            if codes:
+                self.stacks[tuple(reversed(codes))] += 1
+
+    def folded(self):
+        return [(';'.join(self._label(code) for code in stack), count) for stack, count in self.stacks.items()]
+
+
+class _Tracing:
+    """Reference-counted tracemalloc, so overlapping profiles share one trace."""
+    lock = threading.Lock()
+    users = 0
+    started_here = False
+
+    @classmethod
+    def acquire(cls):
+        with cls.lock:
+            if cls.users == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+                cls.started_here = True
+            cls.users += 1
+
+    @classmethod
+    def release(cls):
+        with cls.lock:
+            cls.users -= 1
+            if cls.users == 0 and cls.started_here:
+                tracemalloc.stop()
+                cls.started_here = False
+
+
+class Profile:
+    def __init__(self, request, interval, trace_memory):
+        self.request = request
+        self.id = uuid.uuid4().hex[:12]
+        self.timings = {}
+        self.timings_lock = threading.Lock()
+        self.sampler = StackSampler(threading.get_ident(), interval)
+        self.trace_memory = trace_memory
+        self.before = None
+        self.allocations = []
+
+    def add_timing(self, name, seconds):
+        with self.timings_lock:
+            count, total, longest = self.timings.get(name, (0, 0.0, 0.0))
+            self.timings[name] = (count + 1, total + seconds, max(longest, seconds))
+
+    def start(self):
+        if self.trace_memory:
+            _Tracing.acquire()
+            self.before = tracemalloc.take_snapshot()
+        self.context_token = _current.set(self)
+        self.started = time.perf_counter()
+        self.sampler.start()
+
+    def stop(self):
+        self.sampler.stop()
+        self.duration = time.perf_counter() - self.started
+        _current.reset(self.context_token)
+        if self.trace_memory:
+            after = tracemalloc.take_snapshot()
+            _Tracing.release()
+            own_file = tracemalloc.Filter(False, tracemalloc.__file__)
+            self.allocations = [
+                stat for stat in after.filter_traces([own_file]).compare_to(
+                    self.before.filter_traces([own_file]), 'traceback')
+                if stat.size_diff > 0
+            ]
+
+    def _allocation_lines(self):
+        for stat in self.allocations:
+            stack = ';'.join(
+                f'{frame.filename}:{frame.lineno}'.replace(';', ':') for frame in reversed(stat.traceback)
+            )
+            yield f'{stack} {stat.size_diff}'
+
+    def summary(self, response):
+        return {
+            'id': self.id,
+            'method': self.request.method,
+            'path': self.request.get_full_path(),
+            'status': getattr(response, 'status_code', None),
+            'duration_ms': round(self.duration * 1000, 3),
+            'samples': sum(self.sampler.stacks.values()),
+            'timers': {
+                name: {'count': count, 'total_ms': round(total * 1000, 3), 'max_ms': round(longest * 1000, 3)}
+                for name, (count, total, longest) in sorted(self.timings.items())
+            },
+            'net_allocated_bytes': sum(stat.size_diff for stat in self.allocations),
+            'top_allocations': [
+                {'where': f'{stat.traceback[0].filename}:{stat.traceback[0].lineno}', 'bytes': stat.size_diff}
+                for stat in sorted(self.allocations, key=lambda s: s.size_diff, reverse=True)[:TOP_ALLOCATIONS]
+            ],
+        }
+
+    def write(self, directory, response, max_profiles):
+        os.makedirs(directory, exist_ok=True)
+        slug = re.sub(r'[^A-Za-z0-9]+', '-', self.request.path).strip('-')[:60] or 'root'
+        name = f"{time.strftime('%Y%m%dT%H%M%S')}-{self.request.method.lower()}-{slug}-{self.id}"
+        base = os.path.join(directory, name)
+        with open(base + '.folded', 'w') as f:
+            f.writelines(f'{stack} {count}\n' for stack, count in self.sampler.folded())
+        with open(base + '.alloc.folded', 'w') as f:
+            f.writelines(line + '\n' for line in self._allocation_lines())
+        # The summary is written last: its presence marks a complete profile
+        with open(base + '.json', 'w') as f:
+            json.dump(self.summary(response), f, indent=1)
+        prune(directory, max_profiles)
+        return name
+
+
+def prune(directory, max_profiles):
+    """Delete all but the newest ``max_profiles`` profiles in ``directory``."""
+    summaries = sorted(
+        (entry for entry in os.scandir(directory) if entry.name.endswith('.json')),
+        key=lambda entry: (entry.stat().st_mtime_ns, entry.name),
+    )
+    for entry in summaries[:max(0, len(summaries) - max_profiles)]:
+        base = entry.path[:-len('.json')]
+        for suffix in SUFFIXES:
+            try:
+                os.remove(base + suffix)
+            except FileNotFoundError:
+                pass
+
+
+class ProfilingMiddleware:
+    """Profile sampled or explicitly requested requests (see module docstring)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'METRONOME_PROFILING_ENABLED', False)
+        self.sample_rate = getattr(settings, 'METRONOME_PROFILING_SAMPLE_RATE', 0)
+        self.token = getattr(settings, 'METRONOME_PROFILING_TOKEN', '')
+        self.directory = getattr(settings, 'METRONOME_PROFILING_DIR', os.path.join(settings.BASE_DIR, 'profiles'))
+        self.max_profiles = getattr(settings, 'METRONOME_PROFILING_MAX_PROFILES', 200)
+        self.interval = getattr(settings, 'METRONOME_PROFILING_INTERVAL', 0.005)
+        self.trace_memory = getattr(settings, 'METRONOME_PROFILING_TRACEMALLOC', True)
+
+    def should_profile(self, request):
+        if not self.enabled:
+            return False
+        if self.token and request.headers.get(PROFILE_HEADER) == self.token:
+            return True
+        return self.sample_rate > 0 and random.random() * self.sample_rate < 1
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+
+        profile = Profile(request, self.interval, self.trace_memory)
+        profile.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            profile.stop()
+        # Streamed bodies are produced after this point and not profiled
+        try:
+            name = profile.write(self.directory, response, self.max_profiles)
+        except OSError as e:
+            print(f"Could not write profile {profile.id}: {e}")
+        else:
+            response['X-Profile-Id'] = name
+        return response
@@ -0,0 +1,60 @@
+import datetime
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import payload_cache
+from .catalog import TOMBSTONE_RETENTION_DAYS
+from .models import MetronomeSoundSet, SoundSetTombstone
+from .tasks import queue_rate_variants, queue_sample_variants, queue_sprite
+
+
+@receiver(post_save, sender=MetronomeSoundSet)
+@receiver(post_delete, sender=MetronomeSoundSet)
+def invalidate_sound_set_payload(sender, instance, **kwargs):
+    """Drop the cached payload of a sound set that was changed or removed."""
+    payload_cache.invalidate(instance.pk)
+
+
+@receiver(post_delete, sender=MetronomeSoundSet)
+def record_sound_set_deletion(sender, instance, **kwargs):
+    """Leave a tombstone for clients syncing the catalog and drop those no cursor can reach any more."""
+    now = timezone.now()
+    SoundSetTombstone.objects.create(sound_set_id=instance.pk, deleted_at=now)
+    SoundSetTombstone.objects.filter(deleted_at__lt=now - datetime.timedelta(days=TOMBSTONE_RETENTION_DAYS)).delete()
+
+
+@receiver(post_save, sender=MetronomeSoundSet)
+def build_sound_set_rate_variants(sender, instance, raw=False, **kwargs):
+    """Resample new or replaced samples to the client sample rates once the save is committed."""
+    if raw or instance.is_synthesized:
+        return
+    transaction.on_commit(lambda: queue_rate_variants(instance))
+
+
+@receiver(post_save, sender=MetronomeSoundSet)
+def build_sound_set_sample_variants(sender, instance, raw=False, **kwargs):
+    """Build the high-tempo variants of the new version once the save is committed."""
+    if raw:
+        return
+    transaction.on_commit(lambda: queue_sample_variants(instance))
+
+
+@receiver(post_delete, sender=MetronomeSoundSet)
+def remove_sound_set_sample_variants(sender, instance, **kwargs):
+    """Delete the variant files of a removed sound set once the deletion is committed."""
+    from .audio.variants import remove_variants
+
+    pk = instance.pk
+    transaction.on_commit(lambda: remove_variants(pk))
+
+
+@receiver(post_save, sender=MetronomeSoundSet)
+@receiver(post_delete, sender=MetronomeSoundSet)
+def rebuild_preview_sprite(sender, instance, raw=False, **kwargs):
+    """Render the previews of a changed sound set into the sprite once the change is committed."""
+    if raw:
+        return
+    transaction.on_commit(queue_sprite)
@@ -0,0 +1,216 @@
+"""
+Static files with content-hashed names and precompressed variants.
+
+``CompressedManifestStaticFilesStorage`` is used by ``collectstatic``: on top
+of Django's hashed names (``main.3f2a9c1b.js``) it writes ``.gz`` siblings of
+every compressible file, and ``.br`` siblings when the ``brotli`` package is
+installed. Variants that do not save at least 5% are not kept.
+
+At request time ``lookup(path)`` answers from an in-memory table built once
+from STATIC_ROOT: per file its size, type, ETag, cache policy and available
+encodings, so serving a file costs no filesystem metadata calls. The table
+is rebuilt when the collectstatic manifest changes.
+"""
+import gzip
+import json
+import mimetypes
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = {
+    '.css', '.csv', '.html', '.ico', '.js', '.json', '.map', '.mjs', '.svg', '.txt', '.wasm', '.xml',
+}
+MIN_COMPRESS_SIZE = 256
+# Keep a variant only if it is at most this fraction of the original
+MAX_COMPRESSED_RATIO = 0.95
+
+# Accept-Encoding token -> file suffix, in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+MUTABLE_MAX_AGE = 60 * 60
+
+# Seconds between two checks of the manifest for a new collectstatic run
+RELOAD_INTERVAL = 1.0
+
+
+def _compressors():
+    compressors = [('.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        compressors.insert(0, ('.br', lambda data: brotli.compress(data, quality=11)))
+    return compressors
+
+
+def compress_file(path):
+    """Write the compressed siblings of ``path``; return the ones written."""
+    if os.path.splitext(path)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+        return []
+    source_mtime = os.stat(path).st_mtime
+    data = None
+    written = []
+    for suffix, compress in _compressors():
+        target = path + suffix
+        if os.path.exists(target) and os.stat(target).st_mtime >= source_mtime:
+            continue
+        if data is None:
+            with open(path, 'rb') as f:
+                data = f.read()
+            if len(data) < MIN_COMPRESS_SIZE:
+                return written
+        compressed = compress(data)
+        if len(compressed) > len(data) * MAX_COMPRESSED_RATIO:
+            if os.path.exists(target):
+                os.remove(target)
+            continue
+        with open(target, 'wb') as f:
+            f.write(compressed)
+        written.append(target)
+    return written
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Manifest storage that also writes precompressed variants."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        names = set(paths) | set(self.hashed_files.values())
+        for name in sorted(names):
+            if not self.exists(name):
+                continue
+            for target in compress_file(self.path(name)):
+                yield name, os.path.relpath(target, self.location), True
+
+    def stored_name(self, name):
+        # Before the first collectstatic there is no manifest; render the
+        # plain name instead of failing the whole page
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+
+class StaticEntry:
+    __slots__ = ('path', 'size', 'content_type', 'etag', 'cache_control', 'variants')
+
+    def __init__(self, path, size, content_type, etag, cache_control, variants):
+        self.path = path
+        self.size = size
+        self.content_type = content_type
+        self.etag = etag
+        self.cache_control = cache_control
+        # encoding -> (path, size)
+        self.variants = variants
+
+
+def build_table(root):
+    """Map every file below ``root`` (by URL path) to its StaticEntry."""
+    hashed = set()
+    try:
+        with open(os.path.join(root, ManifestStaticFilesStorage.manifest_name)) as f:
+            hashed = set(json.load(f).get('paths', {}).values())
+    except (OSError, ValueError):
+        pass
+
+    suffixes = tuple(suffix for _, suffix in ENCODINGS)
+    table = {}
+    for directory, _, files in os.walk(root):
+        for name in files:
+            if name.endswith(suffixes):
+                continue
+            path = os.path.join(directory, name)
+            url_path = os.path.relpath(path, root).replace(os.sep, '/')
+            stat = os.stat(path)
+            variants = {}
+            for encoding, suffix in ENCODINGS:
+                try:
+                    variants[encoding] = (path + suffix, os.stat(path + suffix).st_size)
+                except OSError:
+                    pass
+            content_type, _ = mimetypes.guess_type(name)
+            if url_path in hashed:
+                cache_control = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+            else:
+                cache_control = f'public, max-age={MUTABLE_MAX_AGE}'
+            table[url_path] = StaticEntry(
+                path, stat.st_size, content_type or 'application/octet-stream',
+                f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"', cache_control, variants,
+            )
+    return table
+
+
+def accepted_encodings(header):
+    """The encodings of an Accept-Encoding header with a non-zero quality."""
+    accepted = set()
+    for part in header.split(','):
+        token, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if quality > 0:
+            accepted.add(token.strip().lower())
+    return accepted
+
+
+def choose_variant(entry, accept_encoding):
+    """Return ``(encoding or None, path, size)`` of the best variant of ``entry``."""
+    if entry.variants and accept_encoding:
+        accepted = accepted_encodings(accept_encoding)
+        for encoding, _ in ENCODINGS:
+            if encoding in entry.variants and (encoding in accepted or '*' in accepted):
+                path, size = entry.variants[encoding]
+                return encoding, path, size
+    return None, entry.path, entry.size
+
+
+_table = None
+_table_key = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def _manifest_key(root):
+    try:
+        stat = os.stat(os.path.join(root, ManifestStaticFilesStorage.manifest_name))
+    except OSError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns)
+
+
+def get_table():
+    """The table for STATIC_ROOT, rebuilt when collectstatic has written a new manifest."""
+    global _table, _table_key, _checked_at
+    now = time.monotonic()
+    if _table is not None and now - _checked_at < RELOAD_INTERVAL:
+        return _table
+    with _lock:
+        key = _manifest_key(settings.STATIC_ROOT)
+        if _table is None or key != _table_key:
+            _table = build_table(settings.STATIC_ROOT) if os.path.isdir(settings.STATIC_ROOT) else {}
+            _table_key = key
+        _checked_at = now
+        return _table
+
+
+def lookup(path):
+    return get_table().get(path)
+
+
+def reset_table():
+    global _table
+    with _lock:
+        _table = None
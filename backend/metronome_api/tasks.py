@@ -0,0 +1,260 @@
+"""
+Job tasks registered with the job system (see ``jobs.py``).
+
+Heavy modules are imported inside the tasks so that importing this module
+at startup stays cheap.
+"""
+from .jobs import JobQueueFull, job_output_path, register, submit
+
+# Measures rendered between two progress reports
+TRACK_CHUNK_MEASURES = 16
+
+
+def _write_measures(f, loop, measures, progress, done=0, total=None):
+    """
+    Write ``measures`` repetitions of ``loop`` to ``f`` in chunks, reporting
+    progress as ``done`` plus the measures written, out of ``total``.
+    """
+    total = total or measures
+    for start in range(0, measures, TRACK_CHUNK_MEASURES):
+        count = min(TRACK_CHUNK_MEASURES, measures - start)
+        f.write(loop * count)
+        progress((done + start + count) / total, f'{done + start + count} of {total} measures')
+
+
+@register('render_track')
+def render_track(job, params, progress):
+    """
+    Render ``measures`` repetitions of a rhythm as one WAV click track.
+
+    The measure is rendered once as a loop and written out chunk by chunk,
+    so memory stays bounded by the chunk size however long the track is.
+    """
+    from .audio import rhythm
+    from .audio.render import render_loop
+    from .audio.samples import load_sound_set_samples
+    from .audio.wavfile import to_pcm16, wav_header
+    from .catalog import get_catalog
+
+    spec = rhythm.spec_from_dict(params['rhythm'])
+    sample_rate = params['sample_rate']
+    measures = params['measures']
+    sound_set = get_catalog().get(params['sound_set'])
+    if sound_set is None:
+        raise ValueError(f"Sound set with ID {params['sound_set']} not found")
+
+    samples = load_sound_set_samples(sound_set, sample_rate)
+    # Tails are truncated to the shortest interval, so the loop never wraps
+    # and repeating it gives the exact linear track
+    loop = to_pcm16(render_loop(spec, samples, sample_rate, truncate_tails=True))
+
+    path = job_output_path(job, '.wav')
+    with open(path, 'wb') as f:
+        f.write(wav_header(sample_rate, 1, len(loop) // 2 * measures))
+        _write_measures(f, loop, measures, progress)
+
+    return {
+        'path': path,
+        'content_type': 'audio/wav',
+        'frames': len(loop) // 2 * measures,
+        'sample_rate': sample_rate,
+        'seconds': spec.cycle_seconds() * measures,
+    }
+
+
+@register('render_stems')
+def render_stems(job, params, progress):
+    """
+    Render ``measures`` repetitions of a rhythm as stems (see
+    ``audio/render.py``): one multi-channel WAV with ``format`` ``wav``, or a
+    ZIP archive of one mono WAV per stem with ``zip``.
+
+    The samples are decoded once and all stems are rendered in one pass, as
+    one loop that is then written out chunk by chunk like ``render_track``.
+    """
+    import zipfile
+
+    from .audio import rhythm
+    from .audio.render import render_stems as render, stem_names
+    from .audio.samples import load_sound_set_samples
+    from .audio.wavfile import to_pcm16, wav_header
+    from .catalog import get_catalog
+
+    spec = rhythm.spec_from_dict(params['rhythm'])
+    sample_rate = params['sample_rate']
+    measures = params['measures']
+    sound_set = get_catalog().get(params['sound_set'])
+    if sound_set is None:
+        raise ValueError(f"Sound set with ID {params['sound_set']} not found")
+
+    samples = load_sound_set_samples(sound_set, sample_rate)
+    stems = render(spec, samples, sample_rate, truncate_tails=True)
+    names = stem_names(spec)
+    frames = len(stems) * measures
+
+    if params['format'] == 'zip':
+        path = job_output_path(job, '.zip')
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_STORED) as archive:
+            for index, name in enumerate(names):
+                loop = to_pcm16(stems[:, index])
+                with archive.open(f'{index + 1:02d}-{name}.wav', 'w', force_zip64=True) as f:
+                    f.write(wav_header(sample_rate, 1, frames))
+                    _write_measures(f, loop, measures, progress, index * measures, len(names) * measures)
+        content_type = 'application/zip'
+    else:
+        path = job_output_path(job, '.wav')
+        with open(path, 'wb') as f:
+            f.write(wav_header(sample_rate, len(names), frames))
+            _write_measures(f, to_pcm16(stems), measures, progress)
+        content_type = 'audio/wav'
+
+    return {
+        'path': path,
+        'content_type': content_type,
+        'stems': names,
+        'frames': frames,
+        'sample_rate': sample_rate,
+        'seconds': spec.cycle_seconds() * measures,
+    }
+
+
+@register('render_setlist')
+def render_setlist(job, params, progress):
+    """
+    Render a setlist as one gapless WAV click track (see ``audio/setlist.py``).
+
+    The segments of the timeline are rendered by ``METRONOME_SETLIST_WORKERS``
+    processes (all cores by default) and written out in order.
+    """
+    import os
+
+    from django.conf import settings
+
+    from .audio import setlist
+    from .audio.samples import load_sound_set_samples
+    from .audio.wavfile import wav_header
+    from .catalog import get_catalog
+
+    songs = setlist.setlist_from_dict(params['setlist'])
+    sample_rate = params['sample_rate']
+    sound_set = get_catalog().get(params['sound_set'])
+    if sound_set is None:
+        raise ValueError(f"Sound set with ID {params['sound_set']} not found")
+
+    samples = load_sound_set_samples(sound_set, sample_rate)
+    segments, markers, frames = setlist.plan_segments(songs, sample_rate)
+    workers = getattr(settings, 'METRONOME_SETLIST_WORKERS', None) or os.cpu_count() or 1
+
+    path = job_output_path(job, '.wav')
+    with open(path, 'wb') as f:
+        f.write(wav_header(sample_rate, 1, frames))
+        setlist.render_setlist(
+            segments, samples, sample_rate, f.write, workers=workers,
+            progress=lambda done, total: progress(done / total, f'{done} of {total} segments'),
+        )
+
+    return {
+        'path': path,
+        'content_type': 'audio/wav',
+        'frames': frames,
+        'sample_rate': sample_rate,
+        'seconds': frames / sample_rate,
+        'songs': markers,
+    }
+
+
+@register('build_rate_variants')
+def build_rate_variants(job, params, progress):
+    """Write the sample rate variants of every sample of a sound set (see ``audio/rate_variants.py``)."""
+    from .audio.rate_variants import build_rate_variants as build, sample_paths
+    from .models import MetronomeSoundSet
+
+    sound_set = MetronomeSoundSet.objects.filter(pk=params['sound_set']).first()
+    if sound_set is None:
+        raise ValueError(f"Sound set with ID {params['sound_set']} not found")
+
+    paths = sample_paths(sound_set)
+    written = 0
+    for index, path in enumerate(paths):
+        written += len(build(path))
+        progress((index + 1) / len(paths), f'{index + 1} of {len(paths)} samples')
+    return {'samples': len(paths), 'variants': written}
+
+
+def queue_rate_variants(sound_set):
+    """Queue a ``build_rate_variants`` job if any sample of ``sound_set`` lacks its variants."""
+    from .audio.rate_variants import needs_rate_variants
+
+    if not needs_rate_variants(sound_set):
+        return None
+    try:
+        return submit('build_rate_variants', {'sound_set': sound_set.pk})
+    except JobQueueFull:
+        # The variants are an optimization; build_sample_variants --rates catches up later
+        print(f"Not building rate variants of sound set {sound_set.pk}: the job queue is full")
+        return None
+
+
+@register('build_sample_variants')
+def build_sample_variants(job, params, progress):
+    """Write the truncated high-tempo variants of a sound set at every client sample rate (``audio/variants.py``)."""
+    from .audio.rate_variants import target_rates
+    from .audio.variants import build_variants
+    from .models import MetronomeSoundSet
+
+    sound_set = MetronomeSoundSet.objects.filter(pk=params['sound_set']).first()
+    if sound_set is None:
+        raise ValueError(f"Sound set with ID {params['sound_set']} not found")
+
+    rates = target_rates()
+    written = 0
+    for index, rate in enumerate(rates):
+        manifest = build_variants(sound_set, rate)
+        written += sum(len(info['variants']) for info in manifest.values())
+        progress((index + 1) / len(rates), f'{rate} Hz')
+    return {'variants': written}
+
+
+def queue_sample_variants(sound_set):
+    """Queue a ``build_sample_variants`` job unless the current version of ``sound_set`` has its variants."""
+    from .audio.variants import needs_variants, variant_version
+
+    if not needs_variants(sound_set):
+        return None
+    try:
+        return submit('build_sample_variants', {'sound_set': sound_set.pk, 'version': variant_version(sound_set)})
+    except JobQueueFull:
+        # The variants are also built when they are first requested
+        print(f"Not building sample variants of sound set {sound_set.pk}: the job queue is full")
+        return None
+
+
+@register('build_sprite')
+def build_sprite(job, params, progress):
+    """Bring the preview sprite up to date at every client sample rate (see ``audio/sprite.py``)."""
+    from .audio.rate_variants import target_rates
+    from .audio.sprite import build_sprite as build, sprite_sound_sets
+
+    sound_sets = sprite_sound_sets()
+    rates = target_rates()
+    versions = {}
+    for index, rate in enumerate(rates):
+        versions[str(rate)] = build(rate, sound_sets)['version']
+        progress((index + 1) / len(rates), f'{rate} Hz')
+    return {'sound_sets': len(sound_sets), 'versions': versions}
+
+
+def queue_sprite():
+    """Queue a ``build_sprite`` job unless the sprite is up to date; one already in flight is reused."""
+    from .audio.rate_variants import target_rates
+    from .audio.sprite import needs_sprite, sprite_sound_sets
+
+    # Saving many sets in one transaction queues a callback for each
+    if not needs_sprite(target_rates(), sprite_sound_sets()):
+        return None
+    try:
+        return submit('build_sprite', {})
+    except JobQueueFull:
+        # The sprite is also brought up to date when it is requested
+        print("Not rebuilding the preview sprite: the job queue is full")
+        return None
@@ -0,0 +1,324 @@
+"""
+Training session telemetry.
+
+The training mode produces events per measure (``measure``, with ``silent``
+during silence phases), silence phase changes (``silence``), tempo steps
+(``tempo``, with ``bpm``) and muted measures (``mute``). Clients send them
+in batches, optionally gzip-compressed:
+
+    {"user": "<client id>", "session": "<id>", "events": [{"type": "measure", "ts": 1718000000000, ...}]}
+
+Each batch is appended to a per-day NDJSON log below
+``METRONOME_TELEMETRY_DIR``. Appends use group commit: requests that arrive
+while another request is syncing the log queue up and are written and
+fsynced together by the next one, so the log costs one write and one fsync
+per group instead of a database insert per event.
+
+After the append, the batch is folded into per-user-per-day and per-user
+aggregate rows with a few ``UPDATE ... SET x = x + n`` queries, so
+dashboards read progress from one row instead of scanning events. The log
+stays the source of truth: ``rebuild_training_stats`` recomputes the
+aggregates from it.
+"""
+import datetime
+import json
+import os
+import re
+import threading
+import zlib
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce, Greatest, Least
+from django.utils import timezone
+
+from .models import TrainingDayStats, TrainingUserStats
+
+MAX_BATCH_BYTES = 1024 * 1024
+MAX_BATCH_EVENTS = 5000
+MAX_TYPE_LENGTH = 32
+CLIENT_ID_RE = re.compile(r'^[A-Za-z0-9_.:-]{1,64}$')
+
+# Events timestamped further from the time of receipt are counted on the day
+# they were received
+MAX_CLOCK_SKEW = datetime.timedelta(days=2)
+
+COUNTERS = ('events', 'measures', 'silent_measures', 'silence_phases', 'tempo_steps', 'mutes')
+
+
+class TelemetryError(Exception):
+    """An invalid batch; ``status`` is the HTTP status to answer with."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def decode_batch(body, content_encoding=''):
+    """Decompress and parse a batch into ``(user, session, events)``."""
+    if content_encoding in ('gzip', 'deflate'):
+        # Bounded decompression: a small body may inflate to gigabytes
+        decompressor = zlib.decompressobj(wbits=31 if content_encoding == 'gzip' else 15)
+        try:
+            body = decompressor.decompress(body, MAX_BATCH_BYTES + 1)
+        except zlib.error as e:
+            raise TelemetryError(f'Invalid {content_encoding} body: {e}')
+        if len(body) > MAX_BATCH_BYTES:
+            raise TelemetryError('Batch is too large', status=413)
+    elif content_encoding not in ('', 'identity'):
+        raise TelemetryError(f'Unsupported Content-Encoding {content_encoding}', status=415)
+    elif len(body) > MAX_BATCH_BYTES:
+        raise TelemetryError('Batch is too large', status=413)
+
+    try:
+        batch = json.loads(body)
+    except ValueError:
+        raise TelemetryError('Batch must be JSON')
+    if not isinstance(batch, dict):
+        raise TelemetryError('Batch must be a JSON object')
+    user = batch.get('user')
+    session = batch.get('session') or ''
+    events = batch.get('events')
+    if not isinstance(user, str) or not CLIENT_ID_RE.match(user):
+        raise TelemetryError('user must be 1-64 letters, digits or _.:-')
+    if not isinstance(session, str) or (session and not CLIENT_ID_RE.match(session)):
+        raise TelemetryError('session must be 1-64 letters, digits or _.:-')
+    if not isinstance(events, list) or not events:
+        raise TelemetryError('events must be a non-empty list')
+    if len(events) > MAX_BATCH_EVENTS:
+        raise TelemetryError(f'A batch may hold at most {MAX_BATCH_EVENTS} events', status=413)
+    for event in events:
+        if not isinstance(event, dict) or not isinstance(event.get('type'), str) \
+                or not 0 < len(event['type']) <= MAX_TYPE_LENGTH:
+            raise TelemetryError('Every event needs a type')
+        if not isinstance(event.get('ts'), (int, float)) or isinstance(event['ts'], bool):
+            raise TelemetryError('Every event needs a numeric ts (milliseconds since the epoch)')
+    return user, session, events
+
+
+class EventLog:
+    """
+    Append-only per-day NDJSON files with group commit.
+
+    ``append`` returns once the data is on disk. Only one thread writes at a
+    time; everything queued while it syncs is written by the next writer in
+    a single write and fsync.
+    """
+
+    def __init__(self, directory, fsync=True):
+        self.directory = directory
+        self.fsync = fsync
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.pending = []
+        self.queued = 0
+        self.committed = 0
+
+    def path(self, day):
+        return os.path.join(self.directory, f'{day.isoformat()}.ndjson')
+
+    def append(self, day, data):
+        with self.lock:
+            self.pending.append((day, data))
+            self.queued += 1
+            ticket = self.queued
+        with self.write_lock:
+            if self.committed >= ticket:
+                # Written by the group of an earlier writer
+                return
+            with self.lock:
+                group, self.pending = self.pending, []
+                last = self.queued
+            try:
+                self._write(group)
+            except OSError:
+                # Leave the group to the next writer instead of dropping the
+                # data of the requests waiting for it
+                with self.lock:
+                    self.pending[:0] = group
+                raise
+            self.committed = last
+
+    def _write(self, group):
+        os.makedirs(self.directory, exist_ok=True)
+        by_day = {}
+        for day, data in group:
+            by_day.setdefault(day, []).append(data)
+        for day, chunks in by_day.items():
+            # O_APPEND keeps concurrent writers of other processes intact
+            fd = os.open(self.path(day), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, b''.join(chunks))
+                if self.fsync:
+                    os.fsync(fd)
+            finally:
+                os.close(fd)
+
+
+_logs = {}
+_logs_lock = threading.Lock()
+
+
+def get_event_log():
+    directory = settings.METRONOME_TELEMETRY_DIR
+    with _logs_lock:
+        if directory not in _logs:
+            _logs[directory] = EventLog(directory, getattr(settings, 'METRONOME_TELEMETRY_FSYNC', True))
+        return _logs[directory]
+
+
+def encode_events(user, session, events, received_at):
+    received = received_at.isoformat()
+    return ''.join(
+        json.dumps({**event, 'user': user, 'session': session, 'received_at': received}, separators=(',', ':')) + '\n'
+        for event in events
+    ).encode()
+
+
+def _event_time(event, received_at):
+    try:
+        moment = datetime.datetime.fromtimestamp(event['ts'] / 1000, tz=datetime.timezone.utc)
+    except (OverflowError, OSError, ValueError):
+        return received_at
+    if abs(moment - received_at) > MAX_CLOCK_SKEW:
+        return received_at
+    return moment
+
+
+def _new_counters(moment):
+    counters = dict.fromkeys(COUNTERS, 0)
+    counters.update(max_bpm=None, first_event_at=moment, last_event_at=moment)
+    return counters
+
+
+def summarize(events, received_at, days=None):
+    """Fold events into ``{day: counters}``, adding to ``days`` if given."""
+    days = {} if days is None else days
+    for event in events:
+        moment = _event_time(event, received_at)
+        day = days.setdefault(moment.date(), _new_counters(moment))
+        day['events'] += 1
+        day['first_event_at'] = min(day['first_event_at'], moment)
+        day['last_event_at'] = max(day['last_event_at'], moment)
+        kind = event['type']
+        if kind == 'measure':
+            day['measures'] += 1
+            if event.get('silent'):
+                day['silent_measures'] += 1
+        elif kind == 'silence':
+            if event.get('silent'):
+                day['silence_phases'] += 1
+        elif kind == 'tempo':
+            day['tempo_steps'] += 1
+            bpm = event.get('bpm')
+            if isinstance(bpm, (int, float)) and not isinstance(bpm, bool) and 0 < bpm < 10000:
+                day['max_bpm'] = max(day['max_bpm'] or 0, float(bpm))
+        elif kind == 'mute':
+            day['mutes'] += 1
+    return days
+
+
+def _increment(model, lookup, counters, max_bpm, first, last, extra=None):
+    """Add ``counters`` to the row matching ``lookup``; return whether it was created."""
+    row, created = model.objects.get_or_create(**lookup)
+    updates = {name: F(name) + counters[name] for name in COUNTERS if counters[name]}
+    updates['first_event_at'] = Least(Coalesce('first_event_at', Value(first)), Value(first))
+    updates['last_event_at'] = Greatest(Coalesce('last_event_at', Value(last)), Value(last))
+    if max_bpm is not None:
+        updates['max_bpm'] = Greatest(Coalesce('max_bpm', Value(max_bpm)), Value(max_bpm))
+    updates.update(extra or {})
+    model.objects.filter(pk=row.pk).update(**updates)
+    return created
+
+
+def apply_summary(user, days):
+    """Add the counters of ``summarize`` to the aggregate rows of ``user``."""
+    with transaction.atomic():
+        new_days = 0
+        for day, counters in sorted(days.items()):
+            new_days += _increment(
+                TrainingDayStats, {'user_id': user, 'day': day}, counters,
+                counters['max_bpm'], counters['first_event_at'], counters['last_event_at'],
+            )
+        totals = {name: sum(counters[name] for counters in days.values()) for name in COUNTERS}
+        bpms = [counters['max_bpm'] for counters in days.values() if counters['max_bpm'] is not None]
+        extra = {'days_active': F('days_active') + new_days} if new_days else {}
+        _increment(
+            TrainingUserStats, {'user_id': user}, totals, max(bpms) if bpms else None,
+            min(counters['first_event_at'] for counters in days.values()),
+            max(counters['last_event_at'] for counters in days.values()),
+            extra,
+        )
+
+
+def ingest(user, session, events):
+    """Log a batch durably, then update the aggregates."""
+    received_at = timezone.now()
+    get_event_log().append(received_at.date(), encode_events(user, session, events, received_at))
+    apply_summary(user, summarize(events, received_at))
+
+
+def _stats_to_dict(row):
+    data = {name: getattr(row, name) for name in COUNTERS}
+    data['max_bpm'] = row.max_bpm
+    data['first_event_at'] = row.first_event_at.isoformat() if row.first_event_at else None
+    data['last_event_at'] = row.last_event_at.isoformat() if row.last_event_at else None
+    return data
+
+
+def user_stats(user, days=30):
+    """Totals and the last ``days`` days of a user, or None for unknown users."""
+    totals = TrainingUserStats.objects.filter(user_id=user).first()
+    if totals is None:
+        return None
+    rows = TrainingDayStats.objects.filter(user_id=user).order_by('-day')[:days]
+    data = _stats_to_dict(totals)
+    data['days_active'] = totals.days_active
+    return {
+        'user': user,
+        'totals': data,
+        'days': [{'day': row.day.isoformat(), **_stats_to_dict(row)} for row in reversed(rows)],
+    }
+
+
+def replay_log(directory):
+    """Summarize every event in the logs below ``directory`` as ``{user: {day: counters}}``."""
+    users = {}
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith('.ndjson'):
+            continue
+        with open(os.path.join(directory, name), 'rb') as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                    received_at = datetime.datetime.fromisoformat(event['received_at'])
+                    user = event['user']
+                except (ValueError, KeyError, TypeError):
+                    # A torn last line of a crashed writer
+                    continue
+                summarize([event], received_at, users.setdefault(user, {}))
+    return users
+
+
+def rebuild_stats(directory):
+    """Replace all aggregate rows with ones recomputed from the logs."""
+    users = replay_log(directory) if os.path.isdir(directory) else {}
+    day_rows = []
+    user_rows = []
+    for user, days in users.items():
+        totals = TrainingUserStats(user_id=user, days_active=len(days))
+        for day, counters in days.items():
+            day_rows.append(TrainingDayStats(user_id=user, day=day, **counters))
+            for name in COUNTERS:
+                setattr(totals, name, getattr(totals, name) + counters[name])
+        totals.max_bpm = max((c['max_bpm'] for c in days.values() if c['max_bpm'] is not None), default=None)
+        totals.first_event_at = min(c['first_event_at'] for c in days.values())
+        totals.last_event_at = max(c['last_event_at'] for c in days.values())
+        user_rows.append(totals)
+    with transaction.atomic():
+        TrainingDayStats.objects.all().delete()
+        TrainingUserStats.objects.all().delete()
+        TrainingDayStats.objects.bulk_create(day_rows, batch_size=1000)
+        TrainingUserStats.objects.bulk_create(user_rows, batch_size=1000)
+    return len(user_rows), len(day_rows)
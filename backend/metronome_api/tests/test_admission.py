@@ -0,0 +1,105 @@
+import uuid
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import resolve, reverse
+
+from metronome_api.admission import AdmissionController, AdmissionControlMiddleware, client_address, endpoint_class
+from metronome_api.models import MetronomeSoundSet
+
+
+class AdmissionControllerTest(SimpleTestCase):
+    """
+    Tests for the token buckets and concurrency caps.
+    """
+
+    def test_concurrency_cap(self):
+        """Test that a class at its cap refuses with 503 until a request finishes."""
+        controller = AdmissionController({'render': {'rate': 100.0, 'burst': 100, 'concurrency': 1}})
+        self.assertEqual(controller.acquire('a', 'render'), (None, None))
+        self.assertEqual(controller.acquire('b', 'render'), (503, 1))
+        controller.release('render')
+        self.assertEqual(controller.acquire('b', 'render'), (None, None))
+
+    def test_bucket_refuses_with_retry_after(self):
+        """Test that an empty bucket refuses with the time until the next token."""
+        controller = AdmissionController({'api': {'rate': 0.1, 'burst': 1, 'concurrency': None}})
+        self.assertEqual(controller.acquire('a', 'api'), (None, None))
+        status, retry_after = controller.acquire('a', 'api')
+        self.assertEqual(status, 429)
+        self.assertEqual(retry_after, 10)
+
+    def test_streamed_response_holds_its_slot(self):
+        """Test that a streamed response keeps its concurrency slot until it is closed."""
+        def view(request):
+            if request.path == '/stream/':
+                return StreamingHttpResponse(iter([b'a', b'b']))
+            return HttpResponse(b'ab')
+
+        middleware = AdmissionControlMiddleware(view)
+        in_progress = middleware.controller.in_progress
+
+        def request(path):
+            request = RequestFactory().get(path)
+            middleware.controller.acquire('a', 'render')
+            request._admission_class = 'render'
+            return middleware(request)
+
+        self.assertEqual(request('/plain/').content, b'ab')
+        self.assertEqual(in_progress['render'], 0)
+
+        response = request('/stream/')
+        self.assertEqual(in_progress['render'], 1)
+        self.assertEqual(b''.join(response.streaming_content), b'ab')
+        response.close()
+        self.assertEqual(in_progress['render'], 0)
+        response.close()
+        self.assertEqual(in_progress['render'], 0)
+
+    def test_client_address_behind_proxies(self):
+        """Test that only trusted proxy hops of X-Forwarded-For are believed."""
+        request = RequestFactory().get('/', HTTP_X_FORWARDED_FOR='6.6.6.6, 1.2.3.4', REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(client_address(request), '10.0.0.1')
+        self.assertEqual(client_address(request, proxy_hops=1), '1.2.3.4')
+
+    def test_route_classes(self):
+        """Test that uploads, renders and downloads are limited by their class."""
+        def route_class(name, *args):
+            request = RequestFactory().get(reverse(name, args=args))
+            request.resolver_match = resolve(request.path_info)
+            return endpoint_class(request)
+
+        self.assertEqual(route_class('upload_create'), 'files')
+        self.assertEqual(route_class('upload_detail', uuid.uuid4()), 'files')
+        self.assertEqual(route_class('telemetry_ingest'), 'files')
+        self.assertEqual(route_class('beat_grid'), 'render')
+        self.assertEqual(route_class('render_midi'), 'render')
+        self.assertEqual(route_class('all_sound_sets'), 'api')
+
+
+@override_settings(METRONOME_ADMISSION_CLASSES={'render': {'rate': 0.01, 'burst': 2}})
+class AdmissionMiddlewareTest(TestCase):
+    """
+    Tests for admission control of the API endpoints.
+    """
+
+    def test_expensive_route_is_shed_per_client(self):
+        """Test that a client over its render budget gets 429 while others are served."""
+        MetronomeSoundSet.objects.create(name='Synth', synth_params={})
+        url = reverse('synth_preview')
+        for _ in range(2):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+
+        # Other endpoint classes and other clients are unaffected
+        self.assertEqual(self.client.get(reverse('all_sound_sets')).status_code, 200)
+        self.assertEqual(self.client.get(url, REMOTE_ADDR='10.0.0.2').status_code, 200)
+
+    @override_settings(METRONOME_ADMISSION_ENABLED=False)
+    def test_disabled(self):
+        """Test that nothing is refused when admission control is off."""
+        for _ in range(4):
+            self.assertEqual(self.client.get(reverse('synth_preview')).status_code, 200)
@@ -0,0 +1,86 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from metronome_api import catalog, payload_cache
+from metronome_api.models import MetronomeSoundSet
+
+
+class SoundSetBatchTest(TestCase):
+    """
+    Tests for the multi-id sound set endpoint and the payload cache behind it.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.sound_sets = [
+            MetronomeSoundSet.objects.create(
+                name=f'Set {index}',
+                first_beat_sound=f'set{index}_first.wav',
+                accent_sound=f'set{index}_accent.wav',
+                normal_beat_sound=f'set{index}_normal.wav',
+            )
+            for index in range(3)
+        ]
+        self.url = reverse('sound_sets_batch')
+
+    def test_batch_returns_payloads_keyed_by_id(self):
+        """Test that existing ids map to payloads and unknown ids to null."""
+        ids = [s.id for s in self.sound_sets[:2]]
+        response = self.client.get(self.url, {'ids': f'{ids[0]},{ids[1]},999999'})
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data[str(ids[0])]['name'], 'Set 0')
+        self.assertEqual(data[str(ids[1])]['name'], 'Set 1')
+        self.assertIsNone(data['999999'])
+
+    def test_batch_is_one_query_then_cached(self):
+        """Test that a cold batch costs one query and a warm batch none."""
+        ids = ','.join(str(s.id) for s in self.sound_sets)
+        with self.assertNumQueries(1):
+            self.client.get(self.url, {'ids': ids})
+        with self.assertNumQueries(0):
+            self.client.get(self.url, {'ids': ids})
+
+    def test_cache_is_invalidated_on_save(self):
+        """Test that renaming a set is visible through the cached endpoints."""
+        sound_set = self.sound_sets[0]
+        self.client.get(reverse('sound_set_detail', args=[sound_set.id]))
+
+        sound_set.name = 'Renamed'
+        sound_set.save()
+
+        data = self.client.get(self.url, {'ids': sound_set.id}).json()
+        self.assertEqual(data[str(sound_set.id)]['name'], 'Renamed')
+
+    def test_fields_and_invalid_ids(self):
+        """Test sparse fields and rejection of malformed ids."""
+        sound_set = self.sound_sets[0]
+        data = self.client.get(self.url, {'ids': sound_set.id, 'fields': 'name'}).json()
+        self.assertEqual(data[str(sound_set.id)], {'id': sound_set.id, 'name': 'Set 0'})
+
+        response = self.client.get(self.url, {'ids': '1,two'})
+        self.assertEqual(response.status_code, 400)
+
+        too_many = ','.join(str(pk) for pk in range(1, catalog.MAX_BATCH_IDS + 2))
+        self.assertEqual(self.client.get(self.url, {'ids': too_many}).status_code, 400)
+
+    def test_update_bypasses_signals(self):
+        """Test that bulk updates are invalidated explicitly and local caches keep payloads briefly."""
+        sound_set = self.sound_sets[0]
+        self.client.get(self.url, {'ids': sound_set.id})
+        self.assertEqual(payload_cache.cache_timeout(payload_cache.get_cache()), payload_cache.LOCAL_TIMEOUT)
+
+        MetronomeSoundSet.objects.filter(pk=sound_set.pk).update(name='Renamed')
+        payload_cache.invalidate_many([sound_set.pk])
+        data = self.client.get(self.url, {'ids': sound_set.id}).json()
+        self.assertEqual(data[str(sound_set.id)]['name'], 'Renamed')
+
+    @override_settings(METRONOME_PAYLOAD_CACHE=None)
+    def test_cache_disabled(self):
+        """Test that without a payload cache every batch is one query."""
+        ids = ','.join(str(s.id) for s in self.sound_sets)
+        for _ in range(2):
+            with self.assertNumQueries(1):
+                self.client.get(self.url, {'ids': ids})
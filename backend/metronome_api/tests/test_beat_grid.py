@@ -0,0 +1,65 @@
+import numpy as np
+from django.test import SimpleTestCase
+from django.urls import reverse
+
+from metronome_api.audio import rhythm
+from metronome_api.audio.beatgrid import FLAG_MEASURE, FLAG_MUTED, GRID_DTYPE, TrainingMutes, beat_grid
+
+
+class BeatGridTest(SimpleTestCase):
+    """
+    Tests for beat grids over time windows.
+    """
+
+    def test_windows_tile_the_timeline(self):
+        """Test that consecutive windows hold exactly the onsets of the window spanning both."""
+        spec = rhythm.build_spec(100, [('3,1,2', 2), ('3,1,1,1', 1)], swing=0.2)
+        training = TrainingMutes('random', probability=0.5, seed=7)
+        whole = beat_grid(spec, 48000, 1000, 200000, training)
+        first = beat_grid(spec, 48000, 1000, 90001, training)
+        second = beat_grid(spec, 48000, 90001, 200000, training)
+        second['offset'] += 90001 - 1000
+        np.testing.assert_array_equal(np.concatenate([first, second]), whole)
+        self.assertTrue(np.all(np.diff(whole['offset'].astype(np.int64)) >= 0))
+
+    def test_grid_follows_the_cycle(self):
+        """Test that a grid repeats the cycle onsets measure after measure, flagging downbeats."""
+        spec = rhythm.build_spec(120, [('3,1,2,0', 1)])
+        grid = beat_grid(spec, 48000, 0, 3 * 96000)
+        self.assertEqual(grid['offset'].tolist(), list(range(0, 3 * 96000, 24000)))
+        self.assertEqual(grid['role'].tolist(), [3, 1, 2, 0] * 3)
+        self.assertEqual(grid['beat'].tolist(), [0, 1, 2, 3] * 3)
+        self.assertEqual((grid['flags'] & FLAG_MEASURE).nonzero()[0].tolist(), [0, 4, 8])
+
+    def test_training_mutes(self):
+        """Test that fixed mutes silence whole measures and random mutes silence whole beats."""
+        spec = rhythm.build_spec(120, [('3,1,1,1', 2)])
+        grid = beat_grid(spec, 48000, 0, 6 * 96000, TrainingMutes('fixed', play_measures=2, mute_measures=1))
+        muted = (grid['flags'] & FLAG_MUTED).astype(bool).reshape(6, 8)
+        self.assertEqual(muted.all(axis=1).tolist(), [False, False, True, False, False, True])
+        self.assertFalse(muted[[0, 1, 3, 4]].any())
+
+        grid = beat_grid(spec, 48000, 0, 100 * 96000, TrainingMutes('random', probability=0.3, seed=1))
+        muted = (grid['flags'] & FLAG_MUTED).astype(bool).reshape(-1, 2)
+        np.testing.assert_array_equal(muted[:, 0], muted[:, 1])
+        self.assertAlmostEqual(muted[:, 0].mean(), 0.3, delta=0.05)
+
+    def test_endpoint(self):
+        """Test that the endpoint returns the packed grid with its window in the headers."""
+        params = {'bpm': 120, 'accents': '3,1', 'subdivisions': 2, 'swing': 0.25, 'start': 48000, 'end': 96000}
+        response = self.client.get(reverse('beat_grid'), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/octet-stream')
+        self.assertEqual(response['X-Grid-Start'], '48000')
+        self.assertEqual(response['X-Loop-Samples'], '48000')
+        grid = np.frombuffer(response.content, dtype=GRID_DTYPE)
+        self.assertEqual(grid['offset'].tolist(), [0, 15000, 24000, 39000])
+        self.assertEqual(grid['role'].tolist(), [3, 1, 1, 1])
+
+        etag = response['ETag']
+        self.assertEqual(self.client.get(reverse('beat_grid'), params, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        huge = {'start': 10 ** 20, 'end': ''}
+        for bad in ({'end': 1000}, {'start': 'now'}, {'training': 'loud'}, {'end': 48000 * 1000}, huge):
+            response = self.client.get(reverse('beat_grid'), {**params, **bad})
+            self.assertEqual(response.status_code, 400, bad)
+            self.assertIn('error', response.json())
@@ -0,0 +1,131 @@
+import struct
+import time
+
+import numpy as np
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from metronome_api.audio.calibration import (
+    CLICK_COUNT, CalibrationError, analyze_recording, chirp, click_positions, click_train,
+)
+from metronome_api.audio.wavfile import WavError, read_wav, write_wav
+
+SAMPLE_RATE = 48000
+
+
+def simulate_recording(delay_seconds, seconds=30, noise=0.01, gain=0.3, seed=0):
+    """The click train as a device would record it: delayed, filtered, quieter and noisy."""
+    train = click_train(SAMPLE_RATE).astype(np.float64)
+    frames = int(seconds * SAMPLE_RATE)
+    size = 1 << frames.bit_length()
+    # Fractional delay as a phase shift
+    spectrum = np.fft.rfft(train, size) * np.exp(-2j * np.pi * np.fft.rfftfreq(size) * delay_seconds * SAMPLE_RATE)
+    delayed = np.fft.irfft(spectrum, size)[:frames]
+    kernel = np.hanning(7) / np.hanning(7).sum()
+    recording = gain * np.convolve(delayed, kernel, 'same')
+    recording += noise * np.random.default_rng(seed).standard_normal(frames)
+    return recording.astype(np.float32)
+
+
+class CalibrationAnalysisTest(SimpleTestCase):
+    """
+    Tests for locating the click train in a recording.
+    """
+
+    def test_measures_fractional_delay(self):
+        """Test that the latency is measured to a fraction of a sample."""
+        for delay in (0.0, 0.0123456, 0.2871):
+            result = analyze_recording(simulate_recording(delay), SAMPLE_RATE)
+            self.assertAlmostEqual(result['round_trip_ms'], delay * 1000, delta=0.01)
+            self.assertLess(result['jitter_ms'], 0.05)
+            self.assertEqual(result['clicks_detected'], CLICK_COUNT)
+
+    def test_stereo_and_inverted_polarity(self):
+        """Test that multi-channel and phase-inverted recordings are handled."""
+        recording = -simulate_recording(0.05)
+        stereo = np.stack([recording, recording], axis=1)
+        self.assertAlmostEqual(analyze_recording(stereo, SAMPLE_RATE)['round_trip_ms'], 50.0, delta=0.01)
+
+    def test_jitter(self):
+        """Test that clicks arriving at varying times show up as jitter."""
+        click = chirp(SAMPLE_RATE)
+        recording = np.zeros(30 * SAMPLE_RATE, dtype=np.float32)
+        for index, position in enumerate(click_positions(SAMPLE_RATE)):
+            # Every other click is a millisecond late
+            start = position + 4800 + (48 if index % 2 else 0)
+            recording[start:start + len(click)] += click
+        result = analyze_recording(recording, SAMPLE_RATE)
+        self.assertAlmostEqual(result['round_trip_ms'], 100.5, delta=0.01)
+        self.assertAlmostEqual(result['jitter_ms'], 0.5, delta=0.01)
+
+    def test_rejects_recordings_without_clicks(self):
+        """Test that noise and silence are not mistaken for a measurement."""
+        noise = np.random.default_rng(2).standard_normal(20 * SAMPLE_RATE).astype(np.float32)
+        for recording in (noise, np.zeros(20 * SAMPLE_RATE, dtype=np.float32), np.zeros(100, dtype=np.float32)):
+            with self.assertRaises(CalibrationError):
+                analyze_recording(recording, SAMPLE_RATE)
+
+    def test_analysis_is_fast(self):
+        """Test that a 30 second recording is analyzed well within a request."""
+        recording = simulate_recording(0.1)
+        analyze_recording(recording, SAMPLE_RATE)
+        started = time.perf_counter()
+        analyze_recording(recording, SAMPLE_RATE)
+        self.assertLess(time.perf_counter() - started, 0.25)
+
+
+class CalibrationApiTest(TestCase):
+    """
+    Tests for the calibration endpoints.
+    """
+
+    def test_click_train(self):
+        """Test that the click train is served as a WAV file."""
+        response = self.client.get(reverse('calibration_click_train'), {'sample_rate': SAMPLE_RATE})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Click-Count'], str(CLICK_COUNT))
+        pcm, sample_rate = read_wav(response.content)
+        self.assertEqual(sample_rate, SAMPLE_RATE)
+        self.assertEqual(len(pcm), len(click_train(SAMPLE_RATE)))
+
+    def test_calibrate_and_fetch(self):
+        """Test that a recording is measured, stored and returned for the device."""
+        wav = write_wav(simulate_recording(0.042, seconds=16), SAMPLE_RATE)
+        response = self.client.post(
+            reverse('calibration_create') + '?device=phone-1&input_latency_ms=10',
+            data=wav, content_type='audio/wav',
+        )
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertAlmostEqual(data['round_trip_ms'], 42.0, delta=0.1)
+        self.assertAlmostEqual(data['compensation_ms'], 32.0, delta=0.1)
+
+        response = self.client.get(reverse('calibration_detail', args=['phone-1']))
+        self.assertEqual(response.json()['compensation_ms'], data['compensation_ms'])
+        self.assertEqual(self.client.get(reverse('calibration_detail', args=['other'])).status_code, 404)
+
+    def test_invalid_requests(self):
+        """Test that bad parameters, non-WAV bodies and failed recordings are refused."""
+        url = reverse('calibration_create')
+        silence = write_wav(np.zeros(SAMPLE_RATE * 16, dtype=np.float32), SAMPLE_RATE)
+        self.assertEqual(self.client.post(url, data=silence, content_type='audio/wav').status_code, 400)
+        self.assertEqual(
+            self.client.post(url + '?device=a&input_latency_ms=-5', data=silence, content_type='audio/wav').status_code,
+            400,
+        )
+        self.assertEqual(self.client.post(url + '?device=a', data=b'nope', content_type='audio/wav').status_code, 400)
+        self.assertEqual(self.client.post(url + '?device=a', data=silence, content_type='audio/wav').status_code, 422)
+
+    def test_malformed_wav_headers(self):
+        """Test that headers whose frame size does not match their channels and bit depth are refused with 400."""
+        url = reverse('calibration_create') + '?device=abc'
+        for channels, block_align, bits in [(3, 2, 16), (1, 3, 16), (1, 2, 24), (2, 4, 12)]:
+            fmt = struct.pack('<HHIIHH', 1, channels, SAMPLE_RATE, SAMPLE_RATE * block_align, block_align, bits)
+            body = b'\x01\x02\x03\x04\x05'
+            data = (
+                struct.pack('<4sI4s', b'RIFF', 4 + 8 + len(fmt) + 8 + len(body), b'WAVE')
+                + struct.pack('<4sI', b'fmt ', len(fmt)) + fmt + struct.pack('<4sI', b'data', len(body)) + body
+            )
+            with self.assertRaises(WavError):
+                read_wav(data)
+            self.assertEqual(self.client.post(url, data=data, content_type='audio/wav').status_code, 400)
@@ -0,0 +1,82 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from metronome_api.models import MetronomeSoundSet
+
+
+class SoundSetCatalogTest(TestCase):
+    """
+    Tests for cursor pagination, search and sparse fields of the catalog endpoint.
+    """
+
+    def setUp(self):
+        for index, name in enumerate(['Woodblock', 'Cowbell', 'Rimshot', 'Clave', 'Beep']):
+            MetronomeSoundSet.objects.create(
+                name=name,
+                description=f'{name} sounds, recorded in studio {index}',
+                first_beat_sound=f'{name.lower()}_first.wav',
+                accent_sound=f'{name.lower()}_accent.wav',
+                normal_beat_sound=f'{name.lower()}_normal.wav',
+            )
+        self.url = reverse('all_sound_sets')
+
+    def test_pages_follow_cursor_in_name_order(self):
+        """Test that walking the cursor returns every set exactly once, ordered by name."""
+        names = []
+        response = self.client.get(self.url, {'limit': 2})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            names.extend(item['name'] for item in response.json())
+            cursor = response.get('X-Next-Cursor')
+            if not cursor:
+                break
+            self.assertIn('rel="next"', response['Link'])
+            response = self.client.get(self.url, {'limit': 2, 'cursor': cursor})
+
+        self.assertEqual(names, ['Beep', 'Clave', 'Cowbell', 'Rimshot', 'Woodblock'])
+
+    def test_page_is_a_single_query(self):
+        """Test that a page costs one query regardless of the page size."""
+        with self.assertNumQueries(1):
+            self.client.get(self.url, {'limit': 3})
+
+    def test_list_omits_description_by_default(self):
+        """Test that the default list payload leaves out the description."""
+        data = self.client.get(self.url).json()
+        self.assertNotIn('description', data[0])
+        self.assertIn('first_beat_sound_url', data[0])
+
+    def test_sparse_fields(self):
+        """Test that only the requested fields (plus id) are returned."""
+        data = self.client.get(self.url, {'fields': 'name,description'}).json()
+        self.assertEqual(set(data[0]), {'id', 'name', 'description'})
+
+    def test_unknown_field_is_rejected(self):
+        """Test that an unknown field name is a client error."""
+        response = self.client.get(self.url, {'fields': 'name,secret'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_invalid_cursor_is_rejected(self):
+        """Test that a tampered cursor is a client error."""
+        response = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_search_matches_name_and_description(self):
+        """Test that search covers names, descriptions and word prefixes."""
+        data = self.client.get(self.url, {'q': 'cow'}).json()
+        self.assertEqual([item['name'] for item in data], ['Cowbell'])
+
+        data = self.client.get(self.url, {'q': 'studio 3'}).json()
+        self.assertEqual([item['name'] for item in data], ['Clave'])
+
+    def test_search_index_follows_updates(self):
+        """Test that renamed and deleted sets are reflected by search."""
+        sound_set = MetronomeSoundSet.objects.get(name='Rimshot')
+        sound_set.name = 'Sidestick'
+        sound_set.description = 'Cross stick'
+        sound_set.save()
+        MetronomeSoundSet.objects.filter(name='Beep').delete()
+
+        self.assertEqual(self.client.get(self.url, {'q': 'rimshot'}).json(), [])
+        self.assertEqual(len(self.client.get(self.url, {'q': 'sidestick'}).json()), 1)
+        self.assertEqual(self.client.get(self.url, {'q': 'beep'}).json(), [])
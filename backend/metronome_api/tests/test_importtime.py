@@ -0,0 +1,65 @@
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase
+
+from metronome_api.importtime import attribute, measure, parse_importtime
+
+# Generous bounds: a cold start imports in about 0.6 s here, of which the
+# app itself takes under 0.1 s. Loading numpy alone would add 0.1-0.2 s.
+COLD_START_BUDGET_MS = 1500
+APP_BUDGET_MS = 250
+
+# Audio modules the URLconf may load up front; they do not import numpy
+EAGER_AUDIO_MODULES = {'metronome_api.audio', 'metronome_api.audio.rhythm', 'metronome_api.audio.sniff'}
+
+
+class ImportTimeReportTest(SimpleTestCase):
+    """
+    Tests for the import-time reports of the entry points.
+    """
+
+    def test_parse_and_attribute(self):
+        """Test that -X importtime lines are parsed and summed per installed app."""
+        output = '\n'.join([
+            'import time: self [us] | cumulative | imported package',
+            'import time:       120 |        120 |     _io',
+            'import time:       300 |        420 |   django.contrib.admin.sites',
+            'import time:        80 |         80 |   django.utils.text',
+            'import time:      1000 |       1500 | metronome_api.views',
+            'Traceback (most recent call last):',
+        ])
+        entries = parse_importtime(output)
+        self.assertEqual(entries[1], ('django.contrib.admin.sites', 300, 420, 1))
+        self.assertEqual(entries[3], ('metronome_api.views', 1000, 1500, 0))
+        self.assertEqual(attribute(entries, ['django.contrib.admin', 'metronome_api']), {
+            'stdlib': (120, 1),
+            'django.contrib.admin': (300, 1),
+            'django': (80, 1),
+            'metronome_api': (1000, 1),
+        })
+
+    def test_wsgi_cold_start(self):
+        """Test that starting the WSGI application stays within its budget and does not load numpy."""
+        report = measure('wsgi')
+        modules = report['modules']
+        self.assertIn('metronome_api.urls', modules)
+        self.assertIn('metronome_api.views', modules)
+
+        self.assertFalse([m for m in modules if m.split('.')[0] in ('numpy', 'rest_framework')])
+        audio = {m for m in modules if m.startswith('metronome_api.audio')}
+        self.assertLessEqual(audio, EAGER_AUDIO_MODULES)
+
+        owners = {entry['owner']: entry['ms'] for entry in report['owners']}
+        self.assertLess(owners['metronome_api'], APP_BUDGET_MS)
+        self.assertLess(report['import_ms'], COLD_START_BUDGET_MS)
+
+    def test_report_command(self):
+        """Test that the command prints the time per app and fails over budget."""
+        out = StringIO()
+        call_command('importtime_report', entry_point=['wsgi'], repeat=1, top=5, stdout=out)
+        self.assertRegex(out.getvalue(), r'wsgi: [\d.]+ ms importing \d+ modules')
+        self.assertRegex(out.getvalue(), r'metronome_api +[\d.]+ ms +\d+ modules')
+
+        with self.assertRaisesMessage(CommandError, 'the budget is 1 ms'):
+            call_command('importtime_report', entry_point=['wsgi'], repeat=1, budget_ms=1, stdout=StringIO())
@@ -0,0 +1,133 @@
+import datetime
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from metronome_api import jobs, views
+from metronome_api.audio.wavfile import read_wav
+from metronome_api.models import Job, MetronomeSoundSet
+
+
+class JobSystemTest(TestCase):
+    """
+    Tests for the job system and the click track job endpoints.
+    """
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root, METRONOME_JOBS_EAGER=True)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.sound_set = MetronomeSoundSet.objects.create(name='Synth', synth_params={})
+        self.params = {'accents': '3,1,1,1', 'bpm': 240, 'measures': 40, 'sample_rate': 8000}
+
+    def test_render_track_job(self):
+        """Test that a track job renders every measure and serves the result."""
+        response = self.client.post(reverse('render_track'), self.params)
+        self.assertEqual(response.status_code, 202)
+        data = response.json()
+        self.assertEqual(data['status'], Job.SUCCEEDED)
+        self.assertEqual(data['progress'], 1.0)
+        self.assertNotIn('path', data['result'])
+
+        self.assertEqual(self.client.get(response['Location']).json(), data)
+        download = self.client.get(data['result_url'])
+        pcm, sample_rate = read_wav(b''.join(download.streaming_content))
+        self.assertEqual(sample_rate, 8000)
+        self.assertEqual(len(pcm), 40 * 8000)  # 40 measures of one second
+
+    def test_invalid_sound_set(self):
+        """Test that a sound set that is not an ASCII id is rejected."""
+        response = self.client.post(reverse('render_track'), {**self.params, 'sound_set': '\u00b2'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_identical_in_flight_jobs_are_shared(self):
+        """Test that submitting the same work twice while it runs returns one job."""
+        params = {'rhythm': {'bpm': 120}, 'measures': 1}
+        running = Job.objects.create(
+            kind='render_track', params=params, dedupe_key=jobs.dedupe_key('render_track', params), status=Job.RUNNING,
+        )
+        self.assertEqual(jobs.submit('render_track', params).pk, running.pk)
+
+        jobs.cancel(running)
+        with mock.patch.object(jobs, 'run_job'):
+            self.assertNotEqual(jobs.submit('render_track', params).pk, running.pk)
+
+    def test_cancel(self):
+        """Test that queued jobs are cancelled at once and running ones at the next progress report."""
+        queued = Job.objects.create(kind='render_track', dedupe_key='a')
+        self.assertEqual(jobs.cancel(queued).status, Job.CANCELLED)
+        jobs.run_job(queued.pk)
+        queued.refresh_from_db()
+        self.assertIsNone(queued.started_at)
+
+        running = Job.objects.create(kind='render_track', dedupe_key='b', status=Job.RUNNING)
+        response = self.client.post(reverse('job_cancel', args=[running.pk]))
+        self.assertEqual(response.json()['status'], Job.RUNNING)
+        with self.assertRaises(jobs.JobCancelled):
+            jobs.ProgressReporter(running.pk)(0.5)
+
+    @override_settings(METRONOME_JOBS_EAGER=False, METRONOME_JOB_QUEUE_LIMIT=0)
+    def test_full_queue_is_rejected(self):
+        """Test that a full pool answers 503 instead of queueing."""
+        response = self.client.post(reverse('render_track'), self.params)
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response)
+
+    def test_event_stream(self):
+        """Test that the event stream ends with a done event for a finished job."""
+        job = self.client.post(reverse('render_track'), self.params).json()
+        response = self.client.get(reverse('job_events', args=[job['id']]))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join(response.streaming_content).decode()
+        self.assertTrue(body.startswith('event: done\n'))
+        self.assertIn('"status": "succeeded"', body)
+
+    def test_orphaned_jobs_expire(self):
+        """Test that jobs without a live worker are failed and no longer returned in place of new work."""
+        params = {'rhythm': {'bpm': 120}, 'measures': 1}
+        long_ago = timezone.now() - datetime.timedelta(hours=2)
+        zombie = Job.objects.create(
+            kind='render_track', params=params, dedupe_key=jobs.dedupe_key('render_track', params),
+            status=Job.RUNNING, started_at=long_ago, heartbeat_at=long_ago,
+        )
+        never_started = Job.objects.create(kind='render_track', dedupe_key='queued')
+        Job.objects.filter(pk=never_started.pk).update(created_at=long_ago)
+        alive = Job.objects.create(
+            kind='render_track', dedupe_key='alive', status=Job.RUNNING, heartbeat_at=timezone.now(),
+        )
+
+        with mock.patch.object(jobs, 'run_job'):
+            self.assertNotEqual(jobs.submit('render_track', params).pk, zombie.pk)
+        for job, status in ((zombie, Job.FAILED), (never_started, Job.FAILED), (alive, Job.RUNNING)):
+            job.refresh_from_db()
+            self.assertEqual(job.status, status)
+        self.assertIn('abandoned', zombie.error)
+
+    def test_old_outputs_expire(self):
+        """Test that output files past their lifetime are deleted and their jobs answer 410."""
+        job = self.client.post(reverse('render_track'), self.params).json()
+        path = Job.objects.get(pk=job['id']).result['path']
+        fresh = os.path.join(os.path.dirname(path), 'fresh.wav')
+        open(fresh, 'wb').close()
+        old = time.time() - 2 * 24 * 60 * 60
+        os.utime(path, (old, old))
+
+        self.assertEqual(jobs.expire_outputs(), 1)
+        self.assertTrue(os.path.exists(fresh))
+        self.assertEqual(self.client.get(job['result_url']).status_code, 410)
+
+    def test_event_stream_is_bounded(self):
+        """Test that the stream of a job that never finishes ends after its maximum duration."""
+        job = Job.objects.create(kind='render_track', dedupe_key='slow', status=Job.RUNNING)
+        with mock.patch.multiple(views, JOB_EVENTS_MAX_SECONDS=0.05, JOB_EVENTS_POLL_SECONDS=0.01):
+            body = b''.join(self.client.get(reverse('job_events', args=[job.pk])).streaming_content).decode()
+        self.assertEqual(body.count('event: progress'), 1)
+        self.assertNotIn('event: done', body)
@@ -0,0 +1,90 @@
+import json
+import os
+import shutil
+import tempfile
+from itertools import islice
+
+import numpy as np
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.test import LiveServerTestCase, SimpleTestCase, override_settings
+
+from metronome_api.audio.wavfile import write_wav
+from metronome_api.loadtest import (
+    ScenarioError, load_scenario, percentile, request_plan, run_scenario, validate_scenario,
+)
+from metronome_api.models import MetronomeSoundSet
+
+DEFAULT_SCENARIO = os.path.join(settings.BASE_DIR, 'loadtest', 'default.json')
+
+
+class ScenarioTest(SimpleTestCase):
+    """
+    Tests for scenario parsing and the request sequence.
+    """
+
+    def test_default_scenario_is_valid(self):
+        """Test that the scenario shipped with the repo loads."""
+        scenario = load_scenario(DEFAULT_SCENARIO)
+        self.assertIn('serve_sound_file', [route['name'] for route in scenario['routes']])
+
+    def test_invalid_scenarios(self):
+        """Test that malformed scenarios are refused."""
+        for scenario in [
+            {},
+            {'routes': [{'name': 'a', 'path': 'no-slash'}]},
+            {'routes': [{'name': 'a', 'path': '/'}, {'name': 'a', 'path': '/x'}]},
+            {'routes': [{'name': 'a', 'path': '/', 'method': 'TRACE'}]},
+            {'routes': [{'name': 'a', 'path': '/', 'weight': 0}]},
+        ]:
+            with self.assertRaises(ScenarioError):
+                validate_scenario(scenario)
+
+    def test_plan_is_reproducible(self):
+        """Test that a seed always produces the same requests, in the weighted mix."""
+        scenario = validate_scenario({'routes': [
+            {'name': 'a', 'path': '/a/{sound_set_id}/', 'weight': 3},
+            {'name': 'b', 'path': '/b/'},
+        ]})
+        variables = {'sound_set_id': [1, 2, 3]}
+        first = [(route['name'], path) for route, path in islice(request_plan(scenario, variables, 7), 400)]
+        second = [(route['name'], path) for route, path in islice(request_plan(scenario, variables, 7), 400)]
+        self.assertEqual(first, second)
+        share = sum(1 for name, _ in first if name == 'a') / len(first)
+        self.assertAlmostEqual(share, 0.75, delta=0.07)
+
+    def test_percentile(self):
+        """Test nearest-rank percentiles."""
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([5], 95), 5)
+        self.assertIsNone(percentile([], 50))
+
+
+class LoadTestRunTest(LiveServerTestCase):
+    """
+    Tests for running the default scenario against a live server.
+    """
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root, METRONOME_JOBS_EAGER=True)
+        override.enable()
+        self.addCleanup(override.disable)
+        wav = write_wav(np.zeros(1000, dtype=np.float32), 44100)
+        sound_set = MetronomeSoundSet(name='Load')
+        for field in ('first_beat_sound', 'accent_sound', 'normal_beat_sound'):
+            getattr(sound_set, field).save(f'{field}.wav', ContentFile(wav), save=False)
+        sound_set.save()
+
+    def test_report(self):
+        """Test that every route of the mix is exercised and reported without errors."""
+        report = run_scenario(load_scenario(DEFAULT_SCENARIO), self.live_server_url, duration=1.5, rate=60)
+        json.dumps(report)
+        self.assertEqual(report['total']['errors'], 0, report['routes'])
+        self.assertGreater(report['total']['requests'], 60)
+        for name, route in report['routes'].items():
+            self.assertGreater(route['requests'], 0, name)
+            self.assertEqual(set(route['latency_ms']), {'p50', 'p95', 'p99', 'mean', 'max'})
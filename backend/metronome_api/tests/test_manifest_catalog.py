@@ -0,0 +1,132 @@
+import datetime
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from metronome_api import manifest_catalog
+from metronome_api.catalog import CHANGES_SETTLE_SECONDS, encode_sync_cursor
+from metronome_api.models import MetronomeSoundSet
+
+
+class ManifestCatalogTest(TestCase):
+    """
+    Tests for the database-free catalog served from a manifest file.
+    """
+
+    def setUp(self):
+        for index, name in enumerate(['Woodblock', 'Cowbell', 'Rimshot', 'Clave', 'Beep']):
+            MetronomeSoundSet.objects.create(
+                name=name,
+                description=f'{name} sounds, recorded in studio {index}',
+                first_beat_sound=f'{name.lower()}_first.wav',
+                accent_sound=f'{name.lower()}_accent.wav',
+                normal_beat_sound=f'{name.lower()}_normal.wav',
+            )
+        MetronomeSoundSet.objects.create(name='Synth', synth_params={'first': {'voice': 'beep'}})
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'catalog.json')
+        call_command('export_catalog_manifest', output=self.path, stdout=StringIO())
+
+    def manifest_settings(self):
+        return override_settings(METRONOME_CATALOG_BACKEND='manifest', METRONOME_CATALOG_MANIFEST=self.path)
+
+    def test_reads_match_the_database_without_queries(self):
+        """Test that every read endpoint returns the ORM payloads with zero queries."""
+        ids = ','.join(str(pk) for pk in MetronomeSoundSet.objects.values_list('id', flat=True))
+        first_id = MetronomeSoundSet.objects.first().id
+        requests = [
+            (reverse('all_sound_sets'), {'limit': 2}),
+            (reverse('all_sound_sets'), {'q': 'stud', 'fields': 'name,description'}),
+            (reverse('sound_sets_batch'), {'ids': ids + ',999999'}),
+            (reverse('sound_set_detail', args=[first_id]), {}),
+            (reverse('default_sound_set'), {}),
+        ]
+        expected = [self.client.get(url, params) for url, params in requests]
+
+        with self.manifest_settings():
+            for (url, params), orm_response in zip(requests, expected):
+                with self.assertNumQueries(0):
+                    response = self.client.get(url, params)
+                self.assertEqual(response.json(), orm_response.json(), url)
+                self.assertEqual(response.get('X-Next-Cursor'), orm_response.get('X-Next-Cursor'))
+
+    def test_pages_and_prefix_search(self):
+        """Test cursor pagination and AND-ed prefix search over the index."""
+        url = reverse('all_sound_sets')
+        with self.manifest_settings():
+            names = []
+            response = self.client.get(url, {'limit': 4})
+            while True:
+                names.extend(item['name'] for item in response.json())
+                if not response.get('X-Next-Cursor'):
+                    break
+                response = self.client.get(url, {'limit': 4, 'cursor': response['X-Next-Cursor']})
+            self.assertEqual(names, ['Beep', 'Clave', 'Cowbell', 'Rimshot', 'Synth', 'Woodblock'])
+
+            data = self.client.get(url, {'q': 'COW studio'}).json()
+            self.assertEqual([item['name'] for item in data], ['Cowbell'])
+            self.assertEqual(self.client.get(url, {'q': 'gong'}).json(), [])
+            self.assertEqual(self.client.get(url, {'cursor': 'garbage'}).status_code, 400)
+
+    def test_synthesized_set_renders_from_manifest(self):
+        """Test that synthesis and loop rendering work on manifest sound sets."""
+        sound_set = MetronomeSoundSet.objects.get(name='Synth')
+        with self.manifest_settings():
+            with self.assertNumQueries(0):
+                response = self.client.get(reverse('sound_set_synth_sample', args=[sound_set.id, 'first']))
+                self.assertEqual(response.status_code, 200)
+                response = self.client.get(reverse('render_loop'), {
+                    'accents': '3,1', 'bpm': 120, 'sound_set': sound_set.id, 'sample_rate': 8000,
+                })
+                self.assertEqual(response.status_code, 200)
+
+    def test_changes_since_the_snapshot(self):
+        """Test that a delta sync against the manifest matches the database and never passes the export."""
+        url = reverse('sound_set_changes')
+        MetronomeSoundSet.objects.update(updated_at=timezone.now() - datetime.timedelta(hours=1))
+        cursor = self.client.get(url).json()['cursor']
+        rimshot = MetronomeSoundSet.objects.get(name='Rimshot')
+        rimshot_id = rimshot.pk
+        rimshot.delete()
+        MetronomeSoundSet.objects.get(name='Clave').save()
+        call_command('export_catalog_manifest', output=self.path, stdout=StringIO())
+        expected = self.client.get(url, {'since': cursor}).json()
+
+        with self.manifest_settings(), self.assertNumQueries(0):
+            data = self.client.get(url, {'since': cursor}).json()
+            self.assertEqual([item['name'] for item in data['changed']], ['Clave'])
+            self.assertEqual(data['changed'], expected['changed'])
+            self.assertEqual(data['deleted'], [rimshot_id])
+            self.assertEqual(len(self.client.get(url).json()['changed']), 5)
+
+        with open(self.path) as f:
+            generated_at = parse_datetime(json.load(f)['generated_at'])
+        self.assertEqual(data['cursor'], encode_sync_cursor(generated_at - datetime.timedelta(seconds=CHANGES_SETTLE_SECONDS)))
+
+    def test_hot_reload_swaps_index_and_survives_bad_manifest(self):
+        """Test that a changed manifest is picked up and a broken one is ignored."""
+        url = reverse('all_sound_sets')
+        with self.manifest_settings(), mock.patch.object(manifest_catalog, 'RELOAD_INTERVAL', 0):
+            self.assertEqual(len(self.client.get(url).json()), 6)
+
+            MetronomeSoundSet.objects.create(name='Agogo', synth_params={})
+            call_command('export_catalog_manifest', output=self.path, stdout=StringIO())
+            with open(self.path) as f:
+                self.assertEqual(json.load(f)['version'], 2)
+            data = self.client.get(url).json()
+            self.assertEqual(data[0]['name'], 'Agogo')
+
+            with open(self.path, 'w') as f:
+                f.write('{"version": 3, "sound_')
+            self.assertEqual(len(self.client.get(url).json()), 7)
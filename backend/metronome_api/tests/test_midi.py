@@ -0,0 +1,182 @@
+import json
+import struct
+
+import numpy as np
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from metronome_api.audio.midi import PPQ, click_map, encode_events
+from metronome_api.audio.rhythm import RhythmSpecError
+from metronome_api.audio.setlist import setlist_from_dict
+
+
+def read_vlq(data, position):
+    value = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value = value << 7 | byte & 0x7F
+        if byte < 0x80:
+            return value, position
+
+
+def read_midi(data):
+    """Parse a Standard MIDI File into its division and tracks of ``(tick, status, bytes)`` events."""
+    assert data[:4] == b'MThd'
+    _, file_format, count, division = struct.unpack('>IHHH', data[4:14])
+    assert file_format == 1
+    tracks, position = [], 14
+    for _ in range(count):
+        assert data[position:position + 4] == b'MTrk'
+        end = position + 8 + struct.unpack('>I', data[position + 4:position + 8])[0]
+        position += 8
+        events, tick, status = [], 0, None
+        while position < end:
+            delta, position = read_vlq(data, position)
+            tick += delta
+            if data[position] == 0xFF:
+                kind = data[position + 1]
+                length, position = read_vlq(data, position + 2)
+                events.append((tick, (0xFF, kind), data[position:position + length]))
+                position += length
+                status = None
+                continue
+            if data[position] & 0x80:
+                status = data[position]
+                position += 1
+            events.append((tick, status, data[position:position + 2]))
+            position += 2
+        tracks.append(events)
+    return division, tracks
+
+
+def notes(track):
+    """``(tick, note, velocity, length)`` of every note of a track."""
+    on = {}
+    found = []
+    for tick, status, data in track:
+        if status == 0x99 and data[1]:
+            on[data[0]] = (tick, data[1])
+        elif status == 0x99:
+            start, velocity = on.pop(data[0])
+            found.append((start, data[0], velocity, tick - start))
+    return sorted(found)
+
+
+class ClickMapTest(SimpleTestCase):
+    """
+    Tests for click maps as Standard MIDI Files.
+    """
+
+    def test_variable_length_quantities(self):
+        """Test that delta times are encoded in one to four bytes, followed by the event data."""
+        deltas = np.array([0, 127, 128, 16383, 16384, 2 ** 21, 2 ** 28 - 1])
+        data = np.array([[1, 2]] * len(deltas), dtype=np.uint8)
+        encoded = encode_events(deltas, data)
+        position = 0
+        for delta in deltas:
+            value, position = read_vlq(encoded, position)
+            self.assertEqual(value, delta)
+            self.assertEqual(encoded[position:position + 2], b'\x01\x02')
+            position += 2
+        self.assertEqual(position, len(encoded))
+        self.assertEqual(encoded[:6], bytes([0x00, 1, 2, 0x7F, 1, 2]))
+
+    def test_setlist_tempo_map_and_clicks(self):
+        """Test the tempo and meter changes, markers and clicks of every layer of a setlist."""
+        songs = setlist_from_dict({'songs': [
+            {'name': 'Intro', 'bpm': 120, 'accents': [3, 1, 2, 0], 'measures': 2, 'count_in': 1},
+            {'bpm': 90, 'layers': [{'accents': [3, 1, 1], 'subdivisions': 2}, {'accents': [2, 1]}], 'measures': 1},
+        ]})
+        division, (conductor, click, layer) = read_midi(click_map(songs))
+        self.assertEqual(division, PPQ)
+
+        meta = [(tick, status[1], bytes(data)) for tick, status, data in conductor]
+        second = 3 * 4 * PPQ
+        self.assertEqual(meta, [
+            (0, 0x03, b'Tempo map'),
+            (0, 0x51, (500000).to_bytes(3, 'big')),
+            (0, 0x58, bytes([4, 2, 24, 8])),
+            (0, 0x06, b'Intro'),
+            (second, 0x51, (666667).to_bytes(3, 'big')),
+            (second, 0x58, bytes([3, 2, 24, 8])),
+            (second, 0x06, b'Song 2'),
+            (second + 3 * PPQ, 0x2F, b''),
+        ])
+
+        clicks = notes(click)
+        # The count-in: four plain beats, the first accented
+        self.assertEqual([(t, n, v) for t, n, v, _ in clicks[:4]], [
+            (0, 76, 127), (PPQ, 77, 80), (2 * PPQ, 77, 80), (3 * PPQ, 77, 80),
+        ])
+        # The song: first beat, normal beat, accent, muted fourth beat
+        self.assertEqual(
+            [(t - 4 * PPQ, n, v) for t, n, v, _ in clicks[4:7]], [(0, 76, 127), (PPQ, 77, 80), (2 * PPQ, 76, 100)],
+        )
+        self.assertEqual(clicks[7][0], 8 * PPQ)
+        # Subdivision clicks at half beats, quieter
+        self.assertEqual(
+            [(t - second, v) for t, _, v, _ in clicks[10:14]], [(0, 127), (PPQ // 2, 50), (PPQ, 80), (3 * PPQ // 2, 50)],
+        )
+        self.assertEqual(len(clicks), 4 + 2 * 3 + 6)
+        self.assertTrue(all(length == PPQ // 16 for *_, length in clicks))
+
+        # The second layer only plays in the second song, two clicks over three beats
+        self.assertEqual(notes(layer), [(second, 75, 100, PPQ // 16), (second + 3 * PPQ // 2, 75, 80, PPQ // 16)])
+
+    def test_swing_and_dense_clicks(self):
+        """Test that swung steps are delayed and clicks never overlap their successor."""
+        songs = setlist_from_dict({'songs': [{'bpm': 60, 'accents': [3, 1], 'subdivisions': 16, 'swing': 0.5}]})
+        clicks = notes(read_midi(click_map(songs))[1][1])
+        self.assertEqual([t for t, *_ in clicks[:3]], [0, PPQ // 16 + PPQ // 32, PPQ // 8])
+        for (start, _, _, length), (following, *_) in zip(clicks, clicks[1:]):
+            self.assertLessEqual(start + length, following)
+
+    def test_limits(self):
+        """Test that tempos MIDI cannot express and oversized maps are rejected."""
+        with self.assertRaisesMessage(RhythmSpecError, 'MIDI tempos must be at least 3.58 bpm'):
+            click_map(setlist_from_dict({'songs': [{'bpm': 3, 'accents': [3, 1]}]}))
+        with self.assertRaisesMessage(RhythmSpecError, 'at most'):
+            dense = {'bpm': 1000, 'accents': [3] * 64, 'subdivisions': 16, 'measures': 1000}
+            click_map(setlist_from_dict({'songs': [dense]}))
+
+
+class RenderMidiViewTest(TestCase):
+    """
+    Tests for the MIDI click map endpoint.
+    """
+
+    def setUp(self):
+        cache.clear()
+
+    def test_rhythm_from_query(self):
+        """Test that a rhythm exports as a MIDI file, cached and revalidated by its ETag."""
+        url = reverse('render_midi')
+        params = {'bpm': 100, 'accents': ['3,1,1,1', '2,1,1'], 'measures': 8, 'count_in': 1}
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'audio/midi')
+        _, tracks = read_midi(response.content)
+        self.assertEqual(len(tracks), 3)
+        self.assertEqual(len(notes(tracks[1])), 4 + 8 * 4)
+        self.assertEqual(len(notes(tracks[2])), 8 * 3)
+
+        self.assertEqual(self.client.get(url, params, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(self.client.get(url, params).content, response.content)
+        self.assertNotEqual(self.client.get(url, {**params, 'bpm': 101})['ETag'], response['ETag'])
+
+    def test_setlist_from_body_and_errors(self):
+        """Test that setlists are posted as JSON and invalid or too long ones rejected."""
+        url = reverse('render_midi')
+        setlist = {'songs': [{'bpm': 120, 'accents': [3, 1], 'measures': 4}, {'bpm': 140, 'accents': [3, 1, 1]}]}
+        response = self.client.post(url, json.dumps(setlist), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        _, (conductor, _) = read_midi(response.content)
+        self.assertEqual([tick for tick, status, _ in conductor if status == (0xFF, 0x51)], [0, 4 * 2 * PPQ])
+
+        self.assertEqual(self.client.get(url, {'accents': '3,1', 'measures': 0}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'accents': '3,1', 'bpm': 2}).status_code, 400)
+        self.assertEqual(self.client.post(url, 'nope', content_type='application/json').status_code, 400)
+        long_set = {'songs': [{'bpm': 60, 'accents': [3, 1, 1, 1], 'measures': 4000}]}
+        self.assertEqual(self.client.post(url, json.dumps(long_set), content_type='application/json').status_code, 400)
@@ -0,0 +1,121 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from metronome_api.audio.wavfile import write_wav
+from metronome_api.models import MetronomeSoundSet
+from metronome_api.packs import MANIFEST_NAME, PackError, export_pack, import_pack
+
+
+class SoundPackTest(TestCase):
+    """
+    Tests for exporting and importing sound packs.
+    """
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        shared = ContentFile(write_wav(np.linspace(-0.5, 0.5, 2000, dtype=np.float32), 44100))
+        self.sampled = MetronomeSoundSet(name='Sampled', description='Three files')
+        for index, field in enumerate(('first_beat_sound', 'accent_sound', 'normal_beat_sound')):
+            content = shared if index else ContentFile(write_wav(np.zeros(500, dtype=np.float32), 44100))
+            getattr(self.sampled, field).save(f'{field}.wav', content, save=False)
+        self.sampled.save()
+        self.synthesized = MetronomeSoundSet.objects.create(name='Synth', synth_params={'first': {'voice': 'beep'}})
+
+    def export(self, sound_sets=None):
+        return b''.join(export_pack(sound_sets or MetronomeSoundSet.objects.order_by('name', 'id')))
+
+    def test_export_is_a_zip_with_checksums(self):
+        """Test that the pack holds every sample once and a manifest describing the sound sets."""
+        with zipfile.ZipFile(io.BytesIO(self.export())) as archive:
+            manifest = json.loads(archive.read(MANIFEST_NAME))
+            self.assertEqual([entry['name'] for entry in manifest['sound_sets']], ['Sampled', 'Synth'])
+            self.assertEqual(len(manifest['files']), 3)
+            for name, checksum in manifest['files'].items():
+                self.assertEqual(len(archive.read(name)), checksum['size'])
+
+    def test_export_is_streamed(self):
+        """Test that the export is produced in pieces, not as one buffer."""
+        self.assertGreater(len([chunk for chunk in export_pack(MetronomeSoundSet.objects.all()) if chunk]), 3)
+
+    def test_round_trip(self):
+        """Test that an imported pack recreates the sound sets with identical samples."""
+        pack = self.export()
+        result = import_pack(io.BytesIO(pack))
+        self.assertEqual(result['created'], [])
+        self.assertEqual(result['skipped'], ['Sampled', 'Synth'])
+
+        result = import_pack(io.BytesIO(pack), existing='copy')
+        self.assertEqual(len(result['created']), 2)
+        copy = MetronomeSoundSet.objects.get(pk=result['created'][0])
+        self.assertEqual(copy.description, 'Three files')
+        for field in ('first_beat_sound', 'accent_sound', 'normal_beat_sound'):
+            with getattr(copy, field).open('rb') as imported, getattr(self.sampled, field).open('rb') as original:
+                self.assertEqual(imported.read(), original.read())
+        self.assertEqual(MetronomeSoundSet.objects.get(pk=result['created'][1]).synth_params, {'first': {'voice': 'beep'}})
+
+    def test_tampered_pack_is_rejected(self):
+        """Test that a sample that does not match its checksum aborts the import without leftovers."""
+        source = zipfile.ZipFile(io.BytesIO(self.export()))
+        tampered = io.BytesIO()
+        with zipfile.ZipFile(tampered, 'w') as target:
+            for info in source.infolist():
+                data = source.read(info)
+                if info.filename != MANIFEST_NAME and info.filename.endswith('accent_sound.wav'):
+                    data = data[:-1] + b'\x01'
+                target.writestr(info, data)
+        files_before = sorted(os.listdir(self.media_root))
+
+        with self.assertRaises(PackError):
+            import_pack(tampered, existing='copy')
+        self.assertEqual(MetronomeSoundSet.objects.count(), 2)
+        self.assertEqual(sorted(os.listdir(self.media_root)), files_before)
+
+    def test_invalid_packs(self):
+        """Test that files that are not packs are refused."""
+        with self.assertRaises(PackError):
+            import_pack(io.BytesIO(b'not a zip'))
+        empty = io.BytesIO()
+        with zipfile.ZipFile(empty, 'w') as archive:
+            archive.writestr(MANIFEST_NAME, json.dumps({'format': 'something-else'}))
+        with self.assertRaises(PackError):
+            import_pack(empty)
+
+    def test_api(self):
+        """Test the staff-only export and import endpoints."""
+        response = self.client.get(reverse('sound_sets_export'))
+        self.assertEqual(response.status_code, 403)
+
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+        response = self.client.get(reverse('sound_sets_export'), {'ids': self.sampled.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        pack = b''.join(response.streaming_content)
+
+        response = self.client.post(reverse('sound_sets_import'), {
+            'pack': SimpleUploadedFile('sound-sets.zip', pack, content_type='application/zip'),
+            'existing': 'copy',
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.json()['created']), 1)
+
+    def test_missing_sample_fails_before_streaming(self):
+        """Test that an export with a missing sample file is refused up front."""
+        os.remove(self.sampled.first_beat_sound.path)
+        with self.assertRaises(PackError):
+            export_pack(MetronomeSoundSet.objects.all())
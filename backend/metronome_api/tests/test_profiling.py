@@ -0,0 +1,102 @@
+import json
+import os
+import shutil
+import tempfile
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from metronome_api.models import MetronomeSoundSet
+from metronome_api.profiling import PROFILE_HEADER, _current, timer
+
+
+class ProfilingMiddlewareTest(TestCase):
+    """
+    Tests for on-demand request profiling.
+    """
+
+    def setUp(self):
+        self.profile_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.profile_dir)
+        override = override_settings(
+            METRONOME_PROFILING_ENABLED=True,
+            METRONOME_PROFILING_TOKEN='secret',
+            METRONOME_PROFILING_DIR=self.profile_dir,
+            METRONOME_PROFILING_INTERVAL=0.001,
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        MetronomeSoundSet.objects.create(name='Synth', synth_params={'first': {'waveform': 'sine'}})
+
+    def profiles(self):
+        return sorted(name[:-len('.json')] for name in os.listdir(self.profile_dir) if name.endswith('.json'))
+
+    def get(self, token='secret'):
+        extra = {'HTTP_' + PROFILE_HEADER.upper().replace('-', '_'): token} if token else {}
+        return self.client.get(reverse('all_sound_sets'), **extra)
+
+    def test_requested_profile_is_written(self):
+        """Test that a request with the profile token leaves folded stacks, allocations and a summary."""
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        [name] = self.profiles()
+        self.assertEqual(response['X-Profile-Id'], name)
+
+        for suffix in ('.folded', '.alloc.folded'):
+            with open(os.path.join(self.profile_dir, name + suffix)) as f:
+                for line in f:
+                    stack, count = line.rstrip('\n').rsplit(' ', 1)
+                    self.assertTrue(stack)
+                    self.assertGreater(int(count), 0)
+
+        with open(os.path.join(self.profile_dir, name + '.json')) as f:
+            summary = json.load(f)
+        self.assertEqual(summary['method'], 'GET')
+        self.assertEqual(summary['status'], 200)
+        self.assertEqual(summary['timers']['catalog.serialize']['count'], 1)
+        self.assertGreaterEqual(summary['duration_ms'], summary['timers']['catalog.serialize']['total_ms'])
+
+    def test_wrong_token_is_not_profiled(self):
+        """Test that requests without the right token are not profiled at a sample rate of 0."""
+        self.get(token='wrong')
+        response = self.get(token=None)
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(self.profiles(), [])
+
+    def test_sample_rate(self):
+        """Test that a sample rate of 1 profiles every request."""
+        with self.settings(METRONOME_PROFILING_SAMPLE_RATE=1, METRONOME_PROFILING_TRACEMALLOC=False):
+            for _ in range(3):
+                self.get(token=None)
+        self.assertEqual(len(self.profiles()), 3)
+
+    def test_disabled(self):
+        """Test that nothing is profiled while profiling is disabled, even with the token."""
+        with self.settings(METRONOME_PROFILING_ENABLED=False, METRONOME_PROFILING_SAMPLE_RATE=1):
+            response = self.get()
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(os.listdir(self.profile_dir), [])
+
+    def test_ring_is_bounded(self):
+        """Test that only the newest profiles are kept."""
+        with self.settings(METRONOME_PROFILING_MAX_PROFILES=3):
+            names = [self.get()['X-Profile-Id'] for _ in range(5)]
+        self.assertEqual(self.profiles(), sorted(names[2:]))
+        self.assertEqual(len(os.listdir(self.profile_dir)), 9)
+
+
+class TimerTest(SimpleTestCase):
+    """
+    Tests for named timer sections.
+    """
+
+    def test_timer_outside_profile(self):
+        """Test that timers outside a profiled request do nothing."""
+        @timer('noop')
+        def work():
+            return 42
+
+        self.assertIsNone(_current.get())
+        self.assertEqual(work(), 42)
+        with timer('noop'):
+            pass
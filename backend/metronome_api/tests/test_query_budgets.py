@@ -0,0 +1,147 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from metronome_api.db import pragma_statements
+from metronome_api.models import DeviceCalibration, Job, MetronomeSoundSet
+from metronome_api.telemetry import apply_summary, summarize
+
+# Most queries each view may issue, with cold caches. The catalog views must
+# stay at one query however many sound sets a page holds.
+QUERY_BUDGETS = {
+    'all_sound_sets': 1,
+    'sound_sets_batch': 1,
+    'sound_set_changes': 2,
+    'sound_set_detail': 1,
+    'default_sound_set': 1,
+    'active_sound_set': 1,
+    'set_active_sound_set': 1,
+    'sound_set_synth_sample': 1,
+    'render_loop': 1,
+    'job_detail': 1,
+    'calibration_detail': 1,
+    'telemetry_stats': 2,
+}
+
+
+class QueryBudgetTest(TestCase):
+    """
+    Tests that the API views stay within their query budgets.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sound_sets = [
+            MetronomeSoundSet.objects.create(name=f'Set {i:02}', description='Clicks', synth_params={})
+            for i in range(40)
+        ]
+        cls.job = Job.objects.create(kind='render_track', params={}, dedupe_key='budget')
+        DeviceCalibration.objects.create(
+            device_id='phone', sample_rate=48000, round_trip_ms=40.0, jitter_ms=0.1,
+            compensation_ms=40.0, clicks_detected=24, clicks_total=24, confidence=0.9,
+        )
+        apply_summary('player', summarize([{'type': 'measure', 'ts': 0}], cls.job.created_at))
+
+    def setUp(self):
+        # Budgets hold for the first request, not only once payloads are cached
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def assertWithinBudget(self, view, request):
+        budget = QUERY_BUDGETS[view]
+        with CaptureQueriesContext(connection) as queries:
+            response = request()
+        self.assertLess(response.status_code, 400, response.content[:200])
+        self.assertLessEqual(
+            len(queries), budget,
+            f'{view} issued {len(queries)} queries, its budget is {budget}:\n'
+            + '\n'.join(query['sql'] for query in queries.captured_queries),
+        )
+
+    def test_catalog_views(self):
+        """Test that a full catalog page, search and sparse fieldsets each take a single query, and a delta sync two."""
+        url = reverse('all_sound_sets')
+        for params in ({}, {'limit': 500}, {'q': 'Set'}, {'fields': 'id,name,first_beat_sound_url'}):
+            self.assertWithinBudget('all_sound_sets', lambda: self.client.get(url, params))
+        ids = ','.join(str(s.pk) for s in self.sound_sets)
+        self.assertWithinBudget('sound_sets_batch', lambda: self.client.get(reverse('sound_sets_batch'), {'ids': ids}))
+        cursor = self.client.get(reverse('sound_set_changes')).json()['cursor']
+        self.assertWithinBudget('sound_set_changes', lambda: self.client.get(reverse('sound_set_changes'), {'since': cursor}))
+
+    def test_sound_set_views(self):
+        """Test the budgets of the single sound set views."""
+        pk = self.sound_sets[0].pk
+        self.assertWithinBudget('sound_set_detail', lambda: self.client.get(reverse('sound_set_detail', args=[pk])))
+        self.assertWithinBudget('default_sound_set', lambda: self.client.get(reverse('default_sound_set')))
+        self.assertWithinBudget('active_sound_set', lambda: self.client.get(reverse('active_sound_set')))
+        self.assertWithinBudget(
+            'set_active_sound_set', lambda: self.client.post(reverse('set_active_sound_set', args=[pk])),
+        )
+        self.assertWithinBudget(
+            'sound_set_synth_sample',
+            lambda: self.client.get(reverse('sound_set_synth_sample', args=[pk, 'accent'])),
+        )
+        self.assertWithinBudget(
+            'render_loop',
+            lambda: self.client.get(reverse('render_loop'), {'accents': '3,1,1,1', 'sound_set': pk}),
+        )
+
+    def test_status_views(self):
+        """Test the budgets of the job, calibration and telemetry views."""
+        self.assertWithinBudget('job_detail', lambda: self.client.get(reverse('job_detail', args=[self.job.pk])))
+        self.assertWithinBudget(
+            'calibration_detail', lambda: self.client.get(reverse('calibration_detail', args=['phone'])),
+        )
+        self.assertWithinBudget(
+            'telemetry_stats', lambda: self.client.get(reverse('telemetry_stats', args=['player'])),
+        )
+
+
+class SqlitePragmaTest(SimpleTestCase):
+    """
+    Tests for the SQLite connection setup.
+    """
+
+    def test_new_connections_use_wal_and_mmap(self):
+        """Test that a new connection to a database file switches it to WAL with memory-mapped reads."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        wrapper = DatabaseWrapper({**connection.settings_dict, 'NAME': os.path.join(directory, 'db.sqlite3')}, 'pragmas')
+        self.addCleanup(wrapper.close)
+        with wrapper.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute('PRAGMA mmap_size')
+            self.assertGreater(cursor.fetchone()[0], 0)
+
+    def test_pragmas_are_checked(self):
+        """Test that pragma names and values that could smuggle SQL are refused."""
+        self.assertEqual(pragma_statements({'cache_size': -2000}), ['PRAGMA cache_size = -2000'])
+        with self.assertRaises(ValueError):
+            pragma_statements({'journal_mode': 'WAL; DROP TABLE x'})
+
+
+class BenchDatabasesTest(SimpleTestCase):
+    """
+    Tests for the database benchmark command.
+    """
+
+    def test_sqlite_profile(self):
+        """Test that the benchmark measures a profile in a separate process against its own test database."""
+        out = StringIO()
+        call_command(
+            'bench_databases', profile=['sqlite'], conn_max_age=[600], seconds=0.3, workers=2, sound_sets=20,
+            stdout=out,
+        )
+        self.assertRegex(out.getvalue(), r'sqlite CONN_MAX_AGE=600 +[\d.]+ req/s .*\(\d+ requests, 0 errors\)')
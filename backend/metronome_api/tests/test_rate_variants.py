@@ -0,0 +1,119 @@
+import os
+import shutil
+import tempfile
+
+import numpy as np
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from metronome_api.audio.rate_variants import find_rate_variant, rate_variant_path
+from metronome_api.audio.resample import resample
+from metronome_api.audio.wavfile import read_wav, write_wav
+from metronome_api.models import Job, MetronomeSoundSet
+
+
+def sine(frequency, sample_rate, seconds=0.5):
+    return np.sin(2 * np.pi * frequency * np.arange(int(sample_rate * seconds)) / sample_rate).astype(np.float32)
+
+
+def level_db(pcm):
+    return 20 * np.log10(np.sqrt(np.mean(pcm ** 2)) / np.sqrt(0.5))
+
+
+class ResampleTest(SimpleTestCase):
+    """
+    Tests for polyphase resampling.
+    """
+
+    def test_tone_is_preserved(self):
+        """Test that a tone resampled between common rates matches the tone generated at the target rate."""
+        for source_rate, target_rate in [(44100, 48000), (48000, 44100), (22050, 48000), (96000, 44100)]:
+            out = resample(sine(1000, source_rate), source_rate, target_rate)
+            expected = sine(1000, target_rate)
+            self.assertEqual(len(out), len(expected))
+            # Away from the edges, where the filter sees the silence around the input
+            error = np.abs(out - expected)[200:-200].max()
+            self.assertLess(error, 1e-4, (source_rate, target_rate))
+
+    def test_downsampling_rejects_aliases(self):
+        """Test that content above the new Nyquist frequency is filtered out instead of folding back."""
+        passed = resample(sine(19000, 48000), 48000, 44100)
+        rejected = resample(sine(23000, 48000), 48000, 44100)
+        self.assertGreater(level_db(passed[500:-500]), -1)
+        self.assertLess(level_db(rejected[500:-500]), -60)
+
+    def test_channels_and_odd_rates(self):
+        """Test that channels are resampled independently, also for rate pairs with many phases."""
+        left = sine(440, 44101)
+        out = resample(np.stack([left, -left], axis=1), 44101, 48000)
+        self.assertEqual(out.shape, (int(round(len(left) * 48000 / 44101)), 2))
+        np.testing.assert_allclose(out[:, 0], -out[:, 1], atol=1e-6)
+        np.testing.assert_allclose(out[:, 0], resample(left, 44101, 48000), atol=1e-6)
+        error = np.abs(out[:, 0] - sine(440, 48000)[:len(out)])[200:-200].max()
+        self.assertLess(error, 1e-3)
+
+    def test_same_rate(self):
+        """Test that resampling to the same rate returns the input."""
+        pcm = sine(440, 8000)
+        self.assertIs(resample(pcm, 8000, 8000), pcm)
+
+
+@override_settings(METRONOME_JOBS_EAGER=True, METRONOME_SAMPLE_RATES=(44100, 48000))
+class RateVariantsTest(TestCase):
+    """
+    Tests for the sample rate variants built at ingest and their negotiation.
+    """
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.source = sine(1000, 22050, 0.1)
+        for name in ('first.wav', 'accent.wav', 'normal.wav'):
+            with open(os.path.join(self.media_root, name), 'wb') as f:
+                f.write(write_wav(self.source, 22050))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sound_set = MetronomeSoundSet.objects.create(
+                name='Clicks', first_beat_sound='first.wav', accent_sound='accent.wav', normal_beat_sound='normal.wav',
+            )
+
+    def test_variants_are_built_on_save(self):
+        """Test that saving a sound set resamples its samples to every configured rate in a job."""
+        job = Job.objects.get(kind='build_rate_variants')
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertEqual(job.result, {'samples': 3, 'variants': 6})
+        for rate in (44100, 48000):
+            pcm, sample_rate = read_wav(rate_variant_path(os.path.join(self.media_root, 'first.wav'), rate))
+            self.assertEqual(sample_rate, rate)
+            self.assertEqual(len(pcm), int(round(len(self.source) * rate / 22050)))
+
+        # Up-to-date variants are not built again
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sound_set.save()
+        self.assertEqual(Job.objects.filter(kind='build_rate_variants').count(), 1)
+
+    def test_variant_is_served_for_sample_rate(self):
+        """Test that the sample URL serves the variant matching the sample_rate parameter."""
+        url = reverse('serve_sound_file', args=['first.wav'])
+        response = self.client.get(url, {'sample_rate': 48000})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Sample-Rate'], '48000')
+        self.assertEqual(response['Content-Type'], 'audio/wav')
+        self.assertEqual(read_wav(b''.join(response.streaming_content))[1], 48000)
+
+        # Rates without variants fall back to the original file
+        for params in ({'sample_rate': 32000}, {'sample_rate': 'fast'}, {'sample_rate': '\u00b2'}, {}):
+            response = self.client.get(url, params)
+            self.assertNotIn('X-Sample-Rate', response)
+            self.assertEqual(read_wav(b''.join(response.streaming_content))[1], 22050)
+
+    def test_stale_variant_is_not_served(self):
+        """Test that a variant older than its replaced source file is ignored."""
+        source_path = os.path.join(self.media_root, 'first.wav')
+        self.assertIsNotNone(find_rate_variant(source_path, 48000))
+        variant_mtime = os.stat(rate_variant_path(source_path, 48000)).st_mtime_ns
+        os.utime(source_path, ns=(variant_mtime + 10 ** 9, variant_mtime + 10 ** 9))
+        self.assertIsNone(find_rate_variant(source_path, 48000))
@@ -0,0 +1,188 @@
+import os
+import shutil
+import struct
+import tempfile
+from unittest import mock
+
+import numpy as np
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from metronome_api import views
+from metronome_api.audio import rhythm
+from metronome_api.audio.render import render_loop
+from metronome_api.audio.wavfile import WavError, max_wav_frames, read_wav, wav_header, write_wav
+from metronome_api.models import MetronomeSoundSet
+
+
+def click(length, value):
+    """A rectangular test click that is easy to find in a render."""
+    return np.full(length, value, dtype=np.float32)
+
+
+class RhythmOnsetTest(SimpleTestCase):
+    """
+    Tests for the onset layout of rhythm specs.
+    """
+
+    def test_single_layer_with_subdivisions(self):
+        """Test positions and roles of a 4/4 measure with eighth notes."""
+        spec = rhythm.build_spec(120, [('3,1,2,0', 2)])
+        positions, roles, layers = rhythm.cycle_onsets(spec, 48000)
+
+        self.assertEqual(spec.cycle_samples(48000), 96000)
+        self.assertEqual(positions.tolist(), list(range(0, 96000, 12000)))
+        self.assertEqual(roles.tolist(), [3, 1, 1, 1, 2, 1, 0, 0])
+        self.assertEqual(set(layers.tolist()), {0})
+
+    def test_polyrhythm_grid_is_lcm_of_layers(self):
+        """Test that a 3 against 4 polyrhythm lands on exact shared sample positions."""
+        spec = rhythm.build_spec(90, [('3,1,1', 1), ('3,1,1,1', 1)])
+        self.assertEqual(spec.grid_size, 12)
+        positions, _, layers = rhythm.cycle_onsets(spec, 44100)
+
+        total = spec.cycle_samples(44100)
+        self.assertEqual(positions[layers == 0].tolist(), [0, total // 3, 2 * total // 3])
+        self.assertEqual(positions[layers == 1].tolist(), [0, total // 4, total // 2, 3 * total // 4])
+
+    def test_coprime_layers_do_not_overflow(self):
+        """Test that layers of prime step counts, whose common grid exceeds 1e14, get exact positions."""
+        primes = [61, 59, 53, 47, 43, 41, 37, 31]
+        spec = rhythm.build_spec(1000, [([1] * p, 16) for p in primes])
+        self.assertGreater(spec.grid_size * spec.cycle_samples(48000), 2 ** 63)
+        positions, _, layers = rhythm.cycle_onsets(spec, 48000)
+        total = spec.cycle_samples(48000)
+        self.assertEqual(len(positions), 16 * sum(primes))
+        self.assertGreaterEqual(positions.min(), 0)
+        self.assertLess(positions.max(), total)
+        for index, p in enumerate(primes):
+            self.assertEqual(positions[layers == index].tolist(), [k * total // (16 * p) for k in range(16 * p)])
+
+    def test_swing_delays_odd_steps(self):
+        """Test that swing delays every odd step of the first layer, and the onsets of other layers on it."""
+        spec = rhythm.build_spec(120, [('3,1', 2), ('3,1,1,1', 1)], swing=0.25)
+        positions, _, layers = rhythm.cycle_onsets(spec, 48000)
+        self.assertEqual(positions[layers == 0].tolist(), [0, 15000, 24000, 39000])
+        self.assertEqual(positions[layers == 1].tolist(), [0, 15000, 24000, 39000])
+        self.assertEqual(spec.cycle_samples(48000), 48000)
+        # Straight rhythms keep their cache keys
+        self.assertNotIn('swing', rhythm.build_spec(120, [('3,1', 2)]).to_dict())
+        self.assertEqual(rhythm.spec_from_dict(spec.to_dict()), spec)
+        with self.assertRaises(rhythm.RhythmSpecError):
+            rhythm.build_spec(120, [('3,1', 2)], swing=0.6)
+
+    def test_invalid_specs(self):
+        """Test that out-of-range values are rejected."""
+        for bpm, layers in [(0, [('3,1', 1)]), (120, [('3,5', 1)]), (120, [('3,1', 0)]), (120, [])]:
+            with self.assertRaises(rhythm.RhythmSpecError):
+                rhythm.build_spec(bpm, layers)
+
+
+class LoopRenderTest(SimpleTestCase):
+    """
+    Tests for the loop renderer and WAV encoding.
+    """
+
+    def test_tails_wrap_around_for_seamless_loops(self):
+        """Test that a click tail running past the cycle end continues at the start."""
+        spec = rhythm.build_spec(750, [('3,1', 1)])  # two 4-sample beats at 50 Hz
+        samples = {'first': click(6, 0.5), 'accent': click(6, 0.25), 'normal': click(6, 0.125)}
+        loop = render_loop(spec, samples, 50, truncate_tails=False)
+
+        self.assertEqual(len(loop), 8)
+        np.testing.assert_allclose(loop, [0.625, 0.625, 0.5, 0.5, 0.625, 0.625, 0.125, 0.125])
+
+    def test_wav_round_trip(self):
+        """Test that 16-bit output decodes back to the same PCM."""
+        pcm = np.linspace(-1, 1, 101, dtype=np.float32)
+        decoded, sample_rate = read_wav(write_wav(pcm, 22050))
+        self.assertEqual(sample_rate, 22050)
+        np.testing.assert_allclose(decoded[:, 0], pcm, atol=1 / 16384)
+
+    def test_wav_size_limit(self):
+        """Test that headers are written up to the 32-bit size limit and refused beyond it."""
+        frames = max_wav_frames(1)
+        riff_size, = struct.unpack_from('<I', wav_header(192000, 1, frames), 4)
+        self.assertLessEqual(riff_size, 0xFFFFFFFF)
+        with self.assertRaises(WavError):
+            wav_header(192000, 1, frames + 1)
+        with self.assertRaises(WavError):
+            wav_header(192000, 4, max_wav_frames(4) + 1)
+
+    def test_reads_24_bit_pcm(self):
+        """Test decoding of 24-bit WAV files, which the wave module cannot read."""
+        values = np.array([0, 0x400000, -0x800000], dtype=np.int32)
+        frames = b''.join(int(v).to_bytes(3, 'little', signed=True) for v in values)
+        data = wav_header(8000, 1, 3, bits=24) + frames
+        decoded, _ = read_wav(data)
+        np.testing.assert_allclose(decoded[:, 0], [0.0, 0.5, -1.0])
+
+
+class RenderLoopEndpointTest(TestCase):
+    """
+    Tests for the /api/render/loop/ endpoint.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        for name, value in [('first.wav', 0.5), ('accent.wav', 0.25), ('normal.wav', 0.125)]:
+            with open(os.path.join(self.media_root, name), 'wb') as f:
+                f.write(write_wav(click(100, value), 8000))
+        self.sound_set = MetronomeSoundSet.objects.create(
+            name='Clicks',
+            first_beat_sound='first.wav',
+            accent_sound='accent.wav',
+            normal_beat_sound='normal.wav',
+        )
+        self.url = reverse('render_loop')
+
+    def test_renders_loop_wav(self):
+        """Test that the endpoint returns a loop of exactly one cycle."""
+        response = self.client.get(self.url, {
+            'bpm': 120, 'accents': '3,1,2,1', 'sound_set': self.sound_set.id, 'sample_rate': 8000,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'audio/wav')
+        self.assertEqual(response['X-Loop-Samples'], '16000')
+
+        pcm, sample_rate = read_wav(response.content)
+        self.assertEqual(sample_rate, 8000)
+        self.assertEqual(pcm.shape, (16000, 1))
+        np.testing.assert_allclose(pcm[[0, 4000, 8000, 12000], 0], [0.5, 0.125, 0.25, 0.125], atol=1e-4)
+
+    def test_long_loops_are_not_cached(self):
+        """Test that loops larger than the cache limit are rendered on every request."""
+        params = {'bpm': 120, 'accents': '3,1', 'sample_rate': 8000}
+        with mock.patch.object(views, 'MAX_CACHED_LOOP_BYTES', 100):
+            first = self.client.get(self.url, params)
+            with mock.patch('metronome_api.audio.render.render_loop', wraps=render_loop) as render:
+                self.assertEqual(self.client.get(self.url, params).content, first.content)
+            render.assert_called_once()
+
+    def test_etag_revalidation(self):
+        """Test that a repeated request with the ETag is answered with 304."""
+        params = {'bpm': 100, 'accents': '3,1,1', 'sample_rate': 8000}
+        response = self.client.get(self.url, params)
+        again = self.client.get(self.url, params, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+
+    def test_errors(self):
+        """Test bad specs, unknown sound sets and undecodable samples."""
+        self.assertEqual(self.client.get(self.url, {'accents': '3,9'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'accents': '3', 'sound_set': 999999}).status_code, 404)
+        # Digits int() rejects, and digits of other scripts, are not ids
+        for sound_set in ['\u00b2', '\u0663', '-1']:
+            self.assertEqual(self.client.get(self.url, {'accents': '3', 'sound_set': sound_set}).status_code, 400)
+
+        mp3_set = MetronomeSoundSet.objects.create(
+            name='Compressed', first_beat_sound='a.mp3', accent_sound='b.mp3', normal_beat_sound='c.mp3',
+        )
+        response = self.client.get(self.url, {'accents': '3,1', 'sound_set': mp3_set.id})
+        self.assertEqual(response.status_code, 422)
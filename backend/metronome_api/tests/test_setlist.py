@@ -0,0 +1,132 @@
+import json
+import shutil
+import tempfile
+
+import numpy as np
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from metronome_api.audio.rhythm import RhythmSpecError
+from metronome_api.audio.setlist import plan_segments, render_segment, render_setlist, setlist_from_dict
+from metronome_api.audio.wavfile import read_wav
+from metronome_api.models import Job, MetronomeSoundSet
+
+SETLIST = {'songs': [
+    {'name': 'Ballad', 'bpm': 70, 'accents': [3, 1, 1], 'measures': 5, 'count_in': 1},
+    # Steps of 12.5 ms, shorter than the shortest tail variant: tails cross measures
+    {'name': 'Blast', 'bpm': 600, 'layers': [{'accents': [3, 1], 'subdivisions': 8}], 'measures': 40},
+    {'name': 'Shuffle', 'bpm': 133, 'layers': [{'accents': [3, 1, 2, 1], 'subdivisions': 2}, {'accents': [2, 1, 1]}],
+     'swing': 0.3, 'measures': 7, 'count_in': 2},
+]}
+
+
+class SetlistRenderTest(SimpleTestCase):
+    """
+    Tests for rendering setlists in segments.
+    """
+
+    def setUp(self):
+        self.sample_rate = 8000
+        decay = np.exp(-np.arange(1600) / 300.0).astype(np.float32)
+        self.samples = {'first': 0.5 * decay, 'accent': 0.3 * decay, 'normal': 0.2 * decay}
+        self.songs = setlist_from_dict(SETLIST)
+
+    def render(self, segment_seconds, workers):
+        segments, _, frames = plan_segments(self.songs, self.sample_rate, segment_seconds)
+        chunks = []
+        render_setlist(segments, self.samples, self.sample_rate, chunks.append, workers=workers)
+        pcm = np.frombuffer(b''.join(chunks), dtype='<i2')
+        self.assertEqual(len(pcm), frames)
+        return segments, pcm
+
+    def test_timeline_positions(self):
+        """Test that songs and their count-ins start at exact sample positions, one after another."""
+        segments, markers, frames = plan_segments(self.songs, self.sample_rate, segment_seconds=2)
+        ballad = 3 * 60 * self.sample_rate // 70
+        blast = 2 * 60 * self.sample_rate // 600
+        shuffle = round(4 * 60 * self.sample_rate / 133)
+        self.assertEqual(markers, [
+            {'name': 'Ballad', 'start': 0, 'downbeat': ballad},
+            {'name': 'Blast', 'start': 6 * ballad, 'downbeat': 6 * ballad},
+            {'name': 'Shuffle', 'start': 6 * ballad + 40 * blast, 'downbeat': 6 * ballad + 40 * blast + 2 * shuffle},
+        ])
+        self.assertEqual(frames, 6 * ballad + 40 * blast + 9 * shuffle)
+        # Segments tile the timeline and never exceed their length
+        position = 0
+        for segment in segments:
+            self.assertEqual(segment.start, position)
+            self.assertLessEqual(segment.measures * segment.spec.cycle_seconds(), max(2, segment.spec.cycle_seconds()))
+            position += segment.frames(self.sample_rate)
+        self.assertEqual(position, frames)
+
+    def test_segments_stitch_to_a_single_pass(self):
+        """Test that parallel segments overlap-add to the same track as rendering every part in one piece."""
+        _, whole = self.render(segment_seconds=3600, workers=1)
+        segments, split = self.render(segment_seconds=0.1, workers=2)
+        self.assertGreater(len(segments), 20)
+        np.testing.assert_allclose(split, whole, atol=1)
+
+        # The reference: every part mixed at its position on one long timeline
+        parts, _, frames = plan_segments(self.songs, self.sample_rate, 3600)
+        expected = np.zeros(frames + 1600)
+        for part in parts:
+            pcm = render_segment(part, self.samples, self.sample_rate)
+            expected[part.start:part.start + len(pcm)] += pcm
+        expected = np.round(np.clip(expected[:frames], -1, 1) * 32767)
+        np.testing.assert_allclose(split, expected, atol=1)
+        # Tails of the fast song carry over segment boundaries
+        blast = next(segment for segment in segments if segment.spec.bpm == 600)
+        tail = render_segment(blast, self.samples, self.sample_rate)[blast.frames(self.sample_rate):]
+        self.assertGreater(np.abs(tail).max(), 0.01)
+
+    def test_invalid_setlists(self):
+        """Test that malformed songs are rejected with their position."""
+        with self.assertRaisesMessage(RhythmSpecError, 'song 2: measures must be positive'):
+            setlist_from_dict({'songs': [{'accents': [3, 1]}, {'accents': [3, 1], 'measures': 0}]})
+        with self.assertRaisesMessage(RhythmSpecError, 'song 1: count_in must be between 0 and 8'):
+            setlist_from_dict({'songs': [{'accents': [3, 1], 'count_in': 9}]})
+        with self.assertRaises(RhythmSpecError):
+            setlist_from_dict({'songs': []})
+
+
+@override_settings(METRONOME_JOBS_EAGER=True, METRONOME_SETLIST_WORKERS=1)
+class RenderSetlistJobTest(TestCase):
+    """
+    Tests for the setlist job endpoint.
+    """
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        MetronomeSoundSet.objects.create(name='Synth', synth_params={})
+
+    def post(self, data):
+        return self.client.post(reverse('render_setlist'), json.dumps(data), content_type='application/json')
+
+    def test_render_setlist_job(self):
+        """Test that a setlist job renders one track and reports where every song starts."""
+        response = self.post({**SETLIST, 'sample_rate': 8000})
+        self.assertEqual(response.status_code, 202)
+        job = response.json()
+        self.assertEqual(job['status'], Job.SUCCEEDED)
+        songs = job['result']['songs']
+        self.assertEqual([song['name'] for song in songs], ['Ballad', 'Blast', 'Shuffle'])
+
+        pcm, sample_rate = read_wav(b''.join(self.client.get(job['result_url']).streaming_content))
+        self.assertEqual(sample_rate, 8000)
+        self.assertEqual(len(pcm), job['result']['frames'])
+        for song in songs:
+            self.assertGreater(np.abs(pcm[song['start']:song['start'] + 100, 0]).max(), 0.01)
+
+    def test_invalid_setlist(self):
+        """Test that invalid setlists and setlists that are too long are rejected."""
+        self.assertEqual(self.post({'songs': [{'bpm': 120}]}).status_code, 400)
+        self.assertEqual(self.post({'songs': [{'bpm': 60, 'accents': [3, 1, 1, 1], 'measures': 4000}]}).status_code, 400)
+        self.assertEqual(self.post({**SETLIST, 'sound_set': 999}).status_code, 404)
+        # Four hours fit the limit in seconds, but not in a WAV file at 192 kHz
+        four_hours = {'songs': [{'bpm': 60, 'accents': [3, 1, 1, 1], 'measures': 3600}]}
+        self.assertEqual(self.post({**four_hours, 'sample_rate': 192000}).status_code, 400)
+        self.assertEqual(self.post({**SETLIST, 'sound_set': '\u00b2'}).status_code, 400)
@@ -0,0 +1,96 @@
+import datetime
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from metronome_api import catalog
+from metronome_api.catalog import encode_cursor, encode_sync_cursor
+from metronome_api.models import MetronomeSoundSet, SoundSetTombstone
+
+
+class SoundSetChangesTest(TestCase):
+    """
+    Tests for syncing the sound set catalog through its changes.
+    """
+
+    def setUp(self):
+        self.sound_sets = [
+            MetronomeSoundSet.objects.create(name=name, synth_params={}) for name in ['Beep', 'Clave', 'Woodblock']
+        ]
+        # Settled long before the first sync
+        MetronomeSoundSet.objects.update(updated_at=timezone.now() - datetime.timedelta(hours=1))
+        self.url = reverse('sound_set_changes')
+
+    def sync(self, since=None, **params):
+        return self.client.get(self.url, {'since': since, **params} if since else params)
+
+    def test_initial_sync_and_no_changes(self):
+        """Test that a sync without a cursor returns every set and a cursor that then reports nothing."""
+        response = self.sync(fields='name')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([item['name'] for item in data['changed']], ['Beep', 'Clave', 'Woodblock'])
+        self.assertEqual(set(data['changed'][0]), {'id', 'name'})
+        self.assertEqual(data['deleted'], [])
+        self.assertEqual(response['X-Sync-Cursor'], data['cursor'])
+
+        response = self.sync(data['cursor'])
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(response.content, b'')
+        self.assertIn('X-Sync-Cursor', response)
+
+    def test_updates_and_deletions_after_the_cursor(self):
+        """Test that only sets changed after the cursor are returned, with tombstones for deleted ones."""
+        cursor = self.sync(fields='name,description').json()['cursor']
+        beep, clave, _ = self.sound_sets
+        beep.description = 'Sharper'
+        beep.save()
+        created = MetronomeSoundSet.objects.create(name='Cowbell', synth_params={})
+        clave_id = clave.pk
+        clave.delete()
+
+        data = self.sync(cursor, fields='name,description').json()
+        self.assertEqual(
+            [(item['id'], item['name']) for item in data['changed']], [(beep.pk, 'Beep'), (created.pk, 'Cowbell')],
+        )
+        self.assertEqual(data['changed'][0]['description'], 'Sharper')
+        self.assertEqual(data['deleted'], [clave_id])
+        # The new cursor trails the present, so recent changes are sent again
+        self.assertEqual(self.sync(data['cursor']).json()['deleted'], [clave_id])
+
+    def test_queryset_update_is_synced(self):
+        """Test that QuerySet.update() stamps updated_at, so bulk updates reach syncing clients."""
+        cursor = self.sync(fields='name,description').json()['cursor']
+        beep = self.sound_sets[0]
+        MetronomeSoundSet.objects.filter(pk=beep.pk).update(description='Bulk edited')
+
+        data = self.sync(cursor, fields='name,description').json()
+        self.assertEqual([(item['id'], item['description']) for item in data['changed']], [(beep.pk, 'Bulk edited')])
+
+    def test_tombstones_expire(self):
+        """Test that deleting a set drops tombstones past retention, and cursors that old are refused."""
+        old = timezone.now() - datetime.timedelta(days=catalog.TOMBSTONE_RETENTION_DAYS + 1)
+        SoundSetTombstone.objects.create(sound_set_id=999, deleted_at=old)
+        deleted_id = self.sound_sets[0].pk
+        self.sound_sets[0].delete()
+        self.assertEqual(list(SoundSetTombstone.objects.values_list('sound_set_id', flat=True)), [deleted_id])
+
+        response = self.sync(encode_sync_cursor(old))
+        self.assertEqual(response.status_code, 410)
+        self.assertIn('error', response.json())
+
+    def test_too_many_changes(self):
+        """Test that a cursor too far behind is refused rather than answered with a huge response."""
+        cursor = encode_sync_cursor(timezone.now() - datetime.timedelta(days=1))
+        with mock.patch.object(catalog, 'MAX_CHANGES', 2):
+            self.assertEqual(self.sync(cursor).status_code, 410)
+            # A full sync is not limited
+            self.assertEqual(len(self.sync().json()['changed']), 3)
+
+    def test_invalid_parameters(self):
+        """Test that malformed cursors, page cursors and unknown fields are rejected."""
+        self.assertEqual(self.sync('garbage').status_code, 400)
+        self.assertEqual(self.sync(encode_cursor('Beep', 1)).status_code, 400)
+        self.assertEqual(self.sync(fields='name,bogus').status_code, 400)
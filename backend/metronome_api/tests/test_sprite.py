@@ -0,0 +1,117 @@
+import os
+import shutil
+import tempfile
+
+import numpy as np
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from metronome_api.audio.sprite import PREVIEW_MS, preview
+from metronome_api.audio.wavfile import read_wav, write_wav
+from metronome_api.models import Job, MetronomeSoundSet
+
+
+@override_settings(METRONOME_JOBS_EAGER=True, METRONOME_SAMPLE_RATES=(44100, 48000))
+class PreviewSpriteTest(TestCase):
+    """
+    Tests for the preview sprite of all sound sets.
+    """
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        # A 50 ms click followed by a second of silence
+        click = np.zeros(48000 + 2400, dtype=np.float32)
+        click[:2400] = np.sin(np.arange(2400) / 5.0) * np.linspace(1, 0.1, 2400)
+        for name in ('first.wav', 'accent.wav', 'normal.wav'):
+            with open(os.path.join(self.media_root, name), 'wb') as f:
+                f.write(write_wav(click, 48000))
+        self.wood = MetronomeSoundSet.objects.create(
+            name='Wood', first_beat_sound='first.wav', accent_sound='accent.wav', normal_beat_sound='normal.wav',
+        )
+        self.synth = MetronomeSoundSet.objects.create(name='Synth', synth_params={})
+        self.broken = MetronomeSoundSet.objects.create(
+            name='Broken', first_beat_sound='gone.wav', accent_sound='gone.wav', normal_beat_sound='gone.wav',
+        )
+
+    def get_sprite(self, **params):
+        response = self.client.get(reverse('sound_sets_sprite'), params)
+        self.assertEqual(response.status_code, 200)
+        table = response.json()
+        pcm, sample_rate = read_wav(b''.join(self.client.get(table['url']).streaming_content))
+        return response, table, pcm[:, 0], sample_rate
+
+    def test_previews_match_the_table(self):
+        """Test that every preview sits in the sprite where the table says, trimmed and gapped."""
+        response, table, pcm, sample_rate = self.get_sprite()
+        self.assertEqual(sample_rate, 48000)
+        self.assertEqual(len(pcm), table['frames'])
+        self.assertEqual(table['missing'], [self.broken.pk])
+        self.assertEqual(set(table['sound_sets']), {str(self.wood.pk), str(self.synth.pk)})
+
+        wood = table['sound_sets'][str(self.wood.pk)]
+        self.assertEqual(wood['name'], 'Wood')
+        for role in ('first', 'accent', 'normal'):
+            entry = wood[role]
+            # Trailing silence is cut, leaving roughly the click
+            self.assertLess(entry['frames'], 2400 + 1)
+            self.assertGreater(entry['frames'], 2000)
+            self.assertAlmostEqual(entry['offset'], entry['start'] / 48000, places=5)
+            self.assertGreater(np.abs(pcm[entry['start']:entry['start'] + 100]).max(), 0.05)
+            # Followed by silence up to the next preview
+            self.assertEqual(np.abs(pcm[entry['start'] + entry['frames']:][:900]).max(), 0)
+        for entry in table['sound_sets'][str(self.synth.pk)].values():
+            if isinstance(entry, dict):
+                self.assertLessEqual(entry['frames'], 48000 * PREVIEW_MS / 1000)
+
+        file_response = self.client.get(table['url'])
+        self.assertIn('immutable', file_response['Cache-Control'])
+        self.assertEqual(self.client.get(table['url'].replace('48000', '44100')).status_code, 404)
+        self.assertEqual(self.client.get(reverse('sound_sets_sprite'), {'sample_rate': 22050}).status_code, 400)
+
+    def test_unchanged_sprite_is_revalidated(self):
+        """Test that the table answers 304 to its ETag until a sound set changes."""
+        response, table, _, _ = self.get_sprite()
+        etag = response['ETag']
+        self.assertEqual(etag, f'"{table["version"]}"')
+        url = reverse('sound_sets_sprite')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.synth.name = 'Synthesized'
+        self.synth.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['sound_sets'][str(self.synth.pk)]['name'], 'Synthesized')
+
+    def test_only_changed_sets_are_rendered(self):
+        """Test that a rebuild reuses the stored previews of unchanged sets and drops those of deleted ones."""
+        _, table, _, _ = self.get_sprite()
+        segments = os.path.join(self.media_root, 'sprites', '48000', 'segments')
+        stored = {name: os.stat(os.path.join(segments, name)).st_mtime_ns for name in os.listdir(segments)}
+        self.assertEqual(len(stored), 6)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.synth.synth_params = {'accent': {'pitch': 2000}}
+            self.synth.save()
+            self.wood.delete()
+        job = Job.objects.get(kind='build_sprite')
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertEqual(set(job.result['versions']), {'44100', '48000'})
+
+        _, rebuilt, _, _ = self.get_sprite()
+        self.assertEqual(rebuilt['version'], job.result['versions']['48000'])
+        self.assertEqual(set(rebuilt['sound_sets']), {str(self.synth.pk)})
+        remaining = {name: os.stat(os.path.join(segments, name)).st_mtime_ns for name in os.listdir(segments)}
+        self.assertEqual(len(remaining), 3)
+        self.assertFalse(set(remaining) & set(stored))
+        # The previous sprite stays downloadable
+        self.assertEqual(self.client.get(table['url']).status_code, 200)
+
+    def test_preview_of_silence(self):
+        """Test that a silent sample gives an empty preview."""
+        self.assertEqual(len(preview(np.zeros(100, dtype=np.float32), 48000)), 0)
@@ -0,0 +1,75 @@
+import gzip
+import os
+import shutil
+import tempfile
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+
+from metronome_api import staticfiles
+
+SCRIPT = b'console.log("LibreMetronome");\n' * 50
+
+
+class StaticFilesTest(SimpleTestCase):
+    """
+    Tests for hashed, precompressed static files and their serving.
+    """
+
+    def setUp(self):
+        source = tempfile.mkdtemp()
+        self.static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, source)
+        self.addCleanup(shutil.rmtree, self.static_root)
+        os.makedirs(os.path.join(source, 'js'))
+        with open(os.path.join(source, 'js', 'main.js'), 'wb') as f:
+            f.write(SCRIPT)
+        with open(os.path.join(source, 'logo.png'), 'wb') as f:
+            f.write(b'\x89PNG' + bytes(range(256)) * 4)
+
+        override = override_settings(
+            STATICFILES_DIRS=[source],
+            STATICFILES_FINDERS=['django.contrib.staticfiles.finders.FileSystemFinder'],
+            STATIC_ROOT=self.static_root,
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+        staticfiles.reset_table()
+        self.addCleanup(staticfiles.reset_table)
+
+        self.hashed = next(
+            path for path in staticfiles.get_table() if path.startswith('js/main.') and path != 'js/main.js'
+        )
+
+    def test_collectstatic_writes_gzip_siblings(self):
+        """Test that compressible files get a .gz sibling and binary files do not."""
+        with open(os.path.join(self.static_root, self.hashed + '.gz'), 'rb') as f:
+            self.assertEqual(gzip.decompress(f.read()), SCRIPT)
+        self.assertFalse(os.path.exists(os.path.join(self.static_root, 'logo.png.gz')))
+
+    def test_serves_variant_by_accept_encoding(self):
+        """Test that the compressed variant is chosen only when the client accepts it."""
+        response = self.client.get(f'/static/{self.hashed}', HTTP_ACCEPT_ENCODING='br;q=0, gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), SCRIPT)
+
+        response = self.client.get(f'/static/{self.hashed}', HTTP_ACCEPT_ENCODING='gzip;q=0')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(b''.join(response.streaming_content), SCRIPT)
+        self.assertEqual(response['Content-Type'], 'text/javascript')
+
+    def test_unhashed_names_are_not_immutable(self):
+        """Test that plain names get a short cache lifetime and conditional requests work."""
+        response = self.client.get('/static/js/main.js')
+        self.assertNotIn('immutable', response['Cache-Control'])
+        response = self.client.get('/static/js/main.js', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.get('/static/js/missing.js').status_code, 404)
+
+    def test_accepted_encodings(self):
+        """Test Accept-Encoding parsing with quality values."""
+        self.assertEqual(staticfiles.accepted_encodings('gzip, deflate, br;q=0'), {'gzip', 'deflate'})
+        self.assertEqual(staticfiles.accepted_encodings('*;q=0.5'), {'*'})
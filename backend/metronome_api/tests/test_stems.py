@@ -0,0 +1,110 @@
+import io
+import shutil
+import tempfile
+import zipfile
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from metronome_api.audio import render
+from metronome_api.audio.render import render_loop, render_stems, stem_names
+from metronome_api.audio.rhythm import build_spec
+from metronome_api.audio.wavfile import read_wav
+from metronome_api.models import Job, MetronomeSoundSet
+
+
+class RenderStemsTest(SimpleTestCase):
+    """
+    Tests for rendering a rhythm as stems.
+    """
+
+    def setUp(self):
+        # Distinct lengths and levels, so each stem can be told apart
+        self.samples = {
+            'first': np.full(30, 0.5, dtype=np.float32),
+            'accent': np.full(20, 0.25, dtype=np.float32),
+            'normal': np.full(10, 0.125, dtype=np.float32),
+        }
+        self.spec = build_spec(120, [('3,1,2,0', 1), ('2,1,1', 1)])
+
+    def test_stems_add_up_to_the_loop(self):
+        """Test that every role of the first layer and every further layer gets a channel, summing to the mix."""
+        self.assertEqual(stem_names(self.spec), ['first', 'accent', 'normal', 'layer2'])
+        for limit in (render.DIRECT_MIX_LIMIT, 0):
+            with mock.patch.object(render, 'DIRECT_MIX_LIMIT', limit):
+                stems = render_stems(self.spec, self.samples, 1200, truncate_tails=False)
+                loop = render_loop(self.spec, self.samples, 1200, truncate_tails=False)
+            self.assertEqual(stems.shape, (2400, 4))
+            np.testing.assert_allclose(stems.sum(axis=1), loop, atol=1e-6)
+
+            # The FFT mix leaves rounding noise where the direct mix is silent
+            audible = np.abs(stems) > 1e-4
+            # The first layer: first beat at 0, accent at beat 3, muted beat 4
+            self.assertEqual(np.flatnonzero(audible[:, 0]).tolist(), list(range(30)))
+            self.assertEqual(np.flatnonzero(audible[:, 1]).tolist(), list(range(1200, 1220)))
+            self.assertEqual(np.flatnonzero(audible[:, 2]).tolist(), list(range(600, 610)))
+            # The second layer: an accent and two normal beats a third of the measure apart
+            layer = stems[:, 3]
+            self.assertAlmostEqual(float(layer[0]), 0.25, places=5)
+            self.assertAlmostEqual(float(layer[800]), 0.125, places=5)
+            self.assertAlmostEqual(float(layer[1600]), 0.125, places=5)
+            self.assertEqual(np.count_nonzero(audible[:, 3]), 20 + 10 + 10)
+
+
+@override_settings(METRONOME_JOBS_EAGER=True)
+class RenderStemsJobTest(TestCase):
+    """
+    Tests for the stems job endpoint.
+    """
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        MetronomeSoundSet.objects.create(name='Synth', synth_params={})
+        self.params = {'accents': ['3,1,2,1', '2,1,1'], 'bpm': 240, 'measures': 8, 'sample_rate': 8000}
+
+    def download(self, job):
+        return b''.join(self.client.get(job['result_url']).streaming_content)
+
+    def test_multi_channel_wav(self):
+        """Test that the stems of every measure are rendered into one multi-channel WAV."""
+        response = self.client.post(reverse('render_stems'), self.params)
+        self.assertEqual(response.status_code, 202)
+        job = response.json()
+        self.assertEqual(job['status'], Job.SUCCEEDED)
+        self.assertEqual(job['result']['stems'], ['first', 'accent', 'normal', 'layer2'])
+
+        pcm, sample_rate = read_wav(self.download(job))
+        self.assertEqual(sample_rate, 8000)
+        self.assertEqual(pcm.shape, (8 * 8000, 4))
+        # Every stem sounds in every measure, at the same places
+        for channel in range(4):
+            self.assertTrue(np.abs(pcm[:8000, channel]).max() > 0)
+            np.testing.assert_array_equal(pcm[:8000, channel], pcm[7 * 8000:, channel])
+
+    def test_zip_of_stems(self):
+        """Test that the zip format holds one mono WAV per stem, matching the channels of the WAV format."""
+        job = self.client.post(reverse('render_stems'), {**self.params, 'format': 'zip'}).json()
+        self.assertEqual(job['status'], Job.SUCCEEDED)
+        combined, _ = read_wav(self.download(self.client.post(reverse('render_stems'), self.params).json()))
+
+        with zipfile.ZipFile(io.BytesIO(self.download(job))) as archive:
+            names = archive.namelist()
+            self.assertEqual(names, ['01-first.wav', '02-accent.wav', '03-normal.wav', '04-layer2.wav'])
+            for channel, name in enumerate(names):
+                pcm, _ = read_wav(archive.read(name))
+                np.testing.assert_array_equal(pcm[:, 0], combined[:, channel])
+
+        self.assertEqual(self.client.post(reverse('render_stems'), {**self.params, 'format': 'mp3'}).status_code, 400)
+
+    def test_multi_channel_wav_size_limit(self):
+        """Test that an hour of four stems at 192 kHz is refused as one WAV, pointing to the zip format."""
+        params = {**self.params, 'bpm': 60, 'accents': ['3,1,1,1', '2,1'], 'measures': 900, 'sample_rate': 192000}
+        response = self.client.post(reverse('render_stems'), params)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('format=zip', response.json()['error'])
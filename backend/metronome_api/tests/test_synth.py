@@ -0,0 +1,113 @@
+import numpy as np
+from django.core.exceptions import ValidationError
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from metronome_api.audio import synth
+from metronome_api.audio.wavfile import read_wav
+from metronome_api.models import MetronomeSoundSet
+
+
+class ClickSynthesisTest(SimpleTestCase):
+    """
+    Tests for the procedural click voices.
+    """
+
+    def test_voices_render_bounded_clicks(self):
+        """Test that every voice renders a non-silent click within [-1, 1]."""
+        for voice in synth.VOICES:
+            pcm = synth.render_voice(voice, 1000.0, 0.03, 0.8, 0.1, 48000)
+            self.assertEqual(len(pcm), 4800)
+            self.assertGreater(float(np.abs(pcm).max()), 0.05, voice)
+            self.assertLessEqual(float(np.abs(pcm).max()), 0.8 + 1e-6, voice)
+
+    def test_renders_are_memoized_and_read_only(self):
+        """Test that a parameter set is rendered once and shared safely."""
+        first = synth.render_voice('woodblock', 1234.0, 0.04, 0.9, 0.1, 44100)
+        second = synth.render_voice('woodblock', 1234.0, 0.04, 0.9, 0.1, 44100)
+        self.assertIs(first, second)
+        self.assertFalse(first.flags.writeable)
+
+    def test_low_beep_stays_small(self):
+        """Test that a low-pitched beep at a high rate sums a bounded number of harmonics and is not memoized."""
+        cache_size = synth.render_voice.cache_info().currsize
+        pcm = synth.synthesize_voice('beep', 20.0, 0.05, 1.0, 2.0, 192000)
+        self.assertEqual(synth.render_voice.cache_info().currsize, cache_size)
+        spectrum = np.abs(np.fft.rfft(pcm))
+        frequencies = np.fft.rfftfreq(len(pcm), 1 / 192000)
+        # Nothing above the last harmonic kept (the attack and release spread a little)
+        top = 20.0 * (2 * synth.MAX_BEEP_HARMONICS - 1)
+        self.assertLess(spectrum[frequencies > 2 * top].max(), spectrum.max() * 1e-3)
+
+    def test_woodblock_above_nyquist(self):
+        """Test that a woodblock pitched above half the sample rate still renders finite audio."""
+        with np.errstate(all='raise'):
+            pcm = synth.synthesize_voice('woodblock', 5000.0, 0.03, 0.8, 0.1, 8000)
+        self.assertTrue(np.isfinite(pcm).all())
+        self.assertGreater(np.abs(pcm).max(), 0.1)
+
+    def test_sine_pitch(self):
+        """Test that the sine voice oscillates at the requested pitch."""
+        pcm = synth.render_voice('sine', 500.0, 1.0, 1.0, 0.2, 8000)
+        spectrum = np.abs(np.fft.rfft(pcm))
+        self.assertAlmostEqual(np.argmax(spectrum) * 8000 / len(pcm), 500.0, delta=5)
+
+    def test_parameter_validation(self):
+        """Test defaults and rejection of unknown or out-of-range parameters."""
+        params = synth.normalize_params({'first': {'voice': 'beep', 'pitch': 880}})
+        self.assertEqual(params['first'][:2], ('beep', 880.0))
+        self.assertEqual(params['normal'][0], 'woodblock')
+        # Nearby values are quantized to one render
+        self.assertEqual(synth.normalize_params({'first': {'pitch': 880.3, 'decay': 0.0404}})['first'][1:3], (880.0, 0.04))
+        for bad in [{'first': {'voice': 'gong'}}, {'first': {'pitch': 5}}, {'second': {}}, {'first': {'tone': 1}}]:
+            with self.assertRaises(synth.SynthParamsError):
+                synth.normalize_params(bad)
+
+
+class SynthesizedSoundSetTest(TestCase):
+    """
+    Tests for sound sets defined by synthesis parameters.
+    """
+
+    def test_synthesized_set_needs_no_files(self):
+        """Test that a synthesized set validates without files and links to generated sounds."""
+        sound_set = MetronomeSoundSet(name='Beeps', synth_params={'first': {'voice': 'beep', 'pitch': 1760}})
+        sound_set.full_clean()
+        sound_set.save()
+
+        data = self.client.get(reverse('sound_set_detail', args=[sound_set.id])).json()
+        self.assertEqual(data['first_beat_sound_url'], f'/api/sound-sets/{sound_set.id}/synth/first/')
+
+        response = self.client.get(data['first_beat_sound_url'], {'sample_rate': 22050})
+        self.assertEqual(response.status_code, 200)
+        pcm, sample_rate = read_wav(response.content)
+        self.assertEqual(sample_rate, 22050)
+        self.assertGreater(len(pcm), 0)
+
+    def test_invalid_synth_params_fail_validation(self):
+        """Test that bad parameters are reported on the synth_params field."""
+        sound_set = MetronomeSoundSet(name='Broken', synth_params={'first': {'voice': 'gong'}})
+        with self.assertRaises(ValidationError) as ctx:
+            sound_set.full_clean()
+        self.assertIn('synth_params', ctx.exception.message_dict)
+
+    def test_default_set_is_synthesized(self):
+        """Test that the fallback default set no longer points at missing template files."""
+        sound_set = MetronomeSoundSet.get_active_sound_set()
+        self.assertTrue(sound_set.is_synthesized)
+        self.assertFalse(sound_set.first_beat_sound)
+
+    def test_loop_render_with_synthesized_set(self):
+        """Test that the loop renderer works without any sound files."""
+        sound_set = MetronomeSoundSet.objects.create(name='Synth', synth_params={})
+        response = self.client.get(reverse('render_loop'), {
+            'accents': '3,1,1,1', 'bpm': 200, 'sound_set': sound_set.id, 'sample_rate': 8000,
+        })
+        self.assertEqual(response.status_code, 200)
+
+    def test_preview(self):
+        """Test the parameter preview endpoint."""
+        response = self.client.get(reverse('synth_preview'), {'voice': 'noise', 'pitch': 3000, 'decay': 0.01})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'audio/wav')
+        self.assertEqual(self.client.get(reverse('synth_preview'), {'voice': 'gong'}).status_code, 400)
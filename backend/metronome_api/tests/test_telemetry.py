@@ -0,0 +1,136 @@
+import datetime
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from metronome_api.models import TrainingDayStats, TrainingUserStats
+from metronome_api.telemetry import EventLog, rebuild_stats
+
+
+def ms(moment):
+    return int(moment.timestamp() * 1000)
+
+
+class TelemetryIngestTest(TestCase):
+    """
+    Tests for training telemetry ingestion and aggregates.
+    """
+
+    def setUp(self):
+        self.log_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.log_dir)
+        override = override_settings(METRONOME_TELEMETRY_DIR=self.log_dir, METRONOME_TELEMETRY_FSYNC=False)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.now = datetime.datetime.now(datetime.timezone.utc)
+        self.yesterday = self.now - datetime.timedelta(days=1)
+
+    def send(self, events, user='player-1', compress=True):
+        body = json.dumps({'user': user, 'session': 's1', 'events': events}).encode()
+        extra = {}
+        if compress:
+            body = gzip.compress(body)
+            extra['HTTP_CONTENT_ENCODING'] = 'gzip'
+        return self.client.post(reverse('telemetry_ingest'), body, content_type='application/json', **extra)
+
+    def test_batches_are_logged_and_aggregated(self):
+        """Test that batches land in the log and are added to the per-day and per-user counters."""
+        response = self.send([
+            {'type': 'measure', 'ts': ms(self.yesterday), 'measureIndex': 1, 'silent': False},
+            {'type': 'measure', 'ts': ms(self.yesterday), 'measureIndex': 2, 'silent': True},
+            {'type': 'tempo', 'ts': ms(self.yesterday), 'bpm': 120},
+        ])
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json(), {'accepted': 3})
+        self.send([
+            {'type': 'measure', 'ts': ms(self.now), 'silent': False},
+            {'type': 'silence', 'ts': ms(self.now), 'silent': True},
+            {'type': 'tempo', 'ts': ms(self.now), 'bpm': 132.5},
+            {'type': 'mute', 'ts': ms(self.now)},
+        ], compress=False)
+
+        lines = []
+        for name in os.listdir(self.log_dir):
+            with open(os.path.join(self.log_dir, name)) as f:
+                lines += [json.loads(line) for line in f]
+        self.assertEqual(len(lines), 7)
+        self.assertEqual(lines[0]['user'], 'player-1')
+
+        stats = self.client.get(reverse('telemetry_stats', args=['player-1'])).json()
+        totals = stats['totals']
+        self.assertEqual((totals['events'], totals['measures'], totals['silent_measures']), (7, 3, 1))
+        self.assertEqual((totals['tempo_steps'], totals['mutes'], totals['silence_phases']), (2, 1, 1))
+        self.assertEqual(totals['max_bpm'], 132.5)
+        self.assertEqual(totals['days_active'], 2)
+        self.assertEqual([day['measures'] for day in stats['days']], [2, 1])
+        self.assertEqual(self.client.get(reverse('telemetry_stats', args=['nobody'])).status_code, 404)
+
+    def test_stats_read_constant_queries(self):
+        """Test that reading progress does not depend on the number of events."""
+        self.send([{'type': 'measure', 'ts': ms(self.now)}] * 500)
+        with self.assertNumQueries(2):
+            self.client.get(reverse('telemetry_stats', args=['player-1']))
+
+    def test_rebuild_matches_incremental_aggregates(self):
+        """Test that replaying the log reproduces the aggregates."""
+        self.send([{'type': 'measure', 'ts': ms(self.yesterday), 'silent': True}, {'type': 'mute', 'ts': ms(self.now)}])
+        self.send([{'type': 'tempo', 'ts': ms(self.now), 'bpm': 90}], user='player-2')
+        before = list(TrainingDayStats.objects.order_by('user_id', 'day').values(
+            'user_id', 'day', 'events', 'measures', 'silent_measures', 'mutes', 'tempo_steps', 'max_bpm'))
+        self.assertEqual(rebuild_stats(self.log_dir), (2, 3))
+        after = list(TrainingDayStats.objects.order_by('user_id', 'day').values(
+            'user_id', 'day', 'events', 'measures', 'silent_measures', 'mutes', 'tempo_steps', 'max_bpm'))
+        self.assertEqual(before, after)
+        self.assertEqual(TrainingUserStats.objects.get(user_id='player-1').days_active, 2)
+
+    def test_invalid_batches(self):
+        """Test that malformed and oversized batches are refused."""
+        url = reverse('telemetry_ingest')
+        self.assertEqual(self.send([{'type': 'measure', 'ts': 1}], user='bad user').status_code, 400)
+        self.assertEqual(self.send([{'type': 'measure'}]).status_code, 400)
+        self.assertEqual(self.send([]).status_code, 400)
+        self.assertEqual(self.client.post(url, b'{', content_type='application/json').status_code, 400)
+        bomb = gzip.compress(b' ' * (2 * 1024 * 1024))
+        response = self.client.post(url, bomb, content_type='application/json', HTTP_CONTENT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(TrainingUserStats.objects.exists())
+
+
+class EventLogTest(SimpleTestCase):
+    """
+    Tests for group commit of the event log.
+    """
+
+    def test_concurrent_appends_share_writes(self):
+        """Test that appends waiting for a write are committed together and none is lost."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        writes = []
+
+        class SlowLog(EventLog):
+            def _write(self, group):
+                writes.append(len(group))
+                time.sleep(0.01)
+                super()._write(group)
+
+        log = SlowLog(directory)
+        day = datetime.date(2024, 1, 1)
+        threads = [
+            threading.Thread(target=log.append, args=(day, f'{{"n": {i}}}\n'.encode())) for i in range(40)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        with open(log.path(day)) as f:
+            self.assertEqual(sorted(json.loads(line)['n'] for line in f), list(range(40)))
+        self.assertEqual(sum(writes), 40)
+        self.assertLess(len(writes), 40)
@@ -0,0 +1,125 @@
+import os
+import shutil
+import tempfile
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from metronome_api.audio.sniff import AudioFormatError, sniff_audio
+from metronome_api.audio.wavfile import write_wav
+from metronome_api.models import MetronomeSoundSet, SampleUpload, validate_audio_file
+
+# MPEG-1 layer III, 128 kbit/s, 44.1 kHz: 417 byte frames
+MP3_FRAME = b'\xff\xfb\x90\x00' + bytes(413)
+OGG_VORBIS = b'OggS\x00\x02' + bytes(20) + b'\x01\x1e' + b'\x01vorbis' + bytes(22)
+
+
+class AudioSniffTest(SimpleTestCase):
+    """
+    Tests for incremental audio header detection.
+    """
+
+    def test_formats(self):
+        """Test that WAV, MP3 and Ogg headers are recognized."""
+        self.assertEqual(sniff_audio(write_wav(np.zeros(10, dtype=np.float32), 8000)), 'wav')
+        self.assertEqual(sniff_audio(MP3_FRAME * 2), 'mp3')
+        self.assertEqual(sniff_audio(b'ID3\x04\x00\x00\x00\x00\x00\x0a' + bytes(10) + MP3_FRAME * 2), 'mp3')
+        self.assertEqual(sniff_audio(OGG_VORBIS), 'ogg')
+
+    def test_incremental(self):
+        """Test that a prefix is undecided until it proves the format."""
+        wav = write_wav(np.zeros(10, dtype=np.float32), 8000)
+        self.assertIsNone(sniff_audio(wav[:3]))
+        self.assertIsNone(sniff_audio(wav[:30]))
+        self.assertIsNone(sniff_audio(MP3_FRAME))
+        with self.assertRaises(AudioFormatError):
+            sniff_audio(wav[:30], complete=True)
+
+    def test_rejects_garbage(self):
+        """Test that non-audio content and broken headers are rejected early."""
+        for data in [b'<html><body>', b'RIFF\x00\x00\x00\x00AVI LIST', MP3_FRAME + b'\x00\x00\x00\x00']:
+            with self.assertRaises(AudioFormatError):
+                sniff_audio(data)
+
+    def test_model_validator_checks_content(self):
+        """Test that a .wav name with other content fails model validation."""
+        with self.assertRaises(ValidationError):
+            validate_audio_file(SimpleUploadedFile('fake.wav', b'not a wav file at all'))
+        with self.assertRaises(ValidationError):
+            validate_audio_file(SimpleUploadedFile('clip.wav', MP3_FRAME * 2))
+        validate_audio_file(SimpleUploadedFile('real.wav', write_wav(np.zeros(10, dtype=np.float32), 8000)))
+
+
+class ChunkedUploadTest(TestCase):
+    """
+    Tests for resumable chunked sample uploads.
+    """
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        staff = User.objects.create_user('staff', password='secret', is_staff=True)
+        self.client.force_login(staff)
+        self.wav = write_wav(np.linspace(-0.5, 0.5, 30000, dtype=np.float32), 8000)
+
+    def start(self, filename, size, **extra):
+        response = self.client.post(
+            reverse('upload_create'), {'filename': filename, 'size': size, **extra}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 201)
+        return response['Location']
+
+    def put(self, url, data, start, total):
+        return self.client.put(
+            url, data, content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes {start}-{start + len(data) - 1}/{total}',
+        )
+
+    def test_upload_in_chunks_and_attach(self):
+        """Test that chunks are assembled into the stored file and attached to the sound set."""
+        sound_set = MetronomeSoundSet.objects.create(
+            name='Files', first_beat_sound='a.wav', accent_sound='b.wav', normal_beat_sound='c.wav',
+        )
+        url = self.start('click.wav', len(self.wav), sound_set=sound_set.id, role='accent')
+        size = len(self.wav)
+        for start in range(0, size, 20000):
+            response = self.put(url, self.wav[start:start + 20000], start, size)
+            self.assertEqual(response.status_code, 200)
+
+        data = response.json()
+        self.assertEqual(data['status'], SampleUpload.COMPLETE)
+        self.assertEqual(data['format'], 'wav')
+        sound_set.refresh_from_db()
+        with open(os.path.join(self.media_root, sound_set.accent_sound.name), 'rb') as f:
+            self.assertEqual(f.read(), self.wav)
+        self.assertFalse(os.listdir(os.path.join(self.media_root, 'uploads')))
+
+    def test_bad_content_is_rejected_on_first_chunk(self):
+        """Test that a non-audio file is refused before the rest is sent."""
+        url = self.start('evil.wav', 1000000)
+        response = self.put(url, b'MZ\x90\x00' + bytes(4092), 0, 1000000)
+        self.assertEqual(response.status_code, 415)
+        self.assertEqual(response.json()['status'], SampleUpload.REJECTED)
+        self.assertEqual(self.put(url, bytes(4096), 4096, 1000000).status_code, 409)
+
+    def test_resume_from_received_offset(self):
+        """Test that a chunk at the wrong offset is refused and the offset can be queried."""
+        url = self.start('click.wav', len(self.wav))
+        self.put(url, self.wav[:1000], 0, len(self.wav))
+        self.assertEqual(self.put(url, self.wav[2000:3000], 2000, len(self.wav)).status_code, 409)
+        self.assertEqual(self.client.get(url).json()['received'], 1000)
+
+    def test_staff_only(self):
+        """Test that anonymous clients cannot upload."""
+        self.client.logout()
+        response = self.client.post(
+            reverse('upload_create'), {'filename': 'a.wav', 'size': 10}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 403)
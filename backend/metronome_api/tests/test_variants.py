@@ -0,0 +1,112 @@
+import os
+import shutil
+import tempfile
+
+import numpy as np
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from metronome_api.audio import rhythm
+from metronome_api.audio.render import render_loop
+from metronome_api.audio.variants import (
+    select_bucket, sound_set_variants_dir, truncate_with_fade, variant_dir, variant_version,
+)
+from metronome_api.audio.wavfile import read_wav, write_wav
+from metronome_api.models import Job, MetronomeSoundSet
+
+
+class VariantSelectionTest(SimpleTestCase):
+    """
+    Tests for truncation and bucket selection.
+    """
+
+    def test_select_bucket(self):
+        """Test that the longest bucket fitting the interval is chosen."""
+        self.assertEqual(select_bucket(60, sample_ms=300), 50)
+        self.assertEqual(select_bucket(250, sample_ms=300), 200)
+        self.assertEqual(select_bucket(10, sample_ms=300), 25)
+        self.assertIsNone(select_bucket(500, sample_ms=300))
+
+    def test_truncate_fades_to_silence(self):
+        """Test that a variant has the bucket length and ends faded out."""
+        variant = truncate_with_fade(np.ones(1000, dtype=np.float32), 100, 10)
+        self.assertEqual(len(variant), 100)
+        self.assertEqual(variant[0], 1.0)
+        self.assertAlmostEqual(float(variant[-1]), 0.0)
+
+    def test_fast_loop_has_no_overlapping_tails(self):
+        """Test that a 16th-note loop at 300 BPM never plays two clicks at once."""
+        spec = rhythm.build_spec(300, [('3,1,1,1', 4)])  # 50 ms between clicks
+        sample_rate = 1000
+        samples = {role: np.full(300, 0.25, dtype=np.float32) for role in ('first', 'accent', 'normal')}
+        loop = render_loop(spec, samples, sample_rate)
+        # Overlapping tails would sum above a single click's level
+        self.assertAlmostEqual(float(loop.max()), 0.25)
+        self.assertEqual(float(loop[49]), 0.0)
+
+
+class SoundSetVariantsEndpointTest(TestCase):
+    """
+    Tests for the variant listing and file endpoints.
+    """
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        # 300 ms first/accent samples and a 30 ms normal sample at 8 kHz
+        for name, frames in [('first.wav', 2400), ('accent.wav', 2400), ('normal.wav', 240)]:
+            with open(os.path.join(self.media_root, name), 'wb') as f:
+                f.write(write_wav(np.full(frames, 0.5, dtype=np.float32), 8000))
+        self.sound_set = MetronomeSoundSet.objects.create(
+            name='Long tails', first_beat_sound='first.wav', accent_sound='accent.wav', normal_beat_sound='normal.wav',
+        )
+
+    def test_lists_variants_and_selects_for_interval(self):
+        """Test the variant manifest and the per-role choice for an interval."""
+        url = reverse('sound_set_variants', args=[self.sound_set.id])
+        response = self.client.get(url, {'sample_rate': 8000, 'interval_ms': 60})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+
+        buckets = [v['max_interval_ms'] for v in data['roles']['first']['variants']]
+        self.assertEqual(buckets, [200, 100, 50, 25])
+        self.assertEqual(data['roles']['normal']['variants'], [{
+            'max_interval_ms': 25, 'frames': 200,
+            'url': data['roles']['normal']['variants'][0]['url'],
+        }])
+        self.assertIn('/variants/first/50/', data['selected']['first'])
+        self.assertEqual(data['selected']['normal'], '/metronome_sounds/normal.wav')
+
+    def test_serves_variant_file(self):
+        """Test that a variant file decodes to the bucket length."""
+        url = reverse('sound_set_variant_file', args=[self.sound_set.id, 'accent', 100])
+        response = self.client.get(url, {'sample_rate': 8000})
+        self.assertEqual(response.status_code, 200)
+        pcm, _ = read_wav(b''.join(response.streaming_content))
+        self.assertEqual(len(pcm), 800)
+
+        response = self.client.get(reverse('sound_set_variant_file', args=[self.sound_set.id, 'accent', 33]))
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(METRONOME_JOBS_EAGER=True, METRONOME_SAMPLE_RATES=(8000,))
+    def test_variants_follow_the_version(self):
+        """Test that saving builds the variants of the new version and removes older ones, even within a second."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sound_set.save()
+        first_dir = variant_dir(self.sound_set)
+        self.assertTrue(os.path.exists(os.path.join(first_dir, 'first-200ms-8000.wav')))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sound_set.save()
+        self.assertNotEqual(variant_dir(self.sound_set), first_dir)
+        self.assertEqual(os.listdir(sound_set_variants_dir(self.sound_set.pk)), [str(variant_version(self.sound_set))])
+        self.assertEqual(Job.objects.filter(kind='build_sample_variants', status=Job.SUCCEEDED).count(), 2)
+
+        pk = self.sound_set.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sound_set.delete()
+        self.assertFalse(os.path.exists(sound_set_variants_dir(pk)))
@@ -0,0 +1,34 @@
+import gc
+from unittest import mock
+
+from django.test import TestCase
+
+from metronome_api import warmup
+from metronome_api.models import MetronomeSoundSet
+
+
+class WarmupTest(TestCase):
+    """
+    Tests for the pre-fork warmup hook.
+    """
+
+    def test_warmup_preloads_catalog_and_reports_every_step(self):
+        """Test that every step runs, the first catalog page is loaded and connections are closed."""
+        MetronomeSoundSet.objects.create(name='Synth', synth_params={})
+        self.addCleanup(gc.unfreeze)
+
+        with mock.patch.object(warmup, 'connections') as connections:
+            report = warmup.warmup()
+
+        connections.close_all.assert_called_once_with()
+        self.assertEqual([name for name, _, _ in report], ['urls', 'templates', 'sound sets', 'catalog', 'samples'])
+        for name, seconds, detail in report:
+            self.assertNotIn('failed', detail, name)
+        self.assertEqual(report[3][2], '1 sound sets on the first page')
+        self.assertIn('Warmup finished', warmup.format_report(report))
+
+    def test_disabled_by_default(self):
+        """Test that importing the entry points does not warm up unless asked to."""
+        with mock.patch.dict('os.environ', {'METRONOME_WARMUP': ''}), mock.patch.object(warmup, 'warmup') as run:
+            warmup.maybe_warmup()
+        run.assert_not_called()
@@ -0,0 +1,163 @@
+"""
+Resumable, chunked uploads of sound set samples.
+
+A client creates an upload with the file name and size, then PUTs the bytes
+in order, each request carrying ``Content-Range: bytes <start>-<end>/<size>``.
+After an interruption it asks for the upload's ``received`` offset and
+continues from there.
+
+Chunks are streamed from the request into a ``.part`` file below
+``MEDIA_ROOT/uploads`` in fixed-size pieces, so neither a chunk nor the file
+is ever held in memory. Until the format is recognized, every piece is also
+run through ``audio.sniff``; a file that is not WAV, MP3 or Ogg (or does not
+match its extension) is rejected and deleted after its first few KB. The
+finished file is moved into the default storage and, if the upload names a
+sound set and role, attached to it.
+"""
+import os
+import re
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.utils.text import get_valid_filename
+
+from .audio.sniff import MAX_SNIFF_BYTES, AudioFormatError, check_extension, sniff_audio
+from .models import ROLE_FIELDS, SampleUpload
+
+UPLOAD_DIR = 'uploads'
+READ_SIZE = 64 * 1024
+DEFAULT_MAX_UPLOAD_SIZE = 50 * 1024 * 1024
+
+CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+
+class UploadError(Exception):
+    """A client error in an upload request; ``status`` is the HTTP status to answer with."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def max_upload_size():
+    return getattr(settings, 'METRONOME_MAX_UPLOAD_SIZE', DEFAULT_MAX_UPLOAD_SIZE)
+
+
+def part_path(upload):
+    directory = os.path.join(settings.MEDIA_ROOT, UPLOAD_DIR)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f'{upload.id}.part')
+
+
+def create_upload(filename, size, sound_set=None, role=''):
+    filename = get_valid_filename(os.path.basename(filename or ''))
+    if not filename:
+        raise UploadError('filename is required')
+    if not isinstance(size, int) or size < 1:
+        raise UploadError('size must be a positive integer')
+    if size > max_upload_size():
+        raise UploadError(f'Files may be at most {max_upload_size()} bytes', status=413)
+    if os.path.splitext(filename)[1].lower() not in ('.wav', '.mp3', '.ogg'):
+        raise UploadError('Unsupported file type. Please use WAV, MP3, or OGG files.', status=415)
+    if sound_set is not None and role not in ROLE_FIELDS:
+        raise UploadError(f"role must be one of {', '.join(ROLE_FIELDS)}")
+    return SampleUpload.objects.create(filename=filename, total_size=size, sound_set=sound_set, role=role or '')
+
+
+def parse_content_range(header, upload):
+    match = CONTENT_RANGE_RE.match(header or '')
+    if not match:
+        raise UploadError('Content-Range must look like "bytes <start>-<end>/<size>"')
+    start, end, total = (int(group) for group in match.groups())
+    if total != upload.total_size or end < start or end >= total:
+        raise UploadError('Content-Range does not fit the upload', status=416)
+    return start, end - start + 1
+
+
+def _reject(upload, error, path):
+    if os.path.exists(path):
+        os.remove(path)
+    upload.status = SampleUpload.REJECTED
+    upload.error = str(error)
+    upload.save(update_fields=['status', 'error', 'updated_at'])
+    raise UploadError(f'Rejected: {error}', status=415)
+
+
+def _sniff(upload, head, complete, path):
+    try:
+        audio_format = sniff_audio(head, complete=complete)
+        if audio_format:
+            check_extension(upload.filename, audio_format)
+    except AudioFormatError as e:
+        _reject(upload, e, path)
+    return audio_format
+
+
+def append_chunk(upload, stream, start, length):
+    """
+    Append ``length`` bytes read from ``stream`` at offset ``start``.
+
+    A body that ends early (a dropped connection) keeps what arrived, so the
+    client can resume from the new ``received`` offset.
+    """
+    if upload.status != SampleUpload.UPLOADING:
+        raise UploadError(f'Upload is {upload.status}', status=409)
+    if start != upload.received:
+        raise UploadError(f'Expected a chunk starting at byte {upload.received}', status=409)
+
+    path = part_path(upload)
+    mode = 'r+b' if os.path.exists(path) else 'w+b'
+    with open(path, mode) as f:
+        # Drop bytes of an interrupted request that were never acknowledged
+        f.truncate(upload.received)
+        head = b''
+        if not upload.audio_format:
+            f.seek(0)
+            head = f.read(MAX_SNIFF_BYTES)
+        f.seek(upload.received)
+
+        remaining = length
+        while remaining:
+            data = stream.read(min(READ_SIZE, remaining))
+            if not data:
+                break
+            f.write(data)
+            remaining -= len(data)
+            if not upload.audio_format:
+                head += data[:MAX_SNIFF_BYTES - len(head)]
+                upload.audio_format = _sniff(upload, head, False, path) or ''
+
+    upload.received = start + length - remaining
+    if upload.received == upload.total_size:
+        if not upload.audio_format:
+            upload.audio_format = _sniff(upload, head, True, path)
+        _finish(upload, path)
+    upload.save()
+    return upload
+
+
+def _finish(upload, path):
+    with open(path, 'rb') as f:
+        upload.stored_name = default_storage.save(upload.filename, File(f))
+    os.remove(path)
+    upload.status = SampleUpload.COMPLETE
+    if upload.sound_set_id:
+        sound_set = upload.sound_set
+        setattr(sound_set, ROLE_FIELDS[upload.role], upload.stored_name)
+        sound_set.save()
+
+
+def upload_to_dict(upload):
+    return {
+        'id': str(upload.id),
+        'filename': upload.filename,
+        'size': upload.total_size,
+        'received': upload.received,
+        'status': upload.status,
+        'format': upload.audio_format or None,
+        'error': upload.error or None,
+        'url': default_storage.url(upload.stored_name) if upload.stored_name else None,
+        'sound_set': upload.sound_set_id,
+        'role': upload.role or None,
+    }
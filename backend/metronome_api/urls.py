@@ -6,8 +6,38 @@ api_urlpatterns = [
     path('active-sound-set/', views.active_sound_set, name='active_sound_set'),
     path('default-sound-set/', views.default_sound_set, name='default_sound_set'),
     path('sound-sets/', views.all_sound_sets, name='all_sound_sets'),
+    re_path(r'^sound-sets/batch/?$', views.sound_sets_batch, name='sound_sets_batch'),
+    path('sound-sets/export/', views.sound_sets_export, name='sound_sets_export'),
+    path('sound-sets/import/', views.sound_sets_import, name='sound_sets_import'),
+    path('sound-sets/sprite/', views.sound_sets_sprite, name='sound_sets_sprite'),
+    re_path(
+        r'^sound-sets/sprite/(?P<sample_rate>[0-9]+)/(?P<version>[0-9a-f]{16})\.wav$',
+        views.sound_sets_sprite_file, name='sound_sets_sprite_file',
+    ),
+    path('sound-sets/changes/', views.sound_set_changes, name='sound_set_changes'),
     path('sound-sets/<int:id>/', views.sound_set_detail, name='sound_set_detail'),
     path('sound-sets/<int:id>/set-active/', views.set_active_sound_set_view, name='set_active_sound_set'),
+    path('sound-sets/<int:id>/variants/', views.sound_set_variants, name='sound_set_variants'),
+    path('sound-sets/<int:id>/variants/<str:role>/<int:bucket>/', views.sound_set_variant_file, name='sound_set_variant_file'),
+    path('sound-sets/<int:id>/synth/<str:role>/', views.sound_set_synth_sample, name='sound_set_synth_sample'),
+    path('synth/preview/', views.synth_preview, name='synth_preview'),
+    path('render/loop/', views.render_loop_view, name='render_loop'),
+    path('render/track/', views.render_track_view, name='render_track'),
+    path('render/stems/', views.render_stems_view, name='render_stems'),
+    path('render/setlist/', views.render_setlist_view, name='render_setlist'),
+    path('render/grid/', views.beat_grid_view, name='beat_grid'),
+    path('render/midi/', views.render_midi_view, name='render_midi'),
+    path('uploads/', views.upload_create, name='upload_create'),
+    path('uploads/<uuid:id>/', views.upload_detail, name='upload_detail'),
+    path('calibration/', views.calibration_create, name='calibration_create'),
+    path('calibration/click-train/', views.calibration_click_train, name='calibration_click_train'),
+    path('calibration/<str:device>/', views.calibration_detail, name='calibration_detail'),
+    path('telemetry/', views.telemetry_ingest, name='telemetry_ingest'),
+    path('telemetry/stats/<str:user>/', views.telemetry_stats, name='telemetry_stats'),
+    path('jobs/<uuid:id>/', views.job_detail, name='job_detail'),
+    path('jobs/<uuid:id>/cancel/', views.job_cancel, name='job_cancel'),
+    path('jobs/<uuid:id>/events/', views.job_events, name='job_events'),
+    path('jobs/<uuid:id>/result/', views.job_result, name='job_result'),
     path('support-info/', views.get_support_info, name='support_info'),
 ]
 
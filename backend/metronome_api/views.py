@@ -1,7 +1,8 @@
 from django.views.generic import TemplateView
 from django.views.decorators.cache import never_cache
 from django.http import Http404
-from django.views.decorators.http import require_POST
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods, require_POST
 
 
 # Serve React App
@@ -55,6 +56,21 @@ def serve_sound_file(request, filename):
             print("File not found at either location")
             raise Http404(f"Sound file {filename} not found")
     
+    # Clients pass the rate of their AudioContext so decodeAudioData does not
+    # have to resample; without a variant at that rate the original is served
+    sample_rate = None
+    try:
+        requested_rate = parse_sample_rate(request.GET.get('sample_rate')) if request.GET.get('sample_rate') else None
+    except rhythm.RhythmSpecError:
+        requested_rate = None
+    if requested_rate:
+        from .audio.rate_variants import find_rate_variant
+        variant_path = find_rate_variant(filepath, requested_rate)
+        if variant_path:
+            filepath = variant_path
+            filename = os.path.basename(variant_path)
+            sample_rate = requested_rate
+
     # Determine the correct content type
     content_type, encoding = mimetypes.guess_type(filepath)
     
@@ -69,10 +85,13 @@ def serve_sound_file(request, filename):
     print(f"Serving file with content-type: {content_type}")
     
     # Return the file as a response with the correct content type
-    response = FileResponse(open(filepath, 'rb'))
+    with timer('sound_file.open'):
+        response = FileResponse(open(filepath, 'rb'))
     if content_type:
         response['Content-Type'] = content_type
     response['Content-Disposition'] = f'inline; filename="{filename}"'
+    if sample_rate:
+        response['X-Sample-Rate'] = str(sample_rate)
     
     # Add CORS headers to allow cross-origin requests
     response['Access-Control-Allow-Origin'] = '*'  # Allow from any origin
@@ -81,10 +100,51 @@ def serve_sound_file(request, filename):
     
     return response
 
+def serve_static(request, path):
+    """
+    Serve a collected static file, precompressed if the client accepts it.
+
+    Everything needed to answer comes from the in-memory table of
+    ``staticfiles``; the body is a FileResponse, which WSGI servers with
+    ``wsgi.file_wrapper`` send with sendfile().
+    """
+    from django.http import FileResponse, HttpResponseNotModified
+    from . import staticfiles
+
+    entry = staticfiles.lookup(path)
+    if entry is None:
+        raise Http404(f"Static file {path} not found")
+    if request.headers.get('If-None-Match') == entry.etag:
+        response = HttpResponseNotModified()
+    else:
+        encoding, filepath, size = staticfiles.choose_variant(entry, request.headers.get('Accept-Encoding', ''))
+        response = FileResponse(open(filepath, 'rb'), content_type=entry.content_type)
+        response['Content-Length'] = str(size)
+        if encoding:
+            response['Content-Encoding'] = encoding
+    response['ETag'] = entry.etag
+    response['Cache-Control'] = entry.cache_control
+    if entry.variants:
+        response['Vary'] = 'Accept-Encoding'
+    return response
+
 # API endpoints for sound sets
-from django.http import JsonResponse
+import hashlib
+import json
+import os
+import re
+import time
+from django.core.cache import cache
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
 from django.conf import settings
-from .models import MetronomeSoundSet
+from .models import ROLE_FIELDS, DeviceCalibration, Job, MetronomeSoundSet, SampleUpload
+from . import catalog, jobs, packs, telemetry, uploads
+from .catalog import get_catalog, sample_url
+from .profiling import timer
+# The audio modules load numpy; views import them on first use so that
+# starting a worker stays cheap (see ``manage.py importtime_report``)
+from .audio import rhythm
 
 def get_support_info(request):
     """Return Stripe payment information from settings"""
@@ -101,36 +161,18 @@ def get_support_info(request):
     
     return response
 
-def sound_set_to_dict(sound_set):
-    """Convert a MetronomeSoundSet instance to a dictionary for JSON serialization.
-    Always includes an ID but doesn't rely on is_active for the frontend.
-    """
-    if not sound_set:
-        return None
-    
-    return {
-        'id': sound_set.id,
-        'name': sound_set.name,
-        'description': sound_set.description,
-        # Always include is_active for backwards compatibility, but it's not used
-        'is_active': False,  # Default to false since frontend will use cookies now
-        'first_beat_sound_url': sound_set.first_beat_sound.url if sound_set.first_beat_sound else None,
-        'accent_sound_url': sound_set.accent_sound.url if sound_set.accent_sound else None,
-        'normal_beat_sound_url': sound_set.normal_beat_sound.url if sound_set.normal_beat_sound else None,
-        'created_at': sound_set.created_at.isoformat() if sound_set.created_at else None,
-        'updated_at': sound_set.updated_at.isoformat() if sound_set.updated_at else None,
-    }
-
 @require_POST
 def set_active_sound_set_view(request, id):
     try:
         # This endpoint no longer updates the is_active flag in the database
         # Instead, it just validates that the requested sound set exists
         # and returns it. Selection is handled by cookies in the frontend.
-        sound_set = MetronomeSoundSet.objects.get(id=id)
+        payload = get_catalog().payloads([id]).get(id)
+        if payload is None:
+            return JsonResponse({'error': f'Sound set with ID {id} not found'}, status=404)
         
         # Just return the requested sound set without modifying is_active
-        response = JsonResponse(sound_set_to_dict(sound_set))
+        response = JsonResponse(payload)
         
         # Add CORS headers to allow cross-origin requests if needed
         response['Access-Control-Allow-Origin'] = '*'
@@ -138,8 +180,6 @@ def set_active_sound_set_view(request, id):
         response['Access-Control-Allow-Headers'] = 'X-Requested-With, Content-Type'
         
         return response
-    except MetronomeSoundSet.DoesNotExist:
-        return JsonResponse({'error': f'Sound set with ID {id} not found'}, status=404)
     except Exception as e:
         print(f"Error handling sound set request: {e}")
         return JsonResponse({'error': str(e)}, status=500)
@@ -147,14 +187,14 @@ def set_active_sound_set_view(request, id):
 def active_sound_set(request):
     """
     Get a default sound set, not relying on is_active flag.
-    This endpoint now just returns the first sound set in the database.
+    This endpoint now just returns the first sound set in the catalog.
     """
     try:
         # Simply get the first sound set
-        sound_set = MetronomeSoundSet.objects.first()
+        payload = get_catalog().first_payload()
         
-        if sound_set:
-            response = JsonResponse(sound_set_to_dict(sound_set))
+        if payload:
+            response = JsonResponse(payload)
             # Add CORS headers
             response['Access-Control-Allow-Origin'] = '*'
             response['Access-Control-Allow-Methods'] = 'GET, OPTIONS'
@@ -167,13 +207,13 @@ def active_sound_set(request):
         return JsonResponse({'error': str(e)}, status=500)
 
 def default_sound_set(request):
-    """Get the default sound set (first one in the database)."""
+    """Get the default sound set (first one in the catalog)."""
     try:
         # Simply get the first sound set, no longer using is_active
-        sound_set = MetronomeSoundSet.objects.first()
+        payload = get_catalog().first_payload()
         
-        if sound_set:
-            response = JsonResponse(sound_set_to_dict(sound_set))
+        if payload:
+            response = JsonResponse(payload)
             # Add CORS headers
             response['Access-Control-Allow-Origin'] = '*'
             response['Access-Control-Allow-Methods'] = 'GET, OPTIONS'
@@ -186,21 +226,901 @@ def default_sound_set(request):
         return JsonResponse({'error': str(e)}, status=500)
 
 def all_sound_sets(request):
-    """Get all sound sets."""
+    """
+    Get one page of the sound set catalog.
+
+    Query parameters:
+    - ``cursor``: opaque cursor from a previous page's ``X-Next-Cursor`` header
+    - ``limit``: page size (default 100, max 500)
+    - ``q``: full-text search over name and description
+    - ``fields``: comma separated subset of fields to return
+
+    The body stays a plain JSON list; the next page is announced through the
+    ``X-Next-Cursor`` and ``Link`` headers.
+    """
     try:
-        sound_sets = MetronomeSoundSet.objects.all()
-        return JsonResponse([sound_set_to_dict(s) for s in sound_sets], safe=False)
+        fields = catalog.parse_fields(request.GET.get('fields'))
+        limit = catalog.parse_limit(request.GET.get('limit'))
+        payloads, next_cursor = get_catalog().page(
+            cursor=request.GET.get('cursor'),
+            limit=limit,
+            query=request.GET.get('q', '').strip(),
+            fields=fields,
+        )
+        response = JsonResponse(payloads, safe=False)
+        if next_cursor:
+            params = request.GET.copy()
+            params['cursor'] = next_cursor
+            response['X-Next-Cursor'] = next_cursor
+            response['Link'] = f'<{request.path}?{params.urlencode()}>; rel="next"'
+        return response
+    except catalog.CatalogQueryError as e:
+        return JsonResponse({'error': str(e)}, status=400)
     except Exception as e:
         print(f"Error getting all sound sets: {e}")
         return JsonResponse({'error': str(e)}, status=500)
 
+def sound_set_changes(request):
+    """
+    Changes of the sound set catalog since a sync cursor, for clients that
+    keep a copy of it.
+
+    Query parameters:
+    - ``since``: sync cursor from a previous response; without it every
+      sound set is returned
+    - ``fields``: comma separated subset of fields to return
+
+    Returns ``{"cursor": ..., "changed": [...], "deleted": [ids]}``, or 204
+    with the cursor in ``X-Sync-Cursor`` when nothing changed. A cursor
+    whose changes can no longer be listed gets 410: reload ``/sound-sets/``.
+    """
+    since = request.GET.get('since') or None
+    try:
+        fields = catalog.parse_fields(request.GET.get('fields'))
+        changed, deleted, cursor = get_catalog().changes(since=since, fields=fields)
+    except catalog.CatalogQueryError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except catalog.SyncCursorExpired as e:
+        return JsonResponse({'error': str(e)}, status=410)
+    except Exception as e:
+        print(f"Error getting sound set changes: {e}")
+        return JsonResponse({'error': str(e)}, status=500)
+
+    if since and not changed and not deleted:
+        response = HttpResponse(status=204)
+    else:
+        response = JsonResponse({'cursor': cursor, 'changed': changed, 'deleted': deleted})
+    response['X-Sync-Cursor'] = cursor
+    return response
+
 def sound_set_detail(request, id):
     """Get a specific sound set by ID."""
     try:
-        sound_set = MetronomeSoundSet.objects.get(id=id)
-        return JsonResponse(sound_set_to_dict(sound_set))
-    except MetronomeSoundSet.DoesNotExist:
-        return JsonResponse({'error': f'Sound set with ID {id} not found'}, status=404)
+        payload = get_catalog().payloads([id]).get(id)
+        if payload is None:
+            return JsonResponse({'error': f'Sound set with ID {id} not found'}, status=404)
+        return JsonResponse(payload)
     except Exception as e:
         print(f"Error getting sound set {id}: {e}")
         return JsonResponse({'error': str(e)}, status=500)
+
+def sound_sets_batch(request):
+    """
+    Get several sound sets in one request: ``?ids=1,2,3``.
+
+    Returns an object keyed by id; ids that do not exist map to null.
+    With the database catalog, payloads come from the serialized-payload
+    cache where possible and the rest are loaded with a single query.
+    ``fields`` works as in the catalog; at most ``MAX_BATCH_IDS`` ids.
+    """
+    try:
+        fields = catalog.parse_fields(request.GET.get('fields'))
+        raw_ids = ','.join(request.GET.getlist('ids')).split(',')
+        ids = [int(pk) for pk in raw_ids if pk.strip()]
+    except catalog.CatalogQueryError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except ValueError:
+        return JsonResponse({'error': 'ids must be a comma separated list of integers'}, status=400)
+    if len(set(ids)) > catalog.MAX_BATCH_IDS:
+        return JsonResponse({'error': f'At most {catalog.MAX_BATCH_IDS} ids per request'}, status=400)
+
+    try:
+        payloads = get_catalog().payloads(ids)
+        data = {}
+        for pk in ids:
+            payload = payloads.get(pk)
+            data[str(pk)] = {name: payload[name] for name in fields} if payload else None
+        return JsonResponse(data)
+    except Exception as e:
+        print(f"Error getting sound set batch: {e}")
+        return JsonResponse({'error': str(e)}, status=500)
+
+def sound_sets_export(request):
+    """
+    Download sound sets as a pack (see ``packs.py``), streamed as it is
+    written: ``?ids=1,2,3``, or every sound set without ``ids``.
+    """
+    denied = _staff_only(request, 'export sound sets')
+    if denied:
+        return denied
+    try:
+        raw_ids = ','.join(request.GET.getlist('ids')).split(',')
+        ids = [int(pk) for pk in raw_ids if pk.strip()]
+    except ValueError:
+        return JsonResponse({'error': 'ids must be a comma separated list of integers'}, status=400)
+    sound_sets = MetronomeSoundSet.objects.order_by('name', 'id')
+    if ids:
+        sound_sets = sound_sets.filter(pk__in=ids)
+    try:
+        chunks = packs.export_pack(sound_sets)
+    except packs.PackError as e:
+        return JsonResponse({'error': str(e)}, status=409)
+    response = StreamingHttpResponse(chunks, content_type='application/zip')
+    response['Content-Disposition'] = 'attachment; filename="sound-sets.zip"'
+    return response
+
+@require_POST
+def sound_sets_import(request):
+    """
+    Import a pack uploaded as the ``pack`` form field. ``existing=copy``
+    imports sound sets whose name is taken as additional sets instead of
+    skipping them.
+    """
+    denied = _staff_only(request, 'import sound sets')
+    if denied:
+        return denied
+    if 'pack' not in request.FILES:
+        return JsonResponse({'error': 'Upload the pack as the "pack" field'}, status=400)
+    try:
+        result = packs.import_pack(request.FILES['pack'], existing=request.POST.get('existing', 'skip'))
+    except packs.PackError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse(result, status=201)
+
+DEFAULT_SAMPLE_RATE = 48000
+LOOP_CACHE_TIMEOUT = 24 * 60 * 60
+# Longer loops are rendered again rather than held in the cache, which may be
+# a per-process memory cache
+MAX_CACHED_LOOP_BYTES = 2 * 1024 * 1024
+
+def parse_sample_rate(value):
+    if not value:
+        return DEFAULT_SAMPLE_RATE
+    try:
+        sample_rate = int(value)
+    except ValueError:
+        raise rhythm.RhythmSpecError('sample_rate must be an integer')
+    if not 8000 <= sample_rate <= 192000:
+        raise rhythm.RhythmSpecError('sample_rate must be between 8000 and 192000')
+    return sample_rate
+
+def parse_sound_set_id(value):
+    """The sound set id given as ``value``, or None when it is empty."""
+    if value is None or value == '':
+        return None
+    if not re.fullmatch(r'\d+', str(value), re.ASCII):
+        raise rhythm.RhythmSpecError('sound_set must be an id')
+    return int(value)
+
+def get_render_sound_set(sound_set_id):
+    """Return the sound set with id ``sound_set_id``, or the default one when it is None."""
+    if sound_set_id is not None:
+        return get_catalog().get(sound_set_id)
+    return get_catalog().first()
+
+def render_loop_view(request):
+    """
+    Render one measure of a rhythm as a seamless loop WAV.
+
+    Query parameters: ``bpm``, ``accents`` (e.g. ``3,1,2,1``, repeat for
+    polyrhythm layers), ``subdivisions``, ``sound_set`` and ``sample_rate``.
+    Samples longer than the shortest inter-onset interval are replaced by
+    their truncated variants unless ``tails=full`` is given.
+    The client plays the result with ``loop = true`` and needs one source node
+    per cycle instead of one per click. Renders are cached per pattern, sound
+    set version and sample rate.
+    """
+    from .audio.render import MAX_LOOP_SECONDS, render_loop
+    from .audio.samples import SampleDecodeError, load_sound_set_samples
+    from .audio.wavfile import write_wav
+
+    try:
+        spec = rhythm.spec_from_query(request.GET)
+        sample_rate = parse_sample_rate(request.GET.get('sample_rate'))
+        sound_set_id = parse_sound_set_id(request.GET.get('sound_set'))
+    except rhythm.RhythmSpecError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    if spec.cycle_seconds() > MAX_LOOP_SECONDS:
+        return JsonResponse({'error': f'A loop cycle may last at most {MAX_LOOP_SECONDS} seconds'}, status=400)
+
+    sound_set = get_render_sound_set(sound_set_id)
+    if not sound_set:
+        return JsonResponse({'error': 'Sound set not found'}, status=404)
+
+    version = sound_set.updated_at.timestamp() if sound_set.updated_at else 0
+    truncate_tails = request.GET.get('tails') != 'full'
+    render_key = f'{spec.cache_key()}-{sound_set.pk}-{version}-{sample_rate}-{int(truncate_tails)}'
+    etag = f'"{render_key}"'
+    if request.headers.get('If-None-Match') == etag:
+        return HttpResponseNotModified()
+
+    cache_key = f'metronome_api:loop:{render_key}'
+    wav = cache.get(cache_key)
+    if wav is None:
+        try:
+            with timer('render.load_samples'):
+                samples = load_sound_set_samples(sound_set, sample_rate)
+        except SampleDecodeError as e:
+            return JsonResponse({'error': str(e)}, status=422)
+        with timer('render.loop'):
+            wav = write_wav(render_loop(spec, samples, sample_rate, truncate_tails), sample_rate)
+        if len(wav) <= MAX_CACHED_LOOP_BYTES:
+            cache.set(cache_key, wav, LOOP_CACHE_TIMEOUT)
+
+    response = HttpResponse(wav, content_type='audio/wav')
+    response['ETag'] = etag
+    response['Cache-Control'] = f'public, max-age={LOOP_CACHE_TIMEOUT}'
+    response['X-Loop-Samples'] = str(spec.cycle_samples(sample_rate))
+    response['X-Sample-Rate'] = str(sample_rate)
+    return response
+
+GRID_WINDOW_SECONDS = 10
+
+def beat_grid_view(request):
+    """
+    The onsets of a rhythm from sample ``start`` up to ``end`` as a packed
+    binary array (see ``audio/beatgrid.py``), so that clients schedule
+    clicks without timing logic of their own.
+
+    Query parameters: the rhythm as for the loop endpoint (``bpm``,
+    ``accents``, ``subdivisions``, ``swing``), ``sample_rate``, the window
+    (``end`` defaults to ten seconds after ``start``) and the training
+    mutes ``training``, ``play_measures``, ``mute_measures``,
+    ``mute_probability`` and ``seed``.
+    """
+    from .audio.beatgrid import GRID_DTYPE, beat_grid, training_from_query
+
+    try:
+        spec = rhythm.spec_from_query(request.GET)
+        sample_rate = parse_sample_rate(request.GET.get('sample_rate'))
+        training = training_from_query(request.GET)
+    except rhythm.RhythmSpecError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    try:
+        start = int(request.GET.get('start', 0))
+        end = int(request.GET['end']) if request.GET.get('end') else start + GRID_WINDOW_SECONDS * sample_rate
+    except ValueError:
+        return JsonResponse({'error': 'start and end must be sample offsets'}, status=400)
+
+    etag = f'"{spec.cache_key()}-{sample_rate}-{start}-{end}-{training.cache_key()}"'
+    if request.headers.get('If-None-Match') == etag:
+        return HttpResponseNotModified()
+    try:
+        with timer('render.beat_grid'):
+            grid = beat_grid(spec, sample_rate, start, end, training)
+    except rhythm.RhythmSpecError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    response = HttpResponse(grid.tobytes(), content_type='application/octet-stream')
+    response['ETag'] = etag
+    response['Cache-Control'] = f'public, max-age={LOOP_CACHE_TIMEOUT}'
+    response['X-Sample-Rate'] = str(sample_rate)
+    response['X-Grid-Start'] = str(start)
+    response['X-Grid-End'] = str(end)
+    response['X-Loop-Samples'] = str(spec.cycle_samples(sample_rate))
+    response['X-Grid-Format'] = ','.join(f'{name}:{GRID_DTYPE[name].str}' for name in GRID_DTYPE.names)
+    return response
+
+def sound_set_variants(request, id):
+    """
+    List the truncated sample variants of a sound set for high tempos.
+
+    Every role lists its variants, longest first, with the maximum
+    inter-onset interval each one is meant for. With ``interval_ms`` the
+    response also names, per role, the URL to use at that interval: the
+    longest variant that ends before the next onset, or the original sample
+    if it is short enough already.
+    """
+    from .audio.samples import SampleDecodeError
+    from .audio.variants import INTERVAL_BUCKETS_MS, build_variants, select_bucket, variant_version
+
+    try:
+        sample_rate = parse_sample_rate(request.GET.get('sample_rate'))
+        interval_ms = float(request.GET['interval_ms']) if request.GET.get('interval_ms') else None
+    except (rhythm.RhythmSpecError, ValueError) as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    sound_set = get_catalog().get(id)
+    if not sound_set:
+        return JsonResponse({'error': f'Sound set with ID {id} not found'}, status=404)
+    try:
+        manifest = build_variants(sound_set, sample_rate)
+    except SampleDecodeError as e:
+        return JsonResponse({'error': str(e)}, status=422)
+
+    version = variant_version(sound_set)
+    roles = {}
+    selected = {}
+    for role, info in manifest.items():
+        urls = {
+            entry['max_interval_ms']: (
+                reverse('sound_set_variant_file', args=[sound_set.pk, role, entry['max_interval_ms']])
+                + f'?sample_rate={sample_rate}&v={version}'
+            )
+            for entry in info['variants']
+        }
+        roles[role] = {
+            'frames': info['frames'],
+            'variants': [
+                {'max_interval_ms': e['max_interval_ms'], 'frames': e['frames'], 'url': urls[e['max_interval_ms']]}
+                for e in info['variants']
+            ],
+        }
+        if interval_ms is not None:
+            bucket = select_bucket(interval_ms, info['frames'] * 1000 / sample_rate)
+            selected[role] = urls[bucket] if bucket in urls else sample_url(sound_set, role)
+
+    data = {'sample_rate': sample_rate, 'buckets': list(INTERVAL_BUCKETS_MS), 'roles': roles}
+    if interval_ms is not None:
+        data['selected'] = selected
+    return JsonResponse(data)
+
+def sound_set_variant_file(request, id, role, bucket):
+    """Serve one truncated sample variant as WAV, building it on first use."""
+    from .audio.samples import SampleDecodeError
+    from .audio.variants import INTERVAL_BUCKETS_MS, build_variants
+
+    if role not in ROLE_FIELDS or bucket not in INTERVAL_BUCKETS_MS:
+        return JsonResponse({'error': 'Unknown variant'}, status=404)
+    try:
+        sample_rate = parse_sample_rate(request.GET.get('sample_rate'))
+    except rhythm.RhythmSpecError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    sound_set = get_catalog().get(id)
+    if not sound_set:
+        return JsonResponse({'error': f'Sound set with ID {id} not found'}, status=404)
+    try:
+        manifest = build_variants(sound_set, sample_rate)
+    except SampleDecodeError as e:
+        return JsonResponse({'error': str(e)}, status=422)
+
+    entry = next((e for e in manifest[role]['variants'] if e['max_interval_ms'] == bucket), None)
+    if entry is None:
+        return JsonResponse({'error': f'The {role} sample is already shorter than {bucket} ms'}, status=404)
+
+    response = FileResponse(open(entry['path'], 'rb'), content_type='audio/wav')
+    response['Cache-Control'] = f'public, max-age={LOOP_CACHE_TIMEOUT}'
+    return response
+
+def _sprite_sample_rate(request):
+    from .audio.rate_variants import target_rates
+
+    sample_rate = parse_sample_rate(request.GET.get('sample_rate'))
+    if sample_rate not in target_rates():
+        rates = ', '.join(str(rate) for rate in target_rates())
+        raise rhythm.RhythmSpecError(f'Preview sprites are available at {rates} Hz')
+    return sample_rate
+
+def sound_sets_sprite(request):
+    """
+    The table of the preview sprite of all sound sets (see
+    ``audio/sprite.py``), with the URL of the sprite itself. The sprite is
+    brought up to date first; the ETag changes with every sound set change.
+    """
+    from .audio.sprite import build_sprite, sprite_sound_sets, sprite_version
+
+    try:
+        sample_rate = _sprite_sample_rate(request)
+    except rhythm.RhythmSpecError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    sound_sets = sprite_sound_sets()
+    version = sprite_version(sound_sets, sample_rate)
+    etag = f'"{version}"'
+    if request.headers.get('If-None-Match') == etag:
+        response = HttpResponseNotModified()
+    else:
+        table = build_sprite(sample_rate, sound_sets)
+        response = JsonResponse(dict(table, url=reverse('sound_sets_sprite_file', args=[sample_rate, version])))
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+SPRITE_MAX_AGE = 365 * 24 * 60 * 60
+
+def sound_sets_sprite_file(request, sample_rate, version):
+    """Serve a built preview sprite as WAV; a version never changes its content."""
+    from .audio.sprite import sprite_path
+
+    path = sprite_path(sample_rate, version)
+    if not os.path.isfile(path):
+        return JsonResponse({'error': f'Preview sprite {version} not found'}, status=404)
+    response = FileResponse(open(path, 'rb'), content_type='audio/wav')
+    response['Cache-Control'] = f'public, max-age={SPRITE_MAX_AGE}, immutable'
+    return response
+
+SYNTH_CACHE_TIMEOUT = 7 * 24 * 60 * 60
+
+def _synth_wav_response(values, sample_rate, memoize=True):
+    from .audio.synth import render_voice, synthesize_voice
+    from .audio.wavfile import write_wav
+
+    pcm = (render_voice if memoize else synthesize_voice)(*values, sample_rate)
+    response = HttpResponse(write_wav(pcm, sample_rate), content_type='audio/wav')
+    response['Cache-Control'] = f'public, max-age={SYNTH_CACHE_TIMEOUT}'
+    return response
+
+def sound_set_synth_sample(request, id, role):
+    """Serve the generated sound of one role of a synthesized sound set as WAV."""
+    from .audio.synth import DEFAULT_SYNTH_PARAMS, SynthParamsError, normalize_role_params
+
+    if role not in ROLE_FIELDS:
+        return JsonResponse({'error': f'Unknown role {role}'}, status=404)
+    try:
+        sample_rate = parse_sample_rate(request.GET.get('sample_rate'))
+    except rhythm.RhythmSpecError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    sound_set = get_catalog().get(id, only=('synth_params',))
+    if not sound_set or not sound_set.is_synthesized:
+        return JsonResponse({'error': f'Synthesized sound set with ID {id} not found'}, status=404)
+    try:
+        values = normalize_role_params((sound_set.synth_params or {}).get(role, {}), DEFAULT_SYNTH_PARAMS[role])
+    except SynthParamsError as e:
+        return JsonResponse({'error': str(e)}, status=422)
+    return _synth_wav_response(values, sample_rate)
+
+def synth_preview(request):
+    """
+    Synthesize a single click from query parameters, e.g.
+    ``?voice=woodblock&pitch=1200&decay=0.04``, to audition parameters
+    before saving them on a sound set. ``role`` picks the defaults.
+    """
+    from .audio.synth import DEFAULT_SYNTH_PARAMS, SynthParamsError, normalize_role_params
+
+    role = request.GET.get('role', 'normal')
+    if role not in ROLE_FIELDS:
+        return JsonResponse({'error': f'Unknown role {role}'}, status=400)
+    params = {k: v for k, v in request.GET.items() if k not in ('role', 'sample_rate')}
+    try:
+        sample_rate = parse_sample_rate(request.GET.get('sample_rate'))
+        values = normalize_role_params(params, DEFAULT_SYNTH_PARAMS[role])
+    except (rhythm.RhythmSpecError, SynthParamsError) as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    # Arbitrary parameters: not memoized, browsers cache the response
+    return _synth_wav_response(values, sample_rate, memoize=False)
+
+# Longest click track and setlist a job may render
+MAX_TRACK_SECONDS = 60 * 60
+MAX_SETLIST_SECONDS = 4 * 60 * 60
+
+def _submit_render_job(request, kind, **extra):
+    """
+    Queue a ``kind`` job for ``measures`` repetitions of the rhythm given by
+    the POST parameters, with ``extra`` params. Returns the job with status
+    202; identical requests in flight share one job.
+    """
+    from .audio.wavfile import max_wav_frames
+
+    try:
+        spec = rhythm.spec_from_query(request.POST)
+        sample_rate = parse_sample_rate(request.POST.get('sample_rate'))
+        measures = int(request.POST.get('measures', 1))
+        if measures < 1:
+            raise rhythm.RhythmSpecError('measures must be positive')
+        sound_set_id = parse_sound_set_id(request.POST.get('sound_set'))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    if spec.cycle_seconds() * measures > MAX_TRACK_SECONDS:
+        return JsonResponse({'error': f'A track may last at most {MAX_TRACK_SECONDS} seconds'}, status=400)
+    # Multi-channel stems hold every stem in one file, whose sizes are 32-bit
+    channels = 1
+    if extra.get('format') == 'wav':
+        from .audio.render import stem_names
+        channels = len(stem_names(spec))
+    if spec.cycle_samples(sample_rate) * measures > max_wav_frames(channels):
+        hint = ', use format=zip for one file per stem' if channels > 1 else ''
+        return JsonResponse({'error': f'The track is too long for a WAV file at this sample rate{hint}'}, status=400)
+
+    sound_set = get_render_sound_set(sound_set_id)
+    if not sound_set:
+        return JsonResponse({'error': 'Sound set not found'}, status=404)
+
+    version = sound_set.updated_at.timestamp() if sound_set.updated_at else 0
+    params = {
+        'rhythm': spec.to_dict(),
+        'sample_rate': sample_rate,
+        'measures': measures,
+        'sound_set': sound_set.pk,
+        'version': version,
+        **extra,
+    }
+    try:
+        job = jobs.submit(kind, params)
+    except jobs.JobQueueFull as e:
+        response = JsonResponse({'error': str(e)}, status=503)
+        response['Retry-After'] = '5'
+        return response
+
+    response = JsonResponse(jobs.job_to_dict(job), status=202)
+    response['Location'] = reverse('job_detail', args=[job.pk])
+    return response
+
+@require_POST
+def render_track_view(request):
+    """
+    Queue the rendering of a click track: ``measures`` repetitions of the
+    rhythm given by ``bpm``, ``accents`` and ``subdivisions`` (as for the loop
+    endpoint). Returns the job with status 202; identical requests in flight
+    share one job.
+    """
+    return _submit_render_job(request, 'render_track')
+
+STEM_FORMATS = ('wav', 'zip')
+
+@require_POST
+def render_stems_view(request):
+    """
+    Queue the rendering of a click track split into stems: first beats,
+    accents and normal beats of the first layer and every further layer on
+    a channel of its own. Takes the parameters of the track endpoint and
+    ``format``: ``wav`` (default) for one multi-channel WAV, ``zip`` for one
+    mono WAV per stem.
+    """
+    stem_format = request.POST.get('format') or 'wav'
+    if stem_format not in STEM_FORMATS:
+        return JsonResponse({'error': f"format must be one of {', '.join(STEM_FORMATS)}"}, status=400)
+    return _submit_render_job(request, 'render_stems', format=stem_format)
+
+@require_POST
+def render_setlist_view(request):
+    """
+    Queue the rendering of a setlist as one gapless click track. The body is
+    JSON: ``songs`` (each a rhythm as for the loop endpoint, with
+    ``measures``, an optional ``count_in`` and ``name``), ``sound_set`` and
+    ``sample_rate``. Returns the job with status 202.
+    """
+    from .audio.setlist import plan_segments, setlist_from_dict, setlist_seconds, song_to_dict
+    from .audio.wavfile import max_wav_frames
+
+    try:
+        data = json.loads(request.body or b'{}')
+        if not isinstance(data, dict):
+            raise rhythm.RhythmSpecError('The body must be a JSON object')
+        songs = setlist_from_dict(data)
+        sample_rate = parse_sample_rate(str(data.get('sample_rate') or ''))
+        sound_set_id = parse_sound_set_id(data.get('sound_set'))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    if setlist_seconds(songs) > MAX_SETLIST_SECONDS:
+        return JsonResponse({'error': f'A setlist may last at most {MAX_SETLIST_SECONDS} seconds'}, status=400)
+    if plan_segments(songs, sample_rate)[2] > max_wav_frames(1):
+        return JsonResponse({'error': 'The setlist is too long for a WAV file at this sample rate'}, status=400)
+
+    sound_set = get_render_sound_set(sound_set_id)
+    if not sound_set:
+        return JsonResponse({'error': 'Sound set not found'}, status=404)
+
+    params = {
+        'setlist': {'songs': [song_to_dict(song) for song in songs]},
+        'sample_rate': sample_rate,
+        'sound_set': sound_set.pk,
+        'version': sound_set.updated_at.timestamp() if sound_set.updated_at else 0,
+    }
+    try:
+        job = jobs.submit('render_setlist', params)
+    except jobs.JobQueueFull as e:
+        response = JsonResponse({'error': str(e)}, status=503)
+        response['Retry-After'] = '5'
+        return response
+
+    response = JsonResponse(jobs.job_to_dict(job), status=202)
+    response['Location'] = reverse('job_detail', args=[job.pk])
+    return response
+
+@require_http_methods(['GET', 'POST'])
+def render_midi_view(request):
+    """
+    Export the click map of a rhythm or a setlist as a Standard MIDI File
+    (see ``audio/midi.py``): the tempo map and the clicks, for DAWs,
+    without rendering audio.
+
+    GET takes the rhythm as for the loop endpoint with ``measures``,
+    ``count_in`` and ``name``; POST takes a setlist as JSON, as for the
+    setlist endpoint, and every song becomes a tempo and meter change.
+    Files are cached per spec.
+    """
+    from .audio.midi import click_map
+    from .audio.setlist import plan_segments, setlist_from_dict, setlist_seconds, song_to_dict
+    from .audio.wavfile import max_wav_frames
+
+    try:
+        if request.method == 'POST':
+            data = json.loads(request.body or b'{}')
+        else:
+            song = {
+                **rhythm.spec_from_query(request.GET).to_dict(),
+                'measures': request.GET.get('measures', 1),
+                'count_in': request.GET.get('count_in', 0),
+                'name': request.GET.get('name', ''),
+            }
+            data = {'songs': [song]}
+        songs = setlist_from_dict(data)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    if setlist_seconds(songs) > MAX_SETLIST_SECONDS:
+        return JsonResponse({'error': f'A click map may last at most {MAX_SETLIST_SECONDS} seconds'}, status=400)
+
+    raw = json.dumps([song_to_dict(song) for song in songs], sort_keys=True, separators=(',', ':'))
+    midi_key = hashlib.sha1(raw.encode('utf-8')).hexdigest()
+    etag = f'"{midi_key}"'
+    if request.headers.get('If-None-Match') == etag:
+        return HttpResponseNotModified()
+
+    cache_key = f'metronome_api:midi:{midi_key}'
+    midi = cache.get(cache_key)
+    if midi is None:
+        try:
+            with timer('render.midi'):
+                midi = click_map(songs)
+        except rhythm.RhythmSpecError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        cache.set(cache_key, midi, LOOP_CACHE_TIMEOUT)
+
+    response = HttpResponse(midi, content_type='audio/midi')
+    response['ETag'] = etag
+    response['Cache-Control'] = f'public, max-age={LOOP_CACHE_TIMEOUT}'
+    response['Content-Disposition'] = 'attachment; filename="click-map.mid"'
+    return response
+
+def job_detail(request, id):
+    """Get the status, progress and result of a job."""
+    job = Job.objects.filter(pk=id).first()
+    if not job:
+        return JsonResponse({'error': f'Job {id} not found'}, status=404)
+    return JsonResponse(jobs.job_to_dict(job))
+
+@require_POST
+def job_cancel(request, id):
+    """Cancel a queued or running job."""
+    job = Job.objects.filter(pk=id).first()
+    if not job:
+        return JsonResponse({'error': f'Job {id} not found'}, status=404)
+    return JsonResponse(jobs.job_to_dict(jobs.cancel(job)))
+
+JOB_EVENTS_POLL_SECONDS = 0.5
+JOB_EVENTS_HEARTBEAT_SECONDS = 15
+# Streams end after this long; EventSource reconnects by itself
+JOB_EVENTS_MAX_SECONDS = 5 * 60
+
+def _job_events(job_id):
+    last = None
+    started = last_sent = time.monotonic()
+    while time.monotonic() - started < JOB_EVENTS_MAX_SECONDS:
+        job = Job.objects.filter(pk=job_id).first()
+        if job is None:
+            return
+        data = jobs.job_to_dict(job)
+        if data != last:
+            last = data
+            last_sent = time.monotonic()
+            event = 'done' if job.is_finished else 'progress'
+            yield f'event: {event}\ndata: {json.dumps(data)}\n\n'
+            if job.is_finished:
+                return
+        elif time.monotonic() - last_sent > JOB_EVENTS_HEARTBEAT_SECONDS:
+            # Comment line, keeps proxies from closing an idle stream
+            last_sent = time.monotonic()
+            yield ': keep-alive\n\n'
+            # A job whose worker is gone would otherwise never finish
+            jobs.expire_stale_jobs()
+        time.sleep(JOB_EVENTS_POLL_SECONDS)
+
+def job_events(request, id):
+    """
+    Stream a job's progress as server-sent events: a ``progress`` event per
+    change and a final ``done`` event once the job has finished. Streams
+    last at most ``JOB_EVENTS_MAX_SECONDS``, after which the client
+    reconnects.
+    """
+    if not Job.objects.filter(pk=id).exists():
+        return JsonResponse({'error': f'Job {id} not found'}, status=404)
+    response = StreamingHttpResponse(_job_events(id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+def job_result(request, id):
+    """Download the output file of a finished job."""
+    job = Job.objects.filter(pk=id, status=Job.SUCCEEDED).first()
+    if not job or not job.result or 'path' not in job.result:
+        return JsonResponse({'error': f'No result for job {id}'}, status=404)
+    if not os.path.isfile(job.result['path']):
+        return JsonResponse({'error': f'The result of job {id} has expired'}, status=410)
+    return FileResponse(open(job.result['path'], 'rb'), content_type=job.result.get('content_type'))
+
+def _staff_only(request, action='upload samples'):
+    if not request.user.is_staff:
+        return JsonResponse({'error': f'Only staff members may {action}'}, status=403)
+    return None
+
+@require_POST
+def upload_create(request):
+    """
+    Start a resumable sample upload. JSON body: ``filename``, ``size`` and
+    optionally ``sound_set`` and ``role`` to attach the finished file to.
+    """
+    denied = _staff_only(request)
+    if denied:
+        return denied
+    try:
+        data = json.loads(request.body or b'{}')
+        if not isinstance(data, dict):
+            raise ValueError
+        sound_set = None
+        if data.get('sound_set') is not None:
+            sound_set = MetronomeSoundSet.objects.filter(id=data['sound_set']).first()
+            if not sound_set:
+                return JsonResponse({'error': f"Sound set with ID {data['sound_set']} not found"}, status=404)
+        upload = uploads.create_upload(data.get('filename'), data.get('size'), sound_set, data.get('role', ''))
+    except ValueError:
+        return JsonResponse({'error': 'Body must be a JSON object'}, status=400)
+    except uploads.UploadError as e:
+        return JsonResponse({'error': str(e)}, status=e.status)
+
+    response = JsonResponse(uploads.upload_to_dict(upload), status=201)
+    response['Location'] = reverse('upload_detail', args=[upload.pk])
+    return response
+
+def upload_detail(request, id):
+    """
+    GET: the state of an upload, including the ``received`` offset to resume from.
+    PUT: the next chunk, with ``Content-Range: bytes <start>-<end>/<size>``.
+    """
+    denied = _staff_only(request)
+    if denied:
+        return denied
+    upload = SampleUpload.objects.filter(pk=id).first()
+    if not upload:
+        return JsonResponse({'error': f'Upload {id} not found'}, status=404)
+    if request.method == 'GET':
+        return JsonResponse(uploads.upload_to_dict(upload))
+    if request.method != 'PUT':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+    try:
+        start, length = uploads.parse_content_range(request.headers.get('Content-Range'), upload)
+        if int(request.headers.get('Content-Length') or 0) != length:
+            raise uploads.UploadError('Content-Length does not match Content-Range')
+        uploads.append_chunk(upload, request, start, length)
+    except uploads.UploadError as e:
+        data = uploads.upload_to_dict(upload)
+        data['error'] = str(e)
+        return JsonResponse(data, status=e.status)
+    return JsonResponse(uploads.upload_to_dict(upload))
+
+MAX_RECORDING_SECONDS = 60
+MAX_RECORDING_BYTES = 64 * 1024 * 1024
+MAX_INPUT_LATENCY_MS = 1000
+DEVICE_ID_RE = re.compile(r'^[A-Za-z0-9_.:-]{1,64}$')
+
+def _calibration_to_dict(calibration):
+    return {
+        'device': calibration.device_id,
+        'sample_rate': calibration.sample_rate,
+        'round_trip_ms': round(calibration.round_trip_ms, 3),
+        'jitter_ms': round(calibration.jitter_ms, 3),
+        'input_latency_ms': calibration.input_latency_ms,
+        'compensation_ms': round(calibration.compensation_ms, 3),
+        'clicks_detected': calibration.clicks_detected,
+        'clicks_total': calibration.clicks_total,
+        'confidence': round(calibration.confidence, 3),
+        'created_at': calibration.created_at.isoformat(),
+    }
+
+def calibration_click_train(request):
+    """
+    The latency calibration signal as a WAV file. The client plays it while
+    recording, then posts the recording to ``calibration_create``.
+    """
+    from .audio.calibration import CLICK_COUNT, click_train
+    from .audio.wavfile import write_wav
+
+    try:
+        sample_rate = parse_sample_rate(request.GET.get('sample_rate'))
+    except rhythm.RhythmSpecError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    response = HttpResponse(write_wav(click_train(sample_rate), sample_rate), content_type='audio/wav')
+    response['Cache-Control'] = f'public, max-age={LOOP_CACHE_TIMEOUT}'
+    response['X-Sample-Rate'] = str(sample_rate)
+    response['X-Click-Count'] = str(CLICK_COUNT)
+    return response
+
+@require_POST
+def calibration_create(request):
+    """
+    Measure a device's latency from a WAV recording of the click train, sent
+    as the request body. Query parameters: ``device`` (an id chosen by the
+    client) and optionally ``input_latency_ms``, the recording side's share
+    of the round trip, which is subtracted from the compensation.
+    """
+    from .audio.calibration import CalibrationError, analyze_recording
+    from .audio.wavfile import WavError, read_wav
+
+    device = request.GET.get('device', '')
+    if not DEVICE_ID_RE.match(device):
+        return JsonResponse({'error': 'device must be 1-64 letters, digits or _.:-'}, status=400)
+    try:
+        input_latency = float(request.GET.get('input_latency_ms') or 0)
+    except ValueError:
+        input_latency = -1
+    if not 0 <= input_latency <= MAX_INPUT_LATENCY_MS:
+        return JsonResponse({'error': f'input_latency_ms must be between 0 and {MAX_INPUT_LATENCY_MS}'}, status=400)
+
+    try:
+        length = int(request.headers.get('Content-Length') or 0)
+    except ValueError:
+        length = 0
+    if length > MAX_RECORDING_BYTES:
+        return JsonResponse({'error': 'The recording is too large'}, status=413)
+    # Read the stream directly: recordings exceed DATA_UPLOAD_MAX_MEMORY_SIZE
+    try:
+        recording, sample_rate = read_wav(request.read(length))
+    except WavError as e:
+        return JsonResponse({'error': f'The recording must be a WAV file: {e}'}, status=400)
+    if len(recording) > MAX_RECORDING_SECONDS * sample_rate:
+        return JsonResponse({'error': f'Recordings may last at most {MAX_RECORDING_SECONDS} seconds'}, status=400)
+    if not 8000 <= sample_rate <= 192000:
+        return JsonResponse({'error': 'The recording has an unsupported sample rate'}, status=400)
+
+    try:
+        result = analyze_recording(recording, sample_rate)
+    except CalibrationError as e:
+        return JsonResponse({'error': str(e)}, status=422)
+
+    calibration = DeviceCalibration.objects.create(
+        device_id=device,
+        user_agent=request.headers.get('User-Agent', '')[:255],
+        sample_rate=sample_rate,
+        input_latency_ms=input_latency,
+        compensation_ms=max(0.0, result['round_trip_ms'] - input_latency),
+        **result,
+    )
+    return JsonResponse(_calibration_to_dict(calibration), status=201)
+
+def calibration_detail(request, device):
+    """The latest calibration of a device, whose ``compensation_ms`` the client applies."""
+    calibration = DeviceCalibration.objects.filter(device_id=device).order_by('-created_at').first()
+    if not calibration:
+        return JsonResponse({'error': f'Device {device} has not been calibrated'}, status=404)
+    return JsonResponse(_calibration_to_dict(calibration))
+
+# Batches come from sendBeacon/fetch without a session or CSRF token; the
+# endpoint only records events and acts for nobody
+@csrf_exempt
+@require_POST
+def telemetry_ingest(request):
+    """
+    Record a batch of training events (see ``telemetry.py``). The body may be
+    gzip-compressed with ``Content-Encoding: gzip``.
+    """
+    try:
+        user, session, events = telemetry.decode_batch(
+            request.body, request.headers.get('Content-Encoding', '').strip().lower(),
+        )
+    except telemetry.TelemetryError as e:
+        return JsonResponse({'error': str(e)}, status=e.status)
+    telemetry.ingest(user, session, events)
+    return JsonResponse({'accepted': len(events)}, status=202)
+
+def telemetry_stats(request, user):
+    """Training totals of a user and their last ``days`` days (default 30, max 366)."""
+    try:
+        days = min(max(int(request.GET.get('days', 30)), 0), 366)
+    except ValueError:
+        return JsonResponse({'error': 'days must be an integer'}, status=400)
+    stats = telemetry.user_stats(user, days)
+    if stats is None:
+        return JsonResponse({'error': f'No training data for {user}'}, status=404)
+    return JsonResponse(stats)
@@ -0,0 +1,140 @@
+"""
+Pre-fork warmup of a server process.
+
+``warmup()`` does the work the first requests of a fresh worker would
+otherwise pay for: compiling the URL patterns, loading templates, loading
+the manifest index or running the first catalog page query, and opening and
+decoding the sound set samples. It is called
+from ``wsgi.py``/``asgi.py`` when ``METRONOME_WARMUP=1`` is set. With a
+pre-forking server that loads the application in the master process (e.g.
+``gunicorn --preload``) the warmed state is shared copy-on-write with every
+worker:
+
+- ``gc.freeze()`` moves everything allocated so far out of the collector's
+  generations, so collections in the workers do not write to (and copy) the
+  shared pages
+- database connections are closed so no worker inherits a socket
+"""
+import gc
+import os
+import time
+
+from django.db import connections
+from django.template import engines
+from django.urls import URLPattern, URLResolver, get_resolver
+
+# Upper bound of sound sets whose samples are preloaded
+WARMUP_SOUND_SETS = 1000
+
+
+def _walk_patterns(patterns):
+    for pattern in patterns:
+        yield pattern
+        if isinstance(pattern, URLResolver):
+            yield from _walk_patterns(pattern.url_patterns)
+
+
+def warm_urls():
+    resolver = get_resolver()
+    # Compiles every pattern's regex and builds the reverse lookup tables
+    count = 0
+    for pattern in _walk_patterns(resolver.url_patterns):
+        if isinstance(pattern, (URLPattern, URLResolver)):
+            pattern.pattern.regex
+            count += 1
+    resolver.reverse_dict
+    return f'{count} patterns'
+
+
+def warm_templates():
+    loaded = 0
+    for engine in engines.all():
+        for directory in engine.template_dirs:
+            for root, _, files in os.walk(directory):
+                for name in files:
+                    if not name.endswith(('.html', '.txt', '.xml')):
+                        continue
+                    template_name = os.path.relpath(os.path.join(root, name), directory)
+                    try:
+                        engine.get_template(template_name)
+                    except Exception:
+                        # Partial or third party templates that need a context to compile
+                        continue
+                    loaded += 1
+    return f'{loaded} templates'
+
+
+def warm_catalog():
+    # The first page is what every client loads first; with the manifest
+    # backend this also loads the index
+    from .catalog import get_catalog
+
+    payloads, _ = get_catalog().page()
+    return f'{len(payloads)} sound sets on the first page'
+
+
+def warm_samples(sound_sets):
+    from .audio.samples import SampleDecodeError, load_sound_set_samples
+    from .views import DEFAULT_SAMPLE_RATE
+
+    loaded = failed = 0
+    for sound_set in sound_sets:
+        try:
+            load_sound_set_samples(sound_set, DEFAULT_SAMPLE_RATE)
+        except SampleDecodeError:
+            failed += 1
+            continue
+        loaded += 1
+    return f'{loaded} sound sets decoded, {failed} skipped'
+
+
+def warmup():
+    """
+    Run every warmup step and return the timing report as a list of
+    ``(step, seconds, detail)``. A failing step is reported and skipped.
+    """
+    from .catalog import get_catalog
+
+    report = []
+
+    def step(name, func, *args):
+        started = time.perf_counter()
+        try:
+            detail = func(*args)
+        except Exception as e:
+            detail = f'failed: {e}'
+        report.append((name, time.perf_counter() - started, detail))
+
+    sound_sets = []
+
+    def load_sound_sets():
+        sound_sets.extend(get_catalog().sound_sets(WARMUP_SOUND_SETS))
+        return f'{len(sound_sets)} sound sets'
+
+    step('urls', warm_urls)
+    step('templates', warm_templates)
+    step('sound sets', load_sound_sets)
+    step('catalog', warm_catalog)
+    step('samples', warm_samples, sound_sets)
+
+    connections.close_all()
+    gc.collect()
+    gc.freeze()
+    return report
+
+
+def format_report(report):
+    total = sum(seconds for _, seconds, _ in report)
+    lines = [f'Warmup finished in {total * 1000:.1f} ms']
+    lines.extend(f'  {name:<10} {seconds * 1000:8.1f} ms  {detail}' for name, seconds, detail in report)
+    return '\n'.join(lines)
+
+
+def warmup_enabled():
+    return os.environ.get('METRONOME_WARMUP', '') == '1'
+
+
+def maybe_warmup():
+    """Warm up and print the timing report if warmup is enabled."""
+    if warmup_enabled():
+        print(format_report(warmup()))
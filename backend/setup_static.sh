@@ -8,4 +8,5 @@ mkdir -p metronome_api/static
 python manage.py collectstatic --noinput
 
 echo "Static files have been collected successfully."
-echo "Make sure your web server is configured to serve files from the 'staticfiles' directory."
+echo "Django serves them from /static/ with hashed names and .gz/.br variants;"
+echo "a web server in front may serve the 'staticfiles' directory directly instead."
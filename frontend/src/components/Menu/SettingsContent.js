@@ -1,6 +1,6 @@
 // Updated src/components/Menu/SettingsContent.js
-import React, { useState, useEffect, useCallback } from 'react';
-import { getAllSoundSets, setActiveSoundSet, getActiveSoundSetIdFromCookie } from '../../services/soundSetService';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
+import { getAllSoundSets, setActiveSoundSet, getActiveSoundSetIdFromCookie, loadPreviewSprite } from '../../services/soundSetService';
 // Unused import removed
 
 const SettingsContent = ({
@@ -30,6 +30,8 @@ const SettingsContent = ({
   const [audioContext] = useState(null); // Removed unused setter
   // Removed unused state variable completely
   const [isPreviewPlaying, setIsPreviewPlaying] = useState(false);
+  // Created on the first preview, which is a user gesture
+  const previewContextRef = useRef(null);
 
   // Update local state when props change
   useEffect(() => {
@@ -50,6 +52,13 @@ const SettingsContent = ({
     };
   }, [audioContext]);
 
+  useEffect(() => () => {
+    // The decoded sprite outlives the context and is reused by the next one
+    if (previewContextRef.current && previewContextRef.current.state !== 'closed') {
+      previewContextRef.current.close();
+    }
+  }, []);
+
   // Fetch sound sets from the API
   useEffect(() => {
     setLoadingSoundSets(true);
@@ -148,10 +157,40 @@ const SettingsContent = ({
   }, [activeSoundSetId, soundSets, getBackendUrl]);
 
   // Sound preview functions
+  const playSpriteSegment = async (type) => {
+    const AudioContextClass = window.AudioContext || window.webkitAudioContext;
+    if (!AudioContextClass || activeSoundSetId === null) return false;
+    if (!previewContextRef.current) {
+      previewContextRef.current = new AudioContextClass();
+    }
+    const context = previewContextRef.current;
+    const sprite = await loadPreviewSprite(context);
+    const segment = sprite?.soundSets[activeSoundSetId.toString()]?.[type];
+    if (!segment) return false;
+
+    if (context.state === 'suspended') {
+      await context.resume();
+    }
+    const source = context.createBufferSource();
+    const gain = context.createGain();
+    source.buffer = sprite.buffer;
+    gain.gain.value = localVolume;
+    source.connect(gain).connect(context.destination);
+    source.onended = () => {
+      setIsPreviewPlaying(false);
+    };
+    setIsPreviewPlaying(true);
+    source.start(0, segment.offset, segment.duration);
+    return true;
+  };
+
   const playSound = async (type) => {
     if (isPreviewPlaying) return;
     
     try {
+      // All sets are auditioned from one sprite; single files are the fallback
+      if (await playSpriteSegment(type)) return;
+
       const url = soundPaths[type];
       if (!url) {
         console.error(`No sound URL found for type: ${type}`);
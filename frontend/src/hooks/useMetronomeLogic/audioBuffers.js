@@ -148,6 +148,11 @@ function loadSound(url, audioCtx) {
         fetchUrl = url;
       }
 
+      // Ask for a copy at the context's rate so decodeAudioData doesn't have to resample
+      if (url.includes('/metronome_sounds/') && audioCtx && audioCtx.sampleRate) {
+        fetchUrl = `${fetchUrl}${fetchUrl.includes('?') ? '&' : '?'}sample_rate=${audioCtx.sampleRate}`;
+      }
+
       // Add a timestamp to bust cache if needed
       const cacheBuster = `${fetchUrl.includes('?') ? '&' : '?'}cb=${Date.now()}`;
       fetchUrl = `${fetchUrl}${cacheBuster}`;
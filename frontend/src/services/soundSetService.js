@@ -43,13 +43,91 @@ const defaultSoundSets = [
   }
 ];
 
+// Local copy of the catalog, kept up to date through /sound-sets/changes/
+const CATALOG_CACHE_KEY = 'soundSetCatalog';
+
+const readCatalogCache = () => {
+  try {
+    const cache = JSON.parse(localStorage.getItem(CATALOG_CACHE_KEY));
+    return cache && cache.cursor && Array.isArray(cache.soundSets) ? cache : null;
+  } catch (error) {
+    return null;
+  }
+};
+
+/**
+ * Brings the local copy of the catalog up to date: only sound sets changed
+ * since the last sync are transferred, and nothing at all (204) when the
+ * catalog is unchanged. An expired cursor (410) triggers a full sync.
+ * @param {AbortSignal} signal - Aborts the request.
+ * @returns {Promise<Array>} - All sound sets, in catalog order (name, id).
+ */
+const syncSoundSets = async (signal, cache = readCatalogCache()) => {
+  const query = cache ? `?since=${encodeURIComponent(cache.cursor)}` : '';
+  const response = await fetch(getApiUrl(`/sound-sets/changes/${query}`), {
+    credentials: 'include',
+    headers: { 'Accept': 'application/json' },
+    signal
+  });
+
+  if (response.status === 204) {
+    return cache.soundSets;
+  }
+  if (response.status === 410 && cache) {
+    localStorage.removeItem(CATALOG_CACHE_KEY);
+    return syncSoundSets(signal, null);
+  }
+  if (!response.ok) {
+    throw new Error(`HTTP error: ${response.status} ${response.statusText}`);
+  }
+
+  const { cursor, changed, deleted } = await response.json();
+  const byId = new Map(cache ? cache.soundSets.map(set => [set.id, set]) : []);
+  deleted.forEach(id => byId.delete(id));
+  changed.forEach(set => byId.set(set.id, set));
+  const soundSets = [...byId.values()].sort(
+    (a, b) => (a.name < b.name ? -1 : a.name > b.name ? 1 : a.id - b.id)
+  );
+  try {
+    localStorage.setItem(CATALOG_CACHE_KEY, JSON.stringify({ cursor, soundSets }));
+  } catch (error) {
+    // Storage full or unavailable: sync in full next time
+  }
+  return soundSets;
+};
+
+/**
+ * Loads the whole catalog page by page, following the X-Next-Cursor header
+ * of every page until the last one.
+ * @param {AbortSignal} signal - Aborts the requests.
+ * @returns {Promise<Array>} - All sound sets, in catalog order (name, id).
+ */
+const fetchAllPages = async (signal) => {
+  const soundSets = [];
+  let cursor = null;
+  do {
+    const query = cursor ? `&cursor=${encodeURIComponent(cursor)}` : '';
+    const response = await fetch(getApiUrl(`/sound-sets/?limit=500${query}`), {
+      credentials: 'include',
+      headers: { 'Accept': 'application/json' },
+      signal
+    });
+    if (!response.ok) {
+      throw new Error(`HTTP error: ${response.status} ${response.statusText}`);
+    }
+    soundSets.push(...await response.json());
+    cursor = response.headers.get('X-Next-Cursor');
+  } while (cursor);
+  return soundSets;
+};
+
 /**
  * Fetches all sound sets from the API with fallback.
  * Determines active state solely from cookie, not from backend is_active flag.
  * @returns {Promise<Array>} - An array of sound set objects.
  */
 export const getAllSoundSets = async () => {
-  const url = getApiUrl('/sound-sets/');
+  const url = getApiUrl('/sound-sets/changes/');
   try {
     console.log("Fetching sound sets from:", url);
     // Create an AbortController for timeout if AbortSignal.timeout is not available
@@ -66,22 +144,17 @@ export const getAllSoundSets = async () => {
       setTimeout(() => controller.abort(), 5000);
     }
     
-    const response = await fetch(url, { 
-      credentials: 'include',
-      // Add these headers to help with CORS
-      headers: {
-        'Accept': 'application/json',
-        'Content-Type': 'application/json'
-      },
-      // Add timeout for fetch using the appropriate signal
-      signal
-    });
-    
-    if (!response.ok) {
-      throw new Error(`HTTP error: ${response.status} ${response.statusText}`);
+    let data;
+    try {
+      data = await syncSoundSets(signal);
+    } catch (error) {
+      if (signal.aborted) {
+        throw error;
+      }
+      // Backends without the changes endpoint: page through the catalog
+      console.warn("Catalog sync failed, loading every page instead:", error);
+      data = await fetchAllPages(signal);
     }
-    
-    let data = await response.json();
     console.log("Successfully loaded sound sets:", data.length);
     
     // Always determine active state from cookie, not from backend
@@ -146,6 +219,73 @@ export const getAllSoundSets = async () => {
   }
 };
 
+/**
+ * Fetches several sound sets by id with a single request.
+ * Ids the backend does not know are omitted from the result.
+ * @param {Array<string|number>} ids - The sound set ids to resolve.
+ * @returns {Promise<Object>} - Sound set objects keyed by id.
+ */
+export const getSoundSetsByIds = async (ids) => {
+  const numericIds = ids.map(id => id.toString()).filter(id => /^\d+$/.test(id));
+  if (numericIds.length === 0) {
+    return {};
+  }
+
+  const url = getApiUrl(`/sound-sets/batch/?ids=${numericIds.join(',')}`);
+  try {
+    const response = await fetch(url, {
+      credentials: 'include',
+      headers: { 'Accept': 'application/json' }
+    });
+    if (!response.ok) {
+      throw new Error(`HTTP error: ${response.status} ${response.statusText}`);
+    }
+    const data = await response.json();
+    return Object.fromEntries(Object.entries(data).filter(([, set]) => set !== null));
+  } catch (error) {
+    console.error("Error fetching sound set batch from", url, ":", error);
+    return {};
+  }
+};
+
+let previewSpritePromise = null;
+
+/**
+ * Loads the preview sprite of all sound sets: one table request and one
+ * audio request, however many sets there are. The sprite is decoded once
+ * and shared; a failed load is retried on the next call.
+ * @param {AudioContext} audioContext - The context to decode the sprite with.
+ * @returns {Promise<Object|null>} - { buffer, soundSets } where soundSets maps
+ *   each sound set id to { name, first, accent, normal } segments with an
+ *   offset and duration in seconds, or null if the sprite is unavailable.
+ */
+export const loadPreviewSprite = (audioContext) => {
+  if (!previewSpritePromise) {
+    const sampleRate = audioContext.sampleRate === 44100 ? 44100 : 48000;
+    previewSpritePromise = (async () => {
+      const response = await fetch(getApiUrl(`/sound-sets/sprite/?sample_rate=${sampleRate}`), {
+        credentials: 'include',
+        headers: { 'Accept': 'application/json' }
+      });
+      if (!response.ok) {
+        throw new Error(`HTTP error: ${response.status} ${response.statusText}`);
+      }
+      const table = await response.json();
+      const audio = await fetch(`${API_BASE_URL}${table.url}`, { credentials: 'include' });
+      if (!audio.ok) {
+        throw new Error(`HTTP error: ${audio.status} ${audio.statusText}`);
+      }
+      const buffer = await audioContext.decodeAudioData(await audio.arrayBuffer());
+      return { buffer, soundSets: table.sound_sets };
+    })().catch((error) => {
+      console.error("Error loading the preview sprite:", error);
+      previewSpritePromise = null;
+      return null;
+    });
+  }
+  return previewSpritePromise;
+};
+
 /**
  * Sets a specific sound set as active.
  * This function saves the ID to cookie and localStorage for persistence.
@@ -227,11 +367,28 @@ export const setActiveSoundSet = async (id) => {
  */
 export const getActiveSoundSet = async () => {
   try {
+    // Restore the stored selection with one batch request for just those ids,
+    // instead of loading the whole catalog
+    const cookieId = getActiveSoundSetIdFromCookie();
+    const storedId = localStorage.getItem('activeSoundSetId');
+    const storedIds = [cookieId, storedId].filter(Boolean);
+    if (storedIds.length > 0) {
+      const restored = await getSoundSetsByIds(storedIds);
+      const restoredId = storedIds.find(id => restored[id.toString()]);
+      if (restoredId) {
+        const restoredIdStr = restoredId.toString();
+        if (restoredIdStr !== cookieId) {
+          setCookie('activeSoundSetId', restoredIdStr, 365);
+        }
+        console.log("Restored active sound set:", restored[restoredIdStr].name);
+        return { ...restored[restoredIdStr], is_active: true };
+      }
+    }
+
     // Get all available sound sets (might return defaults if API fails)
     const sets = await getAllSoundSets();
     
     // Check cookie first - this is always our source of truth
-    const cookieId = getActiveSoundSetIdFromCookie();
     if (cookieId) {
       const cookieIdStr = cookieId.toString();
       const foundByCookie = sets.find(set => set.id.toString() === cookieIdStr);
@@ -244,7 +401,6 @@ export const getActiveSoundSet = async () => {
     }
     
     // Then check localStorage as backup
-    const storedId = localStorage.getItem('activeSoundSetId');
     if (storedId) {
       const storedIdStr = storedId.toString();
       const foundByStorage = sets.find(set => set.id.toString() === storedIdStr);